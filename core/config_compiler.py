@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+Компилятор config.txt в аргументы nfqws и набор портов для файрвола.
+
+Раньше starter.sh разворачивал config.txt построчно в bash: на каждую строку
+около 17 подстановок ${line//...} и два вызова sed, затем ещё десяток конвейеров
+tr|grep|sed|paste|sort для портов. Здесь то же самое делается за один проход:
+
+  * плейсхолдеры списков ({list_general}, {tlsgoogle}, …) -> файлы во временной папке;
+  * {GameFilter} -> порты игр (для строк с --filter-tcp / --filter-udp отдельно);
+  * опции --wf-tcp= / --wf-udp= убираются, пробелы нормализуются;
+  * порты из --filter-tcp= / --filter-udp= собираются в отсортированный набор
+    диапазонов без повторов и пересечений (формат 80,443,1024-2048 для nftables
+    или 80,443,1024:2048 для iptables).
+
+С --workers N (N > 1) компилятор раскладывает nfqws на несколько процессов
+с очередями 200, 201, …: если в конфиге есть и TCP, и UDP, первая половина
+очередей получает только TCP-профили, вторая — только UDP (профили делятся по
+--new, профиль без --filter-tcp/--filter-udp попадает в обе группы); иначе все
+процессы получают полный набор аргументов. Файрвол распределяет соединения
+по очередям группы хешем адресов, так что пакеты одного соединения всегда
+приходят в один и тот же процесс.
+
+Результат кешируется по mtime/размеру и SHA-256 config.txt и значениям GameFilter.
+Временная папка в кеше хранится как метка FILES_TOKEN, поэтому новая папка mktemp
+при каждом запуске службы не сбрасывает кеш.
+
+Модуль использует только стандартную библиотеку: установщик копирует его в
+/opt/zapret, и starter.sh запускает копию, принадлежащую root, а не файл из
+домашней папки пользователя. Если компилятор недоступен, starter.sh
+разворачивает config.txt прежним способом.
+
+Запуск скриптом (вывод для eval в bash):
+    python3 config_compiler.py --config config.txt --files-dir /tmp/tmp.X \\
+        --fwtype nftables --game-filter off [--cache FILE] [--workers N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+COMPILER_VERSION = 1
+DEFAULT_CACHE_PATH = Path("/opt/zapret/cache/compiled_config.json")
+FILES_TOKEN = "@FILES@"
+
+DEFAULT_QNUM = 200
+MAX_WORKERS = 8
+
+# Значения {GameFilter}: порты игр при включённом фильтре, иначе GAMEFILTER_DISABLED_VALUE.
+# Единственный источник для Python (core.game_filter_settings импортирует их отсюда);
+# копию в compile_config_fallback starter.sh сверяет tests/test_game_filter_values.py.
+GAMEFILTER_DISABLED_VALUE = "12"
+GAMEFILTER_TCP_PORTS = "80,443,27000-27100,3074-3076"
+GAMEFILTER_UDP_PORTS = "3000-3010,5050-5060,27000-27100,3478-3481,3074-3076,4380,50000-50200,49152-52000"
+GAMEFILTER_OFF = "off"
+GAMEFILTER_STATES = ("off", "both", "tcp", "udp")
+
+# Плейсхолдеры config.txt -> имена файлов во временной папке; копию в compile_config_fallback
+# starter.sh сверяет tests/test_config_compiler.py
+PLACEHOLDER_FILES = {
+    "{list_general}": "list-general_merged.txt",
+    "{list_exclude}": "list-exclude_merged.txt",
+    "{ipset_exclude}": "ipset-exclude_merged.txt",
+    "{list_google}": "list-google.txt",
+    "{ipset_all}": "ipset-all_merged.txt",
+    "{ipset_all_user}": "ipset-all_merged.txt",
+    "{ipset_exclude_user}": "ipset-exclude_merged.txt",
+    "{list_general_user}": "list-general_merged.txt",
+    "{list_exclude_user}": "list-exclude_merged.txt",
+    "{gw}": "gw.txt",
+    "{other}": "other.txt",
+    "{quicgoogle}": "quic_initial_www_google_com.bin",
+    "{tlsgoogle}": "tls_clienthello_www_google_com.bin",
+    "{tls4pda}": "tls_clienthello_4pda_to.bin",
+    "{tlsmax}": "tls_clienthello_max_ru.bin",
+    "{stun}": "stun.bin",
+    "{dbankcloud}": "quic_initial_dbankcloud_ru.bin",
+}
+
+PortRange = Tuple[int, int]
+QueueRange = Tuple[int, int]
+
+
+def parse_ports(spec: str) -> List[PortRange]:
+    """Разбирает «80,443,1024-2048» (или 1024:2048) в список диапазонов; мусор пропускается"""
+    ranges = []
+    for item in spec.split(","):
+        item = item.strip().replace(":", "-")
+        if not item:
+            continue
+        low, sep, high = item.partition("-")
+        if not low.isdigit() or (sep and not high.isdigit()):
+            print(f"config_compiler: пропущен некорректный порт '{item}'", file=sys.stderr)
+            continue
+        first = int(low)
+        last = int(high) if sep else first
+        ranges.append((min(first, last), max(first, last)))
+    return ranges
+
+
+def normalize_ports(ranges: List[PortRange]) -> List[PortRange]:
+    """Сортирует диапазоны и сливает пересекающиеся и соседние"""
+    merged: List[List[int]] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return [(first, last) for first, last in merged]
+
+
+def game_filter_values(state: str) -> Tuple[str, str]:
+    """
+    Значения {GameFilter} для TCP и UDP.
+
+    :param state: off — фильтр выключен, иначе режим протоколов (both / tcp / udp)
+    """
+    if state == GAMEFILTER_OFF:
+        return GAMEFILTER_DISABLED_VALUE, GAMEFILTER_DISABLED_VALUE
+    if state == "tcp":
+        return GAMEFILTER_TCP_PORTS, GAMEFILTER_DISABLED_VALUE
+    if state == "udp":
+        return GAMEFILTER_DISABLED_VALUE, GAMEFILTER_UDP_PORTS
+    return GAMEFILTER_TCP_PORTS, GAMEFILTER_UDP_PORTS
+
+
+def format_ports(ranges: List[PortRange], fwtype: str = "nftables") -> str:
+    """Набор портов в формате файрвола: диапазоны через «-» (nftables) или «:» (iptables)"""
+    separator = ":" if fwtype == "iptables" else "-"
+    return ",".join(str(first) if first == last else f"{first}{separator}{last}" for first, last in ranges)
+
+
+def _expand_line(line: str, tcp_value: str, udp_value: str) -> List[str]:
+    """Одна строка config.txt -> аргументы nfqws (файлы — относительно FILES_TOKEN)"""
+    for placeholder, name in PLACEHOLDER_FILES.items():
+        if placeholder in line:
+            line = line.replace(placeholder, f"{FILES_TOKEN}/{name}")
+    if "{GameFilter}" in line:
+        if "--filter-tcp" in line:
+            line = line.replace("{GameFilter}", tcp_value)
+        elif "--filter-udp" in line:
+            line = line.replace("{GameFilter}", udp_value)
+    return [word for word in line.split() if not word.startswith(("--wf-tcp=", "--wf-udp="))]
+
+
+def _compile_template(text: str, game_filter: Tuple[str, str]) -> Dict:
+    """Компиляция без привязки к папке: в путях файлов остаётся FILES_TOKEN"""
+    tcp_value, udp_value = game_filter
+    argv: List[str] = []
+    tcp_ports: List[PortRange] = []
+    udp_ports: List[PortRange] = []
+    for line in text.splitlines():
+        for word in _expand_line(line, tcp_value, udp_value):
+            argv.append(word)
+            if word.startswith("--filter-tcp="):
+                tcp_ports.extend(parse_ports(word[len("--filter-tcp="):]))
+            elif word.startswith("--filter-udp="):
+                udp_ports.extend(parse_ports(word[len("--filter-udp="):]))
+    return {
+        "argv": argv,
+        "tcp_ports": normalize_ports(tcp_ports),
+        "udp_ports": normalize_ports(udp_ports),
+    }
+
+
+def _bind(template: Dict, files_dir: Path) -> Dict:
+    """Подставляет папку с файлами вместо FILES_TOKEN"""
+    folder = str(files_dir)
+    return {
+        "argv": [arg.replace(FILES_TOKEN, folder) for arg in template["argv"]],
+        "tcp_ports": [tuple(item) for item in template["tcp_ports"]],
+        "udp_ports": [tuple(item) for item in template["udp_ports"]],
+    }
+
+
+def compile_config_text(text: str, files_dir: Path, game_filter: Tuple[str, str]) -> Dict:
+    """
+    Компилирует текст config.txt (или файла стратегии).
+
+    :param files_dir: папка, где лежат списки и bin-файлы (с объединёнными *_merged.txt)
+    :param game_filter: значения {GameFilter} для TCP и UDP
+    :return: {"argv": [аргументы nfqws], "tcp_ports": [(от, до)], "udp_ports": [(от, до)]}
+    """
+    return _bind(_compile_template(text, game_filter), files_dir)
+
+
+def _load_cache(cache_path: Path) -> Dict:
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_path: Path, entry: Dict) -> None:
+    """Атомарная запись кеша; ошибки записи не мешают запуску службы"""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".compiled_", dir=str(cache_path.parent))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"config_compiler: кеш не сохранён: {e}", file=sys.stderr)
+
+
+def compile_config(config_path: Path, files_dir: Path, game_filter: Tuple[str, str],
+                   cache_path: Optional[Path] = DEFAULT_CACHE_PATH) -> Dict:
+    """
+    Компилирует config.txt с кешем.
+
+    Кеш действителен для того же файла, версии компилятора и значений GameFilter.
+    Если mtime и размер совпадают, файл даже не читается; если изменился только
+    mtime (файл перезаписан тем же содержимым), совпадение проверяется по SHA-256.
+
+    :return: как compile_config_text, плюс "cached": результат взят из кеша
+    """
+    config_path = Path(config_path)
+    stat = config_path.stat()
+    key = {
+        "version": COMPILER_VERSION,
+        "config": str(config_path.resolve()),
+        "game_filter": list(game_filter),
+    }
+
+    cache = _load_cache(cache_path) if cache_path else {}
+    if cache and cache.get("key") == key and "template" in cache:
+        if cache.get("mtime_ns") == stat.st_mtime_ns and cache.get("size") == stat.st_size:
+            result = _bind(cache["template"], files_dir)
+            result["cached"] = True
+            return result
+
+    data = config_path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    if cache and cache.get("key") == key and cache.get("sha256") == digest and "template" in cache:
+        template = cache["template"]
+        cached = True
+    else:
+        template = _compile_template(data.decode("utf-8", errors="ignore"), game_filter)
+        cached = False
+
+    if cache_path:
+        _save_cache(cache_path, {
+            "key": key,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": digest,
+            "template": template,
+        })
+
+    result = _bind(template, files_dir)
+    result["cached"] = cached
+    return result
+
+
+def split_profiles(argv: List[str]) -> List[List[str]]:
+    """Аргументы nfqws -> профили (разделитель --new не входит в профили)"""
+    profiles: List[List[str]] = [[]]
+    for arg in argv:
+        if arg == "--new":
+            profiles.append([])
+        else:
+            profiles[-1].append(arg)
+    return [profile for profile in profiles if profile]
+
+
+def profile_protocols(profile: List[str]) -> Tuple[str, ...]:
+    """Протоколы, пакеты которых может принять профиль: только tcp, только udp или оба"""
+    has_tcp = any(arg.startswith("--filter-tcp=") for arg in profile)
+    has_udp = any(arg.startswith("--filter-udp=") for arg in profile)
+    if has_tcp and not has_udp:
+        return ("tcp",)
+    if has_udp and not has_tcp:
+        return ("udp",)
+    return ("tcp", "udp")
+
+
+def protocol_argv(argv: List[str], protocol: str) -> List[str]:
+    """Аргументы nfqws только с профилями, которые могут принять пакеты протокола (порядок сохраняется)"""
+    result: List[str] = []
+    for profile in split_profiles(argv):
+        if protocol in profile_protocols(profile):
+            if result:
+                result.append("--new")
+            result.extend(profile)
+    return result
+
+
+def worker_layout(compiled: Dict, workers: int, qnum: int = DEFAULT_QNUM) -> Dict:
+    """
+    Раскладка nfqws по процессам.
+
+    :return: {"workers": [{"qnum", "protocol": "tcp"|"udp"|"all", "argv"}],
+              "tcp_queues": (первая, последняя), "udp_queues": (первая, последняя)}
+    """
+    workers = max(1, min(workers, MAX_WORKERS))
+    argv = compiled["argv"]
+    if workers > 1 and compiled["tcp_ports"] and compiled["udp_ports"]:
+        tcp_count = (workers + 1) // 2
+        tcp_argv = protocol_argv(argv, "tcp")
+        udp_argv = protocol_argv(argv, "udp")
+        layout = [{"qnum": qnum + i, "protocol": "tcp", "argv": tcp_argv} for i in range(tcp_count)]
+        layout += [{"qnum": qnum + i, "protocol": "udp", "argv": udp_argv} for i in range(tcp_count, workers)]
+        return {
+            "workers": layout,
+            "tcp_queues": (qnum, qnum + tcp_count - 1),
+            "udp_queues": (qnum + tcp_count, qnum + workers - 1),
+        }
+    return {
+        "workers": [{"qnum": qnum + i, "protocol": "all", "argv": argv} for i in range(workers)],
+        "tcp_queues": (qnum, qnum + workers - 1),
+        "udp_queues": (qnum, qnum + workers - 1),
+    }
+
+
+def format_queues(queues: QueueRange) -> str:
+    first, last = queues
+    return str(first) if first == last else f"{first}-{last}"
+
+
+def shell_assignments(compiled: Dict, fwtype: str, workers: int = 1) -> str:
+    """
+    Присваивания для eval в bash: массив NFQWS_ARGS и строки TCP_PORTS / UDP_PORTS,
+    а также раскладка по процессам: WORKER_QNUMS, WORKER_PROTOCOLS, NFQWS_ARGS_TCP /
+    NFQWS_ARGS_UDP (аргументы процессов группы) и TCP_QUEUES / UDP_QUEUES для файрвола.
+    """
+    def bash_array(values: List) -> str:
+        return "(" + " ".join(shlex.quote(str(value)) for value in values) + ")"
+
+    layout = worker_layout(compiled, workers)
+    by_protocol = {worker["protocol"]: worker["argv"] for worker in layout["workers"]}
+    return "\n".join([
+        f"NFQWS_ARGS={bash_array(compiled['argv'])}",
+        f"NFQWS_ARGS_TCP={bash_array(by_protocol.get('tcp', []))}",
+        f"NFQWS_ARGS_UDP={bash_array(by_protocol.get('udp', []))}",
+        f"WORKER_QNUMS={bash_array([worker['qnum'] for worker in layout['workers']])}",
+        f"WORKER_PROTOCOLS={bash_array([worker['protocol'] for worker in layout['workers']])}",
+        f"TCP_QUEUES={format_queues(layout['tcp_queues'])}",
+        f"UDP_QUEUES={format_queues(layout['udp_queues'])}",
+        f"TCP_PORTS={shlex.quote(format_ports(compiled['tcp_ports'], fwtype))}",
+        f"UDP_PORTS={shlex.quote(format_ports(compiled['udp_ports'], fwtype))}",
+        f"CONFIG_CACHED={'1' if compiled.get('cached') else '0'}",
+        "",
+    ])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Компиляция config.txt в аргументы nfqws")
+    parser.add_argument("--config", required=True, help="путь к config.txt")
+    parser.add_argument("--files-dir", required=True, help="временная папка со списками и bin-файлами")
+    parser.add_argument("--fwtype", default="nftables", choices=("nftables", "iptables"))
+    parser.add_argument("--game-filter", choices=GAMEFILTER_STATES,
+                        help="состояние GameFilter; значения берутся из game_filter_values")
+    parser.add_argument("--game-filter-tcp", default=GAMEFILTER_DISABLED_VALUE)
+    parser.add_argument("--game-filter-udp", default=GAMEFILTER_DISABLED_VALUE)
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE_PATH), help="файл кеша ('' — без кеша)")
+    parser.add_argument("--workers", type=int, default=1, help=f"число процессов nfqws (1–{MAX_WORKERS})")
+    args = parser.parse_args(argv)
+    if args.game_filter:
+        game_filter = game_filter_values(args.game_filter)
+    else:
+        game_filter = (args.game_filter_tcp, args.game_filter_udp)
+
+    try:
+        compiled = compile_config(
+            Path(args.config), Path(args.files_dir),
+            game_filter,
+            Path(args.cache) if args.cache else None,
+        )
+    except OSError as e:
+        print(f"config_compiler: {e}", file=sys.stderr)
+        return 1
+
+    sys.stdout.write(shell_assignments(compiled, args.fwtype, args.workers))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
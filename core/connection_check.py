@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Проверки окна «Проверка соединения» на общем движке проверок.
+
+Раньше окно по очереди вызывало curl (`subprocess.run`, таймауты 5–12 с) для
+каждого URL, и при заблокированной сети проверка длилась больше минуты.
+Теперь все цели — шлюз, сайты для проверки интернета, YouTube и Discord —
+запускаются одновременно через ProbeScheduler (core.probe_engine) и встроенный
+http_probe (core.http_probe), как в тестировщике стратегий. Результаты отдаются
+по мере завершения, поэтому вся проверка занимает примерно время самой
+медленной цели.
+
+Результат каждой цели — словарь:
+  ok      — цель считается доступной
+  level   — ok / warn / fail (для цвета строки в окне)
+  message — текст для лога
+  error_kind, http_code, duration_ms — данные проверки
+"""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from core.http_probe import ERROR_DNS, ERROR_RESET, ERROR_SSL, ERROR_TIMEOUT, http_probe
+from core.probe_engine import ProbeScheduler
+
+GROUP_LOCAL = "Локальная сеть"
+GROUP_INTERNET = "Интернет"
+GROUP_YOUTUBE = "YouTube"
+GROUP_DISCORD = "Discord"
+GROUP_ORDER = (GROUP_LOCAL, GROUP_INTERNET, GROUP_YOUTUBE, GROUP_DISCORD)
+
+LEVEL_OK = "ok"
+LEVEL_WARN = "warn"
+LEVEL_FAIL = "fail"
+
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+GATEWAY_PING_TIMEOUT = 5.0
+SERVICE_STATUS_TIMEOUT = 3.0
+
+# kind: gateway — ping шлюза по умолчанию; http — запрос через http_probe.
+# expected — коды, которые считаются успехом (иначе — правила группы в _judge_http).
+CHECK_TARGETS: List[Dict] = [
+    {"group": GROUP_LOCAL, "name": "Шлюз", "kind": "gateway"},
+    {"group": GROUP_INTERNET, "name": "Google", "kind": "http",
+     "url": "https://www.google.com", "method": "HEAD", "total_timeout": 5, "follow_redirects": False},
+    {"group": GROUP_INTERNET, "name": "Cloudflare", "kind": "http",
+     "url": "https://1.1.1.1", "method": "HEAD", "total_timeout": 5, "follow_redirects": False},
+    {"group": GROUP_INTERNET, "name": "Yandex", "kind": "http",
+     "url": "https://ya.ru", "method": "HEAD", "total_timeout": 5, "follow_redirects": False},
+    {"group": GROUP_YOUTUBE, "name": "youtube.com", "kind": "http",
+     "url": "https://www.youtube.com/", "method": "HEAD", "total_timeout": 10, "follow_redirects": True},
+    {"group": GROUP_YOUTUBE, "name": "generate_204", "kind": "http",
+     "url": "https://rr2---sn-axq7sn7z.googlevideo.com/generate_204", "method": "HEAD",
+     "total_timeout": 10, "follow_redirects": True},
+    {"group": GROUP_YOUTUBE, "name": "YouTube API", "kind": "http",
+     "url": "https://www.googleapis.com/youtube/v3/videos?id=dQw4w9WgXcQ&key=test", "method": "GET",
+     "total_timeout": 10, "follow_redirects": True},
+    {"group": GROUP_YOUTUBE, "name": "YouTube Images", "kind": "http",
+     "url": "https://i.ytimg.com/vi/dQw4w9WgXcQ/mqdefault.jpg", "method": "HEAD",
+     "total_timeout": 10, "follow_redirects": True},
+    {"group": GROUP_DISCORD, "name": "Discord Website", "kind": "http",
+     "url": "https://discord.com/", "method": "HEAD", "total_timeout": 5, "follow_redirects": False,
+     "expected": [200, 301, 302]},
+    {"group": GROUP_DISCORD, "name": "Discord API", "kind": "http",
+     "url": "https://discord.com/api/v9/gateway", "method": "GET", "total_timeout": 5,
+     "follow_redirects": False, "expected": [200, 400, 401]},
+]
+
+
+def _verdict(ok: bool, level: str, message: str, **extra) -> Dict:
+    result = {"ok": ok, "level": level, "message": message,
+              "error_kind": "", "http_code": 0, "duration_ms": 0}
+    result.update(extra)
+    return result
+
+
+async def _run_process(argv: List[str], timeout: float) -> Tuple[int, str]:
+    """Запускает процесс без shell; (код возврата, stdout). Таймаут — код -1"""
+    proc = await asyncio.create_subprocess_exec(
+        *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return -1, ""
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+    return proc.returncode, stdout.decode("utf-8", errors="replace")
+
+
+async def get_service_status(unit: str = "zapret") -> str:
+    """Статус службы из `systemctl is-active` (active, inactive, timeout, error: ...)"""
+    try:
+        returncode, stdout = await _run_process(["systemctl", "is-active", unit], SERVICE_STATUS_TIMEOUT)
+    except (OSError, ValueError) as e:
+        return f"error: {e}"
+    if returncode == -1:
+        return "timeout"
+    return stdout.strip()
+
+
+async def probe_gateway(target: Dict) -> Dict:
+    """Шлюз по умолчанию из `ip route show default` и его ping"""
+    try:
+        _, routes = await _run_process(["ip", "route", "show", "default"], GATEWAY_PING_TIMEOUT)
+        parts = routes.strip().split("\n")[0].split()
+        if len(parts) < 3:
+            return _verdict(False, LEVEL_FAIL, "Шлюз не найден")
+        gateway = parts[2]
+        returncode, _ = await _run_process(["ping", "-c", "2", "-W", "1", gateway], GATEWAY_PING_TIMEOUT)
+    except (OSError, ValueError) as e:
+        return _verdict(False, LEVEL_FAIL, f"Ошибка: {e}")
+    if returncode == 0:
+        return _verdict(True, LEVEL_OK, f"Шлюз {gateway} доступен", gateway=gateway)
+    return _verdict(False, LEVEL_FAIL, f"Шлюз {gateway} недоступен", gateway=gateway)
+
+
+def _describe_error(error_kind: str, error: str) -> Tuple[str, str]:
+    """(уровень, текст) для запроса без HTTP-ответа — как раньше по stderr curl"""
+    if error_kind == ERROR_DNS:
+        return LEVEL_FAIL, "DNS блокировка - не удалось разрешить хост"
+    if error_kind == ERROR_SSL:
+        return LEVEL_FAIL, "SSL handshake ошибка - вероятная DPI блокировка"
+    if error_kind == ERROR_RESET:
+        return LEVEL_FAIL, "Соединение сброшено - блокировка"
+    if error_kind == ERROR_TIMEOUT:
+        return LEVEL_WARN, "Таймаут - возможная DPI блокировка"
+    return LEVEL_FAIL, f"Ошибка: {(error or 'неизвестная ошибка')[:80]}"
+
+
+def _judge_http(target: Dict, code: int) -> Tuple[bool, str, str]:
+    """(успех, уровень, пояснение) по HTTP-коду с правилами группы цели"""
+    expected = target.get("expected")
+    if expected is not None:
+        if code in expected or 200 <= code < 300:
+            return True, LEVEL_OK, ""
+        return False, LEVEL_WARN, "неожиданный код"
+
+    if target["group"] == GROUP_INTERNET:
+        if code < 400:
+            return True, LEVEL_OK, ""
+        return False, LEVEL_WARN, "неожиданный код"
+
+    if target["name"] == "YouTube API":
+        # Тестовый ключ: ошибка ключа означает, что API отвечает
+        if code in (400, 403, 404):
+            return True, LEVEL_OK, "ожидаемая ошибка ключа"
+        if code == 429:
+            return False, LEVEL_FAIL, "лимит запросов"
+        if code == 200:
+            return True, LEVEL_WARN, "неожиданно для тестового ключа"
+        return False, LEVEL_WARN, "неожиданный ответ"
+
+    if code in (200, 204):
+        return True, LEVEL_OK, ""
+    if code == 404:
+        return False, LEVEL_WARN, "endpoint не найден"
+    if code in (403, 429):
+        return False, LEVEL_FAIL, "блокировка"
+    if code in (301, 302, 307, 308):
+        return True, LEVEL_WARN, "редирект"
+    return False, LEVEL_WARN, "неожиданный ответ"
+
+
+async def probe_http(target: Dict) -> Dict:
+    """HTTP(S)-проверка цели через http_probe с оценкой кода ответа"""
+    probe = await http_probe(
+        target["url"],
+        method=target.get("method", "HEAD"),
+        headers={"User-Agent": BROWSER_USER_AGENT},
+        connect_timeout=5,
+        total_timeout=target.get("total_timeout", 10),
+        follow_redirects=target.get("follow_redirects", True),
+    )
+    duration_ms = round(probe["timings"]["total"] * 1000)
+    code = probe["http_code"]
+    if not probe["ok"]:
+        level, message = _describe_error(probe["error_kind"], probe["error"])
+        return _verdict(False, level, message, error_kind=probe["error_kind"],
+                        http_code=code, duration_ms=duration_ms)
+
+    ok, level, note = _judge_http(target, code)
+    message = f"HTTP {code} ({duration_ms} мс)"
+    if note:
+        message += f" - {note}"
+    return _verdict(ok, level, message, http_code=code, duration_ms=duration_ms)
+
+
+async def probe_target(target: Dict) -> Dict:
+    """Проверка одной цели; исключение не прерывает остальные проверки"""
+    try:
+        if target["kind"] == "gateway":
+            return await probe_gateway(target)
+        return await probe_http(target)
+    except Exception as e:
+        return _verdict(False, LEVEL_FAIL, f"Системная ошибка: {str(e)[:80]}")
+
+
+async def stream_checks(
+    targets: Optional[List[Dict]] = None,
+    stop_check: Optional[Callable[[], bool]] = None,
+) -> AsyncIterator[Tuple[Dict, Dict]]:
+    """
+    Запускает все цели одновременно и отдаёт (цель, результат) по мере завершения.
+
+    Лимит параллельности равен числу целей: ждать слота не приходится, а лимит
+    на хост (discord.com) оставлен по умолчанию.
+    """
+    targets = CHECK_TARGETS if targets is None else targets
+    scheduler = ProbeScheduler(max_concurrency=len(targets) or 1, stop_check=stop_check)
+    async with aclosing(scheduler.run_as_completed(targets, probe_target)) as results:
+        async for target, result in results:
+            yield target, result
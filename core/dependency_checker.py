@@ -18,6 +18,7 @@ from core.platform_info import (
     dependency_package_name,
     install_command_for_package,
 )
+from core.privileged import run_privileged
 
 class DependencyChecker:
     def __init__(
@@ -250,24 +251,17 @@ class DependencyChecker:
         self.log_debug(f"Выполнение команды: sudo {' '.join(command)}")
 
         try:
-            process = subprocess.Popen(
-                ['sudo', '-S'] + command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            stdout, stderr = process.communicate(input=self.sudo_password + '\n')
+            result = run_privileged(command, self.sudo_password)
+            stdout, stderr = result['stdout'], result['stderr']
 
-            self.log_debug(f"Результат команды: код={process.returncode}")
+            self.log_debug(f"Результат команды: код={result['returncode']}")
             if stdout:
                 self.log_debug(f"stdout: {stdout[:200]}...")
             if stderr:
                 self.log_debug(f"stderr: {stderr[:200]}...")
 
             self.last_command_result = {
-                'returncode': process.returncode,
+                'returncode': result['returncode'],
                 'stdout': stdout,
                 'stderr': stderr,
                 'command': ' '.join(command)
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+Правила файрвола службы zapret: трафик на порты из config.txt -> очередь NFQUEUE nfqws.
+
+Для nftables вместо семи отдельных вызовов nft add с анонимными наборами
+{ $TCP_PORTS } генерируется один скрипт для nft -f: таблица inet zapret
+пересоздаётся целиком и атомарно, порты лежат в именованных интервальных
+наборах tcp_ports / udp_ports, а правила ссылаются на них (@tcp_ports).
+
+Поэтому смена портов (например, при переключении GameFilter) не требует
+пересоздавать таблицу: nft_set_update_script заменяет только содержимое
+наборов, тоже одной транзакцией. Правила остаются на месте и при пустом
+наборе (такое правило просто ничего не совпадает), чтобы порты можно было
+добавить позже обновлением набора.
+
+Для iptables вместо четырёх вызовов iptables/ip6tables -I на каждый интерфейс,
+цепочку и протокол (каждый берёт xtables lock и перечитывает всю таблицу mangle)
+собирается по одному входу для iptables-restore --noflush и ip6tables-restore:
+правила лежат в своих цепочках ZAPRET_POST / ZAPRET_PRE, а в POSTROUTING /
+PREROUTING добавляется только переход в них. Остановка удаляет эти цепочки
+и переходы тоже одним вызовом restore, не очищая чужие правила в mangle.
+Прямые правила NFQUEUE прежнего starter.sh (он вставлял их сразу в POSTROUTING /
+PREROUTING) удаляются тем же вызовом при запуске и остановке службы.
+
+Если nfqws запущен несколькими процессами (config_compiler --workers), TCP и UDP
+отправляются в свои диапазоны очередей (--tcp-queues 200-201 --udp-queues 202-203):
+в nftables — queue num 200-201, в iptables — --queue-balance 200:201. Ядро выбирает
+очередь хешем адресов, поэтому оба направления соединения попадают в один процесс.
+
+Модуль использует только стандартную библиотеку: установщик копирует его
+в /opt/zapret рядом с config_compiler.py; starter.sh передаёт скрипт в nft -f
+или применяет правила iptables через --apply, stopper.sh снимает их через --remove.
+
+Запуск скриптом:
+    python3 firewall_rules.py --tcp-ports 80,443 --udp-ports 443,50000-50100 [--sets-only]
+    python3 firewall_rules.py --fwtype iptables --tcp-ports 80,443 [--apply | --remove]
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+from typing import List, Optional, Set, Tuple
+
+try:
+    from core.config_compiler import normalize_ports, parse_ports
+except ImportError:
+    # Копия в /opt/zapret рядом с config_compiler.py
+    from config_compiler import normalize_ports, parse_ports
+
+NFT_TABLE = "zapret"
+TCP_SET = "tcp_ports"
+UDP_SET = "udp_ports"
+DEFAULT_QNUM = 200
+
+IPT_CHAIN_POST = "ZAPRET_POST"
+IPT_CHAIN_PRE = "ZAPRET_PRE"
+IPT_JUMPS = (("POSTROUTING", IPT_CHAIN_POST), ("PREROUTING", IPT_CHAIN_PRE))
+IPT_FAMILIES = ("iptables", "ip6tables")
+
+# multiport принимает не больше 15 портов, диапазон считается за два
+MULTIPORT_MAX_SLOTS = 15
+
+PortRange = Tuple[int, int]
+QueueRange = Tuple[int, int]
+
+
+def parse_queues(spec: str, default: int = DEFAULT_QNUM) -> QueueRange:
+    """«200» или «200-203» -> (первая, последняя); пустая строка — одна очередь default"""
+    spec = (spec or "").strip().replace(":", "-")
+    if not spec:
+        return default, default
+    first, _, last = spec.partition("-")
+    first_num = int(first)
+    return first_num, int(last) if last else first_num
+
+
+def _nft_queue(queues: QueueRange) -> str:
+    first, last = queues
+    return f"queue num {first} bypass" if first == last else f"queue num {first}-{last} bypass"
+
+
+def _ipt_queue(queues: QueueRange) -> str:
+    first, last = queues
+    if first == last:
+        return f"--queue-num {first} --queue-bypass"
+    return f"--queue-balance {first}:{last} --queue-bypass"
+
+
+def _port_ranges(spec: str) -> List[PortRange]:
+    """Порты из строки 80,443,1024-2048 (или 1024:2048) без пересечений — иначе интервальный набор их не примет"""
+    return normalize_ports(parse_ports(spec or ""))
+
+
+def _set_elements(ranges: List[PortRange]) -> str:
+    return ", ".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def _set_definition(name: str, ranges: List[PortRange]) -> List[str]:
+    lines = [
+        f"    set {name} {{",
+        "        type inet_service;",
+        "        flags interval;",
+    ]
+    if ranges:
+        lines.append(f"        elements = {{ {_set_elements(ranges)} }}")
+    lines.append("    }")
+    return lines
+
+
+def nft_ruleset_script(tcp_ports: str, udp_ports: str, tcp_queues: QueueRange = (DEFAULT_QNUM, DEFAULT_QNUM),
+                       udp_queues: QueueRange = (DEFAULT_QNUM, DEFAULT_QNUM)) -> str:
+    """
+    Скрипт для nft -f: таблица inet zapret с наборами портов и правилами (пересоздаётся атомарно).
+
+    :param tcp_ports: порты TCP в формате config_compiler.format_ports
+    :param udp_ports: порты UDP
+    :param tcp_queues: очереди nfqws для TCP (первая, последняя)
+    :param udp_queues: очереди nfqws для UDP
+    """
+    tcp = _port_ranges(tcp_ports)
+    udp = _port_ranges(udp_ports)
+    tcp_queue = _nft_queue(tcp_queues)
+    udp_queue = _nft_queue(udp_queues)
+    return "\n".join([
+        f"add table inet {NFT_TABLE}",
+        f"delete table inet {NFT_TABLE}",
+        f"table inet {NFT_TABLE} {{",
+        *_set_definition(TCP_SET, tcp),
+        *_set_definition(UDP_SET, udp),
+        "    chain postrouting {",
+        "        type filter hook postrouting priority mangle;",
+        f"        tcp dport @{TCP_SET} ct original packets 1-12 {tcp_queue}",
+        f"        udp dport @{UDP_SET} ct original packets 1-12 {udp_queue}",
+        "    }",
+        "    chain prerouting {",
+        "        type filter hook prerouting priority mangle;",
+        f"        tcp sport @{TCP_SET} ct reply packets 1-6 {tcp_queue}",
+        f"        udp sport @{UDP_SET} ct reply packets 1-6 {udp_queue}",
+        "    }",
+        "}",
+        "",
+    ])
+
+
+def nft_set_update_script(tcp_ports: str, udp_ports: str) -> str:
+    """Скрипт для nft -f, который заменяет только содержимое наборов портов (одной транзакцией)"""
+    lines = []
+    for name, ranges in ((TCP_SET, _port_ranges(tcp_ports)), (UDP_SET, _port_ranges(udp_ports))):
+        lines.append(f"flush set inet {NFT_TABLE} {name}")
+        if ranges:
+            lines.append(f"add element inet {NFT_TABLE} {name} {{ {_set_elements(ranges)} }}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def multiport_chunks(ranges: List[PortRange]) -> List[str]:
+    """Порты для -m multiport группами не больше MULTIPORT_MAX_SLOTS (диапазоны через «:»)"""
+    chunks: List[str] = []
+    current: List[str] = []
+    slots = 0
+    for first, last in ranges:
+        cost = 1 if first == last else 2
+        if current and slots + cost > MULTIPORT_MAX_SLOTS:
+            chunks.append(",".join(current))
+            current, slots = [], 0
+        current.append(str(first) if first == last else f"{first}:{last}")
+        slots += cost
+    if current:
+        chunks.append(",".join(current))
+    return chunks
+
+
+def parse_iptables_save(save_output: str) -> Tuple[Set[str], Set[Tuple[str, str]]]:
+    """
+    Цепочки службы и переходы в них из вывода iptables-save -t mangle.
+
+    :return: (имена существующих цепочек ZAPRET_*, {(встроенная цепочка, цепочка службы)})
+    """
+    ours = {IPT_CHAIN_POST, IPT_CHAIN_PRE}
+    chains = set()
+    jumps = set()
+    for line in save_output.splitlines():
+        if line.startswith(":"):
+            name = line[1:].split(" ", 1)[0]
+            if name in ours:
+                chains.add(name)
+        elif line.startswith("-A "):
+            for hook, chain in IPT_JUMPS:
+                if line == f"-A {hook} -j {chain}":
+                    jumps.add((hook, chain))
+    return chains, jumps
+
+
+def legacy_nfqueue_rules(save_output: str) -> List[str]:
+    """
+    Прямые правила прежнего starter.sh из вывода iptables-save -t mangle.
+
+    Старый запуск вставлял правила NFQUEUE с connbytes и --queue-bypass сразу
+    в POSTROUTING / PREROUTING; правила других программ без этих признаков не трогаются.
+
+    :return: спецификации правил без «-A» в порядке вывода
+    """
+    hooks = {hook for hook, _chain in IPT_JUMPS}
+    rules = []
+    for line in save_output.splitlines():
+        parts = line.split(" ", 2)
+        if len(parts) < 3 or parts[0] != "-A" or parts[1] not in hooks:
+            continue
+        if "-j NFQUEUE" in line and "--queue-bypass" in line and "-m connbytes" in line:
+            rules.append(line[len("-A "):])
+    return rules
+
+
+def _ipt_rules(chain: str, iface_arg: str, ifaces: List[str], proto: str, ports: List[PortRange],
+               connbytes: str, queues: QueueRange) -> List[str]:
+    """Правила одной цепочки: как add_ipt_rule в starter.sh (--dports и --sports, на каждый интерфейс)"""
+    rules = []
+    for iface in ifaces or [None]:
+        match_iface = f"{iface_arg} {iface} " if iface else ""
+        for chunk in multiport_chunks(ports):
+            for direction in ("--dports", "--sports"):
+                rules.append(
+                    f"-A {chain} {match_iface}-p {proto} -m multiport {direction} {chunk} {connbytes} "
+                    f"-j NFQUEUE {_ipt_queue(queues)}"
+                )
+    return rules
+
+
+def iptables_restore_payload(tcp_ports: str, udp_ports: str, wan_ifaces: List[str] = (),
+                             lan_ifaces: List[str] = (),
+                             tcp_queues: QueueRange = (DEFAULT_QNUM, DEFAULT_QNUM),
+                             udp_queues: QueueRange = (DEFAULT_QNUM, DEFAULT_QNUM),
+                             save_output: str = "") -> str:
+    """
+    Вход для iptables-restore --noflush (одинаковый для ip6tables-restore).
+
+    Объявление цепочки службы при --noflush очищает её, поэтому повторное применение
+    заменяет правила; переходы добавляются, только если их ещё нет в save_output.
+    Прямые правила прежнего starter.sh из save_output удаляются.
+    """
+    _chains, jumps = parse_iptables_save(save_output)
+    legacy = legacy_nfqueue_rules(save_output)
+    tcp = _port_ranges(tcp_ports)
+    udp = _port_ranges(udp_ports)
+    original = "-m connbytes --connbytes-dir=original --connbytes-mode=packets --connbytes 1:12"
+    reply = "-m connbytes --connbytes-dir=reply --connbytes-mode=packets --connbytes 1:6"
+
+    groups = (("tcp", tcp, tcp_queues), ("udp", udp, udp_queues))
+    lines = ["*mangle", f":{IPT_CHAIN_POST} - [0:0]", f":{IPT_CHAIN_PRE} - [0:0]"]
+    lines += [f"-D {rule}" for rule in legacy]
+    for proto, ports, queues in groups:
+        lines += _ipt_rules(IPT_CHAIN_POST, "-o", list(wan_ifaces), proto, ports, original, queues)
+    for proto, ports, queues in groups:
+        lines += _ipt_rules(IPT_CHAIN_PRE, "-i", list(lan_ifaces), proto, ports, reply, queues)
+    for hook, chain in IPT_JUMPS:
+        if (hook, chain) not in jumps:
+            lines.append(f"-I {hook} 1 -j {chain}")
+    lines += ["COMMIT", ""]
+    return "\n".join(lines)
+
+
+def iptables_remove_payload(save_output: str) -> str:
+    """Вход для iptables-restore --noflush, удаляющий переходы, цепочки службы и legacy-правила ("" — удалять нечего)"""
+    chains, jumps = parse_iptables_save(save_output)
+    legacy = legacy_nfqueue_rules(save_output)
+    if not chains and not jumps and not legacy:
+        return ""
+    lines = ["*mangle"]
+    lines += [f"-D {rule}" for rule in legacy]
+    lines += [f"-D {hook} -j {chain}" for hook, chain in IPT_JUMPS if (hook, chain) in jumps]
+    lines += [f"-F {chain}" for chain in sorted(chains)]
+    lines += [f"-X {chain}" for chain in sorted(chains)]
+    lines += ["COMMIT", ""]
+    return "\n".join(lines)
+
+
+def _run(command: List[str], payload: Optional[str] = None) -> Tuple[bool, str]:
+    try:
+        process = subprocess.run(command, input=payload, capture_output=True, text=True, timeout=15)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return False, str(e)
+    return process.returncode == 0, (process.stderr or process.stdout).strip()
+
+
+def apply_iptables(tcp_ports: str, udp_ports: str, wan_ifaces: List[str] = (),
+                   lan_ifaces: List[str] = (),
+                   tcp_queues: QueueRange = (DEFAULT_QNUM, DEFAULT_QNUM),
+                   udp_queues: QueueRange = (DEFAULT_QNUM, DEFAULT_QNUM)) -> Tuple[bool, str]:
+    """Применяет правила для iptables и ip6tables: по одному iptables-save и одному restore на семейство"""
+    for family in IPT_FAMILIES:
+        ok, save_output = _run([f"{family}-save", "-t", "mangle"])
+        if not ok:
+            return False, f"{family}-save: {save_output}"
+        payload = iptables_restore_payload(tcp_ports, udp_ports, wan_ifaces, lan_ifaces,
+                                           tcp_queues, udp_queues, save_output)
+        ok, output = _run([f"{family}-restore", "--noflush"], payload)
+        if not ok:
+            return False, f"{family}-restore: {output}"
+    return True, "iptables"
+
+
+def remove_iptables() -> Tuple[bool, str]:
+    """Удаляет цепочки службы и переходы в них для iptables и ip6tables"""
+    for family in IPT_FAMILIES:
+        ok, save_output = _run([f"{family}-save", "-t", "mangle"])
+        if not ok:
+            return False, f"{family}-save: {save_output}"
+        payload = iptables_remove_payload(save_output)
+        if payload:
+            ok, output = _run([f"{family}-restore", "--noflush"], payload)
+            if not ok:
+                return False, f"{family}-restore: {output}"
+    return True, "iptables"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Правила файрвола службы zapret")
+    parser.add_argument("--fwtype", default="nftables", choices=("nftables", "iptables"))
+    parser.add_argument("--tcp-ports", default="", help="порты TCP (80,443,1024-2048)")
+    parser.add_argument("--udp-ports", default="", help="порты UDP")
+    parser.add_argument("--qnum", type=int, default=DEFAULT_QNUM, help="номер очереди NFQUEUE")
+    parser.add_argument("--tcp-queues", default="", help="очереди для TCP (200 или 200-201; по умолчанию --qnum)")
+    parser.add_argument("--udp-queues", default="", help="очереди для UDP (по умолчанию --qnum)")
+    parser.add_argument("--wan", default="", help="iptables: исходящие интерфейсы через пробел")
+    parser.add_argument("--lan", default="", help="iptables: входящие интерфейсы через пробел")
+    parser.add_argument("--sets-only", action="store_true", help="nftables: только заменить содержимое наборов портов")
+    parser.add_argument("--apply", action="store_true", help="iptables: применить правила")
+    parser.add_argument("--remove", action="store_true", help="iptables: удалить цепочки службы")
+    args = parser.parse_args(argv)
+    tcp_queues = parse_queues(args.tcp_queues, args.qnum)
+    udp_queues = parse_queues(args.udp_queues, args.qnum)
+
+    if args.fwtype == "iptables":
+        if args.remove:
+            ok, message = remove_iptables()
+        elif args.apply:
+            ok, message = apply_iptables(args.tcp_ports, args.udp_ports, args.wan.split(), args.lan.split(),
+                                         tcp_queues, udp_queues)
+        else:
+            sys.stdout.write(iptables_restore_payload(args.tcp_ports, args.udp_ports, args.wan.split(),
+                                                      args.lan.split(), tcp_queues, udp_queues))
+            return 0
+        if not ok:
+            print(f"firewall_rules: {message}", file=sys.stderr)
+        return 0 if ok else 1
+
+    if args.sets_only:
+        sys.stdout.write(nft_set_update_script(args.tcp_ports, args.udp_ports))
+    else:
+        sys.stdout.write(nft_ruleset_script(args.tcp_ports, args.udp_ports, tcp_queues, udp_queues))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
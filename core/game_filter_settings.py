@@ -5,6 +5,13 @@ from __future__ import annotations
 
 import os
 
+from core.config_compiler import (
+    GAMEFILTER_DISABLED_VALUE,
+    GAMEFILTER_OFF,
+    GAMEFILTER_TCP_PORTS,
+    GAMEFILTER_UDP_PORTS,
+    game_filter_values,
+)
 from core.game_presets import get_manager_dir
 
 GAMEFILTER_PROTOCOL_BOTH = "both"
@@ -77,3 +84,10 @@ def disable_standalone_gamefilter(manager_dir: str | None = None) -> None:
     except OSError:
         pass
     remove_game_filter_protocol_mode_file(manager_dir)
+
+
+def game_filter_port_values(manager_dir: str | None = None) -> tuple[str, str]:
+    """Значения {GameFilter} для TCP и UDP с учётом gamefilter.enable и gamefilter.mode."""
+    if not os.path.isfile(get_game_filter_enable_file(manager_dir)):
+        return game_filter_values(GAMEFILTER_OFF)
+    return game_filter_values(read_game_filter_protocol_mode(manager_dir))
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Нормализация hostlist-списков для nfqws (--hostlist / --hostlist-exclude).
+
+nfqws сравнивает хосты по суффиксу домена: запись example.com покрывает и
+www.example.com, и a.b.example.com. Списки же объединялись точным сравнением
+строк, поэтому в них оставались поддомены уже покрытых доменов, а также
+варианты одного домена в разном регистре или с точкой в конце. Здесь список
+приводится к минимальному виду:
+
+  * регистр понижается, IDN-домены переводятся в punycode (IDNA);
+  * префиксы «*.» и «.», а также завершающая точка убираются;
+  * повторы и поддомены, покрытые родителем из того же списка, отбрасываются
+    (дерево по меткам домена в обратном порядке: com -> example -> www);
+  * записи «^домен» (без поддоменов) сохраняются, если их не покрывает родитель;
+  * комментарии и пустые строки отбрасываются, нераспознанные строки
+    сохраняются в конце без изменений.
+
+find_conflicts ищет записи включающего списка, которые целиком покрыты
+списком исключений: такие домены nfqws никогда не обработает.
+
+Модуль использует только стандартную библиотеку: вместе с core/list_cache.py
+он копируется в /opt/zapret и применяется к hostlist-спискам при запуске службы.
+
+Запуск скриптом (отчёт; с -o — запись результата, с --exclude — проверка конфликтов):
+    python3 hostlist_compiler.py files/lists/list-general.txt [-o out.txt] \\
+        [--exclude files/lists/list-exclude.txt]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+EXACT_PREFIX = "^"
+
+_TERMINAL = ""  # ключ узла дерева: домен записан в список
+
+
+def normalize_domain(entry: str) -> Optional[str]:
+    """
+    Запись списка -> нормализованный домен (с «^», если он был) или None,
+    если запись не похожа на домен.
+    """
+    exact = entry.startswith(EXACT_PREFIX)
+    if exact:
+        entry = entry[len(EXACT_PREFIX):]
+    if entry.startswith("*."):
+        entry = entry[2:]
+    entry = entry.strip(".").lower()
+    if not entry or any(ch.isspace() for ch in entry) or ".." in entry:
+        return None
+    if not entry.isascii():
+        try:
+            entry = entry.encode("idna").decode("ascii")
+        except UnicodeError:
+            return None
+    return EXACT_PREFIX + entry if exact else entry
+
+
+def _labels(domain: str) -> List[str]:
+    """Метки домена от зоны верхнего уровня: www.example.com -> [com, example, www]"""
+    return domain.lstrip(EXACT_PREFIX).split(".")[::-1]
+
+
+class DomainTrie:
+    """Дерево доменов по меткам в обратном порядке для проверки покрытия по суффиксу"""
+
+    def __init__(self, domains: Iterable[str] = ()):
+        self.root: Dict = {}
+        for domain in domains:
+            self.add(domain)
+
+    def add(self, domain: str) -> None:
+        """Добавляет домен, покрывающий поддомены (записи «^домен» ничего не покрывают)"""
+        if domain.startswith(EXACT_PREFIX):
+            return
+        node = self.root
+        for label in _labels(domain):
+            node = node.setdefault(label, {})
+        node[_TERMINAL] = True
+
+    def covering(self, domain: str, strict: bool = False) -> Optional[str]:
+        """
+        Домен дерева, который покрывает domain (сам domain или его родитель), иначе None.
+
+        :param strict: учитывать только родителей, но не сам домен
+        """
+        labels = _labels(domain)
+        node = self.root
+        for depth, label in enumerate(labels, start=1):
+            node = node.get(label)
+            if node is None:
+                return None
+            if node.get(_TERMINAL) and (depth < len(labels) or not strict):
+                return ".".join(labels[:depth][::-1])
+        return None
+
+
+def compile_lines(lines: Iterable[str]) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Нормализует hostlist и убирает повторы и покрытые поддомены (порядок первых вхождений сохраняется).
+
+    :return: (строки результата; статистика {"before", "after", "duplicates", "covered", "invalid"})
+    """
+    domains: List[str] = []
+    invalid: List[str] = []
+    total = 0
+    for line in lines:
+        entry = line.strip()
+        if not entry or entry.startswith("#"):
+            continue
+        total += 1
+        domain = normalize_domain(entry)
+        if domain is None:
+            if entry not in invalid:
+                invalid.append(entry)
+            continue
+        domains.append(domain)
+
+    trie = DomainTrie(domains)
+    result: List[str] = []
+    seen = set()
+    duplicates = covered = 0
+    for domain in domains:
+        if domain in seen:
+            duplicates += 1
+            continue
+        seen.add(domain)
+        # «^домен» покрывается и самим доменом без «^»
+        if trie.covering(domain, strict=not domain.startswith(EXACT_PREFIX)):
+            covered += 1
+            continue
+        result.append(domain)
+    result += invalid
+
+    stats = {
+        "before": total,
+        "after": len(result),
+        "duplicates": duplicates,
+        "covered": covered,
+        "invalid": len(invalid),
+    }
+    return result, stats
+
+
+def compile_bytes(data: bytes) -> Tuple[bytes, Dict[str, int]]:
+    """compile_lines для содержимого файла; результат — строки, завершённые \\n"""
+    lines, stats = compile_lines(data.decode("utf-8", errors="ignore").splitlines())
+    return "".join(line + "\n" for line in lines).encode("utf-8"), stats
+
+
+def find_conflicts(include: Iterable[str], exclude: Iterable[str]) -> List[Tuple[str, str]]:
+    """
+    Записи включающего списка, целиком покрытые исключениями (исключение у nfqws главнее).
+
+    :return: [(запись include, покрывающая запись exclude)]
+    """
+    exclude_domains = [domain for domain in map(normalize_domain, (e.strip() for e in exclude)) if domain]
+    trie = DomainTrie(exclude_domains)
+    exact = {domain[len(EXACT_PREFIX):] for domain in exclude_domains if domain.startswith(EXACT_PREFIX)}
+    conflicts = []
+    for entry in include:
+        domain = normalize_domain(entry.strip())
+        if not domain:
+            continue
+        name = domain.lstrip(EXACT_PREFIX)
+        cover = trie.covering(domain)
+        if cover is None and name in exact:
+            cover = EXACT_PREFIX + name
+        if cover is not None:
+            conflicts.append((domain, cover))
+    return conflicts
+
+
+def format_stats(stats: Dict[str, int]) -> str:
+    """Краткая строка: «79 -> 70 записей (повторов 2, покрыто родителем 7)»"""
+    text = (f"{stats['before']} -> {stats['after']} записей "
+            f"(повторов {stats['duplicates']}, покрыто родителем {stats['covered']})")
+    if stats["invalid"]:
+        text += f", нераспознано: {stats['invalid']}"
+    return text
+
+
+def _read_lines(paths: List[str]) -> List[str]:
+    lines: List[str] = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нормализация и сокращение hostlist-списков nfqws")
+    parser.add_argument("files", nargs="+", help="hostlist-списки (объединяются)")
+    parser.add_argument("-o", "--output", help="куда записать результат")
+    parser.add_argument("--exclude", nargs="*", default=[], help="списки исключений для проверки конфликтов")
+    args = parser.parse_args(argv)
+
+    try:
+        lines = _read_lines(args.files)
+        exclude = _read_lines(args.exclude)
+    except OSError as e:
+        print(f"hostlist_compiler: {e}", file=sys.stderr)
+        return 1
+
+    result, stats = compile_lines(lines)
+    print(format_stats(stats))
+    for domain, cover in find_conflicts(result, exclude):
+        print(f"  конфликт: {domain} исключён записью {cover}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write("".join(line + "\n" for line in result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
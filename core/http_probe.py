@@ -0,0 +1,498 @@
+# -*- coding: utf-8 -*-
+"""
+Встроенная HTTP/HTTPS-проверка на asyncio без запуска curl.
+
+Повторяет поведение прежнего вызова curl в тестировщике стратегий:
+только IPv4 (-4), без проверки сертификата (-k), следование редиректам (-L),
+отдельный таймаут на установку соединения (--connect-timeout) и общий (--max-time).
+Дополнительно замеряет время фаз: DNS, TCP connect, TLS handshake, первый байт ответа.
+
+Ошибки раскладываются так же, как раньше разбирался stderr curl:
+  ssl     — TLS alert / обрыв рукопожатия (блокировка),
+  reset   — TCP RST (блокировка),
+  dns     — имя не разрешилось,
+  timeout — истёк таймаут,
+  other   — прочие ошибки соединения.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import errno
+import itertools
+import socket
+import ssl
+import time
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+DEFAULT_CONNECT_TIMEOUT = 1.0
+DEFAULT_TOTAL_TIMEOUT = 3.0
+DEFAULT_MAX_REDIRECTS = 10
+DEFAULT_MAX_BODY = 4 * 1024 * 1024
+DEFAULT_BYTE_BUDGET = 2 * 1024 * 1024
+DEFAULT_STALL_TIMEOUT = 2.0
+DEFAULT_DOWNLOAD_TIMEOUT = 10.0
+
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+
+ERROR_SSL = "ssl"
+ERROR_RESET = "reset"
+ERROR_DNS = "dns"
+ERROR_TIMEOUT = "timeout"
+ERROR_OTHER = "other"
+
+_TLS_VERSIONS = {
+    "1.2": ssl.TLSVersion.TLSv1_2,
+    "1.3": ssl.TLSVersion.TLSv1_3,
+}
+
+
+# Диапазон локальных портов для исходящих соединений текущей задачи asyncio.
+# Используется параллельным тестом стратегий: трафик каждой «полосы» отличается
+# портом источника и попадает в свою очередь NFQUEUE (см. core.strategy_lanes).
+SOURCE_PORTS: "contextvars.ContextVar[Optional[range]]" = contextvars.ContextVar(
+    "http_probe_source_ports", default=None
+)
+_source_port_cursors: Dict[range, Iterator[int]] = {}
+
+
+class _ProbeError(Exception):
+    def __init__(self, kind: str, message: str):
+        super().__init__(message)
+        self.kind = kind
+
+
+def _ssl_context(tls_version: Optional[str]) -> ssl.SSLContext:
+    ctx = ssl.create_default_context()
+    # Как curl -k: доступность проверяем, подлинность сертификата — нет
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    ctx.set_alpn_protocols(["http/1.1"])
+    version = _TLS_VERSIONS.get(tls_version or "")
+    if version is not None:
+        ctx.minimum_version = version
+        ctx.maximum_version = version
+    return ctx
+
+
+def classify_exception(exc: BaseException) -> Tuple[str, str]:
+    """(вид ошибки, текст) по исключению сокета/SSL."""
+    if isinstance(exc, _ProbeError):
+        return exc.kind, str(exc)
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, socket.timeout)):
+        return ERROR_TIMEOUT, "timed out"
+    if isinstance(exc, socket.gaierror):
+        return ERROR_DNS, f"could not resolve host: {exc}"
+    if isinstance(exc, ssl.SSLError):
+        return ERROR_SSL, f"ssl: {exc}"
+    if isinstance(exc, (ConnectionResetError, BrokenPipeError)):
+        return ERROR_RESET, "connection reset by peer"
+    if isinstance(exc, asyncio.IncompleteReadError):
+        return ERROR_RESET, "connection closed before response"
+    return ERROR_OTHER, str(exc) or exc.__class__.__name__
+
+
+async def _read_headers(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], float]:
+    """Читает строку статуса и заголовки; возвращает (код, заголовки, момент первого байта)."""
+    status_line = await reader.readline()
+    first_byte_at = time.monotonic()
+    if not status_line:
+        raise _ProbeError(ERROR_RESET, "empty reply from server")
+
+    parts = status_line.decode("latin-1", errors="ignore").split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+        raise _ProbeError(ERROR_OTHER, f"bad status line: {status_line[:60]!r}")
+    code = int(parts[1])
+
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if not line or line in (b"\r\n", b"\n"):
+            break
+        name, sep, value = line.decode("latin-1", errors="ignore").partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return code, headers, first_byte_at
+
+
+async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str], max_body: int) -> bytes:
+    """Читает тело по Content-Length, chunked или до закрытия соединения (не больше max_body)."""
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        chunks = []
+        size_total = 0
+        while size_total < max_body:
+            size_line = await reader.readline()
+            try:
+                size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+            except ValueError:
+                break
+            if size == 0:
+                break
+            chunk = await reader.readexactly(size)
+            await reader.readline()
+            chunks.append(chunk)
+            size_total += size
+        return b"".join(chunks)[:max_body]
+
+    length = headers.get("content-length")
+    if length and length.isdigit():
+        return await reader.readexactly(min(int(length), max_body))
+
+    data = bytearray()
+    while len(data) < max_body:
+        chunk = await reader.read(65536)
+        if not chunk:
+            break
+        data.extend(chunk)
+    return bytes(data[:max_body])
+
+
+async def _connect_from_range(address: str, port: int, source_ports: range) -> socket.socket:
+    """TCP-соединение с локальным портом из source_ports (занятые порты пропускаются)."""
+    loop = asyncio.get_running_loop()
+    cursor = _source_port_cursors.setdefault(source_ports, itertools.cycle(source_ports))
+    last_error: Optional[OSError] = None
+    for _ in range(len(source_ports)):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setblocking(False)
+        try:
+            sock.bind(("0.0.0.0", next(cursor)))
+        except OSError as exc:
+            sock.close()
+            last_error = exc
+            continue
+        try:
+            await loop.sock_connect(sock, (address, port))
+        except OSError as exc:
+            sock.close()
+            # Порт занят этим же 4-кортежем (TIME_WAIT) — берём следующий
+            if exc.errno in (errno.EADDRINUSE, errno.EADDRNOTAVAIL):
+                last_error = exc
+                continue
+            raise
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+    raise last_error or OSError("нет свободных локальных портов")
+
+
+async def _open_request(
+    url: str,
+    method: str,
+    headers: Dict[str, str],
+    tls_version: Optional[str],
+    connect_timeout: float,
+    timings: Dict[str, float],
+) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, int, Dict[str, str]]:
+    """Соединяется, отправляет запрос и читает заголовки ответа; закрыть writer должен вызывающий."""
+    parts = urlsplit(url)
+    scheme = (parts.scheme or "http").lower()
+    host = parts.hostname
+    if not host:
+        raise _ProbeError(ERROR_OTHER, f"bad url: {url}")
+    use_tls = scheme == "https"
+    port = parts.port or (443 if use_tls else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    loop = asyncio.get_running_loop()
+    connect_started = time.monotonic()
+
+    # DNS: только IPv4, как curl -4
+    started = time.monotonic()
+    infos = await asyncio.wait_for(
+        loop.getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_STREAM),
+        timeout=connect_timeout,
+    )
+    timings["dns"] += time.monotonic() - started
+    if not infos:
+        raise _ProbeError(ERROR_DNS, f"could not resolve host: {host}")
+    address = infos[0][4][0]
+
+    # TCP + TLS укладываются в --connect-timeout
+    started = time.monotonic()
+    remaining = max(0.05, connect_timeout - (started - connect_started))
+    source_ports = SOURCE_PORTS.get()
+    if source_ports:
+        sock = await asyncio.wait_for(_connect_from_range(address, port, source_ports), timeout=remaining)
+        reader, writer = await asyncio.open_connection(sock=sock)
+    else:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(address, port, family=socket.AF_INET),
+            timeout=remaining,
+        )
+    try:
+        timings["connect"] += time.monotonic() - started
+
+        if use_tls:
+            started = time.monotonic()
+            remaining = max(0.05, connect_timeout - (started - connect_started))
+            await asyncio.wait_for(
+                writer.start_tls(_ssl_context(tls_version), server_hostname=host),
+                timeout=remaining,
+            )
+            timings["tls"] += time.monotonic() - started
+
+        host_header = host if parts.port is None else f"{host}:{parts.port}"
+        request_lines = [f"{method} {path} HTTP/1.1", f"Host: {host_header}"]
+        request_lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(request_lines) + "\r\n\r\n").encode("latin-1", errors="ignore"))
+        await writer.drain()
+
+        sent_at = time.monotonic()
+        code, response_headers, first_byte_at = await _read_headers(reader)
+        timings["ttfb"] += first_byte_at - sent_at
+    except BaseException:
+        await _close_writer(writer)
+        raise
+    return reader, writer, code, response_headers
+
+
+async def _close_writer(writer: asyncio.StreamWriter) -> None:
+    writer.close()
+    try:
+        await asyncio.wait_for(writer.wait_closed(), timeout=0.2)
+    except Exception:
+        pass
+
+
+async def _single_request(
+    url: str,
+    method: str,
+    headers: Dict[str, str],
+    tls_version: Optional[str],
+    connect_timeout: float,
+    read_body: bool,
+    max_body: int,
+    timings: Dict[str, float],
+) -> Tuple[int, Dict[str, str], bytes]:
+    reader, writer, code, response_headers = await _open_request(
+        url, method, headers, tls_version, connect_timeout, timings,
+    )
+    try:
+        body = b""
+        if read_body and method != "HEAD" and code not in (204, 304):
+            body = await _read_body(reader, response_headers, max_body)
+        return code, response_headers, body
+    finally:
+        await _close_writer(writer)
+
+
+async def http_probe(
+    url: str,
+    method: str = "HEAD",
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    tls_version: Optional[str] = None,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    total_timeout: float = DEFAULT_TOTAL_TIMEOUT,
+    follow_redirects: bool = True,
+    max_redirects: int = DEFAULT_MAX_REDIRECTS,
+    read_body: bool = False,
+    max_body: int = DEFAULT_MAX_BODY,
+) -> Dict:
+    """
+    Выполняет HTTP(S)-запрос и возвращает словарь:
+
+    ok            — получен HTTP-ответ (любой код)
+    http_code     — код последнего ответа (0, если ответа нет)
+    headers       — заголовки последнего ответа (имена в нижнем регистре)
+    body          — тело (только при read_body)
+    num_redirects — сколько редиректов пройдено
+    url           — итоговый URL
+    error_kind    — ssl / reset / dns / timeout / other или ""
+    error         — текст ошибки
+    timings       — секунды по фазам: dns, connect, tls, ttfb, total
+    """
+    method = method.upper()
+    request_headers = {"User-Agent": DEFAULT_USER_AGENT, "Accept": "*/*"}
+    if headers:
+        request_headers.update(headers)
+
+    timings = {"dns": 0.0, "connect": 0.0, "tls": 0.0, "ttfb": 0.0, "total": 0.0}
+    result = {
+        "ok": False,
+        "http_code": 0,
+        "headers": {},
+        "body": b"",
+        "num_redirects": 0,
+        "url": url,
+        "error_kind": "",
+        "error": "",
+        "timings": timings,
+    }
+
+    async def _follow():
+        current_url = url
+        current_method = method
+        for redirects in range(max_redirects + 1):
+            code, response_headers, body = await _single_request(
+                current_url, current_method, request_headers, tls_version,
+                connect_timeout, read_body, max_body, timings,
+            )
+            result.update({
+                "ok": True,
+                "http_code": code,
+                "headers": response_headers,
+                "body": body,
+                "num_redirects": redirects,
+                "url": current_url,
+            })
+            location = response_headers.get("location")
+            if not follow_redirects or code not in REDIRECT_CODES or not location:
+                return
+            current_url = urljoin(current_url, location)
+            if code == 303 and current_method != "HEAD":
+                current_method = "GET"
+
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(_follow(), timeout=total_timeout)
+    except Exception as exc:
+        # Ответ после редиректа уже есть, но следующий шаг упал — считаем ошибкой, как curl
+        result["ok"] = False
+        result["error_kind"], result["error"] = classify_exception(exc)
+    finally:
+        timings["total"] = time.monotonic() - started
+
+    return result
+
+
+async def download_probe(
+    url: str,
+    *,
+    byte_budget: int = DEFAULT_BYTE_BUDGET,
+    headers: Optional[Dict[str, str]] = None,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    stall_timeout: float = DEFAULT_STALL_TIMEOUT,
+    total_timeout: float = DEFAULT_DOWNLOAD_TIMEOUT,
+    max_redirects: int = DEFAULT_MAX_REDIRECTS,
+) -> Dict:
+    """
+    Скачивает начало тела ответа (GET, не больше byte_budget байт) и замеряет скорость.
+
+    Поток считается замершим, если за stall_timeout не пришло ни байта: так выглядит
+    DPI, который пропускает первые 16–20 КБ ответа и дальше молча держит соединение.
+
+    Возвращает словарь:
+
+    ok            — получен HTTP-ответ (любой код)
+    http_code     — код последнего ответа
+    bytes         — сколько байт тела получено
+    complete      — тело получено целиком или набран byte_budget
+    timed_out     — total_timeout истёк, пока тело ещё шло (поток живой, но медленный)
+    stalled       — поток замер до конца тела
+    stall_at      — на каком байте замер поток (None, если не замер)
+    mbps          — устойчивая скорость в Мбит/с (между первым и последним куском тела)
+    duration      — секунды между первым и последним куском тела
+    error_kind    — ssl / reset / dns / timeout / other или ""
+    error         — текст ошибки
+    timings       — секунды по фазам: dns, connect, tls, ttfb, total
+    """
+    request_headers = {"User-Agent": DEFAULT_USER_AGENT, "Accept": "*/*"}
+    if headers:
+        request_headers.update(headers)
+
+    timings = {"dns": 0.0, "connect": 0.0, "tls": 0.0, "ttfb": 0.0, "total": 0.0}
+    result = {
+        "ok": False,
+        "http_code": 0,
+        "bytes": 0,
+        "complete": False,
+        "timed_out": False,
+        "stalled": False,
+        "stall_at": None,
+        "mbps": 0.0,
+        "duration": 0.0,
+        "error_kind": "",
+        "error": "",
+        "timings": timings,
+    }
+
+    # Момент первого куска тела, его размер и момент последнего куска
+    progress = {"first_at": 0.0, "first_bytes": 0, "last_at": 0.0}
+
+    async def _download():
+        current_url = url
+        for _ in range(max_redirects + 1):
+            reader, writer, code, response_headers = await _open_request(
+                current_url, "GET", request_headers, None, connect_timeout, timings,
+            )
+            try:
+                result["ok"] = True
+                result["http_code"] = code
+                location = response_headers.get("location")
+                if code in REDIRECT_CODES and location:
+                    current_url = urljoin(current_url, location)
+                    continue
+
+                length = response_headers.get("content-length")
+                expected = min(int(length), byte_budget) if length and length.isdigit() else byte_budget
+                while result["bytes"] < expected:
+                    try:
+                        chunk = await asyncio.wait_for(reader.read(65536), timeout=stall_timeout)
+                    except asyncio.TimeoutError:
+                        result["stalled"] = True
+                        result["stall_at"] = result["bytes"]
+                        break
+                    if not chunk:
+                        break
+                    now = time.monotonic()
+                    if not result["bytes"]:
+                        progress.update(first_at=now, first_bytes=len(chunk))
+                    progress["last_at"] = now
+                    result["bytes"] += len(chunk)
+
+                result["complete"] = result["bytes"] >= expected
+                return
+            finally:
+                await _close_writer(writer)
+
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(_download(), timeout=total_timeout)
+    except asyncio.TimeoutError:
+        # Общий таймаут во время скачивания — медленный, но живой поток
+        if result["bytes"]:
+            result["timed_out"] = True
+        else:
+            result["ok"] = False
+            result["error_kind"], result["error"] = ERROR_TIMEOUT, "timed out"
+    except Exception as exc:
+        if result["bytes"]:
+            # Поток оборван после начала тела (RST от DPI) — это тоже точка обрыва
+            result["stalled"] = True
+            result["stall_at"] = result["bytes"]
+        result["error_kind"], result["error"] = classify_exception(exc)
+        if not result["bytes"]:
+            result["ok"] = False
+    finally:
+        timings["total"] = time.monotonic() - started
+
+    # Скорость без первого куска: он приходит вместе с заголовками и завышает результат
+    if progress["last_at"] > progress["first_at"]:
+        result["duration"] = progress["last_at"] - progress["first_at"]
+        sustained_bytes = result["bytes"] - progress["first_bytes"]
+        result["mbps"] = sustained_bytes * 8 / result["duration"] / 1_000_000
+    return result
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """Краткая строка с временем фаз в миллисекундах."""
+    if not timings:
+        return ""
+    return (
+        f"DNS {timings.get('dns', 0) * 1000:.0f} мс, "
+        f"TCP {timings.get('connect', 0) * 1000:.0f} мс, "
+        f"TLS {timings.get('tls', 0) * 1000:.0f} мс, "
+        f"TTFB {timings.get('ttfb', 0) * 1000:.0f} мс"
+    )
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Оптимизация ipset-списков для nfqws (--ipset / --ipset-exclude).
+
+Списки из utils (ipset-all.txt, ipset-all_roblox.txt) и пользовательские записи
+попадают в nfqws как есть: пересекающиеся и соседние подсети, а также диапазоны
+a.b.c.d-e.f.g.h (их принимает окно IPSet) не сворачиваются. Здесь список
+приводится к минимальному набору CIDR отдельно для IPv4 и IPv6:
+
+  * диапазоны разворачиваются в покрывающие их подсети;
+  * вложенные, пересекающиеся и соседние подсети сливаются (ipaddress.collapse_addresses);
+  * комментарии и пустые строки отбрасываются, нераспознанные строки сохраняются
+    в конце без изменений, чтобы их судьбу по-прежнему решал nfqws.
+
+Множество адресов не меняется, меняется только число записей, которые nfqws
+загружает и проверяет.
+
+Модуль использует только стандартную библиотеку: вместе с core/list_cache.py
+он копируется в /opt/zapret и применяется к объединённым ipset-спискам при
+запуске службы.
+
+Запуск скриптом (отчёт о размерах; с -o — запись результата):
+    python3 ipset_optimizer.py utils/ipset-all_roblox.txt [-o out.txt]
+"""
+
+from __future__ import annotations
+
+import argparse
+import ipaddress
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_entry(entry: str) -> List[IPNetwork]:
+    """
+    Запись ipset-списка -> подсети: адрес, подсеть CIDR или диапазон «начало-конец».
+
+    :raises ValueError: запись не распознана
+    """
+    if "-" in entry:
+        first, _, last = entry.partition("-")
+        start = ipaddress.ip_address(first.strip())
+        end = ipaddress.ip_address(last.strip())
+        if start.version != end.version:
+            raise ValueError(f"диапазон смешивает IPv4 и IPv6: {entry}")
+        if start > end:
+            start, end = end, start
+        return list(ipaddress.summarize_address_range(start, end))
+    return [ipaddress.ip_network(entry, strict=False)]
+
+
+def format_network(network: IPNetwork) -> str:
+    """Подсеть из одного адреса пишется без префикса, как в исходных списках"""
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+
+def optimize_lines(lines: Iterable[str]) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Сворачивает записи ipset-списка.
+
+    :return: (строки результата: IPv4, затем IPv6, затем нераспознанные;
+              статистика {"before", "after", "ranges", "invalid",
+                          "ipv4_before", "ipv4_after", "ipv6_before", "ipv6_after"})
+    """
+    networks: Dict[int, List[IPNetwork]] = {4: [], 6: []}
+    counts = {4: 0, 6: 0}
+    invalid: List[str] = []
+    seen_invalid = set()
+    ranges = 0
+
+    for line in lines:
+        entry = line.strip()
+        if not entry or entry.startswith("#"):
+            continue
+        try:
+            parsed = parse_entry(entry)
+        except ValueError:
+            if entry not in seen_invalid:
+                seen_invalid.add(entry)
+                invalid.append(entry)
+            continue
+        if "-" in entry:
+            ranges += 1
+        version = parsed[0].version
+        counts[version] += 1
+        networks[version].extend(parsed)
+
+    collapsed = {version: list(ipaddress.collapse_addresses(items)) for version, items in networks.items()}
+    result = [format_network(net) for net in collapsed[4]]
+    result += [format_network(net) for net in collapsed[6]]
+    result += invalid
+
+    stats = {
+        "before": counts[4] + counts[6] + len(invalid),
+        "after": len(result),
+        "ranges": ranges,
+        "invalid": len(invalid),
+        "ipv4_before": counts[4],
+        "ipv4_after": len(collapsed[4]),
+        "ipv6_before": counts[6],
+        "ipv6_after": len(collapsed[6]),
+    }
+    return result, stats
+
+
+def optimize_bytes(data: bytes) -> Tuple[bytes, Dict[str, int]]:
+    """optimize_lines для содержимого файла; результат — строки, завершённые \\n"""
+    lines, stats = optimize_lines(data.decode("utf-8", errors="ignore").splitlines())
+    return "".join(line + "\n" for line in lines).encode("utf-8"), stats
+
+
+def format_stats(stats: Dict[str, int]) -> str:
+    """Краткая строка: «21941 -> 15475 записей (IPv4 16265 -> 12774, IPv6 5676 -> 2701)»"""
+    text = (f"{stats['before']} -> {stats['after']} записей "
+            f"(IPv4 {stats['ipv4_before']} -> {stats['ipv4_after']}, "
+            f"IPv6 {stats['ipv6_before']} -> {stats['ipv6_after']})")
+    if stats["ranges"]:
+        text += f", диапазонов: {stats['ranges']}"
+    if stats["invalid"]:
+        text += f", нераспознано: {stats['invalid']}"
+    return text
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Сворачивание ipset-списков в минимальный набор CIDR")
+    parser.add_argument("files", nargs="+", help="ipset-списки (объединяются)")
+    parser.add_argument("-o", "--output", help="куда записать результат")
+    args = parser.parse_args(argv)
+
+    data = b""
+    try:
+        for path in args.files:
+            with open(path, "rb") as f:
+                data += f.read() + b"\n"
+    except OSError as e:
+        print(f"ipset_optimizer: {e}", file=sys.stderr)
+        return 1
+
+    optimized, stats = optimize_bytes(data)
+    print(format_stats(stats))
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(optimized)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Статистика задержек по нескольким замерам цели.
+
+Один замер time_total не отличает стратегию, добавляющую 20 мс, от стратегии
+с 800 мс накладных расходов на десинхронизацию: разброс между замерами того же
+сервиса больше самой разницы. Поэтому тестировщик делает K замеров каждой
+доступной цели (круги по всем целям, так что замеры одной цели разнесены
+во времени) и хранит по фазам connect, TLS, TTFB и их сумме (request)
+минимум, медиану, 95-й перцентиль, максимум и джиттер.
+
+Все значения — в миллисекундах.
+"""
+
+from __future__ import annotations
+
+import math
+import statistics
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_LATENCY_SAMPLES = 3
+
+LATENCY_PHASES = ("connect", "tls", "ttfb")
+REQUEST_PHASE = "request"
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Перцентиль q (0–100) с линейной интерполяцией между соседними значениями"""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def jitter(values: Sequence[float]) -> float:
+    """Джиттер: среднее абсолютное изменение между соседними замерами (как в RFC 3550)"""
+    if len(values) < 2:
+        return 0.0
+    return sum(abs(b - a) for a, b in zip(values, values[1:])) / (len(values) - 1)
+
+
+def phase_stats(values: Sequence[float]) -> Dict[str, float]:
+    """{"samples", "min", "p50", "p95", "max", "jitter"} по замерам в порядке их получения"""
+    return {
+        "samples": len(values),
+        "min": round(min(values), 1),
+        "p50": round(percentile(values, 50), 1),
+        "p95": round(percentile(values, 95), 1),
+        "max": round(max(values), 1),
+        "jitter": round(jitter(values), 1),
+    }
+
+
+def target_latency(samples: List[Dict[str, float]], use_tls: bool) -> Optional[Dict[str, Dict]]:
+    """
+    Статистика цели по замерам http_probe.
+
+    :param samples: словари timings (секунды) успешных замеров в порядке получения
+    :param use_tls: цель по HTTPS (для HTTP фаза TLS не считается)
+    :return: {фаза: phase_stats} или None, если замеров нет
+    """
+    if not samples:
+        return None
+    phases = [phase for phase in LATENCY_PHASES if use_tls or phase != "tls"]
+    latency = {}
+    for phase in phases:
+        latency[phase] = phase_stats([sample.get(phase, 0.0) * 1000 for sample in samples])
+    latency[REQUEST_PHASE] = phase_stats(
+        [sum(sample.get(phase, 0.0) for phase in phases) * 1000 for sample in samples]
+    )
+    return latency
+
+
+def strategy_latency(target_results: List[Dict]) -> Optional[Dict]:
+    """
+    Сводка задержек стратегии: медиана по целям от p50, p95 и джиттера каждой фазы.
+
+    Медиана, а не среднее, чтобы один медленный сервис не перевешивал остальные.
+
+    :return: {"targets": N, фаза: {"p50", "p95", "jitter"}} или None, если замеров нет
+    """
+    measured = [result["latency"] for result in target_results if result.get("latency")]
+    if not measured:
+        return None
+    summary: Dict = {"targets": len(measured)}
+    for phase in LATENCY_PHASES + (REQUEST_PHASE,):
+        per_target = [latency[phase] for latency in measured if phase in latency]
+        if per_target:
+            summary[phase] = {
+                key: round(statistics.median(stats[key] for stats in per_target), 1)
+                for key in ("p50", "p95", "jitter")
+            }
+    return summary
+
+
+def latency_score(latency: Optional[Dict]) -> Optional[float]:
+    """Оценка задержки стратегии для сортировки: медиана запроса плюс джиттер (меньше — лучше)"""
+    if not latency or REQUEST_PHASE not in latency:
+        return None
+    request = latency[REQUEST_PHASE]
+    return round(request["p50"] + request["jitter"], 1)
+
+
+def strategy_rank_key(result: Dict, prefer_latency: bool = False) -> Tuple[float, float]:
+    """
+    Ключ сортировки стратегий (по возрастанию — от лучшей к худшей).
+
+    По умолчанию главное — процент успеха, при равенстве быстрее та, у которой меньше
+    задержка. С prefer_latency (включён GameFilter) наоборот: задержка важнее доступности.
+    Стратегии без замеров задержки идут после измеренных.
+    """
+    score = result.get("latency_score")
+    latency = score if score is not None else math.inf
+    rate = -(result.get("success_rate") or 0)
+    if prefer_latency:
+        return latency, rate
+    return rate, latency
+
+
+def format_latency(latency: Optional[Dict]) -> str:
+    """Краткая строка: «запрос 85 мс (p95 120, джиттер 6) • TCP 20 • TLS 30 • TTFB 35»"""
+    if not latency or REQUEST_PHASE not in latency:
+        return ""
+    request = latency[REQUEST_PHASE]
+    parts = [f"запрос {request['p50']:.0f} мс (p95 {request['p95']:.0f}, джиттер {request['jitter']:.0f})"]
+    for phase, title in (("connect", "TCP"), ("tls", "TLS"), ("ttfb", "TTFB")):
+        if phase in latency:
+            parts.append(f"{title} {latency[phase]['p50']:.0f}")
+    return " • ".join(parts)
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Постоянный кеш файлов списков и bin-файлов для nfqws с адресацией по содержимому.
+
+Раньше каждый запуск службы копировал files/lists и files/bin в новую папку
+mktemp -d, объединял четыре пары «основной список + _user» через awk и удалял
+всё через 2 секунды. Тестировщик стратегий перезапускает службу десятки раз,
+и каждый раз эта работа повторялась.
+
+Теперь:
+  objects/<sha256>   — содержимое файла (копия или результат объединения пары);
+  merges/<ключ пары> — sha256 результата объединения для ключа, составленного
+                       из хешей обоих исходных файлов (объединение выполняется,
+                       только если изменился один из них);
+  sets/<ключ набора>/ — готовая папка с привычными именами файлов (жёсткие ссылки
+                       на objects), ключ — хеш всего набора «имя -> объект».
+
+Объединённые ipset-списки дополнительно сворачиваются в минимальный набор CIDR
+(core/ipset_optimizer.py), hostlist-списки нормализуются и освобождаются от
+покрытых поддоменов (core/hostlist_compiler.py); размеры до и после и конфликты
+включения с исключениями пишутся в stderr.
+
+Если набор с таким ключом уже есть, ничего не копируется и не объединяется.
+Старые наборы удаляются, последние KEEP_SETS сохраняются; объекты, на которые
+не ссылается ни один набор, удаляются вместе с ними.
+
+Модуль использует только стандартную библиотеку: установщик копирует его
+в /opt/zapret, и starter.sh запускает копию, принадлежащую root.
+
+Запуск скриптом (печатает путь к папке набора):
+    python3 list_cache.py --files-dir ~/Zapret_DPI_Manager/files [--cache DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+def _load_helper(name: str):
+    """Модуль из core (дерево менеджера) или копия рядом с list_cache.py в /opt/zapret; None, если нет"""
+    for module_name in (f"core.{name}", name):
+        try:
+            return importlib.import_module(module_name)
+        except ImportError:
+            continue
+    return None
+
+
+ipset_optimizer = _load_helper("ipset_optimizer")
+hostlist_compiler = _load_helper("hostlist_compiler")
+
+CACHE_VERSION = 3
+DEFAULT_CACHE_ROOT = Path("/opt/zapret/cache/lists")
+KEEP_SETS = 4
+
+# Папки files/, которые попадают в набор как есть
+SOURCE_SUBDIRS = ("lists", "bin")
+
+# Пары «основной список + пользовательский», которые объединяются в один файл без повторов
+MERGED_LISTS = {
+    "list-general_merged.txt": ("list-general.txt", "list-general_user.txt"),
+    "list-exclude_merged.txt": ("list-exclude.txt", "list-exclude_user.txt"),
+    "ipset-exclude_merged.txt": ("ipset-exclude.txt", "ipset-exclude_user.txt"),
+    "ipset-all_merged.txt": ("ipset-all.txt", "ipset-all_user.txt"),
+}
+
+# Hostlist-списки, которые используются без объединения с пользовательскими
+HOSTLISTS = ("list-google.txt", "other.txt")
+
+# Включающие hostlist-списки и список исключений для проверки конфликтов
+CONFLICT_CHECK = (("list-general_merged.txt", "list-google.txt"), "list-exclude_merged.txt")
+MAX_REPORTED_CONFLICTS = 20
+
+_COMPLETE_MARKER = ".complete"
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def merge_unique(sources: List[bytes]) -> bytes:
+    """
+    Объединяет списки без повторов с сохранением порядка (как merge_unique_lists в starter.sh):
+    завершающий \\r строки отбрасывается, каждая строка заканчивается \\n.
+    """
+    seen = set()
+    out = []
+    for data in sources:
+        lines = data.split(b"\n")
+        if lines and lines[-1] == b"":
+            lines.pop()
+        for line in lines:
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            if line not in seen:
+                seen.add(line)
+                out.append(line + b"\n")
+    return b"".join(out)
+
+
+def _list_helper(name: str):
+    """Модуль, которым сокращается список с таким именем, или None"""
+    if name.startswith("ipset-"):
+        return ipset_optimizer
+    if name.startswith("list-") or name in HOSTLISTS:
+        return hostlist_compiler
+    return None
+
+
+def merge_list(merged_name: str, sources: List[bytes]) -> Tuple[bytes, Optional[str]]:
+    """
+    Объединяет списки; ipset-списки ещё и сворачиваются в минимальный набор CIDR,
+    hostlist-списки нормализуются и освобождаются от покрытых поддоменов.
+
+    :return: (содержимое, строка с размерами до и после или None)
+    """
+    merged = merge_unique(sources)
+    helper = _list_helper(merged_name)
+    if helper is None:
+        return merged, None
+    if helper is ipset_optimizer:
+        merged, stats = helper.optimize_bytes(merged)
+    else:
+        merged, stats = helper.compile_bytes(merged)
+    return merged, helper.format_stats(stats)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ListCache:
+    """
+    Кеш наборов файлов для nfqws.
+
+    :param cache_root: корень кеша (для службы — /opt/zapret/cache/lists)
+    """
+
+    def __init__(self, cache_root: Path = DEFAULT_CACHE_ROOT):
+        self.root = Path(cache_root)
+        self.objects_dir = self.root / "objects"
+        self.merges_dir = self.root / "merges"
+        self.sets_dir = self.root / "sets"
+
+    def _ensure_dirs(self) -> None:
+        for path in (self.root, self.objects_dir, self.merges_dir, self.sets_dir):
+            path.mkdir(parents=True, exist_ok=True)
+            os.chmod(path, 0o755)
+
+    def _store(self, data: bytes) -> str:
+        """Кладёт содержимое в objects (если его там ещё нет) и возвращает его хеш"""
+        digest = _sha256(data)
+        path = self.objects_dir / digest
+        if not path.exists():
+            _write_atomic(path, data)
+        return digest
+
+    def _merged_object(self, merged_name: str, sources: List[Optional[bytes]]) -> str:
+        """Хеш объединённого списка; объединение выполняется, только если пары ещё нет в merges"""
+        pair_key = _sha256(json.dumps(
+            [CACHE_VERSION, merged_name, _list_helper(merged_name) is not None]
+            + [_sha256(data) if data is not None else None for data in sources]
+        ).encode("utf-8"))
+        record = self.merges_dir / pair_key
+        try:
+            digest = record.read_text(encoding="utf-8").strip()
+            if (self.objects_dir / digest).exists():
+                return digest
+        except OSError:
+            pass
+        merged, report = merge_list(merged_name, [data for data in sources if data is not None])
+        if report:
+            print(f"list_cache: {merged_name}: {report}", file=sys.stderr)
+        digest = self._store(merged)
+        _write_atomic(record, digest.encode("utf-8"))
+        return digest
+
+    def _collect(self, files_dir: Path) -> Dict[str, str]:
+        """Набор «имя файла -> хеш объекта» для папки files/"""
+        entries: Dict[str, str] = {}
+        contents: Dict[str, bytes] = {}
+        for sub in SOURCE_SUBDIRS:
+            source = files_dir / sub
+            if not source.is_dir():
+                continue
+            for item in sorted(source.iterdir()):
+                if item.is_file():
+                    data = item.read_bytes()
+                    contents[item.name] = data
+                    if sub == "lists" and item.name in HOSTLISTS:
+                        entries[item.name] = self._merged_object(item.name, [data])
+                    else:
+                        entries[item.name] = self._store(data)
+        for merged_name, names in MERGED_LISTS.items():
+            entries[merged_name] = self._merged_object(merged_name, [contents.get(name) for name in names])
+        return entries
+
+    def build(self, files_dir: Path) -> Tuple[Path, bool]:
+        """
+        Возвращает папку набора для files_dir, создавая её при необходимости.
+
+        :return: (путь к папке набора, True — набор уже был в кеше)
+        """
+        self._ensure_dirs()
+        entries = self._collect(Path(files_dir))
+        set_key = _sha256(json.dumps(entries, sort_keys=True).encode("utf-8"))
+        set_dir = self.sets_dir / set_key
+
+        if (set_dir / _COMPLETE_MARKER).exists():
+            os.utime(set_dir)  # недавно использованные наборы переживают очистку
+            return set_dir, True
+
+        build_dir = Path(tempfile.mkdtemp(prefix=".build_", dir=str(self.sets_dir)))
+        try:
+            for name, digest in entries.items():
+                target = build_dir / name
+                try:
+                    os.link(self.objects_dir / digest, target)
+                except OSError:
+                    shutil.copyfile(self.objects_dir / digest, target)
+                    os.chmod(target, 0o644)
+            (build_dir / _COMPLETE_MARKER).write_bytes(b"")
+            os.chmod(build_dir, 0o755)
+            shutil.rmtree(set_dir, ignore_errors=True)  # недостроенный набор после сбоя
+            os.replace(build_dir, set_dir)
+        except BaseException:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+
+        self.prune(keep=KEEP_SETS, current=set_dir)
+        self._report_conflicts(set_dir)
+        return set_dir, False
+
+    def _report_conflicts(self, set_dir: Path) -> None:
+        """Пишет в stderr домены включающих списков, которые целиком закрыты исключениями"""
+        if hostlist_compiler is None:
+            return
+        include_names, exclude_name = CONFLICT_CHECK
+        try:
+            exclude = (set_dir / exclude_name).read_text(encoding="utf-8").splitlines()
+            include = []
+            for name in include_names:
+                if (set_dir / name).is_file():
+                    include += (set_dir / name).read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return
+        conflicts = hostlist_compiler.find_conflicts(include, exclude)
+        for domain, cover in conflicts[:MAX_REPORTED_CONFLICTS]:
+            print(f"list_cache: конфликт: {domain} исключён записью {cover}", file=sys.stderr)
+        if len(conflicts) > MAX_REPORTED_CONFLICTS:
+            print(f"list_cache: конфликтов всего: {len(conflicts)}", file=sys.stderr)
+
+    def prune(self, keep: int = KEEP_SETS, current: Optional[Path] = None) -> None:
+        """
+        Удаляет старые наборы (кроме последних keep), объекты, которые не входят
+        ни в один набор (сравнение по inode жёстких ссылок), и записи merges на них
+        """
+        sets = sorted(
+            (path for path in self.sets_dir.iterdir() if path.is_dir() and path != current),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True,
+        )
+        for path in sets[max(0, keep - 1):]:
+            shutil.rmtree(path, ignore_errors=True)
+
+        referenced = set()
+        for set_path in self.sets_dir.iterdir():
+            if set_path.is_dir():
+                for item in set_path.iterdir():
+                    referenced.add(item.stat().st_ino)
+        for obj in self.objects_dir.iterdir():
+            if obj.stat().st_ino not in referenced:
+                obj.unlink(missing_ok=True)
+        for record in self.merges_dir.iterdir():
+            try:
+                digest = record.read_text(encoding="utf-8").strip()
+            except OSError:
+                continue
+            if not (self.objects_dir / digest).exists():
+                record.unlink(missing_ok=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Кеш списков и bin-файлов для nfqws")
+    parser.add_argument("--files-dir", required=True, help="папка files/ менеджера")
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE_ROOT), help="корень кеша")
+    args = parser.parse_args(argv)
+
+    try:
+        set_dir, cached = ListCache(Path(args.cache)).build(Path(args.files_dir))
+    except OSError as e:
+        print(f"list_cache: {e}", file=sys.stderr)
+        return 1
+
+    print("list_cache: набор из кеша" if cached else "list_cache: набор собран", file=sys.stderr)
+    print(set_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
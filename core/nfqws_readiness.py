@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Ожидание готовности nfqws вместо фиксированных пауз.
+
+Служба считается готовой, когда одновременно:
+  1) запущен процесс nfqws;
+  2) очередь NFQUEUE привязана (есть в /proc/net/netfilter/nfnetlink_queue);
+  3) в файрволе есть правила, отправляющие трафик в эту очередь
+     (таблица nft ``inet zapret`` или цепочки mangle в iptables).
+
+Первые два условия опрашиваются без sudo. Правила (через sudo) проверяются
+один раз, когда очередь уже привязана: starter.sh загружает их до запуска
+nfqws, так что позже они уже не появятся.
+"""
+
+from __future__ import annotations
+
+import re
+import subprocess
+import time
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+DEFAULT_QNUM = 200
+DEFAULT_READY_TIMEOUT = 8.0
+DEFAULT_STOP_TIMEOUT = 4.0
+POLL_INTERVAL = 0.15
+
+NFQUEUE_PROC_PATH = Path("/proc/net/netfilter/nfnetlink_queue")
+FWTYPE_PATH = Path("/opt/zapret/FWTYPE")
+
+# (команда, use_sudo) -> (успех, вывод); совместимо с StrategyTester._run_command
+CommandRunner = Callable[..., Tuple[bool, str]]
+
+
+def nfqws_running() -> bool:
+    """Есть ли процесс nfqws."""
+    try:
+        proc = subprocess.run(
+            ["pgrep", "-x", "nfqws"],
+            capture_output=True,
+            text=True,
+            timeout=3,
+        )
+    except (subprocess.TimeoutExpired, OSError):
+        return False
+    return proc.returncode == 0 and bool(proc.stdout.strip())
+
+
+def queue_bound(qnum: int = DEFAULT_QNUM) -> Optional[bool]:
+    """
+    Привязана ли очередь qnum к процессу.
+
+    Возвращает None, если таблица очередей недоступна (модуль не загружен или
+    нет прав) — тогда условие не учитывается.
+    """
+    try:
+        text = NFQUEUE_PROC_PATH.read_text(encoding="utf-8", errors="ignore")
+    except OSError:
+        return None
+    for line in text.splitlines():
+        fields = line.split()
+        if fields and fields[0].isdigit() and int(fields[0]) == qnum:
+            return True
+    return False
+
+
+def read_fwtype() -> str:
+    """Тип файрвола из /opt/zapret/FWTYPE (по умолчанию nftables)."""
+    try:
+        value = FWTYPE_PATH.read_text(encoding="utf-8").strip()
+    except OSError:
+        return "nftables"
+    return value if value in ("iptables", "nftables") else "nftables"
+
+
+def firewall_rules_present(run_command: CommandRunner, qnum: int = DEFAULT_QNUM,
+                           fwtype: Optional[str] = None) -> bool:
+    """Есть ли правила, отправляющие трафик в очередь qnum."""
+    fwtype = fwtype or read_fwtype()
+    if fwtype == "iptables":
+        ok, output = run_command("iptables -t mangle -S", use_sudo=True)
+        return ok and (f"--queue-num {qnum}" in output or f"--queue-balance {qnum}:" in output)
+
+    # Старые версии nft печатают "queue num 200 bypass", новые — "queue flags bypass to 200"
+    ok, output = run_command("nft list table inet zapret", use_sudo=True)
+    return ok and re.search(rf"\bqueue\b.*\b(?:num|to) {qnum}\b", output) is not None
+
+
+def wait_until_ready(run_command: CommandRunner, qnum: int = DEFAULT_QNUM,
+                     timeout: float = DEFAULT_READY_TIMEOUT) -> Tuple[bool, str, float]:
+    """
+    Ждёт готовности nfqws не дольше timeout секунд.
+
+    :return: (готово, что не готово/описание, затраченное время)
+    """
+    started = time.monotonic()
+    fwtype = read_fwtype()
+    reason = "nfqws не запущен"
+
+    while True:
+        elapsed = time.monotonic() - started
+        if nfqws_running():
+            if queue_bound(qnum) is not False:
+                if firewall_rules_present(run_command, qnum, fwtype):
+                    return True, f"nfqws готов (очередь {qnum}, {fwtype})", elapsed
+                return False, f"нет правил {fwtype} для очереди {qnum}", elapsed
+            reason = f"очередь {qnum} не привязана"
+        else:
+            reason = "nfqws не запущен"
+
+        if elapsed >= timeout:
+            return False, reason, elapsed
+        time.sleep(POLL_INTERVAL)
+
+
+def wait_until_stopped(qnum: int = DEFAULT_QNUM,
+                       timeout: float = DEFAULT_STOP_TIMEOUT) -> Tuple[bool, float]:
+    """
+    Ждёт завершения nfqws и освобождения очереди не дольше timeout секунд.
+
+    :return: (остановлено, затраченное время)
+    """
+    started = time.monotonic()
+    while True:
+        elapsed = time.monotonic() - started
+        if not nfqws_running() and queue_bound(qnum) is not True:
+            return True, elapsed
+        if elapsed >= timeout:
+            return False, elapsed
+        time.sleep(POLL_INTERVAL)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Число процессов nfqws службы (файл utils/nfqws.workers, читает starter.sh)."""
+
+from __future__ import annotations
+
+import os
+
+from core.config_compiler import MAX_WORKERS
+from core.game_presets import get_manager_dir
+
+DEFAULT_WORKERS = 1
+
+# Состояние процессов запущенной службы: строки «очередь протокол PID» (пишет starter.sh)
+WORKERS_STATE_FILE = "/run/zapret/workers"
+
+
+def get_workers_file(manager_dir: str | None = None) -> str:
+    if manager_dir is None:
+        manager_dir = get_manager_dir()
+    return os.path.join(manager_dir, "utils", "nfqws.workers")
+
+
+def max_worker_count() -> int:
+    """Больше процессов, чем логических ядер, не нужно (и не больше MAX_WORKERS)."""
+    return max(1, min(os.cpu_count() or 1, MAX_WORKERS))
+
+
+def read_worker_count(manager_dir: str | None = None) -> int:
+    path = get_workers_file(manager_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            value = int(f.readline().strip())
+    except (OSError, ValueError):
+        return DEFAULT_WORKERS
+    return max(1, min(value, max_worker_count()))
+
+
+def write_worker_count(count: int, manager_dir: str | None = None) -> int:
+    """Сохраняет число процессов (1 — файл удаляется); вступает в силу после перезапуска службы."""
+    count = max(1, min(int(count), max_worker_count()))
+    path = get_workers_file(manager_dir)
+    if count == DEFAULT_WORKERS:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return count
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{count}\n")
+    return count
+
+
+def read_worker_states(path: str = WORKERS_STATE_FILE) -> list[dict]:
+    """
+    Процессы запущенной службы: [{"qnum", "protocol", "pid", "running"}].
+
+    Пустой список — служба не запущена или запущена старым starter.sh без этого файла.
+    """
+    states = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return states
+    for line in lines:
+        fields = line.split()
+        if len(fields) != 3 or not fields[0].isdigit() or not fields[2].isdigit():
+            continue
+        pid = int(fields[2])
+        states.append({
+            "qnum": int(fields[0]),
+            "protocol": fields[1],
+            "pid": pid,
+            "running": os.path.exists(f"/proc/{pid}"),
+        })
+    return states
@@ -0,0 +1,504 @@
+# -*- coding: utf-8 -*-
+"""
+Клиент привилегированного помощника (core/privileged_helper.py).
+
+Все операции с правами root идут через run_privileged / run_privileged_shell
+и функции для файлов, многошаговые — через run_privileged_transaction.
+Помощник выполняет только фиксированный набор операций (служба zapret,
+журнал, /etc/hosts, FWTYPE, загрузка правил файрвола): запрос к нему
+собирается здесь из обычной команды (_helper_request). При первом таком
+вызове помощник запускается один раз через «sudo -S» из копии в /opt/zapret
+(принадлежит root), дальше каждый вызов — запрос в Unix-сокет без sudo и PAM.
+
+Всё остальное, а также любые вызовы, когда помощник не установлен или не
+запустился, выполняется прежним способом через sudo -S. Транзакция идёт через
+помощника, если все её шаги и откаты входят в его набор, иначе — одним вызовом
+sudo со скриптом помощника в режиме --transaction. Результат во всех случаях —
+словарь {"returncode", "stdout", "stderr"}, как у run_with_sudo.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shlex
+import socket
+import stat
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from core.privileged_helper import (FIREWALL_RESTORE_ARGV, HELPER_PYTHON, HOSTS_FILE, INSTALLED_HELPER_PATH,
+                                    SERVICE_ACTIONS, SERVICE_QUERIES, SERVICE_UNIT, SOCKET_DIR_NAME, SOCKET_NAME,
+                                    TRANSACTION_STEP_KEYS, ZAPRET_CONFIG_FILES, RequestDenied, config_file_path,
+                                    is_private_dir, peer_credentials)
+
+START_TIMEOUT = 8.0
+# Скрипт помощника из каталога менеджера для пакета --transaction
+BATCH_HELPER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "privileged_helper.py")
+CONNECT_TIMEOUT = 2.0
+
+# Символы, при которых строку нельзя выполнить без оболочки
+_SHELL_METACHARS = set("|&;<>()$`*?[]{}~\\\n")
+
+
+def default_socket_path() -> Optional[str]:
+    """
+    Путь сокета в личном каталоге XDG_RUNTIME_DIR или None, если такого
+    каталога нет (тогда помощник не используется, всё идёт через sudo).
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir or not os.path.isabs(runtime_dir):
+        return None
+    try:
+        if not is_private_dir(os.lstat(runtime_dir), os.getuid()):
+            return None
+    except OSError:
+        return None
+    return os.path.join(runtime_dir, SOCKET_DIR_NAME, SOCKET_NAME)
+
+
+def installed_helper_trusted(path: str = INSTALLED_HELPER_PATH) -> bool:
+    """
+    Установленный помощник и все каталоги над ним принадлежат root и не
+    доступны на запись группе и остальным — иначе запускать его через sudo нельзя.
+    """
+    try:
+        st = os.lstat(path)
+        if not stat.S_ISREG(st.st_mode) or st.st_uid != 0 or st.st_mode & 0o022:
+            return False
+        directory = os.path.dirname(path)
+        while True:
+            st = os.lstat(directory)
+            if not stat.S_ISDIR(st.st_mode) or st.st_uid != 0 or st.st_mode & 0o022:
+                return False
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return True
+            directory = parent
+    except OSError:
+        return False
+
+
+def _failure(message: str) -> Dict:
+    return {"returncode": -1, "stdout": "", "stderr": message}
+
+
+class PrivilegedHelper:
+    """Соединение с помощником; запускает его при необходимости"""
+
+    def __init__(self, socket_path: Optional[str] = None):
+        self.socket_path = socket_path or default_socket_path()
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def request(self, op: str, timeout: Optional[float] = None, **args) -> Dict:
+        """
+        Отправляет запрос помощнику.
+
+        :param timeout: таймаут операции на стороне помощника (None — без ограничения)
+        :raises OSError: помощник недоступен или на сокете не процесс root
+        """
+        if not self.socket_path:
+            raise OSError("нет личного каталога XDG_RUNTIME_DIR для сокета помощника")
+        payload = dict(args, op=op, timeout=timeout)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(self.socket_path)
+            _pid, peer_uid = peer_credentials(sock)
+            if peer_uid != 0:
+                raise OSError(f"сокет помощника открыт процессом uid={peer_uid}, а не root")
+            sock.settimeout(None if timeout is None else timeout + CONNECT_TIMEOUT)
+            sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        if not data:
+            raise OSError("помощник закрыл соединение без ответа")
+        return json.loads(data.decode("utf-8"))
+
+    def is_running(self) -> bool:
+        try:
+            return self.request("ping", timeout=CONNECT_TIMEOUT).get("returncode") == 0
+        except (OSError, ValueError):
+            return False
+
+    def ensure_started(self, password: Optional[str]) -> bool:
+        """Проверяет помощника и запускает установленную копию через sudo -S, если есть пароль"""
+        with self._lock:
+            if not self.socket_path:
+                return False
+            if self.is_running():
+                return True
+            if not password or not installed_helper_trusted():
+                return False
+            try:
+                # -I: без PYTHONPATH, пользовательского site-packages и каталога скрипта в sys.path
+                self._process = subprocess.Popen(
+                    ["sudo", "-S", "-p", "", HELPER_PYTHON, "-I", INSTALLED_HELPER_PATH,
+                     "--socket", self.socket_path,
+                     "--uid", str(os.getuid()),
+                     "--owner-pid", str(os.getpid())],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    start_new_session=True,
+                )
+                self._process.stdin.write((password + "\n").encode("utf-8"))
+                self._process.stdin.close()
+            except OSError as e:
+                print(f"Не удалось запустить привилегированный помощник: {e}")
+                return False
+
+            deadline = time.monotonic() + START_TIMEOUT
+            while time.monotonic() < deadline:
+                if self.is_running():
+                    return True
+                if self._process.poll() is not None:
+                    break  # неверный пароль или ошибка запуска
+                time.sleep(0.05)
+            print("Привилегированный помощник не запустился, используется sudo")
+            return False
+
+    def stop(self) -> None:
+        try:
+            self.request("shutdown", timeout=CONNECT_TIMEOUT)
+        except (OSError, ValueError):
+            pass
+
+
+_helper: Optional[PrivilegedHelper] = None
+_helper_lock = threading.Lock()
+
+
+def get_helper() -> PrivilegedHelper:
+    global _helper
+    with _helper_lock:
+        if _helper is None:
+            _helper = PrivilegedHelper()
+        return _helper
+
+
+def _via_helper(password: Optional[str], op: str, timeout: Optional[float], **args) -> Optional[Dict]:
+    """Ответ помощника или None, если нужно выполнить операцию через sudo"""
+    helper = get_helper()
+    if not helper.ensure_started(password):
+        return None
+    try:
+        response = helper.request(op, timeout=timeout, **args)
+    except (OSError, ValueError) as e:
+        print(f"Привилегированный помощник недоступен ({e}), используется sudo")
+        return None
+    if not response.get("ok"):
+        print(f"Помощник отклонил запрос: {response.get('error')}; используется sudo")
+        return None
+    response.pop("ok", None)
+    response.pop("error", None)
+    return response
+
+
+def _service_action(argv: List[str]) -> Optional[str]:
+    """Действие, если argv — «systemctl <действие> zapret» из набора помощника"""
+    if len(argv) == 3 and argv[0] == "systemctl" and argv[2] in ("zapret", SERVICE_UNIT):
+        if argv[1] in SERVICE_ACTIONS or argv[1] in SERVICE_QUERIES:
+            return argv[1]
+    return None
+
+
+def _helper_request(request: Dict) -> Optional[Dict]:
+    """
+    Запрос менеджера (exec, systemctl, write_file, ...) в виде типизированной
+    операции помощника или None, если помощник такую операцию не выполняет.
+    """
+    op = request.get("op")
+    timeout = request.get("timeout")
+    if op == "exec":
+        action = _service_action(request.get("argv") or [])
+        return {"op": "service", "action": action, "timeout": timeout} if action else None
+    if op == "systemctl":
+        action = _service_action(["systemctl", request.get("action"), request.get("unit", "zapret")])
+        return {"op": "service", "action": action, "timeout": timeout} if action else None
+    if op in ("journal", "firewall_apply"):
+        return dict(request)
+    if op == "write_file":
+        path, content = request.get("path"), request.get("content")
+        if path == HOSTS_FILE:
+            return {"op": "write_hosts", "content": content}
+        for name, (config_path, _values) in ZAPRET_CONFIG_FILES.items():
+            if path == config_path:
+                try:
+                    config_file_path(name, content)
+                except RequestDenied:
+                    return None
+                return {"op": "write_config", "name": name, "content": content}
+    return None
+
+
+def _helper_step(step: Dict) -> Optional[Dict]:
+    """Шаг транзакции для помощника (вместе с откатами) или None"""
+    request = _helper_request({key: value for key, value in step.items() if key not in TRANSACTION_STEP_KEYS})
+    if request is None:
+        return None
+    rollback = []
+    for item in step.get("rollback") or []:
+        undo = _helper_request(item)
+        if undo is None:
+            return None
+        rollback.append(undo)
+    return dict(request, description=step.get("description", ""), check=step.get("check", True),
+                rollback=rollback)
+
+
+def _sudo(argv: List[str], password: Optional[str], timeout: Optional[float],
+          input_text: Optional[str] = None) -> Dict:
+    """Прежний способ: sudo -S с паролем в stdin"""
+    if not password:
+        return _failure("Пароль sudo не установлен")
+    try:
+        proc = subprocess.run(
+            ["sudo", "-S", "-p", ""] + argv,
+            input=password + "\n" + (input_text or ""),
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return _failure("Таймаут выполнения команды")
+    except OSError as e:
+        return _failure(str(e))
+    return {"returncode": proc.returncode, "stdout": proc.stdout, "stderr": proc.stderr}
+
+
+def _request_argv(request: Dict) -> Tuple[List[str], Optional[str]]:
+    """
+    Командная строка и stdin запроса менеджера для выполнения без помощника.
+
+    :raises RequestDenied: неизвестная операция или семейство правил
+    """
+    op = request.get("op")
+    if op == "exec":
+        return list(request["argv"]), request.get("input")
+    if op == "systemctl":
+        action = request["action"]
+        argv = ["systemctl", action] + ([] if action == "daemon-reload" else [request.get("unit", "zapret")])
+        if action == "status":
+            argv += ["--no-pager", "-l"]
+        return argv, None
+    if op == "journal":
+        lines = str(request.get("lines") or 50)
+        return ["journalctl", "-u", SERVICE_UNIT, "-n", lines, "--no-pager"], None
+    if op == "read_file":
+        return ["cat", request["path"]], None
+    if op == "write_file":
+        return ["tee", request["path"]], request["content"]
+    if op == "firewall_apply":
+        argv = FIREWALL_RESTORE_ARGV.get(request.get("family"))
+        if not argv:
+            raise RequestDenied(f"неизвестное семейство правил: {request.get('family')!r}")
+        return list(argv), request["payload"]
+    raise RequestDenied(f"неизвестная операция: {op!r}")
+
+
+def _sudo_request(request: Dict, password: Optional[str]) -> Dict:
+    """Запрос менеджера, выполненный напрямую через sudo -S"""
+    try:
+        argv, input_text = _request_argv(request)
+    except RequestDenied as e:
+        return _failure(str(e))
+    result = _sudo(argv, password, request.get("timeout"), input_text)
+    if request.get("op") == "write_file":
+        result["stdout"] = ""
+    return result
+
+
+def _batch_request(request: Dict) -> Dict:
+    """Запрос менеджера в виде шага exec для пакета --transaction"""
+    argv, input_text = _request_argv(request)
+    return {"op": "exec", "argv": argv, "input": input_text, "timeout": request.get("timeout")}
+
+
+def _transaction_failure(result: Dict) -> Dict:
+    """Результат транзакции, которая не дошла до первого шага (неверный пароль, отказ в запросе)"""
+    returncode = result["returncode"] or 1
+    stderr = (result["stderr"] or "").strip() or f"код выхода {returncode}"
+    step = {"description": "Повышение прав", "returncode": returncode, "stdout": "", "stderr": stderr,
+            "duration": 0.0}
+    return {"returncode": returncode, "stdout": "", "stderr": stderr, "steps": [step],
+            "failed_step": 0, "rolled_back": []}
+
+
+def _sudo_transaction(steps: List[Dict], password: Optional[str], timeout: Optional[float]) -> Dict:
+    """Все шаги и откаты — одним вызовом sudo: скрипт помощника в режиме --transaction"""
+    try:
+        batch = [dict(_batch_request(step), description=step.get("description", ""),
+                      check=step.get("check", True),
+                      rollback=[_batch_request(item) for item in step.get("rollback") or []])
+                 for step in steps]
+    except RequestDenied as e:
+        return _transaction_failure(_failure(str(e)))
+    result = _sudo([HELPER_PYTHON, "-I", BATCH_HELPER_PATH, "--transaction"], password, timeout,
+                   input_text=json.dumps({"steps": batch}, ensure_ascii=False) + "\n")
+    try:
+        response = json.loads(result["stdout"])
+    except ValueError:
+        response = None
+    if not isinstance(response, dict):
+        return _transaction_failure(result)
+    if not response.get("ok"):
+        return _transaction_failure(_failure(response.get("error") or ""))
+    response.pop("ok", None)
+    return response
+
+
+def _privileged_request(request: Dict, password: Optional[str]) -> Dict:
+    """Выполняет запрос через помощника, если он входит в его набор, иначе — через sudo"""
+    helper_request = _helper_request(request)
+    if helper_request is not None:
+        args = dict(helper_request)
+        op = args.pop("op")
+        timeout = args.pop("timeout", None)
+        result = _via_helper(password, op, timeout, **args)
+        if result is not None:
+            return result
+    return _sudo_request(request, password)
+
+
+def run_privileged(argv: List[str], password: Optional[str], timeout: Optional[float] = None,
+                   input_text: Optional[str] = None) -> Dict:
+    """Выполняет программу от root (без оболочки)"""
+    return _privileged_request(exec_step(argv, input_text=input_text, timeout=timeout), password)
+
+
+def run_privileged_shell(command: str, password: Optional[str], timeout: Optional[float] = None) -> Dict:
+    """
+    Выполняет строку команды от root. Простая команда выполняется без
+    оболочки (через помощника, если она входит в его набор); строка с
+    конвейером или перенаправлением — через sudo, как раньше (от root
+    выполняется только первая команда конвейера).
+    """
+    if not any(ch in _SHELL_METACHARS for ch in command):
+        try:
+            argv = shlex.split(command)
+        except ValueError:
+            argv = []
+        if argv:
+            return run_privileged(argv, password, timeout)
+
+    if not password:
+        return _failure("Пароль sudo не установлен")
+    try:
+        proc = subprocess.run(
+            f"sudo -S -p '' {command}",
+            shell=True,
+            input=password + "\n",
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return _failure("Таймаут выполнения команды")
+    except OSError as e:
+        return _failure(str(e))
+    return {"returncode": proc.returncode, "stdout": proc.stdout, "stderr": proc.stderr}
+
+
+def run_systemctl(action: str, password: Optional[str], unit: str = "zapret",
+                  timeout: Optional[float] = None) -> Dict:
+    """systemctl <action> <unit>: start/stop/restart/reload zapret — через помощника, остальное — через sudo"""
+    return _privileged_request(systemctl_step(action, unit, timeout=timeout), password)
+
+
+def read_journal(password: Optional[str], lines: int = 50, timeout: Optional[float] = None) -> Dict:
+    """Последние строки журнала zapret.service"""
+    return _privileged_request({"op": "journal", "lines": lines, "timeout": timeout}, password)
+
+
+def apply_firewall_payload(family: str, payload: str, password: Optional[str],
+                           timeout: Optional[float] = None) -> Dict:
+    """Загружает правила одним вызовом: nft -f - или iptables-restore/ip6tables-restore --noflush"""
+    return _privileged_request(firewall_step(family, payload, timeout=timeout), password)
+
+
+def read_privileged_file(path: str, password: Optional[str]) -> Dict:
+    """Содержимое файла (в stdout); если прав на чтение нет — через sudo cat"""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return {"returncode": 0, "stdout": f.read(), "stderr": ""}
+    except PermissionError:
+        return _sudo_request({"op": "read_file", "path": path}, password)
+    except OSError as e:
+        return {"returncode": 1, "stdout": "", "stderr": str(e)}
+
+
+def write_privileged_file(path: str, content: str, password: Optional[str]) -> Dict:
+    """
+    Записывает файл от root. /etc/hosts и FWTYPE помощник пишет атомарно
+    (права и владелец сохраняются), остальные файлы — через sudo tee.
+    """
+    return _privileged_request(write_file_step(path, content), password)
+
+
+def exec_step(argv: List[str], description: str = "", check: bool = True,
+              rollback: Optional[List[Dict]] = None, input_text: Optional[str] = None,
+              timeout: Optional[float] = None) -> Dict:
+    """Шаг транзакции: программа от root без оболочки"""
+    return {"op": "exec", "argv": list(argv), "input": input_text, "timeout": timeout,
+            "description": description, "check": check, "rollback": rollback or []}
+
+
+def systemctl_step(action: str, unit: str = "zapret", description: str = "", check: bool = True,
+                   rollback: Optional[List[Dict]] = None, timeout: Optional[float] = None) -> Dict:
+    """Шаг транзакции: systemctl <action> <unit>"""
+    return {"op": "systemctl", "action": action, "unit": unit, "timeout": timeout,
+            "description": description, "check": check, "rollback": rollback or []}
+
+
+def write_file_step(path: str, content: str, description: str = "", check: bool = True,
+                    rollback: Optional[List[Dict]] = None) -> Dict:
+    """Шаг транзакции: запись файла"""
+    return {"op": "write_file", "path": path, "content": content,
+            "description": description, "check": check, "rollback": rollback or []}
+
+
+def firewall_step(family: str, payload: str, description: str = "", check: bool = True,
+                  rollback: Optional[List[Dict]] = None, timeout: Optional[float] = None) -> Dict:
+    """Шаг транзакции: загрузка правил файрвола (nft / iptables / ip6tables) из payload"""
+    return {"op": "firewall_apply", "family": family, "payload": payload, "timeout": timeout,
+            "description": description, "check": check, "rollback": rollback or []}
+
+
+def run_privileged_transaction(steps: List[Dict], password: Optional[str],
+                               timeout: Optional[float] = None) -> Dict:
+    """
+    Выполняет шаги по порядку одним повышением прав вместо N: запросом к
+    помощнику, если все шаги и откаты входят в его набор, иначе одним вызовом
+    sudo со скриптом помощника в режиме --transaction. Шаг с check=True при ошибке
+    прерывает транзакцию, после чего откаты (rollback) уже выполненных шагов
+    запускаются в обратном порядке.
+
+    Результат: returncode/stderr первого прервавшего шага (0, если все
+    прошли), steps — returncode, stdout, stderr и duration каждого
+    выполненного шага, failed_step — индекс прервавшего шага или None,
+    rolled_back — индексы отменённых шагов.
+    """
+    helper_steps = [_helper_step(step) for step in steps]
+    if all(step is not None for step in helper_steps):
+        result = _via_helper(password, "transaction", timeout, steps=helper_steps)
+        if result is not None:
+            return result
+    return _sudo_transaction(steps, password, timeout)
+
+
+def log_transaction(result: Dict, log=print) -> None:
+    """Пишет в журнал результат и время каждого шага транзакции"""
+    for index, step in enumerate(result.get("steps", [])):
+        status = "OK" if step["returncode"] == 0 else f"код {step['returncode']}"
+        log(f"[{index + 1}] {step['description'] or 'шаг'}: {status}, {step['duration']:.2f} с")
+        if step["returncode"] != 0 and (step["stderr"] or "").strip():
+            log(f"    {step['stderr'].strip()}")
+    if result.get("rolled_back"):
+        log(f"Отменены шаги: {', '.join(str(i + 1) for i in result['rolled_back'])}")
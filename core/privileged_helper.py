@@ -0,0 +1,579 @@
+# -*- coding: utf-8 -*-
+"""
+Привилегированный помощник: процесс root, который запускается один раз за сессию.
+
+Раньше каждая операция с правами root (systemctl, nft, чтение журнала, запись
+/etc/hosts, nmcli) выполнялась через «echo '<пароль>' | sudo -S ...»: оболочка,
+проверка пароля PAM и запуск sudo на каждый вызов, а пароль проходил через
+строку оболочки. Теперь менеджер один раз запускает этот скрипт через sudo
+(core/privileged.py), а дальше отправляет запросы в Unix-сокет.
+
+Протокол: одно соединение — один запрос. Запрос и ответ — строка JSON,
+завершённая \\n. Ответ всегда содержит returncode, stdout и stderr (как
+run_with_sudo в менеджере) и ok=False с error, если запрос отклонён.
+
+Набор операций фиксирован, командная строка каждой собирается здесь, а не
+приходит от клиента:
+  ping                            — проверка связи;
+  service {action}                — systemctl start/stop/restart/reload/reload-or-restart/
+                                    reset-failed zapret.service (и status / is-active для диагностики);
+  journal {lines}                 — journalctl -u zapret.service;
+  write_hosts {content}           — атомарная запись /etc/hosts;
+  write_config {name, content}    — файлы настроек zapret из ZAPRET_CONFIG_FILES
+                                    (только известные значения, не скрипты);
+  firewall_apply {family, payload} — nft -f - / iptables-restore --noflush /
+                                    ip6tables-restore --noflush с payload в stdin; payload
+                                    может менять только таблицы и цепочки zapret
+                                    (validate_firewall_payload: без include/define);
+  transaction {steps}             — несколько таких операций за один запрос, с откатом;
+  shutdown                        — завершение помощника.
+Всё остальное (pacman, cp/rm в /opt/zapret, unit-файл, nmcli, ...) менеджер
+выполняет через sudo с вводом пароля. Многошаговые транзакции с такими шагами
+идут одним вызовом sudo: режим --transaction читает из stdin пакет шагов
+(программа + аргументы), выполняет его с откатом и печатает результат JSON.
+
+Сокет лежит в отдельном каталоге 0700 внутри XDG_RUNTIME_DIR пользователя
+(создаётся помощником без следования по символическим ссылкам), права 0600
+задаются umask до bind. Соединение принимается только от процесса менеджера
+(uid и pid по SO_PEERCRED). Помощник завершается вместе с процессом
+менеджера (--owner-pid).
+
+Модуль использует только стандартную библиотеку. Менеджер запускает копию,
+установленную в /opt/zapret (принадлежит root), а не файл из своего каталога:
+    sudo /usr/bin/python3 -I /opt/zapret/privileged_helper.py --socket PATH --uid UID --owner-pid PID
+Пакет транзакции (пароль проверяет sudo при каждом вызове, поэтому — файл
+из каталога менеджера):
+    sudo /usr/bin/python3 -I core/privileged_helper.py --transaction < steps.json
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Переменная PATH для программ, которые запускает помощник (не наследуется от пользователя)
+SAFE_PATH = "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+
+# Куда устанавливается помощник (копирует ZapretUpdater) и чем запускается
+INSTALLED_HELPER_PATH = "/opt/zapret/privileged_helper.py"
+HELPER_PYTHON = "/usr/bin/python3"
+SOCKET_DIR_NAME = "zapret-helper"
+SOCKET_NAME = "helper.sock"
+
+SERVICE_UNIT = "zapret.service"
+SERVICE_ACTIONS = frozenset({"start", "stop", "restart", "reload", "reload-or-restart", "reset-failed"})
+SERVICE_QUERIES = frozenset({"status", "is-active"})
+HOSTS_FILE = "/etc/hosts"
+# имя -> (путь, допустимые значения без завершающего перевода строки)
+ZAPRET_CONFIG_FILES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "FWTYPE": ("/opt/zapret/FWTYPE", ("iptables", "nftables")),
+}
+# семейство -> команда, которая читает payload из stdin
+FIREWALL_RESTORE_ARGV: Dict[str, List[str]] = {
+    "nft": ["nft", "-f", "-"],
+    "iptables": ["iptables-restore", "--noflush"],
+    "ip6tables": ["ip6tables-restore", "--noflush"],
+}
+# Таблицы nftables службы и полос тестировщика (firewall_rules.NFT_TABLE, strategy_lanes.TEST_TABLE)
+NFT_TABLES = ("zapret", "zapret_test")
+# Цепочки iptables службы и полос (ZAPRET_POST, ZAPRET_PRE, ZAPRET_TEST_*)
+_IPT_OWN_CHAIN = re.compile(r"^ZAPRET_[A-Z_]+$")
+_IPT_HOOKS = ("PREROUTING", "POSTROUTING")
+_NFT_FORBIDDEN = re.compile(r"\b(include|define|redefine|undefine)\b|\$")
+_NFT_TOP_LEVEL = re.compile(
+    r"^(?:(?:add|create|delete|flush)\s+)?(?:table|chain|set|element|rule)\s+inet\s+(\S+?)(?:\s|\{|$)"
+)
+HELPER_OPS = frozenset({"service", "journal", "write_hosts", "write_config", "firewall_apply"})
+
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+OWNER_CHECK_INTERVAL = 2.0
+DEFAULT_JOURNAL_LINES = 50
+MAX_JOURNAL_LINES = 1000
+TRANSACTION_STEP_KEYS = ("description", "check", "rollback")
+
+
+class RequestDenied(Exception):
+    """Запрос вне разрешённого набора операций"""
+
+
+def _result(returncode: int, stdout: str = "", stderr: str = "") -> Dict:
+    return {"ok": True, "returncode": returncode, "stdout": stdout, "stderr": stderr}
+
+
+def _denied(message: str) -> Dict:
+    return {"ok": False, "error": message, "returncode": -1, "stdout": "", "stderr": message}
+
+
+def _run(argv: List[str], input_text: Optional[str] = None, timeout: Optional[float] = None) -> Dict:
+    env = {"PATH": SAFE_PATH, "LANG": os.environ.get("LANG", "C.UTF-8")}
+    try:
+        proc = subprocess.run(argv, input=input_text, capture_output=True, text=True,
+                              timeout=timeout, env=env)
+    except subprocess.TimeoutExpired:
+        return _result(-1, "", "Таймаут выполнения команды")
+    except OSError as e:
+        return _result(-1, "", str(e))
+    return _result(proc.returncode, proc.stdout, proc.stderr)
+
+
+def _program(name: str) -> str:
+    path = shutil.which(name, path=SAFE_PATH)
+    if not path:
+        raise RequestDenied(f"программа не найдена: {name}")
+    return path
+
+
+def config_file_path(name: str, content: str) -> str:
+    """
+    Путь файла настроек zapret по имени; содержимое должно быть одним из
+    допустимых значений.
+
+    :raises RequestDenied: неизвестный файл или значение
+    """
+    if name not in ZAPRET_CONFIG_FILES:
+        raise RequestDenied(f"файл настроек не разрешён: {name!r}")
+    path, values = ZAPRET_CONFIG_FILES[name]
+    if not isinstance(content, str) or content.rstrip("\n") not in values:
+        raise RequestDenied(f"недопустимое значение {name}: {content!r}")
+    return path
+
+
+def _write_file(path: str, content: str) -> Dict:
+    """Атомарная запись с сохранением прав и владельца существующего файла"""
+    directory = os.path.dirname(path)
+    try:
+        st = os.stat(path)
+        file_mode, owner = st.st_mode & 0o7777, (st.st_uid, st.st_gid)
+    except FileNotFoundError:
+        file_mode, owner = 0o644, None
+    fd, tmp_path = tempfile.mkstemp(prefix=".zapret_", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.chmod(tmp_path, file_mode)
+        if owner:
+            os.chown(tmp_path, *owner)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return _result(1, "", str(e))
+    return _result(0)
+
+
+def _validate_nft_payload(payload: str) -> None:
+    depth = 0
+    for line in payload.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        if _NFT_FORBIDDEN.search(line):
+            raise RequestDenied(f"nft: недопустимая конструкция: {line!r}")
+        if depth == 0:
+            match = _NFT_TOP_LEVEL.match(line)
+            if not match or match.group(1) not in NFT_TABLES or ";" in line:
+                raise RequestDenied(f"nft: разрешены только таблицы inet {', '.join(NFT_TABLES)}: {line!r}")
+        for index, char in enumerate(line):
+            if char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth < 0:
+                    raise RequestDenied("nft: лишняя закрывающая скобка")
+                # после закрытия верхнего блока новый оператор обязан начинаться с новой строки
+                if depth == 0 and line[index + 1:].strip():
+                    raise RequestDenied(f"nft: лишний текст после блока: {line!r}")
+    if depth:
+        raise RequestDenied("nft: незакрытый блок")
+
+
+def _validate_iptables_payload(payload: str) -> None:
+    table = None
+    for line in payload.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("*"):
+            table = line[1:]
+            if table != "mangle":
+                raise RequestDenied(f"iptables: разрешена только таблица mangle: {line!r}")
+            continue
+        if table is None:
+            raise RequestDenied("iptables: правила до объявления таблицы")
+        if line == "COMMIT":
+            table = None
+            continue
+        tokens = line.split()
+        if line.startswith(":"):
+            if not _IPT_OWN_CHAIN.match(tokens[0][1:]):
+                raise RequestDenied(f"iptables: чужая цепочка: {line!r}")
+            continue
+        option, chain = tokens[0], tokens[1] if len(tokens) > 1 else ""
+        if option in ("-F", "-X", "-N"):
+            if len(tokens) != 2 or not _IPT_OWN_CHAIN.match(chain):
+                raise RequestDenied(f"iptables: чужая цепочка: {line!r}")
+            continue
+        if option not in ("-A", "-I", "-D") or not (_IPT_OWN_CHAIN.match(chain) or chain in _IPT_HOOKS):
+            raise RequestDenied(f"iptables: недопустимое правило: {line!r}")
+        target = tokens[tokens.index("-j") + 1] if "-j" in tokens[:-1] else ""
+        if target != "NFQUEUE" and not _IPT_OWN_CHAIN.match(target):
+            raise RequestDenied(f"iptables: допустимы только переходы NFQUEUE и в цепочки zapret: {line!r}")
+
+
+def validate_firewall_payload(family: str, payload: str) -> None:
+    """
+    Проверяет вход nft -f / iptables-restore: правила могут затрагивать только
+    таблицы и цепочки zapret, а nft-конструкции include/define (чтение файлов,
+    переменные) запрещены.
+
+    :raises RequestDenied: payload выходит за эти рамки
+    """
+    if family not in FIREWALL_RESTORE_ARGV:
+        raise RequestDenied(f"неизвестное семейство правил: {family!r}")
+    if not isinstance(payload, str):
+        raise RequestDenied("payload должен быть строкой")
+    if family == "nft":
+        _validate_nft_payload(payload)
+    else:
+        _validate_iptables_payload(payload)
+
+
+def _timeout(request: Dict) -> Optional[float]:
+    timeout = request.get("timeout")
+    if timeout is None:
+        return None
+    if not isinstance(timeout, (int, float)) or timeout <= 0:
+        raise RequestDenied("timeout должен быть положительным числом")
+    return float(timeout)
+
+
+def prepare_request(request: Dict) -> Callable[[], Dict]:
+    """
+    Проверяет запрос и возвращает функцию, которая его выполнит.
+    Проверка отделена от выполнения, чтобы транзакция отклонялась целиком
+    до первого шага.
+
+    :raises RequestDenied: операция или аргументы вне разрешённого набора
+    """
+    if not isinstance(request, dict):
+        raise RequestDenied("запрос должен быть объектом JSON")
+    op = request.get("op")
+    timeout = _timeout(request)
+    if op == "ping":
+        return lambda: _result(0, str(os.getpid()))
+    if op == "service":
+        action = request.get("action")
+        if action not in SERVICE_ACTIONS and action not in SERVICE_QUERIES:
+            raise RequestDenied(f"systemctl {action!r} не разрешён")
+        argv = [_program("systemctl"), action, SERVICE_UNIT]
+        if action == "status":
+            argv += ["--no-pager", "-l"]
+        return lambda: _run(argv, timeout=timeout)
+    if op == "journal":
+        lines = request.get("lines") or DEFAULT_JOURNAL_LINES
+        if not isinstance(lines, int) or not 0 < lines <= MAX_JOURNAL_LINES:
+            raise RequestDenied(f"lines должно быть от 1 до {MAX_JOURNAL_LINES}")
+        argv = [_program("journalctl"), "-u", SERVICE_UNIT, "-n", str(lines), "--no-pager"]
+        return lambda: _run(argv, timeout=timeout)
+    if op == "write_hosts":
+        content = request.get("content")
+        if not isinstance(content, str):
+            raise RequestDenied("content должен быть строкой")
+        return lambda: _write_file(HOSTS_FILE, content)
+    if op == "write_config":
+        content = request.get("content")
+        path = config_file_path(request.get("name"), content)
+        return lambda: _write_file(path, content)
+    if op == "firewall_apply":
+        family, payload = request.get("family"), request.get("payload")
+        validate_firewall_payload(family, payload)
+        program, *args = FIREWALL_RESTORE_ARGV[family]
+        argv = [_program(program)] + args
+        return lambda: _run(argv, input_text=payload, timeout=timeout)
+    if op == "transaction":
+        return _prepare_transaction(request.get("steps"), prepare_request)
+    raise RequestDenied(f"неизвестная операция: {op!r}")
+
+
+def handle_request(request: Dict) -> Dict:
+    """Выполняет один запрос; неизвестные операции и аргументы отклоняются"""
+    return prepare_request(request)()
+
+
+def _prepare_transaction(steps: List[Dict], prepare: Callable[[Dict], Callable[[], Dict]]) -> Callable[[], Dict]:
+    """
+    Готовит транзакцию: все шаги и откаты проверяются до выполнения первого шага.
+
+    Шаг — обычный запрос (service, write_config, firewall_apply, ...) с дополнительными ключами:
+      description — подпись для журнала;
+      check       — при ошибке шага (по умолчанию True) транзакция прерывается;
+      rollback    — список запросов, которые отменяют успешный шаг.
+    При прерывании откаты уже выполненных шагов запускаются в обратном порядке.
+    """
+    if not isinstance(steps, list) or not steps:
+        raise RequestDenied("steps должен быть непустым списком")
+    prepared = []
+    for step in steps:
+        if not isinstance(step, dict) or step.get("op") == "transaction":
+            raise RequestDenied("шаг транзакции должен быть простым запросом")
+        rollback = step.get("rollback") or []
+        if not isinstance(rollback, list):
+            raise RequestDenied("rollback должен быть списком запросов")
+        request = {key: value for key, value in step.items() if key not in TRANSACTION_STEP_KEYS}
+        prepared.append((step, prepare(request), [prepare(item) for item in rollback]))
+    return lambda: _run_transaction(prepared)
+
+
+def _run_transaction(prepared: List[Tuple[Dict, Callable[[], Dict], List[Callable[[], Dict]]]]) -> Dict:
+    steps_out: List[Dict] = []
+    failed_step: Optional[int] = None
+    for index, (step, execute, _rollback) in enumerate(prepared):
+        started = time.monotonic()
+        outcome = execute()
+        steps_out.append({
+            "description": step.get("description", ""),
+            "returncode": outcome["returncode"],
+            "stdout": outcome["stdout"],
+            "stderr": outcome["stderr"],
+            "duration": round(time.monotonic() - started, 3),
+        })
+        if outcome["returncode"] != 0 and step.get("check", True):
+            failed_step = index
+            break
+
+    rolled_back: List[int] = []
+    if failed_step is not None:
+        for index in range(failed_step - 1, -1, -1):
+            _step, _execute, rollback = prepared[index]
+            if rollback and steps_out[index]["returncode"] == 0:
+                for undo in rollback:
+                    undo()
+                rolled_back.append(index)
+
+    failed = steps_out[failed_step] if failed_step is not None else None
+    return {
+        "ok": True,
+        "returncode": (failed["returncode"] or 1) if failed else 0,
+        "stdout": "",
+        "stderr": failed["stderr"] if failed else "",
+        "steps": steps_out,
+        "failed_step": failed_step,
+        "rolled_back": rolled_back,
+    }
+
+
+def run_transaction(steps: List[Dict], prepare: Callable[[Dict], Callable[[], Dict]]) -> Dict:
+    """Выполняет транзакцию с заданной функцией подготовки шагов (в помощнике и при запасном пути через sudo)"""
+    return _prepare_transaction(steps, prepare)()
+
+
+def prepare_batch_step(request: Dict) -> Callable[[], Dict]:
+    """
+    Шаг пакета --transaction: программа с аргументами и stdin. Пакет целиком
+    выполняется одним «sudo -S» с паролем пользователя, поэтому набор программ
+    не ограничивается, проверяется только форма запроса.
+
+    :raises RequestDenied: запрос не операция exec или аргументы не строки
+    """
+    if not isinstance(request, dict) or request.get("op") != "exec":
+        raise RequestDenied("шаг пакета должен быть операцией exec")
+    argv, input_text = request.get("argv"), request.get("input")
+    if not isinstance(argv, list) or not argv or not all(isinstance(arg, str) for arg in argv):
+        raise RequestDenied("argv должен быть непустым списком строк")
+    if input_text is not None and not isinstance(input_text, str):
+        raise RequestDenied("input должен быть строкой")
+    timeout = _timeout(request)
+    return lambda: _run(argv, input_text=input_text, timeout=timeout)
+
+
+def run_batch(stdin_text: str) -> Dict:
+    """
+    Выполняет пакет {"steps": [...]} режима --transaction. Запрос — последняя
+    непустая строка stdin: при закэшированных правах sudo -S не читает пароль,
+    и его строка доходит сюда.
+    """
+    lines = [line for line in stdin_text.splitlines() if line.strip()]
+    try:
+        request = json.loads(lines[-1]) if lines else None
+        if not isinstance(request, dict):
+            raise RequestDenied("запрос должен быть объектом JSON")
+        return run_transaction(request.get("steps"), prepare_batch_step)
+    except (ValueError, RequestDenied) as e:
+        return _denied(str(e))
+
+
+def peer_credentials(conn: socket.socket) -> Tuple[int, int]:
+    """(pid, uid) процесса на другой стороне Unix-сокета"""
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    pid, uid, _gid = struct.unpack("3i", creds)
+    return pid, uid
+
+
+def is_private_dir(st: os.stat_result, uid: int) -> bool:
+    """Каталог (не ссылка) пользователя uid, недоступный группе и остальным"""
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == uid and not st.st_mode & 0o077
+
+
+def prepare_socket_dir(socket_path: str, uid: int) -> None:
+    """
+    Готовит каталог сокета: <XDG_RUNTIME_DIR>/zapret-helper/helper.sock.
+
+    Родитель должен быть личным каталогом пользователя (0700, не ссылка);
+    каталог сокета создаётся или проверяется через дескриптор с O_NOFOLLOW,
+    и права выставляются на дескриптор, а не по пути.
+
+    :raises OSError: путь не того вида или каталоги доступны другим
+    """
+    socket_dir = os.path.dirname(socket_path)
+    runtime_dir = os.path.dirname(socket_dir)
+    if (os.path.basename(socket_path) != SOCKET_NAME
+            or os.path.basename(socket_dir) != SOCKET_DIR_NAME
+            or not os.path.isabs(runtime_dir)):
+        raise OSError(f"недопустимый путь сокета: {socket_path}")
+    if not is_private_dir(os.lstat(runtime_dir), uid):
+        raise OSError(f"{runtime_dir} не является личным каталогом пользователя {uid}")
+    try:
+        os.mkdir(socket_dir, 0o700)
+    except FileExistsError:
+        pass
+    fd = os.open(socket_dir, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+    try:
+        st = os.fstat(fd)
+        if st.st_uid not in (uid, 0):
+            raise OSError(f"{socket_dir} принадлежит другому пользователю")
+        os.fchown(fd, uid, -1)
+        os.fchmod(fd, 0o700)
+    finally:
+        os.close(fd)
+
+
+def _read_line(conn: socket.socket) -> bytes:
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > MAX_REQUEST_BYTES:
+            raise RequestDenied("слишком большой запрос")
+    return data
+
+
+class HelperServer:
+    """
+    Сервер помощника.
+
+    :param socket_path: путь к Unix-сокету (<XDG_RUNTIME_DIR>/zapret-helper/helper.sock)
+    :param uid: пользователь, которому разрешены запросы
+    :param owner_pid: процесс менеджера: запросы принимаются только от него,
+                      и помощник завершается вместе с ним
+    """
+
+    def __init__(self, socket_path: str, uid: int, owner_pid: Optional[int] = None):
+        self.socket_path = socket_path
+        self.uid = uid
+        self.owner_pid = owner_pid
+        self._stop = threading.Event()
+
+    def _owner_alive(self) -> bool:
+        return self.owner_pid is None or os.path.exists(f"/proc/{self.owner_pid}")
+
+    def _peer_allowed(self, conn: socket.socket) -> bool:
+        pid, uid = peer_credentials(conn)
+        return uid == self.uid and (self.owner_pid is None or pid == self.owner_pid)
+
+    def _handle(self, conn: socket.socket) -> None:
+        with conn:
+            try:
+                if not self._peer_allowed(conn):
+                    return
+                request = json.loads(_read_line(conn).decode("utf-8"))
+                if isinstance(request, dict) and request.get("op") == "shutdown":
+                    self._stop.set()
+                    response = _result(0)
+                else:
+                    response = handle_request(request)
+            except RequestDenied as e:
+                response = _denied(str(e))
+            except (ValueError, TypeError) as e:
+                response = _denied(f"некорректный запрос: {e}")
+            except OSError:
+                return
+            try:
+                conn.sendall(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            except OSError:
+                pass
+
+    def serve(self) -> None:
+        prepare_socket_dir(self.socket_path, self.uid)
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Права 0600 — с момента создания файла сокета, а не после bind
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        os.chown(self.socket_path, self.uid, -1, follow_symlinks=False)
+        server.listen(16)
+        server.settimeout(OWNER_CHECK_INTERVAL)
+        try:
+            while not self._stop.is_set() and self._owner_alive():
+                try:
+                    conn, _addr = server.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            server.close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Привилегированный помощник Zapret DPI Manager")
+    parser.add_argument("--socket", help="путь к Unix-сокету (<XDG_RUNTIME_DIR>/zapret-helper/helper.sock)")
+    parser.add_argument("--uid", type=int, help="uid пользователя менеджера")
+    parser.add_argument("--owner-pid", type=int, help="PID процесса менеджера")
+    parser.add_argument("--transaction", action="store_true",
+                        help="выполнить пакет шагов из stdin, напечатать результат и завершиться")
+    args = parser.parse_args(argv)
+    if not args.transaction and (args.socket is None or args.uid is None):
+        parser.error("нужны --socket и --uid (или --transaction)")
+
+    if os.geteuid() != 0:
+        print("privileged_helper: нужен запуск от root", file=sys.stderr)
+        return 1
+    if args.transaction:
+        print(json.dumps(run_batch(sys.stdin.read()), ensure_ascii=False))
+        return 0
+    try:
+        HelperServer(args.socket, args.uid, args.owner_pid).serve()
+    except OSError as e:
+        print(f"privileged_helper: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
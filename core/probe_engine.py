@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Параллельный запуск проверок целей для тестировщика стратегий.
+
+Все проверки (curl, ping) и так выполняются как asyncio-подпроцессы, поэтому их
+можно держать «в полёте» одновременно. ProbeScheduler ограничивает общее число
+одновременных проверок семафором и дополнительно — число проверок на один хост,
+чтобы цели одного сервиса (десяток URL YouTube) не занимали все слоты.
+Результаты отдаются либо строго в исходном порядке целей (run_ordered —
+тестировщик стратегий), либо по мере завершения (run_as_completed — окно
+проверки соединения).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_PER_HOST_LIMIT = 2
+DEFAULT_STOP_POLL_INTERVAL = 0.2
+
+# Результат задачи, которая не стартовала из-за запроса остановки
+_SKIPPED = object()
+
+
+def target_host(target: Dict) -> str:
+    """Хост цели: ping_target, иначе hostname из URL, иначе имя цели."""
+    host = target.get("ping_target")
+    if not host and target.get("url"):
+        try:
+            host = urlparse(target["url"]).hostname
+        except ValueError:
+            host = None
+    return (host or target.get("name", "")).lower()
+
+
+def fair_launch_order(targets: Sequence[Dict]) -> List[int]:
+    """
+    Индексы целей в порядке запуска: по кругу между хостами.
+
+    Задачи встают в очередь семафора в порядке создания, поэтому чередование
+    хостов даёт каждому сервису шанс стартовать раньше, чем закончится
+    длинная серия целей одного хоста.
+    """
+    by_host: "OrderedDict[str, List[int]]" = OrderedDict()
+    for index, target in enumerate(targets):
+        by_host.setdefault(target_host(target), []).append(index)
+
+    order: List[int] = []
+    queues = [list(indices) for indices in by_host.values()]
+    while queues:
+        next_round = []
+        for queue in queues:
+            order.append(queue.pop(0))
+            if queue:
+                next_round.append(queue)
+        queues = next_round
+    return order
+
+
+class ProbeScheduler:
+    """
+    Ограниченный по параллельности запуск проверок.
+
+    :param max_concurrency: сколько проверок может выполняться одновременно
+    :param per_host_limit: сколько из них может идти к одному хосту
+    :param stop_check: функция без аргументов; True — новые проверки не запускать
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+        stop_check: Optional[Callable[[], bool]] = None,
+    ):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.per_host_limit = max(1, int(per_host_limit))
+        self.stop_check = stop_check or (lambda: False)
+
+    async def run_ordered(
+        self,
+        targets: Sequence[Dict],
+        probe: Callable[[Dict], Awaitable[Any]],
+    ) -> AsyncIterator[Tuple[Dict, Any]]:
+        """
+        Запускает probe(target) для всех целей и отдаёт (target, result) в исходном порядке.
+
+        Как только запрошена остановка, новые проверки не стартуют, уже готовые
+        результаты по порядку отдаются до первой незавершённой цели, остальные
+        задачи отменяются.
+        """
+        if not targets:
+            return
+
+        tasks = self._launch(targets, probe)
+        try:
+            for index, target in enumerate(targets):
+                task = tasks[index]
+                if self.stop_check() and not task.done():
+                    break
+                result = await task
+                if result is _SKIPPED:
+                    break
+                yield target, result
+        finally:
+            await _cancel_pending(tasks.values())
+
+    async def run_as_completed(
+        self,
+        targets: Sequence[Dict],
+        probe: Callable[[Dict], Awaitable[Any]],
+        poll_interval: float = DEFAULT_STOP_POLL_INTERVAL,
+    ) -> AsyncIterator[Tuple[Dict, Any]]:
+        """
+        Запускает probe(target) для всех целей и отдаёт (target, result) по мере завершения.
+
+        Остановка проверяется каждые poll_interval секунд, а не только между
+        результатами: после запроса остановки проверки «в полёте» отменяются,
+        не дожидаясь их таймаутов.
+        """
+        if not targets:
+            return
+
+        tasks = self._launch(targets, probe)
+        task_index = {task: index for index, task in tasks.items()}
+        pending: Set[asyncio.Task] = set(tasks.values())
+        try:
+            while pending and not self.stop_check():
+                done, pending = await asyncio.wait(
+                    pending, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Завершившиеся за один шаг отдаются в исходном порядке целей
+                for task in sorted(done, key=task_index.__getitem__):
+                    result = task.result()
+                    if result is _SKIPPED:
+                        continue
+                    yield targets[task_index[task]], result
+        finally:
+            await _cancel_pending(tasks.values())
+
+    def _launch(
+        self,
+        targets: Sequence[Dict],
+        probe: Callable[[Dict], Awaitable[Any]],
+    ) -> Dict[int, asyncio.Task]:
+        """Создаёт задачи проверок (индекс цели -> задача) с учётом лимитов."""
+        global_slots = asyncio.Semaphore(self.max_concurrency)
+        host_slots: Dict[str, asyncio.Semaphore] = {}
+
+        async def _guarded(target: Dict):
+            host = target_host(target)
+            host_sem = host_slots.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+            async with host_sem:
+                async with global_slots:
+                    if self.stop_check():
+                        return _SKIPPED
+                    return await probe(target)
+
+        tasks: Dict[int, asyncio.Task] = {}
+        for index in fair_launch_order(targets):
+            tasks[index] = asyncio.ensure_future(_guarded(targets[index]))
+        return tasks
+
+
+async def _cancel_pending(tasks) -> None:
+    pending = [task for task in tasks if not task.done()]
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковая запись HTML-отчёта тестирования стратегий.
+
+Карточка стратегии дописывается в файл сразу после её теста, поэтому при
+сбое или остановке в отчёте остаётся всё, что уже проверено, а в памяти
+держится только краткая сводка по каждой стратегии.
+
+Сводка и заголовки разделов известны только в конце, поэтому они дописываются
+в конец файла, а на своё место (наверх и между карточками) встают через
+CSS-свойство order: контейнер отчёта — flex-колонка, итоговый блок <style>
+задаёт порядок карточек по разделам.
+
+Рядом с HTML пишутся машиночитаемые файлы: .jsonl (строка на стратегию,
+с результатами целей) и .csv (строка на стратегию).
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Поля результата, которые нужны для итоговой сводки и CSV
+SUMMARY_FIELDS = [
+    "strategy", "mode", "success_rate", "successful", "total_targets", "failed", "blocked",
+    "youtube_passed", "discord_passed", "critical_fail_reason", "pruned", "cached", "latency_score",
+]
+
+# Поля результата цели в .jsonl
+TARGET_FIELDS = ["target_name", "protocol", "success", "blocked", "http_code", "time_taken", "details",
+                 "latency", "throughput_mbps", "stall_at"]
+
+SUMMARY_ORDER = -50
+FOOTER_ORDER = 1000000
+
+
+class StreamingReportWriter:
+    """
+    Отчёт, который пишется по мере тестирования.
+
+    :param html_path: путь к HTML-файлу отчёта (.jsonl и .csv пишутся рядом)
+    :param head_html: начало документа до контейнера с карточками включительно
+    """
+
+    def __init__(self, html_path: Path, head_html: str):
+        self.html_path = Path(html_path)
+        self.jsonl_path = self.html_path.with_suffix(".jsonl")
+        self.csv_path = self.html_path.with_suffix(".csv")
+        self.summaries: List[Dict] = []
+        self.finalized = False
+
+        self.html_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.html_path, "w", encoding="utf-8") as f:
+            f.write(head_html)
+        self.jsonl_path.write_text("", encoding="utf-8")
+        with open(self.csv_path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerow(SUMMARY_FIELDS + ["category"])
+
+    def __len__(self) -> int:
+        return len(self.summaries)
+
+    def add_card(self, result: Dict, card_html: str, category: str) -> str:
+        """
+        Дописывает карточку стратегии и строки в .jsonl/.csv.
+
+        :param category: раздел отчёта ("working", "partial", "non_working")
+        :return: id карточки в документе
+        """
+        card_id = f"card-{len(self.summaries) + 1}"
+        summary = {field: result[field] for field in SUMMARY_FIELDS if result.get(field) is not None}
+        summary["category"] = category
+        summary["card_id"] = card_id
+        self.summaries.append(summary)
+
+        with open(self.html_path, "a", encoding="utf-8") as f:
+            f.write(f'<div class="report-card-slot" id="{card_id}">{card_html}</div>\n')
+            f.flush()
+
+        record = dict(summary)
+        record["latency"] = result.get("latency")
+        record["throughput"] = result.get("throughput")
+        record["targets"] = [
+            {field: target.get(field) for field in TARGET_FIELDS}
+            for target in result.get("target_results", [])
+        ]
+        with open(self.jsonl_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        with open(self.csv_path, "a", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerow([summary.get(field) for field in SUMMARY_FIELDS] + [category])
+
+        return card_id
+
+    def finalize(self, summary_html: str, sections: List[Tuple[str, Optional[List[str]]]],
+                 footer_html: str) -> None:
+        """
+        Дописывает сводку, заголовки разделов, порядок карточек и закрывает документ.
+
+        :param sections: [(HTML заголовка раздела, [id карточек раздела по порядку])];
+                         None вместо списка — заголовок без своих карточек (выводится всегда),
+                         раздел с пустым списком пропускается
+        """
+        if self.finalized:
+            return
+
+        parts = [f'<div class="report-summary" style="order: {SUMMARY_ORDER};">{summary_html}</div>\n']
+        order_rules = []
+        order = 1
+        for heading_html, card_ids in sections:
+            if card_ids is not None and not card_ids:
+                continue
+            parts.append(f'<div class="report-section" style="order: {order};">{heading_html}</div>\n')
+            order += 1
+            for card_id in card_ids or []:
+                order_rules.append(f"#{card_id} {{ order: {order}; }}")
+                order += 1
+
+        parts.append(f"<style>\n{chr(10).join(order_rules)}\n</style>\n")
+        parts.append(f'<div class="report-footer" style="order: {FOOTER_ORDER};">{footer_html}</div>\n')
+        parts.append("    </div>\n</body>\n</html>\n")
+
+        with open(self.html_path, "a", encoding="utf-8") as f:
+            f.write("".join(parts))
+        self.finalized = True
+
+    def discard(self) -> None:
+        """Удаляет файлы отчёта (в нём нет ни одной стратегии)"""
+        for path in (self.html_path, self.jsonl_path, self.csv_path):
+            try:
+                path.unlink()
+            except OSError:
+                pass
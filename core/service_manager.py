@@ -2,6 +2,7 @@ import subprocess
 import time
 
 from core.app_logging import get_error_logger
+from core.privileged import read_journal, run_privileged_shell, run_systemctl
 
 
 class ServiceManager:
@@ -12,49 +13,43 @@ class ServiceManager:
         """Устанавливает пароль sudo"""
         self.sudo_password = password
 
-    def _run_sudo_command(self, command):
-        """Выполняет команду с sudo"""
+    def _run_sudo_command(self, command, timeout=10):
+        """Выполняет команду с правами root (через помощника, конвейеры — через sudo)"""
         if not self.sudo_password:
             return False, "Пароль sudo не установлен"
+        return self._result_to_tuple(run_privileged_shell(command, self.sudo_password, timeout=timeout))
 
-        try:
-            # Формируем команду с передачей пароля
-            cmd = f"echo '{self.sudo_password}' | sudo -S {command}"
-
-            process = subprocess.run(
-                cmd,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-
-            if process.returncode == 0:
-                return True, process.stdout.strip()
-            else:
-                err_parts = []
-                if (process.stderr or "").strip():
-                    err_parts.append(process.stderr.strip())
-                if (process.stdout or "").strip():
-                    err_parts.append(process.stdout.strip())
-                merged = "\n".join(err_parts)
-                if not merged:
-                    merged = f"(код выхода {process.returncode}, вывод пуст)"
-                return False, merged
-
-        except subprocess.TimeoutExpired:
-            return False, "Таймаут выполнения команды"
-        except Exception as e:
-            return False, str(e)
+    def _systemctl(self, action, timeout=10):
+        """systemctl <action> zapret через привилегированного помощника"""
+        if not self.sudo_password:
+            return False, "Пароль sudo не установлен"
+        return self._result_to_tuple(run_systemctl(action, self.sudo_password, timeout=timeout))
+
+    @staticmethod
+    def _result_to_tuple(result):
+        """Словарь returncode/stdout/stderr -> (успех, текст)"""
+        if result["returncode"] == 0:
+            return True, (result["stdout"] or "").strip()
+        err_parts = []
+        if (result["stderr"] or "").strip():
+            err_parts.append(result["stderr"].strip())
+        if (result["stdout"] or "").strip():
+            err_parts.append(result["stdout"].strip())
+        merged = "\n".join(err_parts)
+        if not merged:
+            merged = f"(код выхода {result['returncode']}, вывод пуст)"
+        return False, merged
 
     def _collect_zapret_failure_context(self, max_chars=12000):
         """Текст из systemctl status и journalctl (как в journal), для диагностики конфига."""
         chunks = []
-        for cmd in (
-            "systemctl status zapret --no-pager -l",
-            "journalctl -u zapret.service -n 50 --no-pager",
+        if not self.sudo_password:
+            return ""
+        for cmd, result in (
+            ("systemctl status zapret --no-pager -l", run_systemctl("status", self.sudo_password, timeout=10)),
+            ("journalctl -u zapret.service -n 50 --no-pager", read_journal(self.sudo_password, 50, timeout=10)),
         ):
-            _ok, out = self._run_sudo_command(cmd)
+            _ok, out = self._result_to_tuple(result)
             text = (out or "").strip()
             if text:
                 chunks.append(f"$ {cmd}\n{text}")
@@ -99,10 +94,12 @@ class ServiceManager:
         full = f"{head}\n\n{ctx}" if ctx else head
         return False, full
 
-    def _start_or_restart_zapret(self, op):
-        """op: 'start' или 'restart'. Пишет подробности в лог при ошибке."""
+    def _start_or_restart_zapret(self, op, timeout=10):
+        """op: 'start', 'restart' или 'reload-or-restart'. Пишет подробности в лог при ошибке."""
         log = get_error_logger()
-        ok, msg = self._run_sudo_command(f"systemctl {op} zapret")
+        # Ручной запуск не должен упираться в StartLimitBurst, накопленный автоперезапусками
+        self._systemctl("reset-failed")
+        ok, msg = self._systemctl(op, timeout=timeout)
         if not ok:
             ctx = self._collect_zapret_failure_context()
             full = (msg or "systemctl вернул ошибку").strip()
@@ -124,23 +121,27 @@ class ServiceManager:
 
     def stop_service(self):
         """Останавливает службу zapret"""
-        return self._run_sudo_command("systemctl stop zapret")
+        return self._systemctl("stop")
 
     def restart_service(self):
         """Перезапускает службу zapret"""
         return self._start_or_restart_zapret("restart")
 
+    def reload_service(self):
+        """Применяет изменения config.txt, списков и GameFilter без снятия правил файрвола (reload-or-restart)"""
+        return self._start_or_restart_zapret("reload-or-restart", timeout=60)
+
     def enable_autostart(self):
         """Включает автозапуск службы zapret"""
-        return self._run_sudo_command("systemctl enable zapret")
+        return self._systemctl("enable")
 
     def disable_autostart(self):
         """Отключает автозапуск службы zapret"""
-        return self._run_sudo_command("systemctl disable zapret")
+        return self._systemctl("disable")
 
     def get_service_status(self):
         """Получает статус службы zapret"""
-        success, output = self._run_sudo_command("systemctl is-active zapret")
+        success, output = self._systemctl("is-active")
 
         if success:
             status = output.strip()
@@ -247,7 +248,7 @@ class ServiceManager:
 
     def get_autostart_status(self):
         """Проверяет, включен ли автозапуск"""
-        success, output = self._run_sudo_command("systemctl is-enabled zapret")
+        success, output = self._systemctl("is-enabled")
 
         if success:
             return output.strip() == "enabled"
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Отслеживание состояния службы zapret по сигналам systemd вместо опроса.
+
+Главное окно раньше каждые 5 секунд запускало в потоке Tk два процесса
+(systemctl is-active и systemctl is-enabled). ServiceMonitor работает в
+фоновом потоке и вызывает on_change только при изменении состояния:
+
+  * основной режим — системная шина D-Bus: подписка на PropertiesChanged
+    объекта unit-а zapret.service и на UnitFilesChanged (enable/disable);
+    состояние перечитывается одним «systemctl show» только после сигнала;
+  * запасной режим (нет шины или доступа к ней) — тот же «systemctl show»
+    раз в POLL_INTERVAL секунд, но в фоновом потоке и одним процессом.
+
+Клиент D-Bus минимальный, на стандартной библиотеке: аутентификация EXTERNAL,
+вызовы Hello / AddMatch / Subscribe и разбор заголовков входящих сообщений
+(тело сигналов не разбирается — оно не нужно).
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import struct
+import subprocess
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+UNIT_NAME = "zapret.service"
+POLL_INTERVAL = 5.0
+# Сигналы приходят пачками (activating -> active): состояние читается после паузы
+SETTLE_DELAY = 0.3
+
+SYSTEM_BUS_SOCKET = "/run/dbus/system_bus_socket"
+SYSTEMD_BUS_NAME = "org.freedesktop.systemd1"
+SYSTEMD_PATH = "/org/freedesktop/systemd1"
+SYSTEMD_MANAGER = "org.freedesktop.systemd1.Manager"
+
+# Состояние службы: {"active": "active" | "inactive" | "failed" | ..., "loaded": bool, "enabled": bool}
+ServiceState = Dict[str, object]
+
+_MESSAGE_METHOD_CALL = 1
+_MESSAGE_ERROR = 3
+_MESSAGE_SIGNAL = 4
+_FIELD_PATH = 1
+_FIELD_INTERFACE = 2
+_FIELD_MEMBER = 3
+_FIELD_ERROR_NAME = 4
+_FIELD_REPLY_SERIAL = 5
+_FIELD_DESTINATION = 6
+_FIELD_SIGNATURE = 8
+
+
+def unit_object_path(unit: str) -> str:
+    """Путь объекта unit-а на шине: zapret.service -> /org/freedesktop/systemd1/unit/zapret_2eservice"""
+    escaped = "".join(
+        ch if ch.isascii() and (ch.isalnum() and ch != "_") else f"_{ord(ch):02x}"
+        for ch in unit
+    )
+    return f"{SYSTEMD_PATH}/unit/{escaped}"
+
+
+def read_service_state(unit: str = UNIT_NAME) -> ServiceState:
+    """Состояние службы одним вызовом systemctl show (без sudo)"""
+    state: ServiceState = {"active": "unknown", "loaded": False, "enabled": False}
+    try:
+        proc = subprocess.run(
+            ["systemctl", "show", unit, "--property=ActiveState,LoadState,UnitFileState"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except (subprocess.TimeoutExpired, OSError):
+        return state
+    values = dict(line.partition("=")[::2] for line in proc.stdout.splitlines() if "=" in line)
+    state["active"] = values.get("ActiveState") or "unknown"
+    state["loaded"] = values.get("LoadState") == "loaded"
+    state["enabled"] = values.get("UnitFileState") == "enabled"
+    return state
+
+
+def _pad(buf: bytearray, alignment: int) -> None:
+    buf.extend(b"\0" * (-len(buf) % alignment))
+
+
+def _put_string(buf: bytearray, value: str) -> None:
+    data = value.encode("utf-8")
+    _pad(buf, 4)
+    buf.extend(struct.pack("<I", len(data)) + data + b"\0")
+
+
+def _put_signature(buf: bytearray, value: str) -> None:
+    data = value.encode("ascii")
+    buf.extend(bytes([len(data)]) + data + b"\0")
+
+
+def method_call(serial: int, destination: str, path: str, interface: str, member: str,
+                args: Tuple[str, ...] = ()) -> bytes:
+    """Сообщение METHOD_CALL (little-endian) с аргументами-строками"""
+    body = bytearray()
+    for arg in args:
+        _put_string(body, arg)
+
+    fields = [
+        (_FIELD_PATH, "o", path),
+        (_FIELD_INTERFACE, "s", interface),
+        (_FIELD_MEMBER, "s", member),
+        (_FIELD_DESTINATION, "s", destination),
+    ]
+    if args:
+        fields.append((_FIELD_SIGNATURE, "g", "s" * len(args)))
+
+    header = bytearray(struct.pack(
+        "<cBBBII", b"l", _MESSAGE_METHOD_CALL, 0, 1, len(body), serial,
+    ))
+    array = bytearray()
+    for code, signature, value in fields:
+        # Выравнивание считается от начала сообщения: 12 байт заголовка + 4 байта длины массива
+        while (16 + len(array)) % 8:
+            array.append(0)
+        array.append(code)
+        _put_signature(array, signature)
+        while (16 + len(array)) % (1 if signature == "g" else 4):
+            array.append(0)
+        if signature == "g":
+            _put_signature(array, value)
+        else:
+            data = value.encode("utf-8")
+            array.extend(struct.pack("<I", len(data)) + data + b"\0")
+    header.extend(struct.pack("<I", len(array)))
+    header.extend(array)
+    _pad(header, 8)
+    return bytes(header + body)
+
+
+def message_length(data: bytes) -> int:
+    """Полная длина сообщения по его первым 16 байтам"""
+    endian = "<" if data[0:1] == b"l" else ">"
+    body_len, _serial, fields_len = struct.unpack(endian + "III", data[4:16])
+    header_end = 16 + fields_len
+    return header_end + (-header_end % 8) + body_len
+
+
+def parse_header(data: bytes) -> Tuple[int, Dict[int, object]]:
+    """
+    Разбор заголовка полного сообщения D-Bus.
+
+    :return: (тип сообщения, {код поля: значение}); строковые поля — str, поля «u» — int
+    """
+    endian = "<" if data[0:1] == b"l" else ">"
+    msg_type = data[1]
+    (fields_len,) = struct.unpack(endian + "I", data[12:16])
+    header_end = 16 + fields_len
+
+    fields: Dict[int, object] = {}
+    pos = 16
+    while pos < header_end:
+        pos += -pos % 8
+        if pos >= header_end:
+            break
+        code = data[pos]
+        sig_len = data[pos + 1]
+        signature = data[pos + 2:pos + 2 + sig_len].decode("ascii")
+        pos += 3 + sig_len
+        if signature in ("s", "o"):
+            pos += -pos % 4
+            (length,) = struct.unpack(endian + "I", data[pos:pos + 4])
+            fields[code] = data[pos + 4:pos + 4 + length].decode("utf-8", errors="replace")
+            pos += 5 + length
+        elif signature == "g":
+            length = data[pos]
+            fields[code] = data[pos + 1:pos + 1 + length].decode("ascii")
+            pos += 2 + length
+        elif signature == "u":
+            pos += -pos % 4
+            (fields[code],) = struct.unpack(endian + "I", data[pos:pos + 4])
+            pos += 4
+        else:
+            break  # неизвестный тип поля: остальные поля не нужны
+    return msg_type, fields
+
+
+class _BusConnection:
+    """Соединение с системной шиной: только отправка вызовов и чтение заголовков"""
+
+    def __init__(self, path: str = SYSTEM_BUS_SOCKET):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(5)
+        self.sock.connect(path)
+        self.serial = 0
+        self._buffer = b""
+        self._authenticate()
+
+    def _authenticate(self) -> None:
+        uid = str(os.getuid()).encode("ascii").hex().encode("ascii")
+        self.sock.sendall(b"\0AUTH EXTERNAL " + uid + b"\r\n")
+        reply = b""
+        while not reply.endswith(b"\r\n"):
+            chunk = self.sock.recv(256)
+            if not chunk:
+                raise OSError("шина D-Bus закрыла соединение")
+            reply += chunk
+        if not reply.startswith(b"OK"):
+            raise OSError(f"шина D-Bus отклонила аутентификацию: {reply.strip()!r}")
+        self.sock.sendall(b"BEGIN\r\n")
+
+    def call(self, destination: str, path: str, interface: str, member: str,
+             args: Tuple[str, ...] = ()) -> int:
+        """Отправляет вызов и возвращает его serial (ответ приходит среди прочих сообщений)"""
+        self.serial += 1
+        self.sock.sendall(method_call(self.serial, destination, path, interface, member, args))
+        return self.serial
+
+    def read_message(self, timeout: Optional[float]) -> Optional[Tuple[int, Dict[int, object]]]:
+        """Следующее сообщение (тип, поля заголовка) или None по таймауту"""
+        self.sock.settimeout(timeout)
+        while True:
+            if len(self._buffer) >= 16:
+                total = message_length(self._buffer)
+                if len(self._buffer) >= total:
+                    message, self._buffer = self._buffer[:total], self._buffer[total:]
+                    return parse_header(message)
+            try:
+                chunk = self.sock.recv(65536)
+            except socket.timeout:
+                return None
+            if not chunk:
+                raise OSError("шина D-Bus закрыла соединение")
+            self._buffer += chunk
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ServiceMonitor:
+    """
+    Фоновое отслеживание службы.
+
+    :param on_change: вызывается из фонового потока с новым состоянием
+        (ServiceState) при запуске и при каждом изменении
+    :param unit: имя unit-а systemd
+    :param poll_interval: период опроса в запасном режиме
+    """
+
+    def __init__(self, on_change: Callable[[ServiceState], None], unit: str = UNIT_NAME,
+                 poll_interval: float = POLL_INTERVAL):
+        self.on_change = on_change
+        self.unit = unit
+        self.poll_interval = poll_interval
+        self.mode = ""  # "dbus" или "poll" после запуска
+        self._state: Optional[ServiceState] = None
+        self._stop = threading.Event()
+        self._refresh = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="zapret-service-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._refresh.set()
+
+    def refresh(self) -> None:
+        """Перечитать состояние вне очереди (например, после действия пользователя)"""
+        self._refresh.set()
+
+    def _publish(self) -> None:
+        state = read_service_state(self.unit)
+        if state != self._state:
+            self._state = state
+            try:
+                self.on_change(dict(state))
+            except Exception as e:
+                print(f"Ошибка обработчика состояния службы: {e}")
+
+    def _run(self) -> None:
+        self._publish()
+        while not self._stop.is_set():
+            try:
+                self._watch_bus()
+            except (OSError, ValueError, struct.error, IndexError) as e:
+                if self.mode != "poll":
+                    print(f"Состояние службы: D-Bus недоступна ({e}), опрос каждые {self.poll_interval:g} с")
+                self.mode = "poll"
+                self._poll()
+
+    def _watch_bus(self) -> None:
+        bus = _BusConnection()
+        try:
+            bus.call("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus", "Hello")
+            unit_path = unit_object_path(self.unit)
+            matches: List[str] = [
+                f"type='signal',sender='{SYSTEMD_BUS_NAME}',path='{unit_path}',"
+                "interface='org.freedesktop.DBus.Properties',member='PropertiesChanged'",
+                f"type='signal',sender='{SYSTEMD_BUS_NAME}',path='{SYSTEMD_PATH}',"
+                f"interface='{SYSTEMD_MANAGER}',member='UnitFilesChanged'",
+            ]
+            for rule in matches:
+                bus.call("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus",
+                         "AddMatch", (rule,))
+            # Без Subscribe systemd не рассылает сигналы об изменении unit-ов
+            subscribe_serial = bus.call(SYSTEMD_BUS_NAME, SYSTEMD_PATH, SYSTEMD_MANAGER, "Subscribe")
+            self.mode = "dbus"
+            self._publish()  # состояние могло измениться до подписки
+
+            pending = False
+            while not self._stop.is_set():
+                message = bus.read_message(SETTLE_DELAY if pending else 1.0)
+                if self._refresh.is_set():
+                    self._refresh.clear()
+                    pending = True
+                if message is None:
+                    if pending:
+                        pending = False
+                        self._publish()
+                    continue
+                msg_type, fields = message
+                if msg_type == _MESSAGE_ERROR and fields.get(_FIELD_REPLY_SERIAL) == subscribe_serial:
+                    raise OSError(f"systemd отклонил подписку: {fields.get(_FIELD_ERROR_NAME)}")
+                if msg_type == _MESSAGE_SIGNAL and fields.get(_FIELD_MEMBER) in (
+                        "PropertiesChanged", "UnitFilesChanged"):
+                    pending = True
+        finally:
+            bus.close()
+
+    def _poll(self) -> None:
+        while not self._stop.is_set():
+            self._refresh.wait(self.poll_interval)
+            self._refresh.clear()
+            if self._stop.is_set():
+                return
+            self._publish()
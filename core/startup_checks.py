@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Проверки при запуске менеджера без блокировки окна.
+
+Раньше главное окно до показа по очереди выполняло проверку зависимостей
+(по процессу `which` / `curl --version` на пакет), проверку файлов и службы
+zapret и создание списков — всё в потоке Tk. Здесь те же проверки сделаны
+без запуска процессов и выполняются параллельно в пуле потоков
+(StartupOrchestrator), а окно показывается сразу.
+
+Успешные результаты запоминаются в utils/startup_checks.json вместе с
+«отпечатком» того, от чего они зависят (mtime каталогов PATH и базы пакетов
+pacman, mtime файлов /opt/zapret и unit-файла). Пока отпечаток не изменился,
+проверка не повторяется. Неудачный результат не кешируется: установка
+зависимостей или zapret всегда проверяется заново.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from core.platform_info import ZAPRET_SYSTEMD_UNIT_PATH, ZAPRET_SYSTEMD_UNIT_PATH_LEGACY
+
+CACHE_FILENAME = "startup_checks.json"
+DEPENDENCIES = ("curl", "nft")
+ZAPRET_DIR = "/opt/zapret"
+ZAPRET_REQUIRED_FILES = ("FWTYPE", "nfqws", "starter.sh", "stopper.sh", "zapret.service")
+PACKAGE_DB_DIRS = ("/var/lib/pacman/local", "/var/lib/dpkg", "/var/lib/rpm")
+LIST_FILES = (
+    "ipset-all_user.txt",
+    "ipset-exclude_user.txt",
+    "list-exclude_user.txt",
+    "list-general_user.txt",
+)
+
+
+def default_cache_path(manager_dir: Optional[str] = None) -> Path:
+    """Путь к кешу: ~/Zapret_DPI_Manager/utils/startup_checks.json"""
+    base = Path(manager_dir) if manager_dir else Path(os.path.expanduser("~/Zapret_DPI_Manager"))
+    return base / "utils" / CACHE_FILENAME
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _fingerprint(paths) -> List:
+    return [[path, _mtime(path)] for path in paths]
+
+
+class StartupCache:
+    """Последние успешные результаты проверок с их отпечатками"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else default_cache_path()
+        self._lock = threading.Lock()
+        try:
+            self._data = json.loads(self.path.read_text(encoding="utf-8"))
+            if not isinstance(self._data, dict):
+                self._data = {}
+        except (OSError, ValueError):
+            self._data = {}
+
+    def get(self, name: str, fingerprint: List) -> Optional[Dict]:
+        with self._lock:
+            entry = self._data.get(name)
+        if entry and entry.get("fingerprint") == fingerprint:
+            return entry.get("result")
+        return None
+
+    def put(self, name: str, fingerprint: List, result: Dict) -> None:
+        with self._lock:
+            self._data[name] = {"fingerprint": fingerprint, "result": result}
+            data = json.dumps(self._data, ensure_ascii=False, indent=1)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(data, encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Не удалось сохранить кеш проверок запуска: {e}")
+
+
+def _cached(cache: Optional[StartupCache], name: str, fingerprint: List,
+            compute: Callable[[], Dict]) -> Dict:
+    """Результат из кеша или новый; в кеш попадает только успешный (ok=True)"""
+    if cache is not None:
+        result = cache.get(name, fingerprint)
+        if result is not None:
+            return dict(result, cached=True)
+    result = compute()
+    if cache is not None and result.get("ok"):
+        cache.put(name, fingerprint, result)
+    return dict(result, cached=False)
+
+
+def check_dependencies(cache: Optional[StartupCache] = None,
+                       dependencies=DEPENDENCIES) -> Dict:
+    """Наличие программ-зависимостей в PATH (shutil.which вместо `which` в отдельном процессе)"""
+    path_dirs = [d for d in os.environ.get("PATH", "").split(os.pathsep) if d]
+    fingerprint = _fingerprint(list(PACKAGE_DB_DIRS) + path_dirs) + [list(dependencies)]
+
+    def compute() -> Dict:
+        missing = [name for name in dependencies if shutil.which(name) is None]
+        return {"ok": not missing, "missing": missing}
+
+    return _cached(cache, "dependencies", fingerprint, compute)
+
+
+def check_zapret_installation(cache: Optional[StartupCache] = None) -> Dict:
+    """Установлен ли zapret: каталог, unit-файл и непустые обязательные файлы"""
+    files = [os.path.join(ZAPRET_DIR, name) for name in ZAPRET_REQUIRED_FILES]
+    fingerprint = _fingerprint([ZAPRET_DIR, ZAPRET_SYSTEMD_UNIT_PATH, ZAPRET_SYSTEMD_UNIT_PATH_LEGACY] + files)
+
+    def compute() -> Dict:
+        installed = os.path.isdir(ZAPRET_DIR) and (
+            os.path.isfile(ZAPRET_SYSTEMD_UNIT_PATH) or os.path.isfile(ZAPRET_SYSTEMD_UNIT_PATH_LEGACY)
+        )
+        missing = []
+        for path in files:
+            try:
+                if os.path.getsize(path) == 0:
+                    missing.append(os.path.basename(path))
+            except OSError:
+                missing.append(os.path.basename(path))
+        return {"ok": installed and not missing, "installed": installed, "missing_files": missing}
+
+    return _cached(cache, "zapret", fingerprint, compute)
+
+
+def ensure_list_files(manager_dir: Optional[str] = None) -> Dict:
+    """Создаёт отсутствующие пользовательские списки в files/lists/"""
+    base = manager_dir or os.path.expanduser("~/Zapret_DPI_Manager")
+    lists_dir = os.path.join(base, "files", "lists")
+    created, failed = [], []
+    os.makedirs(lists_dir, exist_ok=True)
+    for filename in LIST_FILES:
+        path = os.path.join(lists_dir, filename)
+        if os.path.isfile(path):
+            continue
+        try:
+            with open(path, "w", encoding="utf-8"):
+                pass
+            created.append(filename)
+        except OSError as e:
+            print(f"Не удалось создать {filename}: {e}")
+            failed.append(filename)
+    return {"ok": not failed, "created": created, "failed": failed}
+
+
+class StartupOrchestrator:
+    """
+    Запускает независимые проверки параллельно в пуле потоков.
+
+    :param checks: имя -> функция проверки (возвращает словарь с ключом ok)
+    :param on_result: вызывается из рабочего потока как on_result(имя, результат);
+                      в результат добавляется duration (с)
+    :param on_done: вызывается один раз после всех проверок со словарём имя -> результат
+    """
+
+    def __init__(self, checks: Dict[str, Callable[[], Dict]],
+                 on_result: Optional[Callable[[str, Dict], None]] = None,
+                 on_done: Optional[Callable[[Dict[str, Dict]], None]] = None,
+                 max_workers: Optional[int] = None):
+        self.checks = dict(checks)
+        self.on_result = on_result
+        self.on_done = on_done
+        self.max_workers = max_workers or max(1, len(self.checks))
+        self.results: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _run_check(self, name: str, check: Callable[[], Dict]) -> None:
+        started = time.monotonic()
+        try:
+            result = check()
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        result = dict(result, duration=round(time.monotonic() - started, 3))
+        with self._lock:
+            self.results[name] = result
+            finished = len(self.results) == len(self.checks)
+        if self.on_result:
+            self.on_result(name, result)
+        if finished and self.on_done:
+            self.on_done(dict(self.results))
+
+    def start(self) -> None:
+        """Запускает проверки и сразу возвращает управление"""
+        if not self.checks:
+            if self.on_done:
+                self.on_done({})
+            return
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="startup-check")
+        for name, check in self.checks.items():
+            executor.submit(self._run_check, name, check)
+        executor.shutdown(wait=False)
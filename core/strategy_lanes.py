@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Изолированные «полосы» для параллельного тестирования стратегий.
+
+Каждая полоса — отдельный процесс nfqws со своей очередью NFQUEUE (--qnum=201, 202, …).
+Проверки полосы открывают соединения только с локальных портов из своего диапазона
+(см. core.http_probe.SOURCE_PORTS), а отдельная таблица файрвола ``inet zapret_test``
+(или цепочки ZAPRET_TEST_* в iptables и ip6tables) отправляет трафик каждого диапазона в очередь
+своей полосы. Так несколько стратегий проверяются одновременно, а config.txt
+и unit zapret.service не переписываются и не перезапускаются на каждую стратегию.
+
+Метка SO_MARK требует CAP_NET_ADMIN, а отдельный network namespace — запуска проверок
+от root, поэтому трафик полос различается портом источника: привязка к непривилегированному
+порту доступна обычному пользователю.
+"""
+
+from __future__ import annotations
+
+import os
+import shlex
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from core.config_compiler import compile_config_text
+from core.firewall_rules import IPT_FAMILIES
+from core.game_filter_settings import game_filter_port_values
+from core.list_cache import MERGED_LISTS, merge_list
+from core.nfqws_readiness import POLL_INTERVAL, queue_bound
+
+NFQWS_PATH = "/opt/zapret/nfqws"
+TEST_TABLE = "zapret_test"
+IPT_CHAIN_PRE = "ZAPRET_TEST_PRE"
+IPT_CHAIN_POST = "ZAPRET_TEST_POST"
+
+LANE_QNUM_BASE = 201
+LANE_PORT_BASE = 42000
+LANE_PORT_SPAN = 500
+MAX_LANES = 8
+DEFAULT_LANES = 3
+LANE_READY_TIMEOUT = 5.0
+
+CommandRunner = Callable[..., Tuple[bool, str]]
+
+
+def prepare_lane_files(files_dir: Path) -> Path:
+    """
+    Готовит общую для всех полос папку с файлами: копии files/bin и files/lists,
+    основные и пользовательские списки объединены без повторов (как в core.list_cache).
+    """
+    target = Path(tempfile.mkdtemp(prefix="zapret_lanes_"))
+    for sub in ("lists", "bin"):
+        source = files_dir / sub
+        if source.is_dir():
+            for item in source.iterdir():
+                if item.is_file():
+                    shutil.copyfile(item, target / item.name)
+
+    for merged_name, sources in MERGED_LISTS.items():
+        contents = [(target / name).read_bytes() for name in sources if (target / name).is_file()]
+        (target / merged_name).write_bytes(merge_list(merged_name, contents)[0])
+
+    target.chmod(0o755)
+    for item in target.iterdir():
+        item.chmod(0o644)
+    return target
+
+
+def resolve_strategy_args(strategy_text: str, lane_files_dir: Path,
+                          manager_dir: Optional[str] = None) -> List[str]:
+    """Превращает текст стратегии в аргументы nfqws тем же компилятором, что и starter.sh."""
+    compiled = compile_config_text(strategy_text, lane_files_dir, game_filter_port_values(manager_dir))
+    return compiled["argv"]
+
+
+class StrategyLane:
+    """Одна полоса: очередь NFQUEUE, диапазон портов источника и процесс nfqws."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.qnum = LANE_QNUM_BASE + index
+        first_port = LANE_PORT_BASE + index * LANE_PORT_SPAN
+        self.source_ports = range(first_port, first_port + LANE_PORT_SPAN)
+        self.pid: Optional[int] = None
+
+    @property
+    def label(self) -> str:
+        return f"[полоса {self.index + 1}] "
+
+    def start(self, run_command: CommandRunner, nfqws_args: List[str]) -> Tuple[bool, str]:
+        """Запускает nfqws полосы в фоне (через sudo) и запоминает PID."""
+        argv = [NFQWS_PATH, f"--qnum={self.qnum}", "--uid=0:0"] + nfqws_args
+        inner = " ".join(shlex.quote(arg) for arg in argv)
+        ok, output = run_command(
+            f"sh -c {shlex.quote(inner + ' >/dev/null 2>&1 & echo $!')}",
+            use_sudo=True,
+        )
+        pid_text = (output or "").strip().splitlines()[-1:] or [""]
+        if not ok or not pid_text[0].isdigit():
+            return False, output or "nfqws не запустился"
+        self.pid = int(pid_text[0])
+        return True, f"PID {self.pid}"
+
+    def wait_ready(self, timeout: float = LANE_READY_TIMEOUT) -> Tuple[bool, str]:
+        """Ждёт, пока nfqws полосы привяжет свою очередь."""
+        started = time.monotonic()
+        while True:
+            if self.pid is None or not os.path.exists(f"/proc/{self.pid}"):
+                return False, "nfqws завершился (ошибка в аргументах стратегии?)"
+            if queue_bound(self.qnum) is not False:
+                return True, f"очередь {self.qnum} готова"
+            if time.monotonic() - started >= timeout:
+                return False, f"очередь {self.qnum} не привязана за {timeout:g} с"
+            time.sleep(POLL_INTERVAL)
+
+    def stop(self, run_command: CommandRunner, timeout: float = 2.0) -> None:
+        """Останавливает nfqws полосы и ждёт освобождения очереди."""
+        if self.pid is None:
+            return
+        run_command(f"kill {self.pid}", use_sudo=True)
+        started = time.monotonic()
+        while os.path.exists(f"/proc/{self.pid}") and time.monotonic() - started < timeout:
+            time.sleep(POLL_INTERVAL)
+        if os.path.exists(f"/proc/{self.pid}"):
+            run_command(f"kill -9 {self.pid}", use_sudo=True)
+        self.pid = None
+
+
+def build_lanes(count: int) -> List[StrategyLane]:
+    return [StrategyLane(i) for i in range(max(1, min(count, MAX_LANES)))]
+
+
+def _port_span(ports: range, separator: str) -> str:
+    return f"{ports.start}{separator}{ports.stop - 1}"
+
+
+def nft_lane_script(lanes: List[StrategyLane]) -> str:
+    """Скрипт для nft -f: отдельная таблица с правилами всех полос (пересоздаётся атомарно)."""
+    post_rules = []
+    pre_rules = []
+    for lane in lanes:
+        span = _port_span(lane.source_ports, "-")
+        post_rules.append(f"        tcp sport {span} ct original packets 1-12 queue num {lane.qnum} bypass")
+        pre_rules.append(f"        tcp dport {span} ct reply packets 1-6 queue num {lane.qnum} bypass")
+    return "\n".join([
+        f"add table inet {TEST_TABLE}",
+        f"delete table inet {TEST_TABLE}",
+        f"table inet {TEST_TABLE} {{",
+        "    chain postrouting {",
+        "        type filter hook postrouting priority mangle;",
+        *post_rules,
+        "    }",
+        "    chain prerouting {",
+        "        type filter hook prerouting priority mangle;",
+        *pre_rules,
+        "    }",
+        "}",
+        "",
+    ])
+
+
+def iptables_lane_commands(lanes: List[StrategyLane]) -> List[str]:
+    """
+    Команды iptables и ip6tables: свои цепочки в mangle и переходы в них из PREROUTING/POSTROUTING
+    (проверки полос ходят и по IPv6, как правила inet в nftables).
+    """
+    commands = []
+    for family in IPT_FAMILIES:
+        for chain, hook in ((IPT_CHAIN_POST, "POSTROUTING"), (IPT_CHAIN_PRE, "PREROUTING")):
+            commands.append(f"{family} -t mangle -N {chain}")
+            commands.append(f"{family} -t mangle -I {hook} -j {chain}")
+        for lane in lanes:
+            span = _port_span(lane.source_ports, ":")
+            commands.append(
+                f"{family} -t mangle -A {IPT_CHAIN_POST} -p tcp --sport {span} "
+                f"-m connbytes --connbytes-dir=original --connbytes-mode=packets --connbytes 1:12 "
+                f"-j NFQUEUE --queue-num {lane.qnum} --queue-bypass"
+            )
+            commands.append(
+                f"{family} -t mangle -A {IPT_CHAIN_PRE} -p tcp --dport {span} "
+                f"-m connbytes --connbytes-dir=reply --connbytes-mode=packets --connbytes 1:6 "
+                f"-j NFQUEUE --queue-num {lane.qnum} --queue-bypass"
+            )
+    return commands
+
+
+def install_lane_firewall(run_command: CommandRunner, lanes: List[StrategyLane],
+                          fwtype: str) -> Tuple[bool, str]:
+    """Создаёт правила полос, не трогая таблицу inet zapret и цепочки службы."""
+    if fwtype == "iptables":
+        remove_lane_firewall(run_command, fwtype)
+        for command in iptables_lane_commands(lanes):
+            ok, output = run_command(command, use_sudo=True)
+            if not ok:
+                return False, output
+        return True, "iptables"
+
+    fd, script_path = tempfile.mkstemp(prefix="zapret_lanes_", suffix=".nft")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(nft_lane_script(lanes))
+        os.chmod(script_path, 0o644)
+        return run_command(f"nft -f {shlex.quote(script_path)}", use_sudo=True)
+    finally:
+        try:
+            os.remove(script_path)
+        except OSError:
+            pass
+
+
+def remove_lane_firewall(run_command: CommandRunner, fwtype: str) -> None:
+    """Удаляет правила полос (ошибки «не существует» игнорируются)."""
+    if fwtype == "iptables":
+        for family in IPT_FAMILIES:
+            for chain, hook in ((IPT_CHAIN_POST, "POSTROUTING"), (IPT_CHAIN_PRE, "PREROUTING")):
+                run_command(f"{family} -t mangle -D {hook} -j {chain}", use_sudo=True)
+                run_command(f"{family} -t mangle -F {chain}", use_sudo=True)
+                run_command(f"{family} -t mangle -X {chain}", use_sudo=True)
+        return
+    run_command(f"nft delete table inet {TEST_TABLE}", use_sudo=True)
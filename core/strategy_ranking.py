@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Порядок тестирования стратегий по их прошлым успехам в этой сети.
+
+Для каждой стратегии оценивается вероятность оказаться рабочей: доля успешных
+тестов в текущей сети, сглаженная априорной оценкой по другим сетям
+(бета-распределение, другие сети учитываются с меньшим весом). К оценке
+добавляется бонус за неопределённость в духе UCB1: чем меньше тестов у
+стратегии, тем больше бонус, поэтому непроверенные стратегии не откладываются
+навсегда в конец очереди.
+
+Без истории все оценки равны и порядок остаётся алфавитным.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Tuple
+
+# Вес бонуса за исследование малоизвестных стратегий
+EXPLORATION_WEIGHT = 0.35
+# Вес тестов из других сетей в априорной оценке
+OTHER_NETWORK_WEIGHT = 0.25
+
+
+def strategy_score(stats: Dict, total_tests: int) -> float:
+    """
+    Оценка стратегии: сглаженная доля успехов плюс бонус за неопределённость.
+
+    :param stats: {"tests", "wins", "other_tests", "other_wins"} (см. StrategyResultsDB.strategy_stats)
+    :param total_tests: число тестов всех стратегий в этой сети
+    """
+    tests = stats.get("tests", 0)
+    wins = stats.get("wins", 0)
+    other_tests = stats.get("other_tests", 0)
+    other_wins = stats.get("other_wins", 0)
+
+    alpha = 1 + OTHER_NETWORK_WEIGHT * other_wins
+    beta = 1 + OTHER_NETWORK_WEIGHT * (other_tests - other_wins)
+    mean = (alpha + wins) / (alpha + beta + tests)
+    bonus = EXPLORATION_WEIGHT * math.sqrt(math.log(1 + total_tests) / (1 + tests))
+    return mean + bonus
+
+
+def rank_strategies(strategies: List[str], hashes: Dict[str, str],
+                    stats: Dict[str, Dict]) -> List[Tuple[str, float]]:
+    """
+    Стратегии по убыванию оценки (при равенстве — в исходном порядке).
+
+    :param hashes: {имя стратегии: хеш содержимого}
+    :param stats: сводка по хешам из StrategyResultsDB.strategy_stats
+    :return: [(имя, оценка)]
+    """
+    total_tests = sum(entry.get("tests", 0) for entry in stats.values())
+    scored = []
+    for index, strategy in enumerate(strategies):
+        entry = stats.get(hashes.get(strategy, ""), {})
+        scored.append((-strategy_score(entry, total_tests), index, strategy))
+    scored.sort()
+    return [(strategy, -negative_score) for negative_score, _, strategy in scored]
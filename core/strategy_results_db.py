@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная база результатов тестирования стратегий (SQLite).
+
+Каждый результат привязан к хешу содержимого файла стратегии, режиму теста и
+«отпечатку» сети (шлюз, его MAC-адрес, DNS-серверы). Пока стратегия не менялась
+и сеть та же, свежий результат можно взять из базы, а не тестировать заново;
+окна выбора стратегий читают из базы последние результаты мгновенно.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DB_FILENAME = "strategy_results.sqlite3"
+FRESH_RESULT_MAX_AGE = 3 * 24 * 3600  # результаты старше трёх суток перепроверяются
+
+ROUTE_PROC_PATH = Path("/proc/net/route")
+ARP_PROC_PATH = Path("/proc/net/arp")
+RESOLV_CONF_PATH = Path("/etc/resolv.conf")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    strategy TEXT NOT NULL,
+    strategy_hash TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    network TEXT NOT NULL,
+    tested_at REAL NOT NULL,
+    success_rate REAL NOT NULL,
+    working INTEGER NOT NULL,
+    result_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_lookup
+    ON results (strategy_hash, mode, network, tested_at);
+CREATE INDEX IF NOT EXISTS results_by_network
+    ON results (network, mode, tested_at);
+CREATE TABLE IF NOT EXISTS target_results (
+    result_id INTEGER NOT NULL REFERENCES results(id) ON DELETE CASCADE,
+    target TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    blocked INTEGER NOT NULL,
+    http_code TEXT,
+    time_taken REAL
+);
+CREATE INDEX IF NOT EXISTS target_results_by_result ON target_results (result_id);
+"""
+
+
+def default_db_path(manager_dir: Optional[str] = None) -> Path:
+    """Путь к базе: ~/Zapret_DPI_Manager/utils/strategy_results.sqlite3"""
+    base = Path(manager_dir) if manager_dir else Path(os.path.expanduser("~/Zapret_DPI_Manager"))
+    return base / "utils" / DB_FILENAME
+
+
+def strategy_hash(strategy_file: Path) -> str:
+    """SHA-256 содержимого файла стратегии (пробелы по краям строк не учитываются)"""
+    text = Path(strategy_file).read_text(encoding="utf-8", errors="ignore")
+    normalized = "\n".join(line.strip() for line in text.splitlines() if line.strip())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _default_gateway() -> Optional[str]:
+    """IPv4-шлюз маршрута по умолчанию из /proc/net/route"""
+    try:
+        lines = ROUTE_PROC_PATH.read_text(encoding="utf-8").splitlines()[1:]
+    except OSError:
+        return None
+    for line in lines:
+        fields = line.split()
+        if len(fields) > 2 and fields[1] == "00000000":
+            raw = bytes.fromhex(fields[2])[::-1]
+            return ".".join(str(b) for b in raw)
+    return None
+
+
+def _gateway_mac(gateway: Optional[str]) -> Optional[str]:
+    """MAC-адрес шлюза из ARP-таблицы (отличает роутеры с одинаковым адресом 192.168.0.1)"""
+    if not gateway:
+        return None
+    try:
+        lines = ARP_PROC_PATH.read_text(encoding="utf-8").splitlines()[1:]
+    except OSError:
+        return None
+    for line in lines:
+        fields = line.split()
+        if len(fields) > 3 and fields[0] == gateway:
+            return fields[3].lower()
+    return None
+
+
+def _dns_servers() -> List[str]:
+    """DNS-серверы из /etc/resolv.conf"""
+    try:
+        lines = RESOLV_CONF_PATH.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+    servers = []
+    for line in lines:
+        fields = line.split()
+        if len(fields) >= 2 and fields[0] == "nameserver":
+            servers.append(fields[1])
+    return servers
+
+
+def network_fingerprint() -> Tuple[str, Dict]:
+    """
+    Отпечаток текущей сети: шлюз, MAC шлюза и DNS-серверы.
+
+    Провайдер отдельно не определяется (для этого нужен внешний запрос), но смена
+    провайдера почти всегда меняет роутер или выданные им DNS.
+
+    :return: (короткий хеш, исходные данные)
+    """
+    gateway = _default_gateway()
+    details = {
+        "gateway": gateway,
+        "gateway_mac": _gateway_mac(gateway),
+        "dns": sorted(_dns_servers()),
+    }
+    digest = hashlib.sha256(json.dumps(details, sort_keys=True).encode("utf-8")).hexdigest()
+    return digest[:16], details
+
+
+class StrategyResultsDB:
+    """Хранилище результатов тестирования стратегий"""
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path else default_db_path()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Соединение на одну операцию: фиксирует транзакцию и закрывается"""
+        conn = sqlite3.connect(str(self.db_path), timeout=5)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record_result(self, result: Dict, strategy_hash_value: str, network: str,
+                      working: bool) -> None:
+        """Сохраняет результат стратегии вместе с результатами отдельных целей"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO results (strategy, strategy_hash, mode, network, tested_at,"
+                " success_rate, working, result_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    result.get("strategy", ""),
+                    strategy_hash_value,
+                    result.get("mode", "standard"),
+                    network,
+                    time.time(),
+                    float(result.get("success_rate", 0)),
+                    1 if working else 0,
+                    json.dumps(result, ensure_ascii=False, default=str),
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO target_results (result_id, target, success, blocked, http_code, time_taken)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        cursor.lastrowid,
+                        target.get("target_name", ""),
+                        1 if target.get("success") else 0,
+                        1 if target.get("blocked") else 0,
+                        str(target.get("http_code", "")),
+                        target.get("time_taken"),
+                    )
+                    for target in result.get("target_results", [])
+                ],
+            )
+
+    def fresh_result(self, strategy_hash_value: str, mode: str, network: str,
+                     max_age: float = FRESH_RESULT_MAX_AGE) -> Optional[Dict]:
+        """Последний результат для той же стратегии, режима и сети, если он не старше max_age"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result_json, tested_at FROM results"
+                " WHERE strategy_hash = ? AND mode = ? AND network = ? AND tested_at >= ?"
+                " ORDER BY tested_at DESC LIMIT 1",
+                (strategy_hash_value, mode, network, time.time() - max_age),
+            ).fetchone()
+        if row is None:
+            return None
+        result = json.loads(row["result_json"])
+        result["tested_at"] = row["tested_at"]
+        return result
+
+    def latest_results(self, network: str, mode: Optional[str] = None) -> Dict[str, Dict]:
+        """
+        Последний результат каждой стратегии в этой сети (без подробностей по целям).
+
+        :return: {имя стратегии: {"success_rate", "working", "mode", "tested_at", "strategy_hash"}}
+        """
+        query = ("SELECT strategy, strategy_hash, mode, tested_at, success_rate, working"
+                 " FROM results WHERE network = ?")
+        params: list = [network]
+        if mode:
+            query += " AND mode = ?"
+            params.append(mode)
+        query += " ORDER BY tested_at"
+
+        latest: Dict[str, Dict] = {}
+        with self._connect() as conn:
+            for row in conn.execute(query, params):
+                latest[row["strategy"]] = {
+                    "strategy_hash": row["strategy_hash"],
+                    "mode": row["mode"],
+                    "tested_at": row["tested_at"],
+                    "success_rate": row["success_rate"],
+                    "working": bool(row["working"]),
+                }
+        return latest
+
+    def strategy_stats(self, network: str, mode: str) -> Dict[str, Dict]:
+        """
+        Сводка тестов по хешам стратегий в этом режиме: в текущей сети и во всех остальных.
+
+        :return: {хеш стратегии: {"tests", "wins", "other_tests", "other_wins"}}
+        """
+        stats: Dict[str, Dict] = {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT strategy_hash, network = ? AS here, COUNT(*) AS tests, SUM(working) AS wins"
+                " FROM results WHERE mode = ? GROUP BY strategy_hash, here",
+                (network, mode),
+            )
+            for row in rows:
+                entry = stats.setdefault(row["strategy_hash"],
+                                         {"tests": 0, "wins": 0, "other_tests": 0, "other_wins": 0})
+                prefix = "" if row["here"] else "other_"
+                entry[prefix + "tests"] = row["tests"]
+                entry[prefix + "wins"] = row["wins"] or 0
+        return stats
+
+
+def format_age(tested_at: float) -> str:
+    """Возраст результата для подписи в интерфейсе: «5 мин», «3 ч», «2 дн»"""
+    age = max(0, time.time() - tested_at)
+    if age < 3600:
+        return f"{int(age // 60)} мин"
+    if age < 24 * 3600:
+        return f"{int(age // 3600)} ч"
+    return f"{int(age // (24 * 3600))} дн"
+
+
+def latest_results_for_current_network(manager_dir: Optional[str] = None,
+                                       mode: Optional[str] = None) -> Dict[str, Dict]:
+    """Последние результаты стратегий в текущей сети (для окон выбора); при ошибке — пустой словарь"""
+    db_path = default_db_path(manager_dir)
+    if not db_path.exists():
+        return {}
+    try:
+        network, _ = network_fingerprint()
+        return StrategyResultsDB(db_path).latest_results(network, mode)
+    except Exception as e:
+        print(f"Ошибка чтения базы результатов: {e}")
+        return {}
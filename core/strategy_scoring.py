@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Досрочное отсечение заведомо нерабочих стратегий.
+
+Стратегия считается рабочей (см. StrategyTester._is_working_result), если:
+  * стандартный режим — не меньше 60% успешных целей и пройдены критические
+    цели YouTube и Discord;
+  * режим DPI — не меньше 70% успешных целей;
+  * режим YouTube/Discord — пройдены все критические цели.
+
+EarlyAbortScorer получает результаты целей по мере готовности и сообщает,
+когда стратегия уже не может пройти порог: критические цели провалены у всех
+сервисов или даже при успехе всех оставшихся целей процент успеха будет ниже
+порога. Провал одного сервиса не отсекает стратегию: пока другой сервис может
+пройти свои критические цели, результат попадает в частично рабочие.
+Критические цели проверяются первыми, чтобы решение принималось как можно раньше.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+STANDARD_MIN_SUCCESS_RATE = 60
+DPI_MIN_SUCCESS_RATE = 70
+
+# Критические цели стандартного режима
+YOUTUBE_CRITICAL_NAMES = ["YouTubeWeb", "YouTubeVideoRedirect"]
+DISCORD_CRITICAL_NAMES = ["DiscordMain", "DiscordGateway"]
+
+
+def min_success_rate(mode: str) -> Optional[float]:
+    """Порог процента успеха для режима (None — процент не учитывается)"""
+    if mode == "YouTube/Discord":
+        return None
+    if mode == "dpi":
+        return DPI_MIN_SUCCESS_RATE
+    return STANDARD_MIN_SUCCESS_RATE
+
+
+def critical_target_names(mode: str, targets: List[Dict],
+                          critical_targets: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Критические цели, провал любой из которых делает стратегию нерабочей"""
+    if mode == "YouTube/Discord":
+        return {"youtube": list(critical_targets.get("youtube", [])),
+                "discord": list(critical_targets.get("discord", []))}
+    if mode == "dpi":
+        return {"youtube": [], "discord": []}
+    names = {target["name"] for target in targets}
+    return {"youtube": [name for name in YOUTUBE_CRITICAL_NAMES if name in names],
+            "discord": [name for name in DISCORD_CRITICAL_NAMES if name in names]}
+
+
+class EarlyAbortScorer:
+    """
+    Последовательная оценка стратегии по мере поступления результатов целей.
+
+    :param mode: режим тестирования
+    :param targets: все цели стратегии
+    :param critical_targets: критические цели из StrategyTester._collect_critical_targets
+    """
+
+    def __init__(self, mode: str, targets: List[Dict], critical_targets: Dict[str, List[str]]):
+        self.total = len(targets)
+        self.min_rate = min_success_rate(mode)
+        self.critical = critical_target_names(mode, targets, critical_targets)
+        self._service_by_name = {
+            name: ("YouTube" if service == "youtube" else "Discord")
+            for service, names in self.critical.items()
+            for name in names
+        }
+        self.resolved = 0
+        self.successful = 0
+        # Сервис -> первая проваленная критическая цель
+        self.failed_services: Dict[str, str] = {}
+
+    def probe_order(self, targets: List[Dict]) -> List[Dict]:
+        """Цели в порядке проверки: сначала критические, остальные — в исходном порядке"""
+        critical = [target for target in targets if target["name"] in self._service_by_name]
+        others = [target for target in targets if target["name"] not in self._service_by_name]
+        return critical + others
+
+    def add(self, target_result: Dict) -> Optional[str]:
+        """
+        Учитывает результат цели.
+
+        :return: причина отсечения, если стратегия уже не может пройти порог, иначе None
+        """
+        self.resolved += 1
+        success = bool(target_result.get("success"))
+        if success:
+            self.successful += 1
+
+        name = target_result.get("target_name", "")
+        if not success and name in self._service_by_name:
+            self.failed_services.setdefault(self._service_by_name[name], name)
+            services = [service for service, names in self.critical.items() if names]
+            if len(self.failed_services) == len(services):
+                labels = " и ".join(self.failed_services)
+                verb = "не работает" if len(self.failed_services) == 1 else "не работают"
+                failed = ", ".join(self.failed_services.values())
+                return f"{labels} {verb} (не пройдены критические цели: {failed})"
+
+        if self.min_rate is not None and self.total:
+            best_rate = (self.successful + self.total - self.resolved) / self.total * 100
+            if best_rate < self.min_rate:
+                return (f"Эффективность ниже порога: даже при успехе остальных целей "
+                        f"не больше {best_rate:.0f}% < {self.min_rate}%")
+        return None
@@ -9,18 +9,68 @@ from datetime import datetime
 from typing import List, Dict, Tuple, Optional
 import re
 import os
+import sys
+from contextlib import aclosing
+
+if not __package__:
+    # Импорт как strategy_tester (из окна) или запуск скриптом: нужен корень проекта в sys.path
+    _project_root = str(Path(__file__).resolve().parent.parent)
+    if _project_root not in sys.path:
+        sys.path.insert(0, _project_root)
+
+from core.game_filter_settings import get_game_filter_enable_file
+from core.http_probe import (DEFAULT_BYTE_BUDGET, ERROR_DNS, ERROR_RESET, ERROR_SSL, ERROR_TIMEOUT,
+                             SOURCE_PORTS, download_probe, format_timings, http_probe)
+from core.latency_stats import (DEFAULT_LATENCY_SAMPLES, format_latency, latency_score, strategy_latency,
+                                strategy_rank_key, target_latency)
+from core.nfqws_readiness import DEFAULT_READY_TIMEOUT, read_fwtype, wait_until_ready, wait_until_stopped
+from core.privileged import run_privileged_shell
+from core.probe_engine import DEFAULT_MAX_CONCURRENCY, DEFAULT_PER_HOST_LIMIT, ProbeScheduler
+from core.strategy_lanes import (StrategyLane, build_lanes, install_lane_firewall, prepare_lane_files,
+                                 remove_lane_firewall, resolve_strategy_args)
+from core.report_writer import StreamingReportWriter
+from core.strategy_ranking import rank_strategies
+from core.strategy_scoring import (DISCORD_CRITICAL_NAMES, DPI_MIN_SUCCESS_RATE, STANDARD_MIN_SUCCESS_RATE,
+                                   YOUTUBE_CRITICAL_NAMES, EarlyAbortScorer, critical_target_names)
+from core.strategy_results_db import (StrategyResultsDB, default_db_path, format_age, network_fingerprint,
+                                      strategy_hash)
+from core.throughput_probe import (format_bytes, format_throughput, is_dpi_freeze, standin_url,
+                                   summarize_throughput)
 
 class StrategyTester:
     """
     Класс для автоматического тестирования различных стратегий обхода блокировок
     """
 
-    def __init__(self, project_root: str, sudo_password: Optional[str] = None):
+    def __init__(self, project_root: str, sudo_password: Optional[str] = None,
+                 probe_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 per_host_limit: int = DEFAULT_PER_HOST_LIMIT):
         self.project_root = Path(project_root)
         self.sudo_password = sudo_password
         self.config_path = self.project_root / "config.txt"
         self.stop_requested = False
 
+        # Параллельность проверок целей внутри одной стратегии
+        self.probe_concurrency = probe_concurrency
+        self.per_host_limit = per_host_limit
+
+        # Верхняя граница ожидания готовности nfqws после запуска службы
+        self.ready_timeout = DEFAULT_READY_TIMEOUT
+
+        # Прекращать проверку стратегии, как только она уже не может пройти порог режима
+        self.early_abort = True
+
+        # Замеров задержки на каждую доступную цель (0 — не замерять)
+        self.latency_samples = DEFAULT_LATENCY_SAMPLES
+        # С включённым GameFilter задержка при выборе стратегии важнее процента успеха
+        self.prefer_latency = os.path.isfile(get_game_filter_enable_file(str(self.project_root)))
+
+        # Замер скорости: тяжёлые DPI-цели (bulk) скачиваются, а не проверяются HEAD-запросом
+        self.throughput_mode = False
+        self.byte_budget = DEFAULT_BYTE_BUDGET
+        # Адрес локальной подмены тяжёлых целей (core.throughput_probe.BulkStandInServer)
+        self.throughput_base_url: Optional[str] = None
+
         # Пути к файлам
         self.files_dir = self.project_root / "files"
         self.lists_dir = self.files_dir / "lists"
@@ -34,54 +84,43 @@ class StrategyTester:
         # Результаты тестирования
         self.results = []
 
+        # База результатов (открывается в run_full_test)
+        self.results_db: Optional[StrategyResultsDB] = None
+        self.network_id: Optional[str] = None
+        self.strategy_hashes: Dict[str, str] = {}
+
+        # Отчет текущего прогона (пишется по мере тестирования)
+        self.report_writer: Optional[StreamingReportWriter] = None
+
     async def _smart_curl_check(self, url: str, method: str = "HEAD") -> Dict[str, any]:
         """
         Универсальная "умная" проверка URL, совместимая с zapret на Steam Deck.
+        Запрос выполняется внутри процесса (core.http_probe) с теми же параметрами,
+        что раньше передавались curl: -4, -k, -L, --connect-timeout 1, --max-time 3.
         Возвращает словарь с результатами.
         """
-        # Базовые аргументы curl, как в предложенном решении
-        cmd = [
-            "curl",
-            "-s",                # Тихий режим
-            "-o", "/dev/null",   # Не выводить тело
-            "-I" if method.upper() == "HEAD" else "",  # Только заголовки для HEAD
-            "-L",                # Следовать редиректам
-            "-k",                # Игнорировать проблемы с SSL
-            "-4",                # ПРИНУДИТЕЛЬНО IPv4 (ключевой момент!)
-            "--connect-timeout", "1",
-            "--max-time", "3",
-            "--user-agent", "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "-w", "%{http_code}::%{time_total}::%{num_redirects}",
-            url
-        ]
-        # Убираем возможные пустые строки из списка
-        cmd = [arg for arg in cmd if arg]
-
         result = {
             "success": False,
             "blocked": False,
             "http_code": 0,
             "time_taken": "0",
             "details": "",
-            "raw_output": ""
+            "raw_output": "",
+            "headers": {},
+            "timings": {}
         }
 
         try:
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-
-            output = stdout.decode('utf-8', errors='ignore').strip()
-            error_output = stderr.decode('utf-8', errors='ignore').lower()
-            result["raw_output"] = output
-
-            if process.returncode == 0 and '::' in output:
-                parts = output.split('::')
-                http_code, time_taken = parts[0], parts[1]
-                result["http_code"] = int(http_code) if http_code.isdigit() else 0
+            probe = await http_probe(url, method=method, connect_timeout=1, total_timeout=3)
+            timings = probe["timings"]
+            time_taken = f"{timings['total']:.6f}"
+            result["timings"] = timings
+            result["headers"] = probe["headers"]
+            result["raw_output"] = f"{probe['http_code']}::{time_taken}::{probe['num_redirects']}"
+
+            if probe["ok"]:
+                http_code = str(probe["http_code"])
+                result["http_code"] = probe["http_code"]
                 result["time_taken"] = time_taken
 
                 # ЛОГИКА УСПЕХА
@@ -93,18 +132,18 @@ class StrategyTester:
                     result["details"] = f"HTTP: код {http_code}"
 
             # ЛОГИКА ОПРЕДЕЛЕНИЯ БЛОКИРОВКИ
-            elif 'ssl' in error_output or 'certificate' in error_output:
+            elif probe["error_kind"] == ERROR_SSL:
                 result["blocked"] = True
                 result["details"] = "SSL блокировка"
-            elif 'reset' in error_output or 'rst' in error_output:
+            elif probe["error_kind"] == ERROR_RESET:
                 result["blocked"] = True
                 result["details"] = "Сброс соединения (Connection Reset)"
-            elif 'could not resolve' in error_output:
+            elif probe["error_kind"] == ERROR_DNS:
                 result["details"] = "DNS ошибка"
-            elif 'timed out' in error_output:
+            elif probe["error_kind"] == ERROR_TIMEOUT:
                 result["details"] = "Таймаут"
             else:
-                result["details"] = f"Ошибка curl: {process.returncode}"
+                result["details"] = f"Ошибка соединения: {probe['error']}"
 
         except Exception as e:
             result["details"] = f"Исключение: {str(e)}"
@@ -122,13 +161,14 @@ class StrategyTester:
         """
         Выполняет команду с опциональным sudo
         """
+        if use_sudo and self.sudo_password:
+            result = run_privileged_shell(command, self.sudo_password, timeout=timeout)
+            if result["returncode"] == 0:
+                return True, result["stdout"].strip()
+            return False, result["stderr"].strip()
+
         try:
-            if use_sudo and self.sudo_password:
-                full_cmd = f"echo '{self.sudo_password}' | sudo -S {command}"
-            elif use_sudo:
-                full_cmd = f"sudo {command}"
-            else:
-                full_cmd = command
+            full_cmd = f"sudo {command}" if use_sudo else command
 
             result = subprocess.run(
                 full_cmd,
@@ -148,6 +188,17 @@ class StrategyTester:
         except Exception as e:
             return False, str(e)
 
+    def _start_service(self, timeout: int = 10) -> Tuple[bool, str]:
+        """
+        Запускает службу zapret, предварительно сбрасывая счётчик запусков.
+
+        StartLimitBurst в unit-е считает и ручные запуски, а тестировщик запускает
+        службу на каждую стратегию: без reset-failed systemd отказал бы в запуске
+        уже на шестой стратегии за StartLimitIntervalSec.
+        """
+        self._run_command("systemctl reset-failed zapret", use_sudo=True)
+        return self._run_command("systemctl start zapret", use_sudo=True, timeout=timeout)
+
     def _load_targets(self, mode: str = "standard") -> List[Dict]:
         """
         Загружает цели для тестирования
@@ -162,13 +213,13 @@ class StrategyTester:
                 {"name": "US.Cloudflare.3", "url": "https://api.frankfurter.dev/v1/2000-01-01..2002-12-31", "ping_only": False},
                 {"name": "US.DigitalOcean", "url": "https://genderize.io/", "ping_only": False},
                 {"name": "DE.Hetzner.1", "url": "https://j.dejure.org/jcg/doctrine/doctrine_banner.webp", "ping_only": False},
-                {"name": "FI.Hetzner.2", "url": "https://tcp1620-01.dubybot.live/1MB.bin", "ping_only": False},
-                {"name": "FI.Hetzner.3", "url": "https://tcp1620-02.dubybot.live/1MB.bin", "ping_only": False},
-                {"name": "FI.Hetzner.4", "url": "https://tcp1620-05.dubybot.live/1MB.bin", "ping_only": False},
-                {"name": "FI.Hetzner.5", "url": "https://tcp1620-06.dubybot.live/1MB.bin", "ping_only": False},
+                {"name": "FI.Hetzner.2", "url": "https://tcp1620-01.dubybot.live/1MB.bin", "ping_only": False, "bulk": True},
+                {"name": "FI.Hetzner.3", "url": "https://tcp1620-02.dubybot.live/1MB.bin", "ping_only": False, "bulk": True},
+                {"name": "FI.Hetzner.4", "url": "https://tcp1620-05.dubybot.live/1MB.bin", "ping_only": False, "bulk": True},
+                {"name": "FI.Hetzner.5", "url": "https://tcp1620-06.dubybot.live/1MB.bin", "ping_only": False, "bulk": True},
                 {"name": "FR.OVH.1", "url": "https://eu.api.ovh.com/console/rapidoc-min.js", "ping_only": False},
-                {"name": "FR.OVH.2", "url": "https://ovh.sfx.ovh/10M.bin", "ping_only": False},
-                {"name": "SE.Oracle", "url": "https://oracle.sfx.ovh/10M.bin", "ping_only": False},
+                {"name": "FR.OVH.2", "url": "https://ovh.sfx.ovh/10M.bin", "ping_only": False, "bulk": True},
+                {"name": "SE.Oracle", "url": "https://oracle.sfx.ovh/10M.bin", "ping_only": False, "bulk": True},
                 {"name": "DE.AWS.1", "url": "https://tms.delta.com/delta/dl_anderson/Bootstrap.js", "ping_only": False},
                 {"name": "US.AWS.2", "url": "https://corp.kaltura.com/wp-content/cache/min/1/wp-content/themes/airfleet/dist/styles/theme.css", "ping_only": False},
                 {"name": "US.GoogleCloud", "url": "https://api.usercentrics.eu/gvl/v3/en.json", "ping_only": False},
@@ -306,34 +357,15 @@ class StrategyTester:
         """Специальный тест для Rutracker с проверкой заголовка Connection и 3 попытками"""
         test_url = target["url"]
 
-        # 1. Используем новую "умную" проверку как основу
+        # 1. Используем "умную" проверку: она же возвращает заголовки последнего ответа
         curl_result = await self._smart_curl_check(test_url, method="HEAD")
 
-        # 2. Получаем ЗАГОЛОВКИ для анализа Connection
-        headers_cmd = [
-            "curl", "-k", "-I", "-s", "-m", "5", "-L", "-4",
-            "--user-agent", "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36",
-            test_url
-        ]
-
         try:
-            proc_headers = await asyncio.create_subprocess_exec(
-                *headers_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout_headers, _ = await proc_headers.communicate()
-            headers_text = stdout_headers.decode('utf-8', errors='ignore')
-
-            # 3. ОСНОВНАЯ ЛОГИКА: Ищем keep-alive
-            has_keep_alive = False
-            for line in headers_text.split('\n'):
-                if line.lower().startswith('connection:'):
-                    if 'keep-alive' in line.lower():
-                        has_keep_alive = True
-                    break
+            # 2. ОСНОВНАЯ ЛОГИКА: Ищем keep-alive в заголовке Connection
+            connection = curl_result.get("headers", {}).get("connection", "")
+            has_keep_alive = 'keep-alive' in connection.lower()
 
-            # 4. ФИНАЛЬНОЕ РЕШЕНИЕ (как вы просили)
+            # 3. ФИНАЛЬНОЕ РЕШЕНИЕ (как вы просили)
             if has_keep_alive:
                 result["success"] = True
                 result["blocked"] = False
@@ -349,6 +381,7 @@ class StrategyTester:
             result["success"] = False
             result["blocked"] = True
 
+        result["timings"] = curl_result.get("timings", {})
         result["protocol"] = "HTTP"
         return result
     def _load_standard_targets(self) -> List[Dict]:
@@ -398,6 +431,25 @@ class StrategyTester:
 
         return targets
 
+    def _find_strategy_file(self, strategy_name: str) -> Optional[Path]:
+        """
+        Ищет файл стратегии по имени (без расширения или с любым расширением)
+
+        :param strategy_name: Имя стратегии
+        :return: Путь к файлу или None, если файл не найден
+        """
+        strategy_file = self.strategies_dir / strategy_name
+
+        if not strategy_file.exists():
+            # Попробуем найти с любым расширением
+            matching_files = list(self.strategies_dir.glob(strategy_name + ".*"))
+            if not matching_files:
+                print(f"  Файл стратегии не найден: {strategy_file}")
+                return None
+            strategy_file = matching_files[0]
+
+        return strategy_file
+
     def _prepare_strategy_config(self, strategy_name: str) -> Optional[Path]:
         """
         Подготавливает конфигурационный файл для конкретной стратегии
@@ -406,16 +458,9 @@ class StrategyTester:
         :return: Путь к временному конфигу или None при ошибке
         """
         try:
-            # Ищем файл стратегии без расширения
-            strategy_file = self.strategies_dir / strategy_name
-
-            if not strategy_file.exists():
-                # Попробуем найти с любым расширением
-                matching_files = list(self.strategies_dir.glob(strategy_name + ".*"))
-                if not matching_files:
-                    print(f"  Файл стратегии не найден: {strategy_file}")
-                    return None
-                strategy_file = matching_files[0]
+            strategy_file = self._find_strategy_file(strategy_name)
+            if not strategy_file:
+                return None
 
             # Читаем настройки стратегии
             with open(strategy_file, 'r', encoding='utf-8') as f:
@@ -500,7 +545,10 @@ class StrategyTester:
             # Проверяем специальные цели
             target_name_lower = target["name"].lower()
 
-            if "rutracker" in target_name_lower:
+            if self.throughput_mode and target.get("bulk"):
+                # Скачивание с замером скорости для тяжёлых DPI-целей
+                return await self._throughput_test(target, result)
+            elif "rutracker" in target_name_lower:
                 # Специальный тест для Rutracker
                 return await self._rutracker_test(target, result)
             elif "decky" in target_name_lower:
@@ -511,6 +559,50 @@ class StrategyTester:
                 return await self._curl_test(target, result)
 
 
+    async def _throughput_test(self, target: Dict, result: Dict) -> Dict:
+        """Скачивает начало тяжёлого файла: скорость и точка, где DPI замораживает поток"""
+        url = target["url"]
+        if self.throughput_base_url:
+            url = standin_url(url, self.throughput_base_url)
+
+        probe = await download_probe(url, byte_budget=self.byte_budget)
+        received = probe["bytes"]
+        result.update({
+            "protocol": "GET",
+            "http_code": probe["http_code"],
+            "time_taken": f"{probe['timings']['total']:.6f}",
+            "timings": probe["timings"],
+            "bytes_received": received,
+            "throughput_mbps": round(probe["mbps"], 1),
+            "stall_at": probe["stall_at"],
+        })
+
+        if probe["ok"] and probe["http_code"] in (200, 206) and probe["complete"]:
+            result["success"] = True
+            result["details"] = f"Скорость: {probe['mbps']:.1f} Мбит/с, получено {format_bytes(received)}"
+        elif probe["stalled"]:
+            # Поток замер или оборван после начала тела — DPI пропустил только первые пакеты
+            result["blocked"] = True
+            freeze = " (DPI TCP 16–20)" if is_dpi_freeze(probe["stall_at"]) else ""
+            result["details"] = f"Поток замер на {format_bytes(probe['stall_at'])}{freeze}"
+        elif probe["ok"] and probe["http_code"] in (200, 206) and probe["timed_out"]:
+            # Общий таймаут при идущем теле: DPI поток не держит, но он медленный
+            result["success"] = True
+            result["details"] = (f"Медленно: {probe['mbps']:.1f} Мбит/с, получено {format_bytes(received)} "
+                                 f"за {probe['timings']['total']:.0f} с (таймаут)")
+        elif probe["ok"]:
+            result["details"] = f"HTTP: код {probe['http_code']}, получено {format_bytes(received)}"
+        elif probe["error_kind"] in (ERROR_SSL, ERROR_RESET):
+            result["blocked"] = True
+            result["details"] = "SSL блокировка" if probe["error_kind"] == ERROR_SSL else "Сброс соединения (Connection Reset)"
+        elif probe["error_kind"] == ERROR_DNS:
+            result["details"] = "DNS ошибка"
+        elif probe["error_kind"] == ERROR_TIMEOUT:
+            result["details"] = "Таймаут"
+        else:
+            result["details"] = f"Ошибка соединения: {probe['error']}"
+        return result
+
     async def _ping_test(self, target: Dict, result: Dict) -> Dict:
         """Выполняет ping тест"""
         host = target["ping_target"]
@@ -549,15 +641,15 @@ class StrategyTester:
         """Выполняет проверку JSON API"""
         url = target["url"]
 
-        # Тестируем разные протоколы
+        # Тестируем разные протоколы (None — версия TLS по умолчанию)
         protocols = [
-            ("HTTP", ["--http1.1"]),
-            ("TLS1.2", ["--tlsv1.2", "--tls-max", "1.2"]),
-            ("TLS1.3", ["--tlsv1.3", "--tls-max", "1.3"])
+            ("HTTP", None),
+            ("TLS1.2", "1.2"),
+            ("TLS1.3", "1.3")
         ]
 
-        for proto_name, proto_args in protocols:
-            test_result = await self._json_request(url, proto_name, proto_args)
+        for proto_name, tls_version in protocols:
+            test_result = await self._json_request(url, proto_name, tls_version)
 
             if test_result["success"]:
                 result.update(test_result)
@@ -635,24 +727,8 @@ class StrategyTester:
         curl_result["protocol"] = protocol
         return curl_result
 
-    async def _json_request(self, url: str, protocol: str, args: List[str]) -> Dict:
-        """Выполняет запрос и проверяет корректность JSON"""
-        # Команда для получения статуса и времени
-        status_cmd = ['curl', '-s', '-L', '-m', '1',
-                    '-H', 'Accept: application/json',
-                    '-H', 'User-Agent: Zapret-Tester/1.0',
-                    '-o', '/dev/null',
-                    '-w', '%{http_code}::%{time_total}']
-        status_cmd.extend(args)
-        status_cmd.append(url)
-
-        # Команда для получения контента
-        content_cmd = ['curl', '-s', '-L', '-m', '1',
-                    '-H', 'Accept: application/json',
-                    '-H', 'User-Agent: Zapret-Tester/1.0']
-        content_cmd.extend(args)
-        content_cmd.append(url)
-
+    async def _json_request(self, url: str, protocol: str, tls_version: Optional[str] = None) -> Dict:
+        """Выполняет запрос и проверяет корректность JSON (статус и тело — одним запросом)"""
         result = {
             "protocol": protocol,
             "success": False,
@@ -661,31 +737,24 @@ class StrategyTester:
         }
 
         try:
-            # Получаем статус и время
-            proc_status = await asyncio.create_subprocess_exec(
-                *status_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+            probe = await http_probe(
+                url,
+                method="GET",
+                headers={"Accept": "application/json", "User-Agent": "Zapret-Tester/1.0"},
+                tls_version=tls_version,
+                connect_timeout=1,
+                total_timeout=1,
+                read_body=True,
             )
+            result["timings"] = probe["timings"]
 
-            stdout_status, stderr_status = await proc_status.communicate()
-            status_output = stdout_status.decode('utf-8', errors='ignore').strip()
-            error_output = stderr_status.decode('utf-8', errors='ignore').lower()
-
-            if proc_status.returncode == 0 and '::' in status_output:
-                http_code, time_taken = status_output.split('::')
+            if probe["ok"]:
+                http_code = str(probe["http_code"])
+                time_taken = f"{probe['timings']['total']:.6f}"
 
                 # Проверяем успешный статус
                 if http_code == '200':  # Только 200, так как нам нужен валидный JSON
-                    # Теперь получаем контент
-                    proc_content = await asyncio.create_subprocess_exec(
-                        *content_cmd,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
-                    )
-
-                    stdout_content, stderr_content = await proc_content.communicate()
-                    json_content = stdout_content.decode('utf-8', errors='ignore').strip()
+                    json_content = probe["body"].decode('utf-8', errors='ignore').strip()
 
                     if json_content:
                         try:
@@ -740,18 +809,18 @@ class StrategyTester:
                         result["details"] = f"{protocol}: Пустой ответ"
                 else:
                     result["details"] = f"{protocol}: код {http_code} (ожидался 200)"
-            elif 'ssl' in error_output or 'certificate' in error_output:
+            elif probe["error_kind"] == ERROR_SSL:
                 result["blocked"] = True
                 result["details"] = f"{protocol}: SSL блокировка"
-            elif 'reset' in error_output or 'rst' in error_output:
+            elif probe["error_kind"] == ERROR_RESET:
                 result["blocked"] = True
                 result["details"] = f"{protocol}: сброс соединения"
-            elif 'timed out' in error_output or 'timeout' in error_output:
+            elif probe["error_kind"] == ERROR_TIMEOUT:
                 result["details"] = f"{protocol}: таймаут"
-            elif 'could not resolve' in error_output:
+            elif probe["error_kind"] == ERROR_DNS:
                 result["details"] = f"{protocol}: DNS ошибка"
             else:
-                result["details"] = f"{protocol}: ошибка {proc_status.returncode}"
+                result["details"] = f"{protocol}: ошибка {probe['error']}"
 
         except Exception as e:
             result["details"] = f"{protocol}: исключение {str(e)}"
@@ -765,20 +834,7 @@ class StrategyTester:
         # Проверяем флаг остановки в начале
         if self.stop_requested:
             print(f"⏹️  Остановка тестирования стратегии {strategy_name}")
-            return {
-                "strategy": strategy_name,
-                "mode": mode,
-                "timestamp": datetime.now().isoformat(),
-                "success": False,
-                "error": "Test stopped by user",
-                "total_targets": 0,
-                "successful": 0,
-                "failed": 0,
-                "blocked": 0,
-                "success_rate": 0,
-                "critical_fail": False,
-                "critical_fail_reason": ""
-            }
+            return self._stopped_result(strategy_name, mode)
 
         print(f"\n{'='*60}")
         print(f"Тестируем стратегию: {strategy_name}")
@@ -792,46 +848,12 @@ class StrategyTester:
         targets = self._load_targets(mode)
 
         # ОПРЕДЕЛЯЕМ КРИТИЧЕСКИЕ ЦЕЛИ ИЗ ЗАГРУЖЕННЫХ ТАРГЕТОВ
-        critical_targets = {
-            "youtube": [],
-            "discord": []
-        }
-
-        # Определяем критические тесты из загруженных целей
-        for target in targets:
-            target_name = target["name"]
-
-            if mode == "YouTube/Discord":
-                # Для YouTube/Discord режима - только критические тесты
-                # Берем названия критических тестов из загруженных целей
-                if "YouTubeWeb" == target_name or "YouTubeVideoRedirect" == target_name:
-                    critical_targets["youtube"].append(target_name)
-                elif "DiscordMain" == target_name or "DiscordGateway" == target_name:
-                    critical_targets["discord"].append(target_name)
-            else:
-                # Для стандартного режима - все YouTube/Discord цели
-                if "youtube" in target_name.lower():
-                    critical_targets["youtube"].append(target_name)
-                elif "discord" in target_name.lower():
-                    critical_targets["discord"].append(target_name)
+        critical_targets = self._collect_critical_targets(targets, mode)
 
         # Проверяем флаг остановки
         if self.stop_requested:
             print(f"⏹️  Остановка тестирования перед началом")
-            return {
-                "strategy": strategy_name,
-                "mode": mode,
-                "timestamp": datetime.now().isoformat(),
-                "success": False,
-                "error": "Test stopped by user",
-                "total_targets": 0,
-                "successful": 0,
-                "failed": 0,
-                "blocked": 0,
-                "success_rate": 0,
-                "critical_fail": False,
-                "critical_fail_reason": ""
-            }
+            return self._stopped_result(strategy_name, mode)
 
         # Подготавливаем конфиг стратегии
         temp_config = self._prepare_strategy_config(strategy_name)
@@ -856,9 +878,9 @@ class StrategyTester:
         if not success:
             print(f"  Предупреждение: {output}")
 
-        # Убиваем оставшиеся процессы nfqws
+        # Убиваем оставшиеся процессы nfqws и ждём освобождения очереди
         self._run_command("pkill -9 nfqws", use_sudo=True)
-        time.sleep(2)
+        wait_until_stopped()
 
         try:
             # Подготавливаем временный конфиг
@@ -884,12 +906,12 @@ class StrategyTester:
                 # 3. ПЕРЕЗАПУСКАЕМ СЛУЖБУ ZAPRET С НОВЫМ КОНФИГОМ
                 print("  Перезапускаем службу zapret...")
 
-                # Останавливаем службу
+                # Останавливаем службу (если успела подняться)
                 self._run_command("systemctl stop zapret", use_sudo=True)
-                time.sleep(2)
+                wait_until_stopped()
 
                 # Запускаем службу (она использует обновленный config.txt)
-                success, output = self._run_command("systemctl start zapret", use_sudo=True, timeout=10)
+                success, output = self._start_service(timeout=10)
 
                 if not success:
                     print(f"  Ошибка запуска службы: {output}")
@@ -898,15 +920,17 @@ class StrategyTester:
                     manual_cmd = f"systemd-run --unit=zapret-test-{strategy_name} systemctl start zapret"
                     success, output = self._run_command(manual_cmd, use_sudo=True, timeout=10)
 
-                # Даем время на запуск
-                print("  Ожидание запуска (5 секунд)...")
-                time.sleep(5)
+                # Ждём готовности nfqws (процесс, очередь, правила файрвола), а не фиксированную паузу
+                print(f"  Ожидание запуска (не более {self.ready_timeout:g} с)...")
+                ready, ready_details, waited = wait_until_ready(self._run_command, timeout=self.ready_timeout)
 
                 # Проверяем статус службы
                 status_success, status_output = self._run_command("systemctl is-active zapret", use_sudo=False)
 
-                if status_success and "active" in status_output:
-                    print(f"  ✅ Служба zapret запущена")
+                if ready:
+                    print(f"  ✅ Служба zapret запущена за {waited:.1f} с: {ready_details}")
+                elif status_success and "active" in status_output:
+                    print(f"  ⚠️  Служба zapret активна, но не готова: {ready_details}")
                 else:
                     print(f"  ⚠️  Служба zapret не активна: {status_output}")
                     # Проверяем процессы nfqws
@@ -919,41 +943,13 @@ class StrategyTester:
             # 4. ТЕСТИРУЕМ ЦЕЛИ
             print(f"  Тестируем {len(targets)} целей...")
 
-            target_results = []
-            successful = 0
-            failed = 0
-            blocked = 0
-
-            for target in targets:
-
-                # ПРОВЕРЯЕМ ФЛАГ ОСТАНОВКИ ПЕРЕД КАЖДОЙ ЦЕЛЬЮ
-                if self.stop_requested:
-                    print(f"  ⏹️  Остановка тестирования текущей стратегии")
-                    break
-
-                target_result = await self._test_single_target(target)
-                target_result["strategy"] = strategy_name
-                target_results.append(target_result)
-
-                if target_result["success"]:
-                    successful += 1
-                    status = "✓ УСПЕХ"
-                elif target_result["blocked"]:
-                    blocked += 1
-                    status = "✗ БЛОКИРОВКА"
-                else:
-                    failed += 1
-                    status = "✗ ОШИБКА"
-
-                # ВЕРНУЛИ ДЕТАЛЬНЫЙ ВЫВОД С ПРИЧИНОЙ
-                details = target_result.get('details', '')
-                if details:
-                    print(f"    {status}: {target['name']} - {details}")
-                else:
-                    print(f"    {status}: {target['name']}")
+            target_results, successful, failed, blocked, pruned_reason = await self._probe_targets(
+                strategy_name, targets, mode=mode, critical_targets=critical_targets
+            )
 
             # Проверяем, была ли остановка
             if self.stop_requested:
+                print(f"  ⏹️  Остановка тестирования текущей стратегии")
                 print(f"  ⏹️  Тестирование стратегии прервано")
 
         except Exception as e:
@@ -962,6 +958,7 @@ class StrategyTester:
             traceback.print_exc()
             target_results = []
             successful = failed = blocked = 0
+            pruned_reason = ""
 
         finally:
             # ВОССТАНАВЛИВАЕМ ОРИГИНАЛЬНОЕ СОСТОЯНИЕ
@@ -971,7 +968,7 @@ class StrategyTester:
                 # 1. Останавливаем службу
                 self._run_command("systemctl stop zapret", use_sudo=True)
                 self._run_command("pkill -9 nfqws", use_sudo=True)
-                time.sleep(2)
+                wait_until_stopped()
 
                 # 2. Восстанавливаем оригинальный config.txt
                 if 'backup_config' in locals() and backup_config.exists():
@@ -983,7 +980,7 @@ class StrategyTester:
                 # Проверяем, была ли служба запущена до теста
                 if hasattr(self, 'service_was_running') and self.service_was_running:
                     print("  Восстанавливаем оригинальную службу...")
-                    self._run_command("systemctl start zapret", use_sudo=True)
+                    self._start_service()
 
                 # 4. Восстанавливаем ipset для DPI режима
                 if mode == "dpi":
@@ -999,10 +996,181 @@ class StrategyTester:
             except Exception as e:
                 print(f"  ⚠️  Ошибка при восстановлении: {e}")
 
-        # ТЕПЕРЬ ИЗМЕНЯЕМ ЛОГИКУ ОЦЕНКИ РЕЗУЛЬТАТОВ
-        # УБИРАЕМ ВЫВОД "Анализируем результаты..."
-        # Просто собираем данные без вывода
+        return self._evaluate_strategy(strategy_name, mode, targets, critical_targets,
+                                       target_results, successful, failed, blocked, pruned_reason)
+
+    def _stopped_result(self, strategy_name: str, mode: str) -> Dict:
+        """Результат стратегии, тестирование которой остановлено пользователем"""
+        return {
+            "strategy": strategy_name,
+            "mode": mode,
+            "timestamp": datetime.now().isoformat(),
+            "success": False,
+            "error": "Test stopped by user",
+            "total_targets": 0,
+            "successful": 0,
+            "failed": 0,
+            "blocked": 0,
+            "success_rate": 0,
+            "critical_fail": False,
+            "critical_fail_reason": ""
+        }
+
+    def _collect_critical_targets(self, targets: List[Dict], mode: str) -> Dict[str, List[str]]:
+        """Определяет критические цели (YouTube/Discord) из загруженных таргетов"""
+        critical_targets = {
+            "youtube": [],
+            "discord": []
+        }
+
+        # Определяем критические тесты из загруженных целей
+        for target in targets:
+            target_name = target["name"]
+
+            if mode == "YouTube/Discord":
+                # Для YouTube/Discord режима - только критические тесты
+                # Берем названия критических тестов из загруженных целей
+                if "YouTubeWeb" == target_name or "YouTubeVideoRedirect" == target_name:
+                    critical_targets["youtube"].append(target_name)
+                elif "DiscordMain" == target_name or "DiscordGateway" == target_name:
+                    critical_targets["discord"].append(target_name)
+            else:
+                # Для стандартного режима - все YouTube/Discord цели
+                if "youtube" in target_name.lower():
+                    critical_targets["youtube"].append(target_name)
+                elif "discord" in target_name.lower():
+                    critical_targets["discord"].append(target_name)
+
+        return critical_targets
+
+    async def _probe_targets(self, strategy_name: str, targets: List[Dict], label: str = "",
+                             mode: Optional[str] = None,
+                             critical_targets: Optional[Dict[str, List[str]]] = None
+                             ) -> Tuple[List[Dict], int, int, int, str]:
+        """
+        Проверяет цели стратегии и печатает результат по каждой в исходном порядке.
+
+        :param label: префикс строк лога (нужен, когда стратегии тестируются параллельно)
+        :param mode: режим; если задан и включён early_abort, заведомо нерабочая стратегия
+                     отсекается досрочно (см. core.strategy_scoring)
+        :return: (результаты, успешно, ошибок, блокировок, причина отсечения или "")
+        """
+        target_results = []
+        successful = 0
+        failed = 0
+        blocked = 0
+        pruned_reason = ""
+
+        scorer = None
+        probe_order = targets
+        if self.early_abort and mode and critical_targets is not None:
+            scorer = EarlyAbortScorer(mode, targets, critical_targets)
+            probe_order = scorer.probe_order(targets)
+
+        # Цели проверяются параллельно, но результаты выводятся в исходном порядке
+        scheduler = ProbeScheduler(
+            max_concurrency=self.probe_concurrency,
+            per_host_limit=self.per_host_limit,
+            stop_check=lambda: self.stop_requested,
+        )
+
+        async with aclosing(scheduler.run_ordered(probe_order, self._test_single_target)) as ordered:
+            async for target, target_result in ordered:
+                target_result["strategy"] = strategy_name
+                target_results.append(target_result)
+
+                if target_result["success"]:
+                    successful += 1
+                    status = "✓ УСПЕХ"
+                elif target_result["blocked"]:
+                    blocked += 1
+                    status = "✗ БЛОКИРОВКА"
+                else:
+                    failed += 1
+                    status = "✗ ОШИБКА"
+
+                # ВЕРНУЛИ ДЕТАЛЬНЫЙ ВЫВОД С ПРИЧИНОЙ
+                details = target_result.get('details', '')
+                if details:
+                    print(f"    {label}{status}: {target['name']} - {details}")
+                else:
+                    print(f"    {label}{status}: {target['name']}")
+
+                if scorer:
+                    pruned_reason = scorer.add(target_result) or ""
+                    if pruned_reason:
+                        # Выход из цикла закрывает генератор и отменяет оставшиеся проверки
+                        skipped = len(targets) - len(target_results)
+                        if skipped:
+                            print(f"    {label}✂️  Стратегия отсечена досрочно: {pruned_reason} "
+                                  f"(не проверено целей: {skipped})")
+                        break
+
+        if not pruned_reason and not self.stop_requested and self.latency_samples > 0:
+            await self._measure_latency(targets, target_results, label)
+
+        # В отчёте цели идут в исходном порядке, даже если критические проверялись первыми
+        position = {target["name"]: index for index, target in enumerate(targets)}
+        target_results.sort(key=lambda item: position.get(item.get("target_name"), len(targets)))
+
+        return target_results, successful, failed, blocked, pruned_reason
+
+    async def _latency_sample(self, target: Dict) -> Optional[Dict[str, float]]:
+        """Один замер задержки цели: HEAD без редиректов, время фаз или None при ошибке"""
+        probe = await http_probe(target["url"], method="HEAD", connect_timeout=1, total_timeout=3,
+                                 follow_redirects=False)
+        return probe["timings"] if probe["ok"] else None
+
+    async def _measure_latency(self, targets: List[Dict], target_results: List[Dict], label: str = ""):
+        """
+        Замеряет задержку доступных HTTP(S)-целей latency_samples раз и добавляет
+        в их результаты статистику "latency" (см. core.latency_stats).
 
+        Замеры идут кругами по всем целям, поэтому замеры одной цели разнесены во времени
+        и не попадают все в один короткий всплеск нагрузки на сеть.
+        """
+        by_name = {target["name"]: target for target in targets}
+        measured = [
+            (target_result, by_name[target_result["target_name"]])
+            for target_result in target_results
+            if target_result.get("success")
+            and by_name.get(target_result.get("target_name"), {}).get("url")
+            and not by_name[target_result["target_name"]].get("ping_only", False)
+        ]
+        if not measured:
+            return
+
+        scheduler = ProbeScheduler(
+            max_concurrency=self.probe_concurrency,
+            per_host_limit=self.per_host_limit,
+            stop_check=lambda: self.stop_requested,
+        )
+        round_targets = [target for _, target in measured]
+        samples: Dict[str, List[Dict[str, float]]] = {target["name"]: [] for target in round_targets}
+
+        for _ in range(self.latency_samples):
+            async with aclosing(scheduler.run_ordered(round_targets, self._latency_sample)) as ordered:
+                async for target, timings in ordered:
+                    if timings:
+                        samples[target["name"]].append(timings)
+            if self.stop_requested:
+                return
+
+        for target_result, target in measured:
+            latency = target_latency(samples[target["name"]], target["url"].lower().startswith("https"))
+            if latency:
+                target_result["latency"] = latency
+
+        summary = strategy_latency(target_results)
+        if summary:
+            print(f"    {label}⏱  Задержка (замеров на цель: {self.latency_samples}, "
+                  f"целей: {summary['targets']}): {format_latency(summary)}")
+
+    def _evaluate_strategy(self, strategy_name: str, mode: str, targets: List[Dict],
+                           critical_targets: Dict[str, List[str]], target_results: List[Dict],
+                           successful: int, failed: int, blocked: int,
+                           pruned_reason: str = "") -> Dict:
+        """Оценивает результаты проверки целей и собирает итог по стратегии"""
         # Собираем результаты по критическим тестам
         youtube_critical_results = []
         discord_critical_results = []
@@ -1108,8 +1276,7 @@ class StrategyTester:
             # Проверяем результаты для YouTube
             if youtube_targets:
                 # Для YouTube критически важны: YouTubeWeb и YouTubeVideoRedirect
-                youtube_critical_names = ["YouTubeWeb", "YouTubeVideoRedirect"]
-                youtube_critical_targets = [t for t in youtube_targets if t["name"] in youtube_critical_names]
+                youtube_critical_targets = [t for t in youtube_targets if t["name"] in YOUTUBE_CRITICAL_NAMES]
 
                 if youtube_critical_targets:
                     # Проверяем результаты для критических целей
@@ -1129,8 +1296,7 @@ class StrategyTester:
             # Проверяем результаты для Discord
             if discord_targets:
                 # Для Discord критически важны: DiscordMain и DiscordGateway
-                discord_critical_names = ["DiscordMain", "DiscordGateway"]
-                discord_critical_targets = [t for t in discord_targets if t["name"] in discord_critical_names]
+                discord_critical_targets = [t for t in discord_targets if t["name"] in DISCORD_CRITICAL_NAMES]
 
                 if discord_critical_targets:
                     # Проверяем результаты для критических целей
@@ -1165,6 +1331,19 @@ class StrategyTester:
                 critical_fail = True
                 critical_fail_reason = "Discord не работает (критические тесты не пройдены)"
 
+        # Стратегия отсечена досрочно: непроверенный сервис не считается рабочим
+        if pruned_reason:
+            probed_names = {target_result.get("target_name") for target_result in target_results}
+            critical_names = critical_target_names(mode, targets, critical_targets)
+            if any(name not in probed_names for name in critical_names["youtube"]):
+                youtube_passed = None
+            if any(name not in probed_names for name in critical_names["discord"]):
+                discord_passed = None
+            critical_fail = True
+            critical_fail_reason = pruned_reason
+
+        latency = strategy_latency(target_results)
+
         # Собираем результаты
         results = {
             "strategy": strategy_name,
@@ -1179,6 +1358,11 @@ class StrategyTester:
             "discord_passed": discord_passed,
             "critical_fail": critical_fail,
             "critical_fail_reason": critical_fail_reason,
+            "pruned": bool(pruned_reason),
+            "pruned_reason": pruned_reason,
+            "latency": latency,
+            "latency_score": latency_score(latency),
+            "throughput": summarize_throughput(target_results),
             "target_results": target_results,
             # Добавляем информацию о критических тестах
             "youtube_critical_targets": critical_targets["youtube"],
@@ -1255,95 +1439,142 @@ class StrategyTester:
         """
         Генерирует HTML отчет
         """
+        writer = self._open_report(filename)
+        for result in results:
+            self._add_report_card(writer, result)
+        return self._finalize_report(writer)
+
+    def _classify_report_result(self, result: Dict) -> str:
+        """
+        Определяет раздел отчета для стратегии и уточняет причину критической ошибки
+
+        :return: "working", "partial" или "non_working"
+        """
+        success_rate = result.get('success_rate', 0)
+        mode = result.get('mode', 'standard')
+
+        if mode == "YouTube/Discord":
+            # РЕЖИМ YouTube/Discord - оценка только по критическим тестам
+            youtube_passed = result.get('youtube_passed', False)
+            discord_passed = result.get('discord_passed', False)
+
+            if youtube_passed is True and discord_passed is True:
+                return "working"
+            elif (youtube_passed is True and discord_passed is False) or \
+                (youtube_passed is False and discord_passed is True):
+                result["critical_fail"] = True
+                if youtube_passed and not discord_passed:
+                    result["critical_fail_reason"] = "YouTube работает, но Discord не работает"
+                elif not youtube_passed and discord_passed:
+                    result["critical_fail_reason"] = "Discord работает, но YouTube не работает"
+                return "partial"
+            else:
+                result["critical_fail"] = True
+                result["critical_fail_reason"] = "YouTube и Discord не работают"
+                return "non_working"
+
+        # СТАНДАРТНЫЙ РЕЖИМ - старая логика
+        youtube_passed = result.get('youtube_passed', False)
+        discord_passed = result.get('discord_passed', False)
+
+        # Отсечённая досрочно - в нерабочие: ни один сервис уже не проходит или порог недостижим
+        if result.get('pruned'):
+            result["critical_fail"] = True
+            result["critical_fail_reason"] = result.get('pruned_reason') or "Отсечена досрочно"
+            return "non_working"
+
+        # Если процент успеха < 60% - сразу в нерабочие
+        if success_rate < STANDARD_MIN_SUCCESS_RATE:
+            result["critical_fail"] = True
+            result["critical_fail_reason"] = f"Низкая эффективность"
+            return "non_working"
+
+        # Если процент успеха ≥ 60%, проверяем YouTube/Discord
+        youtube_working = youtube_passed is True
+        discord_working = discord_passed is True
+
+        if not youtube_working and not discord_working:
+            # Оба не работают при хорошем проценте - нерабочие
+            result["critical_fail"] = True
+            result["critical_fail_reason"] = "YouTube и Discord не работают"
+            return "non_working"
+        elif not youtube_working or not discord_working:
+            # Один не работает - частично рабочие
+            result["critical_fail"] = True
+            if not youtube_working and discord_working:
+                result["critical_fail_reason"] = "Discord работает, но YouTube не работает"
+            elif youtube_working and not discord_working:
+                result["critical_fail_reason"] = "YouTube работает, но Discord не работает"
+            return "partial"
+
+        # Оба работают - рабочие
+        return "working"
+
+    def _open_report(self, filename: Optional[str] = None) -> StreamingReportWriter:
+        """
+        Создает файл отчета, в который карточки дописываются по мере тестирования
+        """
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"zapret_test_report_{timestamp}.html"
 
-        report_path = self.reports_dir / filename
-
-        # Сортируем результаты по эффективности
-        sorted_results = sorted(results,
-                              key=lambda x: x.get('success_rate', 0),
-                              reverse=True)
-
-        # Генерируем HTML
-        html = self._generate_html_report(sorted_results)
+        return StreamingReportWriter(self.reports_dir / filename, self._report_head_html())
 
-        # Сохраняем отчет
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write(html)
+    def _add_report_card(self, writer: StreamingReportWriter, result: Dict):
+        """Дописывает в отчет карточку завершенной стратегии"""
+        category = self._classify_report_result(result)
+        writer.add_card(result, self._generate_strategy_card(result, len(writer) + 1), category)
 
-        print(f"\n📄 Отчет сохранен: {report_path}")
-        return str(report_path)
+    def _finalize_report(self, writer: StreamingReportWriter, partial: bool = False) -> str:
+        """
+        Дописывает сводку и порядок разделов, закрывает документ
 
-    def _generate_html_report(self, results: List[Dict]) -> str:
-        """Генерирует HTML содержимое отчета"""
+        :param partial: тестирование остановлено до конца
+        :return: путь к HTML отчету
+        """
+        by_rate = sorted(writer.summaries, key=lambda x: strategy_rank_key(x, self.prefer_latency))
+        working_strategies = [r for r in by_rate if r["category"] == "working"]
+        partially_working_strategies = [r for r in by_rate if r["category"] == "partial"]  # Частично рабочие (YouTube или Discord работает)
+        non_working_strategies = [r for r in by_rate if r["category"] == "non_working"]  # Не рабочие (<60% или оба сервиса не работают)
 
-        total_tests = sum(r.get('total_targets', 0) for r in results)
-        total_success = sum(r.get('successful', 0) for r in results)
+        both_broken = [s for s in non_working_strategies if "YouTube и Discord не работают" in (s.get('critical_fail_reason') or '')]
+        low_percent = [s for s in non_working_strategies if s not in both_broken]
 
-        # Разделяем стратегии на рабочие, частично рабочие и нерабочие
-        working_strategies = []
-        partially_working_strategies = []  # Частично рабочие (YouTube или Discord работает)
-        non_working_strategies = []  # Не рабочие (<60% или оба сервиса не работают)
+        sections = [
+            ("""
+        <h2 style="color: #4fc3f7; margin-bottom: 25px;">🎯 Детальные результаты по стратегиям</h2>
+""", None),
+            ("""
+        <h3 style="color: #66bb6a; margin-bottom: 15px;">✅ Рабочие стратегии</h3>
+""", [r["card_id"] for r in working_strategies]),
+            ("""
+        <h3 style="color: #ffb74d; margin-bottom: 15px; margin-top: 40px;">⚠️ Частично рабочие стратегии (работает только YouTube или Discord)*</h3>
+""", [r["card_id"] for r in partially_working_strategies]),
+            ("""
+        <h3 style="color: #ff7043; margin-bottom: 15px; margin-top: 40px;">❌ Не рабочие стратегии</h3>
+""", [r["card_id"] for r in low_percent]),
+            ("""
+        <h3 style="color: #ff4444; margin-bottom: 15px; margin-top: 40px;">🚫 Критические ошибки (YouTube и Discord не работают)</h3>
+""", [r["card_id"] for r in both_broken]),
+        ]
 
-        for result in results:
-            success_rate = result.get('success_rate', 0)  # Получаем здесь, чтобы переменная всегда была определена
-            mode = result.get('mode', 'standard')
+        footer_html = f"""
+        <div class="timestamp">
+            Сгенерировано Zapret DPI Manager • Steam Deck • {datetime.now().strftime("%d.%m.%Y %H:%M")}
+        </div>
+"""
 
-            if mode == "YouTube/Discord":
-                # РЕЖИМ YouTube/Discord - оценка только по критическим тестам
-                youtube_passed = result.get('youtube_passed', False)
-                discord_passed = result.get('discord_passed', False)
-
-                if youtube_passed is True and discord_passed is True:
-                    working_strategies.append(result)
-                elif (youtube_passed is True and discord_passed is False) or \
-                    (youtube_passed is False and discord_passed is True):
-                    partially_working_strategies.append(result)
-                    result["critical_fail"] = True
-                    if youtube_passed and not discord_passed:
-                        result["critical_fail_reason"] = "YouTube работает, но Discord не работает"
-                    elif not youtube_passed and discord_passed:
-                        result["critical_fail_reason"] = "Discord работает, но YouTube не работает"
-                else:
-                    non_working_strategies.append(result)
-                    result["critical_fail"] = True
-                    result["critical_fail_reason"] = "YouTube и Discord не работают"
-            else:
-                # СТАНДАРТНЫЙ РЕЖИМ - старая логика
-                youtube_passed = result.get('youtube_passed', False)
-                discord_passed = result.get('discord_passed', False)
-
-                # Если процент успеха < 60% - сразу в нерабочие
-                if success_rate < 60:
-                    non_working_strategies.append(result)
-                    result["critical_fail"] = True
-                    result["critical_fail_reason"] = f"Низкая эффективность"
-                    continue
+        summary_html = self._report_summary_html(writer.summaries, working_strategies,
+                                                 partially_working_strategies, non_working_strategies, partial)
+        writer.finalize(summary_html, sections, footer_html)
 
-                # Если процент успеха ≥ 60%, проверяем YouTube/Discord
-                youtube_working = youtube_passed is True
-                discord_working = discord_passed is True
-
-                if not youtube_working and not discord_working:
-                    # Оба не работают при хорошем проценте - нерабочие
-                    non_working_strategies.append(result)
-                    result["critical_fail"] = True
-                    result["critical_fail_reason"] = "YouTube и Discord не работают"
-                elif not youtube_working or not discord_working:
-                    # Один не работает - частично рабочие
-                    partially_working_strategies.append(result)
-                    result["critical_fail"] = True
-                    if not youtube_working and discord_working:
-                        result["critical_fail_reason"] = "Discord работает, но YouTube не работает"
-                    elif youtube_working and not discord_working:
-                        result["critical_fail_reason"] = "YouTube работает, но Discord не работает"
-                else:
-                    # Оба работают - рабочие
-                    working_strategies.append(result)
+        print(f"\n📄 Отчет сохранен: {writer.html_path}")
+        print(f"   Данные для обработки: {writer.jsonl_path.name}, {writer.csv_path.name}")
+        return str(writer.html_path)
 
-        html = f"""<!DOCTYPE html>
+    def _report_head_html(self) -> str:
+        """Начало HTML отчета: стили и шапка"""
+        return f"""<!DOCTYPE html>
 <html lang="ru">
 <head>
     <meta charset="UTF-8">
@@ -1767,6 +1998,16 @@ class StrategyTester:
                 grid-template-columns: 1fr;
             }}
         }}
+
+        /* Отчёт пишется потоково: блоки встают на место через order */
+        .container {{
+            display: flex;
+            flex-direction: column;
+        }}
+
+        .container > .header {{
+            order: -100;
+        }}
     </style>
 </head>
 <body>
@@ -1776,7 +2017,13 @@ class StrategyTester:
             <div class="subtitle">Автоматический тест стратегий обхода блокировок</div>
             <div>Дата тестирования: {datetime.now().strftime("%d.%m.%Y %H:%M:%S")}</div>
         </div>
+"""
 
+    def _report_summary_html(self, results: List[Dict], working_strategies: List[Dict],
+                             partially_working_strategies: List[Dict], non_working_strategies: List[Dict],
+                             partial: bool = False) -> str:
+        """Общая статистика, рекомендация и краткая сводка (дописываются в конец, показываются сверху)"""
+        html = f"""
         <div class="summary-card">
             <h2 style="color: #4fc3f7; margin-top: 0;">📈 Общая статистика</h2>
             <div style="color: #b0bec5; font-size: 0.9em; margin-bottom: 15px; font-style: italic;">
@@ -1803,9 +2050,17 @@ class StrategyTester:
         </div>
 """
 
+        if partial:
+            html += """
+        <div class="partial-warning" style="margin-bottom: 20px;">
+            <h3>⏹️ Тестирование остановлено</h3>
+            <div style="color: #ffd699;">В отчете только стратегии, проверенные до остановки</div>
+        </div>
+"""
+
         # Добавляем рекомендацию для лучшей стратегии
         if working_strategies:
-            best_strategy = working_strategies[0]  # Уже отсортированы по эффективности
+            best_strategy = working_strategies[0]  # Уже отсортированы (strategy_rank_key)
             html += f"""
         <div class="recommendation">
             <h3>⭐ Рекомендуемая стратегия (применена)</h3>
@@ -1819,6 +2074,7 @@ class StrategyTester:
                 Успешно: {best_strategy.get('successful', 0)}/{best_strategy.get('total_targets', 0)} •
                 Блокировок: {best_strategy.get('blocked', 0)} •
                 Неудачно: {best_strategy.get('failed', 0)}
+                {f"• Задержка: ~{best_strategy['latency_score']:.0f} мс" if best_strategy.get('latency_score') is not None else ""}
             </div>
         </div>
 """
@@ -1831,10 +2087,11 @@ class StrategyTester:
             <div class="top-strategies-list">
 """
 
-            # Сначала выводим рабочие стратегии (отсортированы по убыванию эффективности)
+            # Сначала выводим рабочие стратегии (по эффективности и задержке, см. strategy_rank_key)
             for strategy in working_strategies:
                 strategy_name = strategy.get('strategy', 'Неизвестная')
                 success_rate = strategy.get('success_rate', 0)
+                score = strategy.get('latency_score')
 
                 html += f"""
                 <div class="top-strategy-item working">
@@ -1842,6 +2099,7 @@ class StrategyTester:
                     <div class="top-strategy-percent working">{success_rate:.1f}%</div>
                     <div style="color: #b0bec5; font-size: 0.9em;">
                         Успешно: {strategy.get('successful', 0)}/{strategy.get('total_targets', 0)}
+                        {f'<br>⏱ ~{score:.0f} мс' if score is not None else ''}
                     </div>
                 </div>
 """
@@ -1885,59 +2143,6 @@ class StrategyTester:
         </div>
 """
 
-        # Добавляем полную информацию по стратегиям
-        html += """
-        <h2 style="color: #4fc3f7; margin-bottom: 25px;">🎯 Детальные результаты по стратегиям</h2>
-"""
-
-        # Выводим сначала рабочие стратегии
-        if working_strategies:
-            html += f"""
-        <h3 style="color: #66bb6a; margin-bottom: 15px;">✅ Рабочие стратегии</h3>
-"""
-
-            for i, result in enumerate(working_strategies, 1):
-                html += self._generate_strategy_card(result, i)
-
-        # Выводим частично рабочие стратегии
-        if partially_working_strategies:
-            html += f"""
-        <h3 style="color: #ffb74d; margin-bottom: 15px; margin-top: 40px;">⚠️ Частично рабочие стратегии (работает только YouTube или Discord)*</h3>
-"""
-
-            for i, result in enumerate(partially_working_strategies, 1):
-                html += self._generate_strategy_card(result, i + len(working_strategies))
-
-        # Выводим нерабочие стратегии
-        if non_working_strategies:
-            # Фильтруем по типу нерабочих
-            low_percent = [s for s in non_working_strategies if "Эффективность ниже порога" in s.get('critical_fail_reason', '')]
-            both_broken = [s for s in non_working_strategies if "YouTube и Discord не работают" in s.get('critical_fail_reason', '')]
-
-            if low_percent:
-                html += f"""
-        <h3 style="color: #ff7043; margin-bottom: 15px; margin-top: 40px;">❌ Не рабочие стратегии</h3>
-"""
-
-                for i, result in enumerate(low_percent, 1):
-                    html += self._generate_strategy_card(result, i + len(working_strategies) + len(partially_working_strategies))
-
-            if both_broken:
-                html += f"""
-        <h3 style="color: #ff4444; margin-bottom: 15px; margin-top: 40px;">🚫 Критические ошибки (YouTube и Discord не работают)</h3>
-"""
-
-                for i, result in enumerate(both_broken, 1):
-                    html += self._generate_strategy_card(result, i + len(working_strategies) + len(partially_working_strategies) + len(low_percent))
-
-        html += f"""
-        <div class="timestamp">
-            Сгенерировано Zapret DPI Manager • Steam Deck • {datetime.now().strftime("%d.%m.%Y %H:%M")}
-        </div>
-    </div>
-</body>
-</html>"""
-
         return html
 
     def _generate_strategy_card(self, result: Dict, index: int) -> str:
@@ -2024,6 +2229,8 @@ class StrategyTester:
                 <div class="strategy-name">
                     {icon} {strategy_name}
                     <span class="strategy-badge">{mode.upper()}</span>
+                    {"<span class='strategy-badge'>✂️ ОТСЕЧЕНА ДОСРОЧНО</span>" if result.get('pruned') else ""}
+                    {f"<span class='strategy-badge'>💾 ИЗ БАЗЫ, {format_age(result['tested_at'])} назад</span>" if result.get('cached') and result.get('tested_at') else ""}
                     {f"<span style='color: {title_color}; margin-left: 10px; font-size: 0.9em;'>🚫 КРИТИЧЕСКАЯ ОШИБКА</span>" if is_both_broken else ""}
                     {f"<span style='color: {title_color}; margin-left: 10px; font-size: 0.9em;'>❌ НИЗКАЯ ЭФФЕКТИВНОСТЬ</span>" if is_low_percent else ""}
                     {f"<span style='color: {title_color}; margin-left: 10px; font-size: 0.9em;'>⚠️ ЧАСТИЧНО РАБОТАЕТ</span>" if is_partial else ""}
@@ -2090,6 +2297,28 @@ class StrategyTester:
             </div>
     """
 
+        if result.get('pruned'):
+            checked = len(result.get('target_results', []))
+            html += f"""
+            <div style="margin: 10px 0; color: #b0bec5; font-size: 0.95em;">
+                ✂️ Проверка остановлена после {checked} из {total} целей: {result.get('pruned_reason', '')}
+            </div>
+    """
+
+        if result.get('throughput'):
+            html += f"""
+            <div style="margin: 10px 0; color: #b0bec5; font-size: 0.95em;">
+                📥 Скачивание тяжёлых файлов: {format_throughput(result['throughput'])}
+            </div>
+    """
+
+        if result.get('latency'):
+            html += f"""
+            <div style="margin: 10px 0; color: #b0bec5; font-size: 0.95em;">
+                ⏱ Задержка (медиана по {result['latency']['targets']} целям): {format_latency(result['latency'])}
+            </div>
+    """
+
         # Добавляем детали по целям с отладочной информацией
         if result.get('target_results'):
             html += """
@@ -2104,6 +2333,15 @@ class StrategyTester:
                 protocol = target_result.get('protocol', 'N/A')
                 success = target_result.get('success', False)
                 blocked = target_result.get('blocked', False)
+                timings = target_result.get('timings')
+                timings_html = f'<div style="font-size: 0.85em; color: #78909c; margin-top: 4px;">⏱ {format_timings(timings)}</div>' if timings else ""
+                latency = target_result.get('latency')
+                if latency:
+                    request = latency['request']
+                    timings_html += (f'<div style="font-size: 0.85em; color: #78909c;">'
+                                     f'📶 {request["samples"]} замеров: мин {request["min"]:.0f} • '
+                                     f'p50 {request["p50"]:.0f} • p95 {request["p95"]:.0f} • '
+                                     f'макс {request["max"]:.0f} • джиттер {request["jitter"]:.0f} мс</div>')
 
                 # Определяем класс и иконку
                 item_class = "target-item"
@@ -2122,6 +2360,7 @@ class StrategyTester:
                         <div class="target-details">
                             <span class="protocol-badge">{protocol}</span>
                             {details}
+                            {timings_html}
                         </div>
                     </div>
     """
@@ -2134,35 +2373,261 @@ class StrategyTester:
         html += "</div>"
         return html
 
-    async def run_full_test(self, mode: str = "standard",
-                            strategies: Optional[List[str]] = None,
-                            stop_callback: Optional[callable] = None) -> List[Dict]:
+    async def _run_parallel_strategies(self, strategies: List[str], mode: str, instances: int,
+                                       stop_callback: Optional[callable] = None,
+                                       stop_on_first_working: bool = False) -> List[Dict]:
         """
-        Выполняет полное тестирование всех стратегий
+        Тестирует стратегии параллельно в изолированных полосах nfqws
+
+        Служба zapret останавливается один раз на весь прогон (её правила отправили бы
+        трафик полос в очередь 200) и восстанавливается в конце. config.txt не меняется.
         """
-        print("🚀 Zapret DPI Strategy Tester")
-        print("="*60)
+        def stopped() -> bool:
+            if stop_callback and stop_callback():
+                self.stop_requested = True
+            return self.stop_requested
 
-        # Сбрасываем флаг остановки
-        self.stop_requested = False
+        self.check_service_status()
 
-        # Получаем список стратегий
-        if strategies is None:
-            strategies = self.get_available_strategies()
+        targets = self._load_targets(mode)
+        critical_targets = self._collect_critical_targets(targets, mode)
+        lanes = build_lanes(min(instances, len(strategies)))
+        fwtype = read_fwtype()
+        results: List[Optional[Dict]] = [None] * len(strategies)
+        lane_files = None
+        found_working = []
 
-        if not strategies:
-            print("❌ Не найдено ни одной стратегии для тестирования")
-            print(f"   Проверьте папку: {self.strategies_dir}")
-            return []
+        print(f"  Полос: {len(lanes)} (очереди {lanes[0].qnum}-{lanes[-1].qnum}, {fwtype})")
 
-        print(f"📁 Папка стратегий: {self.strategies_dir}")
-        print(f"📋 Будет протестировано: {len(strategies)} стратегий")
-        print(f"🎯 Режим тестирования: {mode}")
-        print("="*60)
+        print("  Останавливаем службу zapret на время теста...")
+        success, output = self._run_command("systemctl stop zapret", use_sudo=True)
+        if not success:
+            print(f"  Предупреждение: {output}")
+        self._run_command("pkill -9 nfqws", use_sudo=True)
+        wait_until_stopped()
+
+        try:
+            # Списки готовятся один раз для всех полос; для DPI режима — с пустым ipset-all.txt
+            if mode == "dpi":
+                print("  [DPI] Очищаем ipset-all.txt...")
+                self._cleanup_ipset_for_dpi()
+            try:
+                lane_files = prepare_lane_files(self.files_dir)
+            finally:
+                if mode == "dpi":
+                    self._restore_ipset()
+
+            success, output = install_lane_firewall(self._run_command, lanes, fwtype)
+            if not success:
+                print(f"  ❌ Не удалось создать правила файрвола для полос: {output}")
+                return []
+
+            pending: asyncio.Queue = asyncio.Queue()
+            for index, strategy in enumerate(strategies):
+                pending.put_nowait((index, strategy))
+
+            async def lane_worker(lane: StrategyLane):
+                # Все проверки этой задачи идут с портов полосы (контекст наследуют дочерние задачи)
+                SOURCE_PORTS.set(lane.source_ports)
+                while not pending.empty() and not stopped() and not found_working:
+                    index, strategy = pending.get_nowait()
+                    print(f"\n{lane.label}[{index + 1}/{len(strategies)}] Тестируем стратегию: {strategy}")
+                    try:
+                        result = await self._test_strategy_on_lane(lane, strategy, mode, targets,
+                                                                    critical_targets, lane_files)
+                    except Exception as e:
+                        print(f"   {lane.label}❌ Ошибка тестирования: {e}")
+                        result = {"strategy": strategy, "error": str(e), "success": False}
+                    results[index] = result
+                    self._strategy_finished(result, mode)
+                    if not result.get("error"):
+                        print(f"\n{lane.label}Итог стратегии {strategy}:")
+                        self._print_strategy_rating(result, mode)
+                    if stop_on_first_working and self._is_working_result(result, mode):
+                        # Уже идущие в других полосах тесты доводятся до конца, новые не начинаются
+                        found_working.append(strategy)
+                        print(f"\n⭐ Найдена рабочая стратегия: {strategy}, новые стратегии не запускаются")
+
+            await asyncio.gather(*(lane_worker(lane) for lane in lanes))
+
+        finally:
+            print("\n  Завершение параллельного теста и восстановление...")
+            for lane in lanes:
+                lane.stop(self._run_command)
+            remove_lane_firewall(self._run_command, fwtype)
+            if lane_files:
+                shutil.rmtree(lane_files, ignore_errors=True)
+
+            if self.service_was_running:
+                print("  Восстанавливаем оригинальную службу...")
+                self._start_service()
+
+        if self.stop_requested:
+            print(f"\n⏹️  Тестирование остановлено пользователем")
+
+        return [result for result in results if result is not None]
+
+    async def _test_strategy_on_lane(self, lane: StrategyLane, strategy_name: str, mode: str,
+                                     targets: List[Dict], critical_targets: Dict[str, List[str]],
+                                     lane_files: Path) -> Dict:
+        """
+        Тестирует одну стратегию в своей полосе: запускает nfqws полосы, проверяет цели, останавливает
+        """
+        strategy_file = self._find_strategy_file(strategy_name)
+        if not strategy_file:
+            return {
+                "strategy": strategy_name,
+                "mode": mode,
+                "success": False,
+                "error": "Не удалось подготовить конфигурацию стратегии",
+                "critical_fail": False,
+                "critical_fail_reason": ""
+            }
+
+        with open(strategy_file, 'r', encoding='utf-8') as f:
+            nfqws_args = resolve_strategy_args(f.read(), lane_files, str(self.project_root))
+
+        try:
+            started, details = await asyncio.to_thread(lane.start, self._run_command, nfqws_args)
+            if started:
+                started, details = await asyncio.to_thread(lane.wait_ready)
+            if not started:
+                print(f"  {lane.label}❌ nfqws не запущен: {details}")
+                return {
+                    "strategy": strategy_name,
+                    "mode": mode,
+                    "success": False,
+                    "error": f"nfqws не запустился: {details}",
+                    "critical_fail": False,
+                    "critical_fail_reason": ""
+                }
+            print(f"  {lane.label}✅ nfqws запущен: {details}")
+
+            target_results, successful, failed, blocked, pruned_reason = await self._probe_targets(
+                strategy_name, targets, label=lane.label, mode=mode, critical_targets=critical_targets
+            )
+        finally:
+            await asyncio.to_thread(lane.stop, self._run_command)
+
+        return self._evaluate_strategy(strategy_name, mode, targets, critical_targets,
+                                       target_results, successful, failed, blocked, pruned_reason)
+
+    @staticmethod
+    def _is_working_result(result: Dict, mode: str) -> bool:
+        """
+        Считается ли стратегия рабочей в этом режиме (попадает в working_strategies.txt)
+        """
+        if result.get('pruned'):
+            # Отсечённая досрочно не рабочая, даже если проверенные цели прошли
+            return False
+
+        success_rate = result.get('success_rate', 0)
+        youtube_passed = result.get('youtube_passed', False)
+        discord_passed = result.get('discord_passed', False)
+
+        if mode == "YouTube/Discord":
+            # РЕЖИМ YouTube/Discord - оба сервиса должны работать
+            return youtube_passed is True and discord_passed is True
+        elif mode == "dpi":
+            # РЕЖИМ DPI - только по проценту
+            return success_rate >= DPI_MIN_SUCCESS_RATE
+        else:
+            # СТАНДАРТНЫЙ РЕЖИМ - старая логика
+            return success_rate >= STANDARD_MIN_SUCCESS_RATE and youtube_passed is True and discord_passed is True
+
+    def _open_results_db(self, strategies: List[str]):
+        """
+        Открывает базу результатов, определяет сеть и считает хеши стратегий
+        """
+        self.strategy_hashes = {}
+        try:
+            self.results_db = StrategyResultsDB(default_db_path(str(self.project_root)))
+            self.network_id, network_details = network_fingerprint()
+            print(f"🌐 Сеть: шлюз {network_details.get('gateway') or '?'}, "
+                  f"DNS {', '.join(network_details.get('dns') or ['?'])} [{self.network_id}]")
+        except Exception as e:
+            print(f"⚠️ База результатов недоступна: {e}")
+            self.results_db = None
+            return
+
+        for strategy in strategies:
+            strategy_file = self._find_strategy_file(strategy)
+            if strategy_file:
+                self.strategy_hashes[strategy] = strategy_hash(strategy_file)
+
+    def _rank_by_history(self, strategies: List[str], mode: str) -> List[str]:
+        """Упорядочивает стратегии по прошлым успехам в этой сети (см. core.strategy_ranking)"""
+        if not self.results_db or len(strategies) < 2:
+            return strategies
+        try:
+            stats = self.results_db.strategy_stats(self.network_id, mode)
+        except Exception as e:
+            print(f"⚠️ Ошибка чтения базы результатов: {e}")
+            return strategies
+        if not stats:
+            return strategies
+
+        ranked = rank_strategies(strategies, self.strategy_hashes, stats)
+        preview = ", ".join(f"{name} ({score:.2f})" for name, score in ranked[:5])
+        print(f"📊 Порядок по истории этой сети: {preview}{', …' if len(ranked) > 5 else ''}")
+        return [name for name, _ in ranked]
+
+    def _cached_result(self, strategy: str, mode: str) -> Optional[Dict]:
+        """Свежий результат той же стратегии в этой сети, если он есть в базе"""
+        if not self.results_db or strategy not in self.strategy_hashes:
+            return None
+        try:
+            result = self.results_db.fresh_result(self.strategy_hashes[strategy], mode, self.network_id)
+        except Exception as e:
+            print(f"⚠️ Ошибка чтения базы результатов: {e}")
+            return None
+        if result and self.throughput_mode and mode == "dpi" and not result.get("throughput"):
+            # Результат HEAD-проверки не говорит, проходит ли стратегия заморозку потока
+            return None
+        if result:
+            result["strategy"] = strategy
+            result["cached"] = True
+        return result
+
+    def _strategy_finished(self, result: Dict, mode: str):
+        """Сохраняет результат стратегии в базу и дописывает его карточку в отчет"""
+        self._record_result(result, mode)
+        if self.report_writer:
+            try:
+                self._add_report_card(self.report_writer, result)
+            except Exception as e:
+                print(f"⚠️ Не удалось дописать отчет: {e}")
+
+    def _record_result(self, result: Dict, mode: str):
+        """Сохраняет завершённый результат стратегии в базу"""
+        if not self.results_db or result.get('error') or result.get('cached'):
+            return
+        # Прерванный тест (проверены не все цели) не сохраняем; отсечённый досрочно — окончательный
+        if not result.get('pruned') and len(result.get('target_results', [])) != result.get('total_targets'):
+            return
+        strategy = result.get('strategy', '')
+        if strategy not in self.strategy_hashes:
+            return
+        try:
+            self.results_db.record_result(result, self.strategy_hashes[strategy], self.network_id,
+                                          self._is_working_result(result, mode))
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить результат в базу: {e}")
+
+    async def _run_strategies(self, strategies: List[str], mode: str, parallel_instances: int,
+                              stop_callback: Optional[callable] = None,
+                              stop_on_first_working: bool = False) -> List[Dict]:
+        """
+        Тестирует стратегии по очереди или параллельно в полосах nfqws
+        """
+        if parallel_instances > 1 and strategies:
+            return await self._run_parallel_strategies(strategies, mode, parallel_instances,
+                                                       stop_callback, stop_on_first_working)
 
         all_results = []
 
         for i, strategy in enumerate(strategies, 1):
+
             # ПРОВЕРЯЕМ, НЕ ЗАПРОШЕНА ЛИ ОСТАНОВКА
             if self.stop_requested:
                 print(f"\n⏹️  Тестирование остановлено пользователем")
@@ -2186,91 +2651,203 @@ class StrategyTester:
                     break
 
                 all_results.append(result)
+                self._strategy_finished(result, mode)
 
-                # ВЫВОД ИТОГОВ В ЗАВИСИМОСТИ ОТ РЕЖИМА
-                if mode == "YouTube/Discord":
-                    # РЕЖИМ YouTube/Discord - оценка по критическим тестам
-                    youtube_passed = result.get('youtube_passed', False)
-                    discord_passed = result.get('discord_passed', False)
-
-                    if youtube_passed is True and discord_passed is True:
-                        rating = "⭐ ОТЛИЧНО"
-                        print(f"   Результат: {rating} (YouTube: ✅, Discord: ✅)")
-                    elif youtube_passed is True and discord_passed is False:
-                        rating = "⚠️  ЧАСТИЧНО"
-                        print(f"   Результат: {rating} (YouTube: ✅, Discord: ❌)")
-                    elif youtube_passed is False and discord_passed is True:
-                        rating = "⚠️  ЧАСТИЧНО"
-                        print(f"   Результат: {rating} (YouTube: ❌, Discord: ✅)")
-                    elif youtube_passed is False and discord_passed is False:
-                        rating = "❌ ПЛОХО"
-                        print(f"   Результат: {rating} (YouTube: ❌, Discord: ❌)")
-                    else:
-                        rating = "❓ НЕИЗВЕСТНО"
-                        print(f"   Результат: {rating}")
-
-                elif mode == "dpi":
-                    # РЕЖИМ DPI - только техническая оценка
-                    success_rate = result.get('success_rate', 0)
-                    if success_rate >= 80:
-                        rating = "✅ ХОРОШО"
-                    elif success_rate >= 60:
-                        rating = "⚠️  НОРМАЛЬНО"
-                    else:
-                        rating = "❌ ПЛОХО"
-                    print(f"   Результат: {rating} ({success_rate:.1f}%)")
-
-                else:
-                    # СТАНДАРТНЫЙ РЕЖИМ - старый подход с процентами
-                    success = result.get('successful', 0)
-                    total = result.get('total_targets', 0)
-                    success_rate = result.get('success_rate', 0)
-                    youtube_passed = result.get('youtube_passed', False)
-                    discord_passed = result.get('discord_passed', False)
-
-                    if success_rate >= 80 and youtube_passed and discord_passed:
-                        rating = "⭐ ОТЛИЧНО"
-                    elif success_rate >= 60 and (youtube_passed or discord_passed):
-                        rating = "✅ ХОРОШО"
-                    elif success_rate >= 60:
-                        rating = "⚠️  НОРМАЛЬНО"
-                    else:
-                        rating = "❌ ПЛОХО"
+                self._print_strategy_rating(result, mode)
 
-                    # Дополнительная информация для стандартного режима
-                    yt_status = "✅" if youtube_passed else "❌"
-                    dc_status = "✅" if discord_passed else "❌"
-                    print(f"   Результат: {rating} ({success}/{total} успешно, {success_rate:.1f}%)")
-                    print(f"              YouTube: {yt_status}, Discord: {dc_status}")
+                if stop_on_first_working and self._is_working_result(result, mode):
+                    print(f"\n⭐ Найдена рабочая стратегия: {strategy}, остальные не тестируются")
+                    break
 
             except Exception as e:
                 print(f"   ❌ Ошибка тестирования: {e}")
-                all_results.append({
+                result = {
                     "strategy": strategy,
                     "error": str(e),
                     "success": False
-                })
+                }
+                all_results.append(result)
+                self._strategy_finished(result, mode)
+
+        return all_results
+
+    def _close_report(self, partial: bool = False) -> Optional[str]:
+        """
+        Завершает отчет текущего прогона; пустой отчет удаляется
+
+        :return: путь к отчету или None
+        """
+        writer, self.report_writer = self.report_writer, None
+        if not writer:
+            return None
+        if not len(writer):
+            writer.discard()
+            return None
+        return self._finalize_report(writer, partial=partial)
+
+    def _print_strategy_rating(self, result: Dict, mode: str):
+        """
+        Выводит итоговую оценку стратегии в зависимости от режима
+        """
+        if mode == "YouTube/Discord":
+            # РЕЖИМ YouTube/Discord - оценка по критическим тестам
+            youtube_passed = result.get('youtube_passed', False)
+            discord_passed = result.get('discord_passed', False)
+
+            if youtube_passed is True and discord_passed is True:
+                rating = "⭐ ОТЛИЧНО"
+                print(f"   Результат: {rating} (YouTube: ✅, Discord: ✅)")
+            elif youtube_passed is True and discord_passed is False:
+                rating = "⚠️  ЧАСТИЧНО"
+                print(f"   Результат: {rating} (YouTube: ✅, Discord: ❌)")
+            elif youtube_passed is False and discord_passed is True:
+                rating = "⚠️  ЧАСТИЧНО"
+                print(f"   Результат: {rating} (YouTube: ❌, Discord: ✅)")
+            elif youtube_passed is False and discord_passed is False:
+                rating = "❌ ПЛОХО"
+                print(f"   Результат: {rating} (YouTube: ❌, Discord: ❌)")
+            else:
+                rating = "❓ НЕИЗВЕСТНО"
+                print(f"   Результат: {rating}")
+
+        elif mode == "dpi":
+            # РЕЖИМ DPI - только техническая оценка
+            success_rate = result.get('success_rate', 0)
+            if success_rate >= 80:
+                rating = "✅ ХОРОШО"
+            elif success_rate >= 60:
+                rating = "⚠️  НОРМАЛЬНО"
+            else:
+                rating = "❌ ПЛОХО"
+            print(f"   Результат: {rating} ({success_rate:.1f}%)")
+
+        else:
+            # СТАНДАРТНЫЙ РЕЖИМ - старый подход с процентами
+            success = result.get('successful', 0)
+            total = result.get('total_targets', 0)
+            success_rate = result.get('success_rate', 0)
+            youtube_passed = result.get('youtube_passed', False)
+            discord_passed = result.get('discord_passed', False)
+
+            if success_rate >= 80 and youtube_passed and discord_passed:
+                rating = "⭐ ОТЛИЧНО"
+            elif success_rate >= 60 and (youtube_passed or discord_passed):
+                rating = "✅ ХОРОШО"
+            elif success_rate >= 60:
+                rating = "⚠️  НОРМАЛЬНО"
+            else:
+                rating = "❌ ПЛОХО"
+
+            # Дополнительная информация для стандартного режима
+            yt_status = "✅" if youtube_passed else "❌"
+            dc_status = "✅" if discord_passed else "❌"
+            print(f"   Результат: {rating} ({success}/{total} успешно, {success_rate:.1f}%)")
+            print(f"              YouTube: {yt_status}, Discord: {dc_status}")
+
+        if result.get('latency'):
+            print(f"   Задержка: {format_latency(result['latency'])}")
+        if result.get('throughput'):
+            print(f"   Скачивание: {format_throughput(result['throughput'])}")
+
+    async def run_full_test(self, mode: str = "standard",
+                            strategies: Optional[List[str]] = None,
+                            stop_callback: Optional[callable] = None,
+                            parallel_instances: int = 1,
+                            force_retest: bool = False,
+                            rank_by_history: bool = True,
+                            stop_on_first_working: bool = False,
+                            throughput: bool = False) -> List[Dict]:
+        """
+        Выполняет полное тестирование всех стратегий
+
+        :param parallel_instances: сколько стратегий проверять одновременно
+                                   (больше 1 — изолированные полосы nfqws, см. core.strategy_lanes)
+        :param force_retest: тестировать заново даже стратегии со свежим результатом в базе
+        :param rank_by_history: сначала тестировать стратегии, чаще работавшие в этой сети
+        :param stop_on_first_working: остановиться на первой рабочей стратегии
+        :param throughput: в режиме DPI скачивать тяжёлые цели и замерять скорость
+        """
+        print("🚀 Zapret DPI Strategy Tester")
+        print("="*60)
+
+        # Сбрасываем флаг остановки
+        self.stop_requested = False
+        self.throughput_mode = throughput and mode == "dpi"
+        if self.throughput_mode:
+            where = f" (локальная подмена {self.throughput_base_url})" if self.throughput_base_url else ""
+            print(f"📥 Замер скорости: до {format_bytes(self.byte_budget)} с каждой тяжёлой цели{where}")
+
+        # Получаем список стратегий
+        if strategies is None:
+            strategies = self.get_available_strategies()
+
+        if not strategies:
+            print("❌ Не найдено ни одной стратегии для тестирования")
+            print(f"   Проверьте папку: {self.strategies_dir}")
+            return []
+
+        print(f"📁 Папка стратегий: {self.strategies_dir}")
+        print(f"📋 Будет протестировано: {len(strategies)} стратегий")
+        print(f"🎯 Режим тестирования: {mode}")
+        if parallel_instances > 1:
+            print(f"🔀 Параллельно: до {parallel_instances} стратегий одновременно")
+        print("="*60)
+
+        # Стратегии, которые не менялись и уже проверены в этой сети, берём из базы
+        self._open_results_db(strategies)
+        cached_results = {}
+        if not force_retest:
+            for strategy in strategies:
+                cached = self._cached_result(strategy, mode)
+                if cached:
+                    cached_results[strategy] = cached
+                    print(f"💾 {strategy}: свежий результат из базы "
+                          f"({cached.get('success_rate', 0):.1f}%, {format_age(cached['tested_at'])} назад)")
+        all_strategies = strategies
+        strategies = [strategy for strategy in strategies if strategy not in cached_results]
+        if cached_results:
+            print(f"📋 Из базы: {len(cached_results)}, тестируется: {len(strategies)}")
+
+        if rank_by_history:
+            strategies = self._rank_by_history(strategies, mode)
+
+        if stop_on_first_working:
+            cached_working = [name for name, result in cached_results.items()
+                              if self._is_working_result(result, mode)]
+            if cached_working:
+                print(f"⭐ Рабочая стратегия уже известна по базе: {cached_working[0]}")
+                strategies = []
+
+        # Отчет пишется по мере тестирования: при сбое или остановке проверенное не теряется
+        if mode == "YouTube/Discord":
+            report_filename = f"youtube_discord_test_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        elif mode == "dpi":
+            report_filename = f"dpi_test_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        else:
+            report_filename = f"standard_test_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        self.report_writer = self._open_report(report_filename)
+        for strategy in all_strategies:
+            if strategy in cached_results:
+                self._add_report_card(self.report_writer, cached_results[strategy])
+
+        try:
+            all_results = await self._run_strategies(strategies, mode, parallel_instances,
+                                                     stop_callback, stop_on_first_working)
+        except BaseException:
+            self._close_report(partial=True)
+            raise
+
+        # Результаты из базы и новые — в исходном порядке стратегий
+        if cached_results:
+            tested = {result.get('strategy'): result for result in all_results}
+            all_results = [cached_results.get(strategy) or tested[strategy]
+                           for strategy in all_strategies
+                           if strategy in cached_results or strategy in tested]
 
         if all_results and not self.stop_requested:
             # СОХРАНЯЕМ СПИСОК РАБОЧИХ СТРАТЕГИЙ В ЗАВИСИМОСТИ ОТ РЕЖИМА
-            working_names = []
-            for result in all_results:
-                success_rate = result.get('success_rate', 0)
-                youtube_passed = result.get('youtube_passed', False)
-                discord_passed = result.get('discord_passed', False)
-
-                if mode == "YouTube/Discord":
-                    # РЕЖИМ YouTube/Discord - оба сервиса должны работать
-                    if youtube_passed is True and discord_passed is True:
-                        working_names.append(result.get('strategy', ''))
-                elif mode == "dpi":
-                    # РЕЖИМ DPI - только по проценту
-                    if success_rate >= 70:  # Порог для DPI режима
-                        working_names.append(result.get('strategy', ''))
-                else:
-                    # СТАНДАРТНЫЙ РЕЖИМ - старая логика
-                    if success_rate >= 60 and youtube_passed is True and discord_passed is True:
-                        working_names.append(result.get('strategy', ''))
+            working_names = [result.get('strategy', '') for result in all_results
+                             if self._is_working_result(result, mode)]
 
             if working_names:
                 try:
@@ -2286,16 +2863,8 @@ class StrategyTester:
                 except Exception as e:
                     print(f"⚠️ Не удалось сохранить список рабочих стратегий: {e}")
 
-            # ГЕНЕРИРУЕМ ОТЧЕТ С УЧЕТОМ РЕЖИМА
-            report_filename = None
-            if mode == "YouTube/Discord":
-                report_filename = f"youtube_discord_test_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-            elif mode == "dpi":
-                report_filename = f"dpi_test_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-            else:
-                report_filename = f"standard_test_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-
-            report_path = self.generate_report(all_results, report_filename)
+            # ЗАВЕРШАЕМ ОТЧЕТ (карточки уже записаны по ходу теста)
+            report_path = self._close_report()
 
             if mode == "YouTube/Discord":
                 print(f"\n✅ Тестирование YouTube/Discord завершено!")
@@ -2316,17 +2885,14 @@ class StrategyTester:
         elif self.stop_requested:
             print(f"\n⏹️  Тестирование остановлено")
             print(f"   Протестировано стратегий: {len(all_results)}")
-            # Можно сохранить частичный отчет
-            if all_results:
-                report_filename = "partial_test_report.html"
-                if mode == "YouTube/Discord":
-                    report_filename = "partial_youtube_discord_report.html"
-                elif mode == "dpi":
-                    report_filename = "partial_dpi_report.html"
-
-                report_path = self.generate_report(all_results, report_filename)
+            # Частичный отчет: карточки проверенных стратегий уже в файле
+            report_path = self._close_report(partial=True)
+            if report_path:
                 print(f"📄 Частичный отчет сохранен: {report_path}")
 
+        else:
+            self._close_report()
+
         return all_results
 
 # Упрощенная функция для использования
@@ -2349,8 +2915,12 @@ if __name__ == "__main__":
         home_dir = os.path.expanduser("~")
         project_root = os.path.join(home_dir, "Zapret_DPI_Manager")
 
-        if len(sys.argv) > 1:
-            mode = sys.argv[1]
+        # --throughput: замер скорости в режиме DPI; --standin: тяжёлые цели с локальной подмены
+        flags = {arg for arg in sys.argv[1:] if arg.startswith("--")}
+        positional = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
+        if positional:
+            mode = positional[0]
         else:
             print("Выберите режим тестирования:")
             print("  1. Standard (YouTube, Discord)")
@@ -2366,6 +2936,13 @@ if __name__ == "__main__":
             sys.exit(1)
 
         tester = StrategyTester(project_root, sudo_password)
-        await tester.run_full_test(mode)
+        throughput = "--throughput" in flags
+        if "--standin" in flags:
+            from core.throughput_probe import BulkStandInServer
+            async with BulkStandInServer() as server:
+                tester.throughput_base_url = server.base_url
+                await tester.run_full_test(mode, throughput=throughput)
+        else:
+            await tester.run_full_test(mode, throughput=throughput)
 
     asyncio.run(main())
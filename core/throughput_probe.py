@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Замер скорости на «тяжёлых» DPI-целях (1MB.bin, 10M.bin).
+
+HEAD-проверка видит только, что пришли заголовки. DPI вида TCP 16–20 пропускает
+первые ~16–20 КБ ответа и дальше молча замораживает поток, поэтому в режиме
+замера скорости тестировщик скачивает начало файла (core.http_probe.download_probe)
+с ограничением по объёму и сохраняет устойчивую скорость и байт, на котором поток
+замер. Стратегии сравниваются по тому, проходят ли они дальше этой точки.
+
+Для проверки без сети есть локальная подмена — BulkStandInServer: отдаёт файлы
+нужного размера по HTTP и умеет имитировать заморозку потока после N байт.
+
+Запуск скриптом (замер на локальной подмене):
+    python core/throughput_probe.py [--freeze-after 16384] [--rate-mbit 50]
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import statistics
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+if not __package__:
+    _project_root = str(Path(__file__).resolve().parent.parent)
+    if _project_root not in sys.path:
+        sys.path.insert(0, _project_root)
+
+from core.http_probe import download_probe
+
+# Заморозка раньше этой границы — характерный признак DPI TCP 16–20
+DPI_FREEZE_MAX_BYTES = 32 * 1024
+
+STANDIN_CHUNK = 16 * 1024
+STANDIN_DEFAULT_SIZE = 1024 * 1024
+
+_SIZE_RE = re.compile(r"(\d+)\s*(K|M|G)B?", re.IGNORECASE)
+_SIZE_UNITS = {"K": 1024, "M": 1024 * 1024, "G": 1024 * 1024 * 1024}
+
+
+def is_dpi_freeze(stall_at: Optional[int]) -> bool:
+    """Поток замер в пределах первых десятков КБ — похоже на DPI, а не на медленный сервер"""
+    return stall_at is not None and stall_at <= DPI_FREEZE_MAX_BYTES
+
+
+def format_bytes(value: int) -> str:
+    if value >= 1024 * 1024:
+        return f"{value / (1024 * 1024):.1f} МБ"
+    return f"{value / 1024:.0f} КБ"
+
+
+def summarize_throughput(target_results: List[Dict]) -> Optional[Dict]:
+    """
+    Сводка по целям, для которых замерялась скорость.
+
+    :return: {"targets", "survived", "frozen", "median_mbps", "min_stall_at"} или None
+    """
+    measured = [result for result in target_results if "throughput_mbps" in result]
+    if not measured:
+        return None
+    stalls = [result["stall_at"] for result in measured if result.get("stall_at") is not None]
+    speeds = [result["throughput_mbps"] for result in measured if result.get("success")]
+    return {
+        "targets": len(measured),
+        "survived": sum(1 for result in measured if result.get("success")),
+        "frozen": sum(1 for result in measured if is_dpi_freeze(result.get("stall_at"))),
+        "median_mbps": round(statistics.median(speeds), 1) if speeds else 0.0,
+        "min_stall_at": min(stalls) if stalls else None,
+    }
+
+
+def format_throughput(summary: Optional[Dict]) -> str:
+    """Краткая строка: «прошли 4/6 • 38.2 Мбит/с • замерзание до 32 КБ: 2»"""
+    if not summary:
+        return ""
+    parts = [f"прошли {summary['survived']}/{summary['targets']}"]
+    if summary["median_mbps"]:
+        parts.append(f"{summary['median_mbps']:.1f} Мбит/с")
+    if summary["frozen"]:
+        parts.append(f"замерзание до {format_bytes(DPI_FREEZE_MAX_BYTES)}: {summary['frozen']}")
+    elif summary["min_stall_at"] is not None:
+        parts.append(f"обрыв на {format_bytes(summary['min_stall_at'])}")
+    return " • ".join(parts)
+
+
+def standin_url(url: str, base_url: str) -> str:
+    """URL цели на локальной подмене: тот же путь (по нему подмена выбирает размер файла)"""
+    parts = urlsplit(url)
+    return base_url.rstrip("/") + (parts.path or "/")
+
+
+def size_from_path(path: str) -> int:
+    """Размер файла по имени: 1MB.bin -> 1 МБ, 10M.bin -> 10 МБ, иначе 1 МБ"""
+    match = _SIZE_RE.search(path.rsplit("/", 1)[-1])
+    if not match:
+        return STANDIN_DEFAULT_SIZE
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2).upper()]
+
+
+class BulkStandInServer:
+    """
+    Локальный HTTP-сервер, заменяющий тяжёлые DPI-цели при проверке без сети.
+
+    :param freeze_after: после стольких байт тела перестать отправлять данные
+                         (имитация DPI TCP 16–20); None — отдавать файл целиком
+    :param rate_mbit: ограничение скорости отдачи, Мбит/с (None — без ограничения)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 freeze_after: Optional[int] = None, rate_mbit: Optional[float] = None):
+        self.host = host
+        self.port = port
+        self.freeze_after = freeze_after
+        self.rate_mbit = rate_mbit
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> "BulkStandInServer":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "BulkStandInServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while True:
+                line = await reader.readline()
+                if not line or line in (b"\r\n", b"\n"):
+                    break
+            parts = request_line.decode("latin-1", errors="ignore").split()
+            method = parts[0] if parts else "GET"
+            size = size_from_path(parts[1] if len(parts) > 1 else "/")
+
+            writer.write(
+                f"HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\n"
+                f"Content-Length: {size}\r\nConnection: close\r\n\r\n".encode("latin-1")
+            )
+            await writer.drain()
+            if method == "HEAD":
+                return
+
+            chunk = b"\0" * STANDIN_CHUNK
+            delay = STANDIN_CHUNK * 8 / (self.rate_mbit * 1_000_000) if self.rate_mbit else 0
+            limit = size if self.freeze_after is None else min(size, self.freeze_after)
+            sent = 0
+            while sent < limit:
+                piece = chunk[:limit - sent]
+                writer.write(piece)
+                await writer.drain()
+                sent += len(piece)
+                if delay:
+                    await asyncio.sleep(delay)
+            if sent < size:
+                # Соединение остаётся открытым, но данные больше не идут
+                await reader.read()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Сервер останавливается, пока клиент держит «замороженное» соединение
+            pass
+        finally:
+            writer.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Замер скорости на локальной подмене DPI-целей")
+    parser.add_argument("--freeze-after", type=int, default=None, help="заморозить поток после N байт")
+    parser.add_argument("--rate-mbit", type=float, default=None, help="ограничить отдачу, Мбит/с")
+    parser.add_argument("--path", default="/10M.bin", help="путь файла (размер берётся из имени)")
+    args = parser.parse_args()
+
+    async def main():
+        async with BulkStandInServer(freeze_after=args.freeze_after, rate_mbit=args.rate_mbit) as server:
+            probe = await download_probe(server.base_url + args.path)
+            stall = f", замер на {format_bytes(probe['stall_at'])}" if probe["stalled"] else ""
+            print(f"{server.base_url}{args.path}: {format_bytes(probe['bytes'])} за {probe['duration']:.2f} с, "
+                  f"{probe['mbps']:.1f} Мбит/с{stall}")
+
+    asyncio.run(main())
@@ -26,6 +26,7 @@ from core.platform_info import (
     os_release_id_normalized,
     zapret_systemd_unit_is_present,
 )
+from core.privileged import run_privileged
 
 class ZapretChecker:
     def __init__(
@@ -278,18 +279,11 @@ class ZapretChecker:
             self.update_progress(task_name, self.get_current_progress())
 
         try:
-            process = subprocess.Popen(
-                ['sudo', '-S'] + command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            stdout, stderr = process.communicate(input=self.sudo_password + '\n')
+            result = run_privileged(command, self.sudo_password)
+            stdout, stderr = result['stdout'], result['stderr']
 
             return {
-                'returncode': process.returncode,
+                'returncode': result['returncode'],
                 'stdout': stdout,
                 'stderr': stderr
             }
@@ -22,6 +22,8 @@ from core.platform_info import (
     ZAPRET_SYSTEMD_UNIT_PATH_LEGACY,
     zapret_systemd_unit_is_present,
 )
+from core.privileged import (exec_step, log_transaction, run_privileged, run_privileged_transaction,
+                             systemctl_step)
 
 class ZapretUninstaller:
     def __init__(
@@ -240,24 +242,17 @@ class ZapretUninstaller:
         self.log_debug(f"Выполнение команды: sudo {' '.join(command)}")
 
         try:
-            process = subprocess.Popen(
-                ['sudo', '-S'] + command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            stdout, stderr = process.communicate(input=self.sudo_password + '\n')
+            result = run_privileged(command, self.sudo_password)
+            stdout, stderr = result['stdout'], result['stderr']
 
-            self.log_debug(f"Результат команды: код={process.returncode}")
+            self.log_debug(f"Результат команды: код={result['returncode']}")
             if stdout:
                 self.log_debug(f"stdout: {stdout[:200]}...")
             if stderr:
                 self.log_debug(f"stderr: {stderr[:200]}...")
 
             return {
-                'returncode': process.returncode,
+                'returncode': result['returncode'],
                 'stdout': stdout,
                 'stderr': stderr,
                 'command': ' '.join(command)
@@ -346,114 +341,33 @@ class ZapretUninstaller:
 
         return zapret_dir_exists or service_exists or manager_dir_exists
 
-    def stop_zapret_service(self):
-        """Останавливает службу zapret"""
+    def remove_zapret_service(self):
+        """
+        Останавливает и отключает службу, удаляет unit-файлы и /opt/zapret
+        одной транзакцией (одно повышение прав вместо отдельного sudo на шаг).
+        Ошибки шагов не прерывают удаление: служба может быть уже остановлена,
+        а legacy unit в /usr на immutable-системах не удаляется.
+        """
         self.current_task = "stop_service"
-        self.log_debug("Остановка службы zapret...")
-
-        result = self.run_with_sudo(
-            ['systemctl', 'stop', 'zapret'],
-            "Остановка службы zapret..."
-        )
-
-        if not result:
-            self.log_debug("Нет результата от остановки службы")
-            return False
-
-        if result['returncode'] != 0:
-            # Если служба не запущена, это не ошибка
-            if "inactive" in result['stderr'] or "not loaded" in result['stderr']:
-                self.log_debug("Служба уже остановлена или не существует")
-                return True
-            else:
-                self.log_debug(f"Ошибка остановки службы: {result['stderr']}")
-                return False
-
-        self.log_debug("Служба успешно остановлена")
-        return True
-
-    def disable_zapret_service(self):
-        """Отключает автозапуск службы zapret"""
-        self.current_task = "disable_service"
-        self.log_debug("Отключение автозапуска службы zapret...")
-
-        result = self.run_with_sudo(
-            ['systemctl', 'disable', 'zapret'],
-            "Отключение автозапуска службы..."
-        )
-
-        if not result:
-            self.log_debug("Нет результата от отключения службы")
-            return False
-
-        if result['returncode'] != 0:
-            # Если служба уже отключена, это не ошибка
-            if "disabled" in result['stderr'] or "does not exist" in result['stderr']:
-                self.log_debug("Служба уже отключена или не существует")
-                return True
-            else:
-                self.log_debug(f"Ошибка отключения службы: {result['stderr']}")
-                return False
-
-        self.log_debug("Автозапуск службы успешно отключен")
-        return True
-
-    def remove_service_file(self):
-        """Удаляет unit zapret в /etc и при наличии — legacy в /usr."""
-        self.current_task = "remove_service"
-        self.log_debug("Удаление файлов службы zapret.service...")
-
-        if not zapret_systemd_unit_is_present():
-            self.log_debug("Файлы unit не найдены, пропускаем удаление")
-            return True
-
-        result = self.run_with_sudo(
-            ["rm", "-f", ZAPRET_SYSTEMD_UNIT_PATH],
-            "Удаление unit из /etc/systemd/system…",
-        )
-        if not result or result["returncode"] != 0:
-            self.log_debug(
-                f"Ошибка удаления unit: {result['stderr'] if result else 'No result'}"
-            )
-            return False
-
-        # Legacy в /usr: на immutable-системах rm может завершиться с ошибкой — не считаем это фатальным.
-        self.run_with_sudo(
-            ["rm", "-f", ZAPRET_SYSTEMD_UNIT_PATH_LEGACY],
-            "Удаление устаревшего unit из /usr…",
-        )
-
-        self.log_debug("Файлы службы удалены (основной путь; /usr при возможности)")
-        return True
-
-    def remove_zapret_directory(self):
-        """Удаляет директорию /opt/zapret"""
-        self.current_task = "remove_zapret_dir"
-        self.log_debug("Удаление директории /opt/zapret...")
-
-        zapret_dir = "/opt/zapret"
-
-        # Проверяем, существует ли директория
-        check_result = self.run_with_sudo(['ls', '-la', '/opt/'])
-        if check_result and check_result['returncode'] == 0:
-            if 'zapret' not in check_result['stdout']:
-                self.log_debug("Директория /opt/zapret не существует, пропускам удаление")
-                return True
-        else:
-            self.log_debug("Не удалось проверить существование /opt/zapret")
-
-        # Удаляем директорию
-        result = self.run_with_sudo(
-            ['rm', '-rf', zapret_dir],
-            "Удаление директории /opt/zapret..."
-        )
-
-        if not result or result['returncode'] != 0:
-            self.log_debug(f"Ошибка удаления директории: {result['stderr'] if result else 'No result'}")
-            return False
+        self.log_debug("Остановка службы и удаление файлов zapret...")
+
+        steps = [
+            systemctl_step('stop', description="Остановка службы zapret", check=False),
+            systemctl_step('disable', description="Отключение автозапуска службы", check=False),
+            exec_step(["rm", "-f", ZAPRET_SYSTEMD_UNIT_PATH],
+                      "Удаление unit из /etc/systemd/system", check=False),
+            exec_step(["rm", "-f", ZAPRET_SYSTEMD_UNIT_PATH_LEGACY],
+                      "Удаление устаревшего unit из /usr", check=False),
+            systemctl_step('daemon-reload', description="Обновление systemd", check=False),
+            exec_step(['rm', '-rf', '/opt/zapret'], "Удаление директории /opt/zapret", check=False),
+        ]
+        result = run_privileged_transaction(steps, self.sudo_password)
+        log_transaction(result, self.log_debug)
 
-        self.log_debug("Директория /opt/zapret успешно удалена")
-        return True
+        removed = not os.path.exists("/opt/zapret") and not zapret_systemd_unit_is_present()
+        if removed:
+            self.log_debug("Служба и файлы zapret удалены")
+        return removed
 
     def remove_manager_directory(self):
         """Удаляет директорию менеджера"""
@@ -730,28 +644,10 @@ class ZapretUninstaller:
                 else:
                     self.log_debug("Пропускаем разблокировку на не-SteamOS системе")
 
-            # 2. Останавливаем службу
-            self.update_progress("Остановка службы...", 20)
-            if not self.stop_zapret_service():
-                self.log_debug("Предупреждение: не удалось остановить службу, продолжаем...")
-
-            # 3. Отключаем автозапуск
-            self.update_progress("Отключение автозапуска...", 30)
-            if not self.disable_zapret_service():
-                self.log_debug("Предупреждение: не удалось отключить автозапуск, продолжаем...")
-
-            # 4. Удаляем файл службы
-            self.update_progress("Удаление службы...", 40)
-            if not self.remove_service_file():
-                self.log_debug("Предупреждение: не удалось удалить файл службы, продолжаем...")
-
-            # 5. Обновляем systemd
-            self.reload_systemd()
-
-            # 6. Удаляем директорию /opt/zapret
-            self.update_progress("Удаление системных файлов...", 60)
-            if not self.remove_zapret_directory():
-                self.log_debug("Предупреждение: не удалось удалить /opt/zapret, продолжаем...")
+            # 2-6. Останавливаем службу, удаляем unit и /opt/zapret
+            self.update_progress("Остановка службы и удаление системных файлов...", 20)
+            if not self.remove_zapret_service():
+                self.log_debug("Предупреждение: служба или /opt/zapret удалены не полностью, продолжаем...")
 
             # 7. Удаляем директорию менеджера
             self.update_progress("Удаление файлов менеджера...", 80)
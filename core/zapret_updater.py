@@ -4,7 +4,6 @@ import os
 import tempfile
 import tarfile
 import shutil
-import subprocess
 import threading
 import time
 import urllib.error
@@ -22,6 +21,9 @@ from core.platform_info import (
     ZAPRET_SYSTEMD_UNIT_PATH,
     ZAPRET_SYSTEMD_UNIT_PATH_LEGACY,
 )
+from core.privileged import (exec_step, log_transaction, run_privileged, run_privileged_transaction,
+                             run_systemctl, systemctl_step, write_file_step)
+from core.privileged_helper import INSTALLED_HELPER_PATH
 
 class ZapretUpdater(BaseUpdater):
     def __init__(self):
@@ -104,30 +106,8 @@ class ZapretUpdater(BaseUpdater):
             if description:
                 print(f"Выполнение: {description}")
 
-            sudo_cmd = ['sudo', '-S'] + command
+            return run_privileged(command, password, timeout=30)
 
-            process = subprocess.Popen(
-                sudo_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            stdout, stderr = process.communicate(input=f"{password}\n", timeout=30)
-
-            return {
-                'returncode': process.returncode,
-                'stdout': stdout,
-                'stderr': stderr
-            }
-
-        except subprocess.TimeoutExpired:
-            return {
-                'returncode': -1,
-                'stdout': '',
-                'stderr': 'Таймаут выполнения команды'
-            }
         except Exception as e:
             return {
                 'returncode': -1,
@@ -135,48 +115,38 @@ class ZapretUpdater(BaseUpdater):
                 'stderr': str(e)
             }
 
+    def run_transaction(self, steps, password, description=""):
+        """Выполняет шаги одним повышением прав и печатает время каждого шага"""
+        if description:
+            print(f"Выполнение: {description}")
+        result = run_privileged_transaction(steps, password)
+        log_transaction(result)
+        return result
+
     def stop_and_remove_zapret(self, password, progress_callback=None):
         """Останавливает и удаляет старую версию zapret"""
-        commands = [
-            (['systemctl', 'stop', 'zapret'], "Остановка службы zapret"),
-            (['systemctl', 'disable', 'zapret'], "Отключение автозапуска"),
-            (["rm", "-f", ZAPRET_SYSTEMD_UNIT_PATH], "Удаление unit из /etc/systemd/system"),
-            (
-                ["rm", "-f", ZAPRET_SYSTEMD_UNIT_PATH_LEGACY],
-                "Удаление устаревшего unit из /usr (при возможности)",
-            ),
-            (['rm', '-rf', '/opt/zapret/'], "Удаление директории zapret")
+        steps = [
+            systemctl_step('stop', description="Остановка службы zapret", check=False),
+            systemctl_step('disable', description="Отключение автозапуска", check=False),
+            exec_step(["rm", "-f", ZAPRET_SYSTEMD_UNIT_PATH],
+                      "Удаление unit из /etc/systemd/system", check=False),
+            exec_step(["rm", "-f", ZAPRET_SYSTEMD_UNIT_PATH_LEGACY],
+                      "Удаление устаревшего unit из /usr (при возможности)", check=False),
+            exec_step(['rm', '-rf', '/opt/zapret/'], "Удаление директории zapret", check=False),
         ]
 
         if self.is_steamos:
-            commands.insert(0, (['steamos-readonly', 'disable'], "Отключение защиты SteamOS"))
+            steps.insert(0, exec_step(['steamos-readonly', 'disable'], "Отключение защиты SteamOS", check=False))
 
-        for cmd, description in commands:
-            if progress_callback:
-                progress_callback(description, None)
-
-            result = self.run_with_sudo(cmd, password, description)
-            if result['returncode'] != 0:
-                print(f"Предупреждение при {description}: {result['stderr']}")
+        if progress_callback:
+            progress_callback("Удаление старой версии zapret...", None)
 
+        self.run_transaction(steps, password, "Удаление старой версии zapret")
         return True
 
     def copy_zapret_files(self, extract_dir, password, progress_callback=None):
         """Копирует файлы zapret в /opt/zapret"""
         try:
-            if progress_callback:
-                progress_callback("Создание директории /opt/zapret...", 50)
-
-            result = self.run_with_sudo(
-                ['mkdir', '-p', '/opt/zapret'],
-                password,
-                "Создание директории /opt/zapret..."
-            )
-
-            if not result or result['returncode'] != 0:
-                print("Не удалось создать /opt/zapret")
-                return False
-
             system_dir = None
             for root, dirs, files in os.walk(extract_dir):
                 if 'system' in dirs:
@@ -188,30 +158,45 @@ class ZapretUpdater(BaseUpdater):
                 return False
 
             if progress_callback:
-                progress_callback("Копирование файлов системы...", 60)
+                progress_callback("Копирование файлов zapret в /opt/zapret...", 50)
+
+            # Все копирования — одна транзакция; прерывает её только ошибка создания /opt/zapret.
+            # Каталог принадлежит root и закрыт на запись: из него через sudo запускается помощник
+            steps = [exec_step(['install', '-d', '-o', 'root', '-g', 'root', '-m', '755', '/opt/zapret'],
+                               "Создание директории /opt/zapret", timeout=30)]
 
             for item in os.listdir(system_dir):
                 src = os.path.join(system_dir, item)
                 dst = os.path.join('/opt/zapret', item)
 
                 if os.path.isfile(src):
-                    result = self.run_with_sudo(
-                        ['cp', src, dst],
-                        password,
-                        f"Копирование {item}..."
-                    )
+                    steps.append(exec_step(['cp', src, dst], f"Копирование {item}", check=False, timeout=30))
                 elif os.path.isdir(src):
-                    result = self.run_with_sudo(
-                        ['cp', '-r', src, dst],
-                        password,
-                        f"Копирование папки {item}..."
-                    )
-
-                if not result or result['returncode'] != 0:
-                    print(f"Не удалось скопировать {item}")
-
-            if progress_callback:
-                progress_callback("Копирование бинарных файлов...", 70)
+                    steps.append(exec_step(['cp', '-r', src, dst], f"Копирование папки {item}",
+                                           check=False, timeout=30))
+
+            # Компилятор config.txt и кеш списков: starter.sh запускает копии из /opt/zapret
+            # (принадлежат root), а при их отсутствии работает прежним способом средствами bash
+            core_dir = os.path.dirname(os.path.abspath(__file__))
+            for helper, title in (("config_compiler.py", "компилятора конфигурации"),
+                                  ("list_cache.py", "кеша списков"),
+                                  ("ipset_optimizer.py", "оптимизатора ipset"),
+                                  ("hostlist_compiler.py", "компилятора hostlist"),
+                                  ("firewall_rules.py", "генератора правил файрвола")):
+                helper_src = os.path.join(core_dir, helper)
+                if not os.path.isfile(helper_src):
+                    continue
+                steps.append(exec_step(['cp', helper_src, f'/opt/zapret/{helper}'],
+                                       f"Копирование {title}", check=False, timeout=30))
+            # Привилегированный помощник: менеджер запускает через sudo только эту копию (root, 644),
+            # а не файл из своего каталога, доступного пользователю на запись
+            helper_src = os.path.join(core_dir, "privileged_helper.py")
+            if os.path.isfile(helper_src):
+                steps.append(exec_step(['install', '-o', 'root', '-g', 'root', '-m', '644', helper_src,
+                                        INSTALLED_HELPER_PATH],
+                                       "Установка привилегированного помощника", check=False, timeout=30))
+            steps.append(exec_step(['mkdir', '-p', '/opt/zapret/cache'], "Создание папки кеша",
+                                   check=False, timeout=30))
 
             arch = os.uname().machine
             bin_dirs = {
@@ -236,21 +221,22 @@ class ZapretUpdater(BaseUpdater):
                     nfqws_path = os.path.join(arch_bin_dir, 'nfqws')
 
                     if os.path.exists(nfqws_path):
-                        result = self.run_with_sudo(
-                            ['cp', nfqws_path, '/opt/zapret/nfqws'],
-                            password,
-                            "Копирование бинарного файла nfqws..."
-                        )
-                        if result and result['returncode'] == 0:
-                            self.run_with_sudo(['chmod', '+x', '/opt/zapret/nfqws'], password)
-
-            self.run_with_sudo(
-                ['bash', '-c', 'echo "iptables" > /opt/zapret/FWTYPE'],
-                password,
-                "Создание файла FWTYPE...",
-            )
+                        # install копирует и выставляет +x одним шагом
+                        steps.append(exec_step(['install', '-m', '755', nfqws_path, '/opt/zapret/nfqws'],
+                                               "Копирование бинарного файла nfqws", check=False, timeout=30))
 
-            self.run_with_sudo(['chmod', '-R', 'o+r', '/opt/zapret/'], password)
+            steps.append(write_file_step('/opt/zapret/FWTYPE', "iptables\n", "Создание файла FWTYPE",
+                                         check=False))
+            steps.append(exec_step(['chmod', '-R', 'o+r', '/opt/zapret/'], "Права на /opt/zapret",
+                                   check=False, timeout=30))
+
+            if progress_callback:
+                progress_callback("Копирование бинарных файлов...", 70)
+
+            result = self.run_transaction(steps, password, "Копирование файлов zapret")
+            if result['failed_step'] is not None:
+                print("Не удалось создать /opt/zapret")
+                return False
 
             return True
 
@@ -295,55 +281,41 @@ class ZapretUpdater(BaseUpdater):
 Description=zapret
 After=network-online.target
 Wants=network-online.target
+StartLimitIntervalSec=300
+StartLimitBurst=5
 
 [Service]
-Type=oneshot
-RemainAfterExit=yes
+Type=notify
+NotifyAccess=all
 WorkingDirectory=/opt/zapret
-ExecStart=/bin/bash /opt/zapret/starter.sh
-ExecStop=/bin/bash /opt/zapret/stopper.sh
+ExecStart=/bin/bash /opt/zapret/starter.sh --foreground
+ExecReload=/bin/bash /opt/zapret/reloader.sh $MAINPID
+ExecStopPost=/bin/bash /opt/zapret/stopper.sh
+Restart=on-failure
+RestartSec=2
+RestartSteps=5
+RestartMaxDelaySec=60
+TimeoutStartSec=90
+TimeoutStopSec=15
 
 [Install]
 WantedBy=multi-user.target
 """
 
-            temp_service = tempfile.NamedTemporaryFile(mode='w', delete=False)
-            temp_service.write(service_content)
-            temp_service.close()
-
-            result_mk = self.run_with_sudo(
-                ["mkdir", "-p", ZAPRET_SYSTEMD_UNIT_DIR],
-                password,
-                "Подготовка каталога /etc/systemd/system…",
-            )
-            if not result_mk or result_mk["returncode"] != 0:
-                print("Не удалось создать каталог для службы")
-                os.unlink(temp_service.name)
-                return False
-
-            result = self.run_with_sudo(
-                ["cp", temp_service.name, ZAPRET_SYSTEMD_UNIT_PATH],
-                password,
-                "Копирование файла службы...",
-            )
-
-            os.unlink(temp_service.name)
-
-            if not result or result["returncode"] != 0:
-                print("Не удалось создать службу")
+            steps = [
+                exec_step(["mkdir", "-p", ZAPRET_SYSTEMD_UNIT_DIR],
+                          "Подготовка каталога /etc/systemd/system", timeout=30),
+                write_file_step(ZAPRET_SYSTEMD_UNIT_PATH, service_content, "Запись файла службы",
+                                rollback=[exec_step(["rm", "-f", ZAPRET_SYSTEMD_UNIT_PATH])]),
+                exec_step(["chmod", "644", ZAPRET_SYSTEMD_UNIT_PATH], "Права на файл службы", timeout=30),
+                exec_step(["rm", "-f", ZAPRET_SYSTEMD_UNIT_PATH_LEGACY],
+                          "Удаление устаревшего unit из /usr", check=False, timeout=30),
+            ]
+            result = self.run_transaction(steps, password, "Создание службы systemd")
+            if result['failed_step'] is not None:
+                print(f"Не удалось создать службу: {result['stderr']}")
                 return False
 
-            self.run_with_sudo(
-                ["chmod", "644", ZAPRET_SYSTEMD_UNIT_PATH],
-                password,
-                "Права на файл службы...",
-            )
-            self.run_with_sudo(
-                ["rm", "-f", ZAPRET_SYSTEMD_UNIT_PATH_LEGACY],
-                password,
-                "Удаление устаревшего unit из /usr…",
-            )
-
             return True
 
         except Exception as e:
@@ -354,48 +326,24 @@ WantedBy=multi-user.target
         """Включает и запускает службу"""
         try:
             if progress_callback:
-                progress_callback("Обновление systemd...", 85)
-
-            result = self.run_with_sudo(
-                ['systemctl', 'daemon-reload'],
-                password,
-                "Обновление systemd..."
-            )
-
-            if not result or result['returncode'] != 0:
+                progress_callback("Обновление systemd и запуск службы...", 85)
+
+            steps = [
+                systemctl_step('daemon-reload', description="Обновление systemd", timeout=30),
+                systemctl_step('enable', 'zapret.service', "Включение автозапуска службы",
+                               check=False, timeout=30),
+                systemctl_step('start', 'zapret.service', "Запуск службы Zapret", check=False, timeout=30),
+            ]
+            result = self.run_transaction(steps, password, "Включение и запуск службы")
+            if result['failed_step'] is not None:
                 print("Не удалось обновить systemd")
                 return False
 
-            if progress_callback:
-                progress_callback("Включение автозапуска...", 90)
-
-            result = self.run_with_sudo(
-                ['systemctl', 'enable', 'zapret.service'],
-                password,
-                "Включение автозапуска службы..."
-            )
-
-            if not result or result['returncode'] != 0:
-                print("Не удалось включить автозапуск")
-
-            if progress_callback:
-                progress_callback("Запуск службы...", 95)
-
-            result = self.run_with_sudo(
-                ['systemctl', 'start', 'zapret.service'],
-                password,
-                "Запуск службы Zapret..."
-            )
-
             if progress_callback:
                 progress_callback("Служба успешно запущена", 100)
 
             time.sleep(2)
-            check_result = self.run_with_sudo(
-                ['systemctl', 'is-active', 'zapret'],
-                password,
-                "Проверка статуса службы..."
-            )
+            run_systemctl('is-active', password, timeout=30)
 
             return True
 
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""Корень проекта в sys.path, чтобы тесты импортировали пакет core как main.py."""
+
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Компилятор config.txt: раскладка по процессам nfqws и совпадение с bash-fallback starter.sh."""
+
+import os
+import re
+import subprocess
+
+from core import config_compiler
+
+STARTER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "zapret", "system", "starter.sh")
+
+
+def _fallback_placeholders():
+    with open(STARTER_PATH, encoding="utf-8") as f:
+        text = f.read()
+    pairs = re.findall(r'line="\$\{line//\\\{(\w+)\\\}/\$FILES_DIR/([^}]+)\}"', text)
+    return {"{" + name + "}": file_name for name, file_name in pairs}
+
+
+def test_starter_fallback_placeholders_match_compiler():
+    assert _fallback_placeholders() == config_compiler.PLACEHOLDER_FILES
+
+
+CONFIG_TEXT = "\n".join([
+    "--filter-tcp=80,443 --hostlist={list_general} --dpi-desync=fake --new",
+    "--filter-udp=443,50000-50100 --dpi-desync=fake --dpi-desync-repeats=6 --new",
+    "--filter-tcp={GameFilter} --filter-udp={GameFilter} --dpi-desync=multisplit --wf-tcp=80",
+])
+
+
+def _compiled(tmp_path, text=CONFIG_TEXT):
+    return config_compiler.compile_config_text(text, tmp_path, config_compiler.game_filter_values("off"))
+
+
+def test_compile_collects_ports_and_drops_wf_options(tmp_path):
+    compiled = _compiled(tmp_path)
+    assert f"--hostlist={tmp_path}/list-general_merged.txt" in compiled["argv"]
+    assert not any(word.startswith("--wf-") for word in compiled["argv"])
+    assert compiled["tcp_ports"] == [(12, 12), (80, 80), (443, 443)]
+    assert compiled["udp_ports"] == [(12, 12), (443, 443), (50000, 50100)]
+
+
+def test_worker_layout_single_process(tmp_path):
+    layout = config_compiler.worker_layout(_compiled(tmp_path), 1)
+    assert [worker["protocol"] for worker in layout["workers"]] == ["all"]
+    assert layout["tcp_queues"] == layout["udp_queues"] == (200, 200)
+
+
+def test_worker_layout_splits_queues_by_protocol(tmp_path):
+    compiled = _compiled(tmp_path)
+    layout = config_compiler.worker_layout(compiled, 5)
+    assert [(worker["qnum"], worker["protocol"]) for worker in layout["workers"]] == [
+        (200, "tcp"), (201, "tcp"), (202, "tcp"), (203, "udp"), (204, "udp"),
+    ]
+    assert layout["tcp_queues"] == (200, 202)
+    assert layout["udp_queues"] == (203, 204)
+
+    tcp_argv = layout["workers"][0]["argv"]
+    udp_argv = layout["workers"][-1]["argv"]
+    # UDP-профиль не попадает в процессы TCP и наоборот; общий профиль — в обе группы
+    assert "--dpi-desync-repeats=6" not in tcp_argv
+    assert "--hostlist=" not in " ".join(udp_argv)
+    assert "--dpi-desync=multisplit" in tcp_argv and "--dpi-desync=multisplit" in udp_argv
+    assert tcp_argv[0] != "--new" and tcp_argv[-1] != "--new"
+
+
+def test_worker_layout_without_udp_keeps_full_argv(tmp_path):
+    compiled = _compiled(tmp_path, "--filter-tcp=443 --dpi-desync=fake")
+    layout = config_compiler.worker_layout(compiled, 3)
+    assert [worker["protocol"] for worker in layout["workers"]] == ["all", "all", "all"]
+    assert layout["tcp_queues"] == layout["udp_queues"] == (200, 202)
+    assert all(worker["argv"] == compiled["argv"] for worker in layout["workers"])
+
+
+def test_worker_layout_clamps_worker_count(tmp_path):
+    compiled = _compiled(tmp_path)
+    assert len(config_compiler.worker_layout(compiled, 0)["workers"]) == 1
+    assert len(config_compiler.worker_layout(compiled, 100)["workers"]) == config_compiler.MAX_WORKERS
+
+
+def _bash_eval(assignments, expression):
+    script = f'{assignments}\nprintf "%s\\n" {expression}'
+    return subprocess.run(["bash", "-c", script], capture_output=True, text=True, check=True).stdout.splitlines()
+
+
+def test_shell_assignments_round_trip_through_bash(tmp_path):
+    compiled = _compiled(tmp_path, "--filter-tcp=80,1000-2000 --dpi-desync-fake-http='a b' --new\n"
+                                   "--filter-udp=443 --dpi-desync=fake")
+    assignments = config_compiler.shell_assignments(compiled, "iptables", workers=2)
+    assert _bash_eval(assignments, '"${NFQWS_ARGS[@]}"') == compiled["argv"]
+    assert _bash_eval(assignments, '"${WORKER_QNUMS[@]}" "${WORKER_PROTOCOLS[@]}"') == ["200", "201", "tcp", "udp"]
+    assert _bash_eval(assignments, '"$TCP_QUEUES" "$UDP_QUEUES" "$TCP_PORTS" "$UDP_PORTS"') == \
+        ["200", "201", "80,1000:2000", "443"]
+    assert _bash_eval(assignments, '"${NFQWS_ARGS_UDP[@]}"') == ["--filter-udp=443", "--dpi-desync=fake"]
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Правила iptables службы: группы портов multiport и разбор iptables-save."""
+
+from core.firewall_rules import (
+    IPT_CHAIN_POST,
+    IPT_CHAIN_PRE,
+    MULTIPORT_MAX_SLOTS,
+    iptables_remove_payload,
+    iptables_restore_payload,
+    legacy_nfqueue_rules,
+    multiport_chunks,
+    parse_iptables_save,
+)
+
+LEGACY_RULE = ("POSTROUTING -o wlan0 -p tcp -m multiport --dports 80,443 -m connbytes --connbytes 1:12 "
+               "--connbytes-mode packets --connbytes-dir original -j NFQUEUE --queue-num 200 --queue-bypass")
+
+SAVE_OUTPUT = "\n".join([
+    "# Generated by iptables-save",
+    "*mangle",
+    ":PREROUTING ACCEPT [0:0]",
+    ":POSTROUTING ACCEPT [0:0]",
+    f":{IPT_CHAIN_POST} - [0:0]",
+    f"-A POSTROUTING -j {IPT_CHAIN_POST}",
+    f"-A {LEGACY_RULE}",
+    "-A PREROUTING -p udp -j MARK --set-mark 0x1",
+    "-A PREROUTING -p tcp -j NFQUEUE --queue-num 300",
+    "COMMIT",
+    "",
+])
+
+
+def _slots(chunk):
+    return sum(2 if ":" in item else 1 for item in chunk.split(","))
+
+
+def test_multiport_chunks_respect_slot_limit():
+    ranges = [(port, port) for port in range(1000, 1020)] + [(2000, 2010), (3000, 3000)]
+    chunks = multiport_chunks(ranges)
+    assert all(_slots(chunk) <= MULTIPORT_MAX_SLOTS for chunk in chunks)
+    items = [item for chunk in chunks for item in chunk.split(",")]
+    assert items == [str(port) for port in range(1000, 1020)] + ["2000:2010", "3000"]
+
+
+def test_multiport_range_does_not_overflow_chunk():
+    # 14 одиночных портов + диапазон (2 слота) не помещаются в 15 слотов
+    ranges = [(port, port) for port in range(1, 15)] + [(100, 200)]
+    assert multiport_chunks(ranges) == [",".join(str(port) for port in range(1, 15)), "100:200"]
+
+
+def test_multiport_chunks_empty():
+    assert multiport_chunks([]) == []
+
+
+def test_parse_iptables_save_finds_service_chains_and_jumps():
+    chains, jumps = parse_iptables_save(SAVE_OUTPUT)
+    assert chains == {IPT_CHAIN_POST}
+    assert jumps == {("POSTROUTING", IPT_CHAIN_POST)}
+
+
+def test_legacy_rules_ignore_foreign_nfqueue():
+    assert legacy_nfqueue_rules(SAVE_OUTPUT) == [LEGACY_RULE]
+
+
+def test_restore_payload_adds_only_missing_jump():
+    payload = iptables_restore_payload("80,443", "", save_output=SAVE_OUTPUT).splitlines()
+    assert payload[0] == "*mangle"
+    assert payload[-1] == "COMMIT"
+    assert f"-D {LEGACY_RULE}" in payload
+    assert f"-I PREROUTING 1 -j {IPT_CHAIN_PRE}" in payload
+    assert not any(line.startswith("-I POSTROUTING") for line in payload)
+    assert f"-A {IPT_CHAIN_POST} -p tcp -m multiport --dports 80,443 " \
+           "-m connbytes --connbytes-dir=original --connbytes-mode=packets --connbytes 1:12 " \
+           "-j NFQUEUE --queue-num 200 --queue-bypass" in payload
+
+
+def test_restore_payload_uses_queue_balance_per_interface():
+    payload = iptables_restore_payload("443", "443", wan_ifaces=["wlan0", "eth0"],
+                                       tcp_queues=(200, 201), udp_queues=(202, 203))
+    post = [line for line in payload.splitlines() if line.startswith(f"-A {IPT_CHAIN_POST}")]
+    # 2 интерфейса x 2 протокола x (--dports, --sports)
+    assert len(post) == 8
+    assert all("-o " in line for line in post)
+    assert any("-p tcp" in line and "--queue-balance 200:201" in line for line in post)
+    assert any("-p udp" in line and "--queue-balance 202:203" in line for line in post)
+
+
+def test_remove_payload():
+    payload = iptables_remove_payload(SAVE_OUTPUT).splitlines()
+    assert payload == [
+        "*mangle",
+        f"-D {LEGACY_RULE}",
+        f"-D POSTROUTING -j {IPT_CHAIN_POST}",
+        f"-F {IPT_CHAIN_POST}",
+        f"-X {IPT_CHAIN_POST}",
+        "COMMIT",
+    ]
+    assert iptables_remove_payload("*mangle\nCOMMIT\n") == ""
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Значения {GameFilter}: config_compiler, game_filter_settings и копия в starter.sh совпадают."""
+
+import os
+import re
+
+from core import config_compiler, game_filter_settings
+
+STARTER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "zapret", "system", "starter.sh")
+
+
+def _starter_assignments():
+    with open(STARTER_PATH, encoding="utf-8") as f:
+        text = f.read()
+    return re.findall(r'^\s*(GAME_FILTER_\w+)="([^"$]*)"', text, re.MULTILINE)
+
+
+def test_starter_fallback_matches_compiler():
+    values = {}
+    for name, value in _starter_assignments():
+        values.setdefault(name, set()).add(value)
+    assert values["GAME_FILTER_TCP_PORTS"] == {config_compiler.GAMEFILTER_TCP_PORTS}
+    assert values["GAME_FILTER_UDP_PORTS"] == {config_compiler.GAMEFILTER_UDP_PORTS}
+    assert values["GAME_FILTER_TCP_VALUE"] == {config_compiler.GAMEFILTER_DISABLED_VALUE}
+    assert values["GAME_FILTER_UDP_VALUE"] == {config_compiler.GAMEFILTER_DISABLED_VALUE}
+
+
+def test_game_filter_values_by_state():
+    disabled = config_compiler.GAMEFILTER_DISABLED_VALUE
+    tcp = config_compiler.GAMEFILTER_TCP_PORTS
+    udp = config_compiler.GAMEFILTER_UDP_PORTS
+    assert config_compiler.game_filter_values("off") == (disabled, disabled)
+    assert config_compiler.game_filter_values("tcp") == (tcp, disabled)
+    assert config_compiler.game_filter_values("udp") == (disabled, udp)
+    assert config_compiler.game_filter_values("both") == (tcp, udp)
+
+
+def test_settings_use_compiler_values(tmp_path):
+    utils_dir = tmp_path / "utils"
+    utils_dir.mkdir()
+    assert game_filter_settings.game_filter_port_values(str(tmp_path)) == config_compiler.game_filter_values("off")
+    (utils_dir / "gamefilter.enable").write_text("")
+    game_filter_settings.write_game_filter_protocol_mode("udp", str(tmp_path))
+    assert game_filter_settings.game_filter_port_values(str(tmp_path)) == config_compiler.game_filter_values("udp")
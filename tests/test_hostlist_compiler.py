@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Нормализация hostlist-списков: покрытие доменов по суффиксу."""
+
+from core.hostlist_compiler import DomainTrie, compile_lines, find_conflicts, normalize_domain
+
+
+def test_normalize_domain():
+    assert normalize_domain("*.Example.COM.") == "example.com"
+    assert normalize_domain(".example.com") == "example.com"
+    assert normalize_domain("^WWW.example.com") == "^www.example.com"
+    assert normalize_domain("пример.рф") == "xn--e1afmkfd.xn--p1ai"
+    assert normalize_domain("bad domain") is None
+    assert normalize_domain("a..b") is None
+
+
+def test_trie_covers_subdomains_by_label():
+    trie = DomainTrie(["example.com"])
+    assert trie.covering("a.b.example.com") == "example.com"
+    assert trie.covering("example.com") == "example.com"
+    assert trie.covering("example.com", strict=True) is None
+    # Совпадение по меткам, а не по подстроке
+    assert trie.covering("badexample.com") is None
+
+
+def test_exact_entries_do_not_cover():
+    trie = DomainTrie(["^example.com"])
+    assert trie.covering("www.example.com") is None
+
+
+def test_compile_drops_duplicates_and_covered_subdomains():
+    lines = ["www.example.com", "Example.com", "example.com.", "# comment", "", "other.org", "cdn.other.org"]
+    result, stats = compile_lines(lines)
+    assert result == ["example.com", "other.org"]
+    assert stats == {"before": 5, "after": 2, "duplicates": 1, "covered": 2, "invalid": 0}
+
+
+def test_compile_exact_entry_kept_unless_domain_listed():
+    result, _stats = compile_lines(["^www.example.com", "^example.org", "example.org"])
+    assert result == ["^www.example.com", "example.org"]
+
+
+def test_compile_keeps_invalid_entries_last():
+    result, stats = compile_lines(["bad entry", "example.com", "bad entry"])
+    assert result == ["example.com", "bad entry"]
+    assert stats["invalid"] == 1
+
+
+def test_find_conflicts():
+    include = ["video.example.com", "example.org", "keep.net", "^exact.io"]
+    exclude = ["example.com", "^example.org", "exact.io"]
+    assert find_conflicts(include, exclude) == [
+        ("video.example.com", "example.com"),
+        ("example.org", "^example.org"),
+        ("^exact.io", "exact.io"),
+    ]
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Свёртка ipset-списков в минимальный набор CIDR."""
+
+import ipaddress
+
+from core.ipset_optimizer import optimize_bytes, optimize_lines, parse_entry
+
+
+def _addresses(lines):
+    networks = [net for line in lines for net in parse_entry(line)]
+    return {int(address) for net in networks for address in net}
+
+
+def test_adjacent_and_nested_networks_collapse():
+    result, stats = optimize_lines(["10.0.0.0/25", "10.0.0.128/25", "10.0.0.5", "10.0.0.0/26"])
+    assert result == ["10.0.0.0/24"]
+    assert stats["before"] == 4
+    assert stats["after"] == 1
+    assert stats["ipv4_after"] == 1
+
+
+def test_range_expands_to_covering_networks():
+    result, stats = optimize_lines(["192.168.1.10-192.168.1.13"])
+    assert result == ["192.168.1.10/31", "192.168.1.12/31"]
+    assert stats["ranges"] == 1
+
+
+def test_reversed_range_is_accepted():
+    assert parse_entry("10.0.0.3-10.0.0.0") == [ipaddress.ip_network("10.0.0.0/30")]
+
+
+def test_single_address_is_written_without_prefix():
+    result, _stats = optimize_lines(["1.2.3.4/32", "2001:db8::1"])
+    assert result == ["1.2.3.4", "2001:db8::1"]
+
+
+def test_ipv4_before_ipv6_and_invalid_kept_last():
+    lines = ["# comment", "", "2001:db8::/33", "not-an-ip", "2001:db8:8000::/33", "8.8.8.8", "not-an-ip"]
+    result, stats = optimize_lines(lines)
+    assert result == ["8.8.8.8", "2001:db8::/32", "not-an-ip"]
+    assert stats["invalid"] == 1
+    assert stats["ipv6_before"] == 2
+    assert stats["ipv6_after"] == 1
+
+
+def test_address_set_is_unchanged():
+    lines = ["10.1.0.0/16", "10.1.2.3", "10.2.0.0-10.2.0.255", "10.3.0.7/31", "10.3.0.6"]
+    result, _stats = optimize_lines(lines)
+    assert _addresses(result) == _addresses(lines)
+
+
+def test_mixed_family_range_is_invalid():
+    result, stats = optimize_lines(["10.0.0.1-2001:db8::1"])
+    assert result == ["10.0.0.1-2001:db8::1"]
+    assert stats["invalid"] == 1
+
+
+def test_optimize_bytes_terminates_lines():
+    data, _stats = optimize_bytes(b"10.0.0.0/25\r\n10.0.0.128/25\n")
+    assert data == b"10.0.0.0/24\n"
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Кеш наборов списков: объединение пар, повторное использование и очистка."""
+
+import pytest
+
+from core import list_cache
+from core.list_cache import ListCache, merge_unique
+
+
+@pytest.fixture
+def files_dir(tmp_path):
+    files = tmp_path / "files"
+    (files / "lists").mkdir(parents=True)
+    (files / "bin").mkdir()
+    (files / "lists" / "list-general.txt").write_text("youtube.com\ndiscord.com\n", encoding="utf-8")
+    (files / "lists" / "list-general_user.txt").write_text("example.org\nyoutube.com\n", encoding="utf-8")
+    (files / "lists" / "ipset-all.txt").write_text("10.0.0.0/25\n10.0.0.128/25\n", encoding="utf-8")
+    (files / "bin" / "quic_initial.bin").write_bytes(b"\x00\x01binary")
+    return files
+
+
+def test_merge_unique_keeps_order_and_strips_cr():
+    assert merge_unique([b"a\r\nb\n", b"b\nc"]) == b"a\nb\nc\n"
+
+
+def test_build_links_files_and_merges_pairs(tmp_path, files_dir):
+    set_dir, cached = ListCache(tmp_path / "cache").build(files_dir)
+    assert not cached
+    assert (set_dir / "quic_initial.bin").read_bytes() == b"\x00\x01binary"
+    merged = (set_dir / "list-general_merged.txt").read_text(encoding="utf-8").split()
+    assert sorted(merged) == ["discord.com", "example.org", "youtube.com"]
+    # Смежные /25 сворачиваются в один CIDR
+    assert (set_dir / "ipset-all_merged.txt").read_text(encoding="utf-8").split() == ["10.0.0.0/24"]
+    # Пара без файлов даёт пустой объединённый список
+    assert (set_dir / "list-exclude_merged.txt").read_bytes() == b""
+
+
+def test_same_files_reuse_the_set_without_merging(tmp_path, files_dir, monkeypatch):
+    cache = ListCache(tmp_path / "cache")
+    first, _ = cache.build(files_dir)
+
+    def fail(*_args):
+        raise AssertionError("объединение не должно выполняться повторно")
+
+    monkeypatch.setattr(list_cache, "merge_list", fail)
+    second, cached = cache.build(files_dir)
+    assert cached and second == first
+
+
+def test_changed_user_list_builds_a_new_set(tmp_path, files_dir):
+    cache = ListCache(tmp_path / "cache")
+    first, _ = cache.build(files_dir)
+    (files_dir / "lists" / "list-general_user.txt").write_text("new.example\n", encoding="utf-8")
+    second, cached = cache.build(files_dir)
+    assert not cached and second != first
+    assert "new.example" in (second / "list-general_merged.txt").read_text(encoding="utf-8")
+
+
+def test_prune_keeps_recent_sets_and_drops_orphan_objects(tmp_path, files_dir):
+    cache = ListCache(tmp_path / "cache")
+    user_list = files_dir / "lists" / "list-general_user.txt"
+    sets = []
+    for index in range(list_cache.KEEP_SETS + 2):
+        user_list.write_text(f"host{index}.example\n", encoding="utf-8")
+        sets.append(cache.build(files_dir)[0])
+
+    remaining = {path for path in cache.sets_dir.iterdir() if path.is_dir()}
+    assert len(remaining) == list_cache.KEEP_SETS
+    assert sets[-1] in remaining and sets[0] not in remaining
+    referenced = {item.stat().st_ino for path in remaining for item in path.iterdir()}
+    assert all(obj.stat().st_ino in referenced for obj in cache.objects_dir.iterdir())
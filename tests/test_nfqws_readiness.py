@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Ожидание готовности nfqws: правила файрвола проверяются один раз."""
+
+import pytest
+
+from core import nfqws_readiness
+
+
+@pytest.fixture
+def readiness(monkeypatch):
+    """Процесс появляется на втором опросе, очередь привязывается на третьем"""
+    polls = {"running": 0, "bound": 0}
+
+    def running():
+        polls["running"] += 1
+        return polls["running"] >= 2
+
+    def bound(_qnum):
+        polls["bound"] += 1
+        return polls["bound"] >= 2
+
+    monkeypatch.setattr(nfqws_readiness, "nfqws_running", running)
+    monkeypatch.setattr(nfqws_readiness, "queue_bound", bound)
+    monkeypatch.setattr(nfqws_readiness, "read_fwtype", lambda: "nftables")
+    monkeypatch.setattr(nfqws_readiness, "POLL_INTERVAL", 0)
+    return polls
+
+
+def _runner(output, calls):
+    def run_command(command, use_sudo=False, timeout=10):
+        calls.append((command, use_sudo))
+        return True, output
+    return run_command
+
+
+def test_rules_checked_once_after_queue_is_bound(readiness):
+    calls = []
+    ready, details, _waited = nfqws_readiness.wait_until_ready(
+        _runner("tcp dport @tcp_ports queue num 200 bypass", calls), qnum=200)
+    assert ready, details
+    assert calls == [("nft list table inet zapret", True)]
+    assert readiness == {"running": 3, "bound": 2}
+
+
+def test_missing_rules_fail_without_polling_sudo(readiness):
+    calls = []
+    ready, details, _waited = nfqws_readiness.wait_until_ready(_runner("", calls), qnum=200, timeout=5)
+    assert not ready
+    assert "нет правил" in details
+    assert len(calls) == 1
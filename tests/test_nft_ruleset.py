@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Правила nftables службы: таблица с наборами портов и замена только наборов."""
+
+from core import firewall_rules
+from core.firewall_rules import NFT_TABLE, nft_ruleset_script, nft_set_update_script, parse_queues
+
+
+def _set_block(script, name):
+    start = script.index(f"set {name} {{")
+    return script[start:script.index("}", script.index("flags interval;", start)) + 1]
+
+
+def test_ruleset_recreates_table_in_one_script():
+    lines = nft_ruleset_script("80,443", "443").splitlines()
+    assert lines[:3] == [f"add table inet {NFT_TABLE}", f"delete table inet {NFT_TABLE}",
+                         f"table inet {NFT_TABLE} {{"]
+    assert lines[-1] == "}"
+
+
+def test_overlapping_ports_are_merged_into_intervals():
+    script = nft_ruleset_script("443,80,1000-2000,1500-2500,2501", "")
+    assert "elements = { 80, 443, 1000-2501 }" in _set_block(script, "tcp_ports")
+    # Пустой набор объявляется без elements, правило на него остаётся
+    assert "elements" not in _set_block(script, "udp_ports")
+    assert "udp dport @udp_ports" in script
+
+
+def test_rules_match_sets_and_queues():
+    script = nft_ruleset_script("443", "443", tcp_queues=(200, 201), udp_queues=(202, 202))
+    assert "tcp dport @tcp_ports ct original packets 1-12 queue num 200-201 bypass" in script
+    assert "udp dport @udp_ports ct original packets 1-12 queue num 202 bypass" in script
+    assert "tcp sport @tcp_ports ct reply packets 1-6 queue num 200-201 bypass" in script
+
+
+def test_set_update_replaces_only_set_contents():
+    assert nft_set_update_script("80,443", "").splitlines() == [
+        f"flush set inet {NFT_TABLE} tcp_ports",
+        f"add element inet {NFT_TABLE} tcp_ports {{ 80, 443 }}",
+        f"flush set inet {NFT_TABLE} udp_ports",
+    ]
+
+
+def test_parse_queues():
+    assert parse_queues("") == (firewall_rules.DEFAULT_QNUM, firewall_rules.DEFAULT_QNUM)
+    assert parse_queues("200-203") == (200, 203)
+    assert parse_queues("200:201") == (200, 201)
+    assert parse_queues("205", default=1) == (205, 205)
+
+
+def test_cli_prints_sets_only_script(capsys):
+    assert firewall_rules.main(["--tcp-ports", "443", "--udp-ports", "50000-50100", "--sets-only"]) == 0
+    assert capsys.readouterr().out == nft_set_update_script("443", "50000-50100")
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Типизированные операции помощника: действия службы и проверка payload файрвола."""
+
+import pytest
+
+from core.firewall_rules import iptables_remove_payload, iptables_restore_payload, nft_ruleset_script, nft_set_update_script
+from core.privileged import _helper_request
+from core.privileged_helper import RequestDenied, prepare_request, validate_firewall_payload
+from core.strategy_lanes import build_lanes, nft_lane_script
+
+
+@pytest.mark.parametrize("action", ["reset-failed", "reload-or-restart"])
+def test_service_manager_actions_go_through_helper(action):
+    for request in (_helper_request({"op": "systemctl", "action": action}),
+                    _helper_request({"op": "exec", "argv": ["systemctl", action, "zapret"]})):
+        assert (request["op"], request["action"]) == ("service", action)
+        prepare_request(request)
+
+
+def test_unknown_service_action_is_denied():
+    with pytest.raises(RequestDenied):
+        prepare_request({"op": "service", "action": "mask"})
+
+
+@pytest.mark.parametrize("family, payload", [
+    ("nft", nft_ruleset_script("80,443,1024-65535", "443,50000-50100", (200, 201), (202, 202))),
+    ("nft", nft_set_update_script("80,443", "443")),
+    ("nft", nft_lane_script(build_lanes(3))),
+    ("iptables", iptables_restore_payload("80,443", "443", ["wlan0"])),
+    ("ip6tables", iptables_remove_payload("\n".join([
+        "*mangle",
+        ":ZAPRET_POST - [0:0]",
+        "-A POSTROUTING -j ZAPRET_POST",
+        "-A POSTROUTING -p tcp -m connbytes --connbytes 1:6 -j NFQUEUE --queue-num 200 --queue-bypass",
+        "COMMIT",
+    ]))),
+])
+def test_generated_payloads_pass_validation(family, payload):
+    validate_firewall_payload(family, payload)
+
+
+@pytest.mark.parametrize("family, payload", [
+    ("nft", 'include "/etc/shadow"'),
+    ("nft", "define ports = { 22 }\ntable inet zapret {\n}"),
+    ("nft", "flush ruleset"),
+    ("nft", "table inet filter {\n}"),
+    ("nft", "add table inet zapret; flush ruleset"),
+    ("nft", "table inet zapret {\n} table inet filter {\n}"),
+    ("nft", "table inet zapret {"),
+    ("iptables", "*filter\n-A INPUT -j DROP\nCOMMIT"),
+    ("iptables", "*mangle\n-A INPUT -j DROP\nCOMMIT"),
+    ("iptables", "*mangle\n-A PREROUTING -j DROP\nCOMMIT"),
+    ("iptables", "*mangle\n-F PREROUTING\nCOMMIT"),
+    ("iptables", "-A ZAPRET_PRE -j NFQUEUE"),
+    ("arptables", "*mangle\nCOMMIT"),
+])
+def test_foreign_payloads_are_denied(family, payload):
+    with pytest.raises(RequestDenied):
+        prepare_request({"op": "firewall_apply", "family": family, "payload": payload})
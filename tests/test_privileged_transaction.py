@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""Транзакции помощника: проверка до выполнения и откат в обратном порядке."""
+
+import json
+import subprocess
+
+import pytest
+
+from core import privileged
+from core.privileged_helper import RequestDenied, prepare_request, run_batch, run_transaction
+
+
+class FakeRunner:
+    """prepare для run_transaction: запрос {"op": "fake", "name", "rc"} пишется в журнал при выполнении"""
+
+    def __init__(self):
+        self.log = []
+        self.prepared = []
+
+    def __call__(self, request):
+        if request.get("op") != "fake":
+            raise RequestDenied("неизвестная операция")
+        self.prepared.append(request["name"])
+
+        def execute():
+            self.log.append(request["name"])
+            return {"ok": True, "returncode": request.get("rc", 0), "stdout": "", "stderr": request.get("err", "")}
+        return execute
+
+
+def _step(name, rc=0, rollback=(), **extra):
+    step = {"op": "fake", "name": name, "rc": rc, "description": name, **extra}
+    if rollback:
+        step["rollback"] = [{"op": "fake", "name": undo} for undo in rollback]
+    return step
+
+
+def test_all_steps_succeed_without_rollback():
+    runner = FakeRunner()
+    result = run_transaction([_step("a", rollback=["undo-a"]), _step("b")], runner)
+    assert runner.log == ["a", "b"]
+    assert result["returncode"] == 0
+    assert result["failed_step"] is None
+    assert result["rolled_back"] == []
+    assert [step["description"] for step in result["steps"]] == ["a", "b"]
+
+
+def test_failure_rolls_back_completed_steps_in_reverse():
+    runner = FakeRunner()
+    steps = [
+        _step("a", rollback=["undo-a1", "undo-a2"]),
+        _step("b"),
+        _step("c", rollback=["undo-c"]),
+        _step("d", rc=3, err="boom", rollback=["undo-d"]),
+        _step("e"),
+    ]
+    result = run_transaction(steps, runner)
+    assert runner.log == ["a", "b", "c", "d", "undo-c", "undo-a1", "undo-a2"]
+    assert result["failed_step"] == 3
+    assert result["rolled_back"] == [2, 0]
+    assert result["returncode"] == 3
+    assert result["stderr"] == "boom"
+
+
+def test_unchecked_failure_does_not_abort():
+    runner = FakeRunner()
+    result = run_transaction([_step("a", rollback=["undo-a"]), _step("b", rc=1, check=False), _step("c")], runner)
+    assert runner.log == ["a", "b", "c"]
+    assert result["failed_step"] is None
+    assert result["returncode"] == 0
+
+
+def test_failed_unchecked_step_is_not_rolled_back():
+    runner = FakeRunner()
+    steps = [_step("a", rc=1, check=False, rollback=["undo-a"]), _step("b", rc=2)]
+    result = run_transaction(steps, runner)
+    assert runner.log == ["a", "b"]
+    assert result["rolled_back"] == []
+
+
+def test_invalid_rollback_rejects_before_first_step():
+    runner = FakeRunner()
+    steps = [_step("a"), {"op": "fake", "name": "b", "rollback": [{"op": "exec", "argv": ["id"]}]}]
+    with pytest.raises(RequestDenied):
+        run_transaction(steps, runner)
+    assert runner.log == []
+
+
+def test_nested_and_empty_transactions_are_denied():
+    runner = FakeRunner()
+    with pytest.raises(RequestDenied):
+        run_transaction([], runner)
+    with pytest.raises(RequestDenied):
+        run_transaction([{"op": "transaction", "steps": [_step("a")]}], runner)
+
+
+def test_helper_denies_generic_exec_in_transaction():
+    steps = [{"op": "service", "action": "stop"}, {"op": "exec", "argv": ["/bin/sh", "-c", "id"]}]
+    with pytest.raises(RequestDenied):
+        prepare_request({"op": "transaction", "steps": steps})
+
+
+def test_uninstaller_transaction_runs_in_one_sudo_call(monkeypatch):
+    """Шаги вне набора помощника (rm, disable, daemon-reload) идут одним пакетом --transaction"""
+    from core.zapret_uninstaller import ZapretUninstaller
+
+    calls = []
+
+    def fake_run(argv, input=None, **_kwargs):
+        calls.append((argv, input))
+        batch = json.loads(input.splitlines()[-1])
+        steps = [{"description": step["description"], "returncode": 0, "stdout": "", "stderr": "",
+                  "duration": 0.0} for step in batch["steps"]]
+        response = {"ok": True, "returncode": 0, "stdout": "", "stderr": "", "steps": steps,
+                    "failed_step": None, "rolled_back": []}
+        return subprocess.CompletedProcess(argv, 0, json.dumps(response), "")
+
+    monkeypatch.setattr(privileged, "_via_helper", lambda *_args, **_kwargs: None)
+    monkeypatch.setattr(privileged.subprocess, "run", fake_run)
+    uninstaller = ZapretUninstaller()
+    uninstaller.sudo_password = "secret"
+    uninstaller.remove_zapret_service()
+
+    assert len(calls) == 1
+    argv, stdin_text = calls[0]
+    assert argv[:3] == ["sudo", "-S", "-p"]
+    assert argv[-2:] == [privileged.BATCH_HELPER_PATH, "--transaction"]
+    password, request = stdin_text.splitlines()
+    assert password == "secret"
+    batch = json.loads(request)["steps"]
+    assert [step["argv"][:2] for step in batch] == [
+        ["systemctl", "stop"], ["systemctl", "disable"], ["rm", "-f"], ["rm", "-f"],
+        ["systemctl", "daemon-reload"], ["rm", "-rf"],
+    ]
+    assert all(step["op"] == "exec" and step["check"] is False for step in batch)
+
+
+def test_batch_runs_programs_and_rolls_back(tmp_path):
+    marker = tmp_path / "undone"
+    steps = [
+        {"op": "exec", "argv": ["true"], "description": "a",
+         "rollback": [{"op": "exec", "argv": ["touch", str(marker)]}]},
+        {"op": "exec", "argv": ["false"], "description": "b"},
+        {"op": "exec", "argv": ["true"], "description": "c"},
+    ]
+    # Первая строка — пароль, который sudo -S с закэшированными правами не прочитал
+    result = run_batch("secret\n" + json.dumps({"steps": steps}) + "\n")
+    assert result["ok"]
+    assert result["failed_step"] == 1
+    assert result["rolled_back"] == [0]
+    assert [step["description"] for step in result["steps"]] == ["a", "b"]
+    assert marker.exists()
+
+
+def test_batch_accepts_only_exec_steps():
+    result = run_batch(json.dumps({"steps": [{"op": "service", "action": "stop"}]}))
+    assert not result["ok"]
+    assert not run_batch("not json")["ok"]
+
+
+def test_batch_failure_is_reported_as_failed_step(monkeypatch):
+    monkeypatch.setattr(privileged, "_via_helper", lambda *_args, **_kwargs: None)
+    monkeypatch.setattr(privileged.subprocess, "run",
+                        lambda argv, **_kwargs: subprocess.CompletedProcess(argv, 1, "", "Sorry, try again."))
+    result = privileged.run_privileged_transaction([privileged.exec_step(["true"], "a")], "wrong")
+    assert result["failed_step"] == 0
+    assert result["steps"][0]["stderr"] == "Sorry, try again."
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""ProbeScheduler: порядок результатов, лимиты на хост и отмена при остановке."""
+
+import asyncio
+from contextlib import aclosing
+
+from core.probe_engine import ProbeScheduler, fair_launch_order, target_host
+
+
+def _target(name, host, delay):
+    return {"name": name, "url": f"https://{host}/", "delay": delay}
+
+
+async def _collect(scheduler, targets, probe, **kwargs):
+    async with aclosing(scheduler.run_as_completed(targets, probe, **kwargs)) as results:
+        return [(target["name"], result) async for target, result in results]
+
+
+def test_results_stream_in_completion_order():
+    targets = [_target("slow", "a", 0.15), _target("fast", "b", 0.01), _target("mid", "c", 0.07)]
+
+    async def probe(target):
+        await asyncio.sleep(target["delay"])
+        return target["name"].upper()
+
+    results = asyncio.run(_collect(ProbeScheduler(max_concurrency=3), targets, probe, poll_interval=0.01))
+    assert results == [("fast", "FAST"), ("mid", "MID"), ("slow", "SLOW")]
+
+
+def test_concurrency_and_per_host_limits():
+    targets = [_target(f"t{i}", "same" if i < 4 else f"h{i}", 0.02) for i in range(8)]
+    running = {"total": 0, "same": 0, "max_total": 0, "max_same": 0}
+
+    async def probe(target):
+        same = "same" in target["url"]
+        running["total"] += 1
+        running["same"] += same
+        running["max_total"] = max(running["max_total"], running["total"])
+        running["max_same"] = max(running["max_same"], running["same"])
+        await asyncio.sleep(target["delay"])
+        running["total"] -= 1
+        running["same"] -= same
+        return True
+
+    scheduler = ProbeScheduler(max_concurrency=3, per_host_limit=2)
+    results = asyncio.run(_collect(scheduler, targets, probe, poll_interval=0.01))
+    assert len(results) == 8
+    assert running["max_total"] <= 3
+    assert running["max_same"] <= 2
+
+
+def test_stop_cancels_in_flight_probes_without_waiting_for_them():
+    stop = {"requested": False}
+    cancelled = []
+    targets = [_target("quick", "a", 0.01)] + [_target(f"hang{i}", f"h{i}", 30) for i in range(3)]
+
+    async def probe(target):
+        try:
+            await asyncio.sleep(target["delay"])
+        except asyncio.CancelledError:
+            cancelled.append(target["name"])
+            raise
+        stop["requested"] = True
+        return target["name"]
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        scheduler = ProbeScheduler(max_concurrency=4, stop_check=lambda: stop["requested"])
+        results = await _collect(scheduler, targets, probe, poll_interval=0.02)
+        return results, loop.time() - started
+
+    results, elapsed = asyncio.run(run())
+    assert results == [("quick", "quick")]
+    assert sorted(cancelled) == ["hang0", "hang1", "hang2"]
+    assert elapsed < 1
+
+
+def test_queued_probes_do_not_start_after_stop():
+    stop = {"requested": False}
+    started = []
+    targets = [_target(f"t{i}", f"h{i}", 0.02) for i in range(5)]
+
+    async def probe(target):
+        started.append(target["name"])
+        await asyncio.sleep(target["delay"])
+        stop["requested"] = True
+        return target["name"]
+
+    scheduler = ProbeScheduler(max_concurrency=1, stop_check=lambda: stop["requested"])
+    results = asyncio.run(_collect(scheduler, targets, probe, poll_interval=0.01))
+    assert started == ["t0"]
+    assert results == [("t0", "t0")]
+
+
+def test_closing_consumer_early_cancels_the_rest():
+    cancelled = []
+    targets = [_target("first", "a", 0.01), _target("second", "b", 30)]
+
+    async def probe(target):
+        try:
+            await asyncio.sleep(target["delay"])
+        except asyncio.CancelledError:
+            cancelled.append(target["name"])
+            raise
+        return target["name"]
+
+    async def run():
+        async with aclosing(ProbeScheduler().run_as_completed(targets, probe, poll_interval=0.01)) as results:
+            async for target, _result in results:
+                return target["name"]
+
+    assert asyncio.run(run()) == "first"
+    assert cancelled == ["second"]
+
+
+def test_fair_launch_order_round_robins_hosts():
+    targets = [_target("a1", "a", 0), _target("a2", "a", 0), _target("a3", "a", 0),
+               _target("b1", "b", 0), {"name": "ping", "ping_target": "1.1.1.1"}]
+    assert fair_launch_order(targets) == [0, 3, 4, 1, 2]
+
+
+async def _collect_ordered(scheduler, targets, probe):
+    async with aclosing(scheduler.run_ordered(targets, probe)) as results:
+        return [(target["name"], result) async for target, result in results]
+
+
+def test_run_ordered_keeps_target_order_while_probing_concurrently():
+    targets = [_target("slow", "a", 0.2), _target("fast", "b", 0.01), _target("mid", "c", 0.1)]
+    finished = []
+
+    async def probe(target):
+        await asyncio.sleep(target["delay"])
+        finished.append(target["name"])
+        return target["name"].upper()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await _collect_ordered(ProbeScheduler(max_concurrency=3), targets, probe)
+        return results, loop.time() - started
+
+    results, elapsed = asyncio.run(run())
+    assert results == [("slow", "SLOW"), ("fast", "FAST"), ("mid", "MID")]
+    assert finished == ["fast", "mid", "slow"]
+    # Параллельно: примерно время самой долгой проверки, а не сумма
+    assert elapsed < 0.28
+
+
+def test_run_ordered_per_host_limit_leaves_slots_for_other_hosts():
+    targets = [_target(f"yt{i}", "youtube.com", 0.03) for i in range(6)] + [_target("discord", "discord.com", 0.03)]
+    running = {"youtube": 0, "max_youtube": 0}
+    started = []
+
+    async def probe(target):
+        youtube = "youtube" in target["url"]
+        started.append(target["name"])
+        running["youtube"] += youtube
+        running["max_youtube"] = max(running["max_youtube"], running["youtube"])
+        await asyncio.sleep(target["delay"])
+        running["youtube"] -= youtube
+        return True
+
+    results = asyncio.run(_collect_ordered(ProbeScheduler(max_concurrency=4, per_host_limit=2), targets, probe))
+    assert [name for name, _result in results] == [target["name"] for target in targets]
+    assert running["max_youtube"] == 2
+    # Discord стартует в первой волне, не дожидаясь шести целей YouTube
+    assert started.index("discord") < 3
+
+
+def test_run_ordered_stop_yields_finished_prefix_only():
+    stop = {"requested": False}
+    targets = [_target("first", "a", 0.01), _target("hang", "b", 30), _target("third", "c", 0.01)]
+
+    async def probe(target):
+        await asyncio.sleep(target["delay"])
+        if target["name"] == "first":
+            stop["requested"] = True
+        return target["name"]
+
+    scheduler = ProbeScheduler(max_concurrency=3, stop_check=lambda: stop["requested"])
+    assert asyncio.run(_collect_ordered(scheduler, targets, probe)) == [("first", "first")]
+
+
+def test_target_host_prefers_ping_target_then_url():
+    assert target_host({"name": "P", "ping_target": "1.1.1.1", "url": "https://x.com/"}) == "1.1.1.1"
+    assert target_host({"name": "U", "url": "https://WWW.YouTube.com/watch"}) == "www.youtube.com"
+    assert target_host({"name": "Only"}) == "only"
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Потоковый отчёт: карточки пишутся сразу, порядок разделов задаётся при finalize."""
+
+import csv
+import json
+import re
+
+import pytest
+
+from core.report_writer import SUMMARY_ORDER, StreamingReportWriter
+
+HEAD = "<html><body>\n    <div class=\"report\">\n"
+
+
+def _result(name, rate, **extra):
+    return dict({"strategy": name, "mode": "standard", "success_rate": rate, "successful": 1,
+                 "total_targets": 2, "target_results": [{"target_name": "YouTubeWeb", "success": True}]},
+                **extra)
+
+
+@pytest.fixture
+def writer(tmp_path):
+    return StreamingReportWriter(tmp_path / "reports" / "report.html", HEAD)
+
+
+def test_cards_and_sidecars_are_written_immediately(writer):
+    card_id = writer.add_card(_result("s1", 50.0), "<p>s1</p>", "partial")
+    assert card_id == "card-1"
+    assert len(writer) == 1
+    html = writer.html_path.read_text(encoding="utf-8")
+    assert html.startswith(HEAD) and '<div class="report-card-slot" id="card-1"><p>s1</p></div>' in html
+
+    record = json.loads(writer.jsonl_path.read_text(encoding="utf-8"))
+    assert record["strategy"] == "s1" and record["category"] == "partial"
+    assert record["targets"][0]["target_name"] == "YouTubeWeb"
+    with open(writer.csv_path, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["strategy"], row["category"]) for row in rows] == [("s1", "partial")]
+
+
+def test_finalize_orders_sections_and_cards(writer):
+    bad = writer.add_card(_result("bad", 10.0), "<p>bad</p>", "non_working")
+    good = writer.add_card(_result("good", 90.0), "<p>good</p>", "working")
+    writer.finalize("<p>summary</p>", [
+        ("<h2>Рабочие</h2>", [good]),
+        ("<h2>Частично</h2>", []),
+        ("<h2>Нерабочие</h2>", [bad]),
+        ("<h2>Легенда</h2>", None),
+    ], "<p>footer</p>")
+
+    html = writer.html_path.read_text(encoding="utf-8")
+    assert f'style="order: {SUMMARY_ORDER};"><p>summary</p>' in html
+    sections = re.findall(r'class="report-section" style="order: (\d+);">(.*?)</div>', html)
+    assert sections == [("1", "<h2>Рабочие</h2>"), ("3", "<h2>Нерабочие</h2>"), ("5", "<h2>Легенда</h2>")]
+    assert f"#{good} {{ order: 2; }}" in html
+    assert f"#{bad} {{ order: 4; }}" in html
+    assert html.endswith("</html>\n")
+
+
+def test_finalize_is_idempotent(writer):
+    writer.add_card(_result("s1", 50.0), "<p>s1</p>", "partial")
+    writer.finalize("<p>summary</p>", [], "<p>footer</p>")
+    size = writer.html_path.stat().st_size
+    writer.finalize("<p>summary</p>", [], "<p>footer</p>")
+    assert writer.html_path.stat().st_size == size
+
+
+def test_discard_removes_all_files(writer):
+    writer.discard()
+    assert not any(path.exists() for path in (writer.html_path, writer.jsonl_path, writer.csv_path))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Порядок тестирования стратегий по прошлым успехам."""
+
+from core.strategy_ranking import rank_strategies, strategy_score
+
+STRATEGIES = ["alpha", "beta", "gamma"]
+HASHES = {name: f"hash-{name}" for name in STRATEGIES}
+
+
+def _names(ranked):
+    return [name for name, _score in ranked]
+
+
+def test_without_history_order_is_unchanged():
+    assert _names(rank_strategies(STRATEGIES, HASHES, {})) == STRATEGIES
+
+
+def test_past_winner_moves_first():
+    stats = {
+        "hash-alpha": {"tests": 4, "wins": 0},
+        "hash-beta": {"tests": 4, "wins": 1},
+        "hash-gamma": {"tests": 4, "wins": 4},
+    }
+    assert _names(rank_strategies(STRATEGIES, HASHES, stats)) == ["gamma", "beta", "alpha"]
+
+
+def test_untested_strategy_beats_repeated_loser():
+    stats = {"hash-alpha": {"tests": 6, "wins": 0}, "hash-beta": {"tests": 6, "wins": 0}}
+    assert _names(rank_strategies(STRATEGIES, HASHES, stats))[0] == "gamma"
+
+
+def test_other_networks_shift_the_estimate():
+    here = {"tests": 4, "wins": 2}
+    good_elsewhere = dict(here, other_tests=8, other_wins=8)
+    bad_elsewhere = dict(here, other_tests=8, other_wins=0)
+    scores = [strategy_score(entry, total_tests=10) for entry in (bad_elsewhere, here, good_elsewhere)]
+    assert scores == sorted(scores) and len(set(scores)) == 3
+
+
+def test_other_networks_weigh_less_than_this_one():
+    # Один и тот же результат 4/4 здесь весит больше, чем в другой сети
+    local = strategy_score({"tests": 4, "wins": 4, "other_tests": 4, "other_wins": 0}, total_tests=10)
+    remote = strategy_score({"tests": 4, "wins": 0, "other_tests": 4, "other_wins": 4}, total_tests=10)
+    assert local > remote
+
+
+def test_unknown_hash_is_treated_as_untested():
+    ranked = rank_strategies(["new"], {}, {"hash-alpha": {"tests": 3, "wins": 3}})
+    assert ranked == [("new", strategy_score({}, total_tests=3))]
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""База результатов стратегий: свежесть, последние результаты и сводка по сетям."""
+
+import time
+
+import pytest
+
+from core import strategy_results_db
+from core.strategy_results_db import StrategyResultsDB, network_fingerprint, strategy_hash
+
+
+@pytest.fixture
+def db(tmp_path):
+    return StrategyResultsDB(tmp_path / "utils" / "results.sqlite3")
+
+
+def _result(name, rate, mode="standard"):
+    return {"strategy": name, "mode": mode, "success_rate": rate,
+            "target_results": [{"target_name": "YouTubeWeb", "success": rate > 0, "http_code": 200}]}
+
+
+def test_strategy_hash_ignores_surrounding_whitespace(tmp_path):
+    first, second = tmp_path / "a.txt", tmp_path / "b.txt"
+    first.write_text("--filter-tcp=443\n--dpi-desync=fake\n", encoding="utf-8")
+    second.write_text("  --filter-tcp=443  \n\n--dpi-desync=fake", encoding="utf-8")
+    assert strategy_hash(first) == strategy_hash(second)
+
+
+def test_fresh_result_matches_hash_mode_and_network(db):
+    db.record_result(_result("s1", 80), "h1", "net", working=True)
+    fresh = db.fresh_result("h1", "standard", "net")
+    assert fresh["strategy"] == "s1"
+    assert fresh["target_results"][0]["target_name"] == "YouTubeWeb"
+    assert db.fresh_result("h1", "dpi", "net") is None
+    assert db.fresh_result("h1", "standard", "other") is None
+    assert db.fresh_result("h2", "standard", "net") is None
+
+
+def test_stale_result_is_not_fresh(db, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(strategy_results_db.time, "time", lambda: now - 10 * 24 * 3600)
+    db.record_result(_result("s1", 80), "h1", "net", working=True)
+    monkeypatch.setattr(strategy_results_db.time, "time", lambda: now)
+    assert db.fresh_result("h1", "standard", "net") is None
+
+
+def test_latest_results_keep_newest_per_strategy_and_filter_mode(db, monkeypatch):
+    clock = iter([100.0, 200.0, 300.0])
+    monkeypatch.setattr(strategy_results_db.time, "time", lambda: next(clock))
+    db.record_result(_result("s1", 20), "h1", "net", working=False)
+    db.record_result(_result("s1", 90), "h1", "net", working=True)
+    db.record_result(_result("s2", 75, mode="dpi"), "h2", "net", working=True)
+
+    latest = db.latest_results("net")
+    assert latest["s1"]["success_rate"] == 90 and latest["s1"]["working"]
+    assert set(db.latest_results("net", mode="standard")) == {"s1"}
+    assert db.latest_results("other") == {}
+
+
+def test_strategy_stats_split_current_and_other_networks(db):
+    db.record_result(_result("s1", 90), "h1", "home", working=True)
+    db.record_result(_result("s1", 10), "h1", "home", working=False)
+    db.record_result(_result("s1", 90), "h1", "work", working=True)
+    db.record_result(_result("s1", 90), "h1", "home", working=True)
+    db.record_result(_result("s1", 90, mode="dpi"), "h1", "home", working=True)
+
+    assert db.strategy_stats("home", "standard") == {
+        "h1": {"tests": 3, "wins": 2, "other_tests": 1, "other_wins": 1},
+    }
+
+
+def test_network_fingerprint_depends_on_gateway_mac_and_dns(tmp_path, monkeypatch):
+    route = tmp_path / "route"
+    arp = tmp_path / "arp"
+    resolv = tmp_path / "resolv.conf"
+    route.write_text("Iface\tDestination\tGateway\n"
+                     "wlan0\t00000000\t0100A8C0\n", encoding="utf-8")
+    arp.write_text("IP address HW type Flags HW address Mask Device\n"
+                   "192.168.0.1 0x1 0x2 AA:BB:CC:DD:EE:FF * wlan0\n", encoding="utf-8")
+    resolv.write_text("nameserver 8.8.8.8\nnameserver 1.1.1.1\n", encoding="utf-8")
+    monkeypatch.setattr(strategy_results_db, "ROUTE_PROC_PATH", route)
+    monkeypatch.setattr(strategy_results_db, "ARP_PROC_PATH", arp)
+    monkeypatch.setattr(strategy_results_db, "RESOLV_CONF_PATH", resolv)
+
+    digest, details = network_fingerprint()
+    assert details == {"gateway": "192.168.0.1", "gateway_mac": "aa:bb:cc:dd:ee:ff",
+                       "dns": ["1.1.1.1", "8.8.8.8"]}
+
+    # Другой роутер с тем же адресом — другая сеть
+    arp.write_text("IP address HW type Flags HW address Mask Device\n"
+                   "192.168.0.1 0x1 0x2 11:22:33:44:55:66 * wlan0\n", encoding="utf-8")
+    assert network_fingerprint()[0] != digest
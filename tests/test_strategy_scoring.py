@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Досрочное отсечение стратегий и процент успеха отсечённой стратегии."""
+
+from core.strategy_scoring import EarlyAbortScorer
+from core.strategy_tester import StrategyTester
+
+CRITICAL = ["YouTubeWeb", "YouTubeVideoRedirect", "DiscordMain", "DiscordGateway"]
+TARGETS = [{"name": name} for name in ["Extra1"] + CRITICAL + ["Extra2", "Extra3", "Extra4", "Extra5", "Extra6"]]
+
+
+def _result(name, success):
+    return {"target_name": name, "success": success}
+
+
+def test_critical_targets_are_probed_first():
+    scorer = EarlyAbortScorer("standard", TARGETS, {})
+    assert [target["name"] for target in scorer.probe_order(TARGETS)][:4] == CRITICAL
+
+
+def test_one_failed_service_keeps_probing_the_other():
+    scorer = EarlyAbortScorer("standard", TARGETS, {})
+    assert scorer.add(_result("YouTubeWeb", False)) is None
+    # Discord ещё может пройти: результат попадёт в частично рабочие
+    assert scorer.add(_result("YouTubeVideoRedirect", True)) is None
+    assert scorer.add(_result("DiscordMain", True)) is None
+    assert scorer.add(_result("DiscordGateway", True)) is None
+    assert scorer.failed_services == {"YouTube": "YouTubeWeb"}
+
+
+def test_prunes_when_both_services_failed():
+    scorer = EarlyAbortScorer("standard", TARGETS, {})
+    assert scorer.add(_result("YouTubeWeb", False)) is None
+    assert scorer.add(_result("YouTubeVideoRedirect", True)) is None
+    reason = scorer.add(_result("DiscordMain", False))
+    assert reason and "YouTube и Discord" in reason
+
+
+def test_single_service_mode_prunes_on_its_failure():
+    scorer = EarlyAbortScorer("YouTube/Discord", TARGETS, {"youtube": ["YouTubeWeb"], "discord": []})
+    reason = scorer.add(_result("YouTubeWeb", False))
+    assert reason and reason.startswith("YouTube не работает")
+
+
+def test_prunes_when_rate_threshold_is_unreachable():
+    targets = [{"name": f"T{index}"} for index in range(10)]
+    scorer = EarlyAbortScorer("dpi", targets, {})
+    assert [scorer.add(_result(f"T{index}", False)) for index in range(3)] == [None, None, None]
+    assert scorer.add(_result("T3", False))
+
+
+def test_pruned_success_rate_counts_all_targets(tmp_path):
+    (tmp_path / "utils").mkdir()
+    tester = StrategyTester(str(tmp_path))
+    target_results = [_result("YouTubeWeb", True), _result("YouTubeVideoRedirect", False),
+                      _result("DiscordMain", False)]
+    result = tester._evaluate_strategy("s", "standard", TARGETS, {"youtube": [], "discord": []}, target_results,
+                                       successful=1, failed=2, blocked=0,
+                                       pruned_reason="YouTube и Discord не работают")
+    assert result["success_rate"] == 10
+    assert result["pruned"]
+    assert not StrategyTester._is_working_result(result, "standard")
+    assert tester._classify_report_result(result) == "non_working"
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""StrategyTester: запуск службы между стратегиями."""
+
+import inspect
+
+import pytest
+
+from core import strategy_tester
+from core.strategy_tester import StrategyTester
+
+
+@pytest.fixture
+def tester(tmp_path):
+    (tmp_path / "utils").mkdir()
+    tester = StrategyTester(str(tmp_path))
+    tester.commands = []
+
+    def run_command(command, use_sudo=False, timeout=10):
+        tester.commands.append((command, use_sudo))
+        return True, ""
+
+    tester._run_command = run_command
+    return tester
+
+
+def test_start_service_resets_start_limit_first(tester):
+    assert tester._start_service() == (True, "")
+    assert tester.commands == [
+        ("systemctl reset-failed zapret", True),
+        ("systemctl start zapret", True),
+    ]
+
+
+def test_service_is_started_only_through_start_service():
+    # Прямой «systemctl start zapret» мимо _start_service упрётся в StartLimitBurst
+    source = inspect.getsource(strategy_tester)
+    assert source.count('"systemctl start zapret"') == 1
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Бюджет импорта при запуске менеджера (python -X importtime).
+
+Запускает чистый интерпретатор с `import ui.windows.main_window` (то, что
+main.py импортирует до показа окна), разбирает вывод -X importtime и
+сравнивает с tools/import_budget.json:
+
+  forbidden            — модули, которые не должны загружаться при запуске
+                         (окна и core-модули за ними открываются через
+                         ui/windows/window_registry.py);
+  max_project_modules  — число модулей core.* / ui.* при запуске;
+  max_total_modules    — общее число импортированных модулей (с запасом);
+  max_cumulative_ms    — время импорта точки входа (минимум из --runs запусков).
+
+Код выхода 1, если бюджет превышен. --update записывает текущие значения
+(с запасом по времени) в файл бюджета.
+
+    python3 tools/import_budget.py
+    python3 tools/import_budget.py --update
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BUDGET_FILE = Path(__file__).with_name("import_budget.json")
+TIME_SLACK = 1.5  # время шумное: запас от измеренного
+TOTAL_SLACK = 1.1  # число модулей stdlib немного зависит от версии Python
+
+
+def measure(entry: str) -> Dict[str, int]:
+    """Один холодный запуск: модуль -> накопленное время импорта, мкс"""
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entry}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {entry} завершился с ошибкой:\n{proc.stderr[-2000:]}")
+    cumulative_us: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # заголовок
+        cumulative_us[parts[2].strip()] = int(parts[1])
+    return cumulative_us
+
+
+def is_project_module(name: str) -> bool:
+    return name in ("core", "ui") or name.startswith(("core.", "ui."))
+
+
+def collect(entry: str, runs: int) -> Dict:
+    """Сводка по нескольким запускам (время — минимум, чтобы сгладить шум)"""
+    best_ms = None
+    modules: List[str] = []
+    cumulative: Dict[str, int] = {}
+    for _ in range(max(1, runs)):
+        cumulative_us = measure(entry)
+        entry_ms = cumulative_us.get(entry, 0) / 1000
+        if best_ms is None or entry_ms < best_ms:
+            best_ms = entry_ms
+            cumulative = cumulative_us
+        modules = sorted(cumulative_us)
+    project = [name for name in modules if is_project_module(name)]
+    return {
+        "entry_ms": round(best_ms or 0.0, 1),
+        "modules": modules,
+        "project_modules": project,
+        "cumulative": cumulative,
+    }
+
+
+def check(budget: Dict, summary: Dict) -> List[str]:
+    problems = []
+    loaded = set(summary["modules"])
+    for name in budget.get("forbidden", []):
+        if name in loaded:
+            problems.append(f"при запуске импортируется {name} (должен загружаться при открытии окна)")
+    if len(summary["project_modules"]) > budget["max_project_modules"]:
+        problems.append(f"модулей core/ui: {len(summary['project_modules'])} > {budget['max_project_modules']}")
+    if len(summary["modules"]) > budget["max_total_modules"]:
+        problems.append(f"всего модулей: {len(summary['modules'])} > {budget['max_total_modules']}")
+    if summary["entry_ms"] > budget["max_cumulative_ms"]:
+        problems.append(f"импорт {budget['entry']}: {summary['entry_ms']} мс > {budget['max_cumulative_ms']} мс")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Проверка бюджета импорта при запуске")
+    parser.add_argument("--budget", default=str(BUDGET_FILE), help="файл бюджета (JSON)")
+    parser.add_argument("--runs", type=int, default=5, help="число холодных запусков")
+    parser.add_argument("--top", type=int, default=10, help="показать N самых дорогих модулей проекта")
+    parser.add_argument("--update", action="store_true", help="записать текущие значения в бюджет")
+    args = parser.parse_args(argv)
+
+    budget_path = Path(args.budget)
+    budget = json.loads(budget_path.read_text(encoding="utf-8"))
+    summary = collect(budget["entry"], args.runs)
+
+    print(f"{budget['entry']}: {summary['entry_ms']} мс, модулей {len(summary['modules'])}, "
+          f"из них core/ui {len(summary['project_modules'])}")
+    top = sorted(((us, name) for name, us in summary["cumulative"].items() if is_project_module(name)),
+                 reverse=True)[:args.top]
+    for us, name in top:
+        print(f"  {us / 1000:8.1f} мс  {name}")
+
+    if args.update:
+        budget["max_project_modules"] = len(summary["project_modules"])
+        budget["max_total_modules"] = int(len(summary["modules"]) * TOTAL_SLACK)
+        budget["max_cumulative_ms"] = round(summary["entry_ms"] * TIME_SLACK, 1)
+        budget_path.write_text(json.dumps(budget, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Бюджет обновлён: {budget_path}")
+        return 0
+
+    problems = check(budget, summary)
+    for problem in problems:
+        print(f"ПРЕВЫШЕН БЮДЖЕТ: {problem}")
+    if not problems:
+        print("Бюджет импорта соблюдён")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,23 +3,30 @@
 import tkinter as tk
 from tkinter import scrolledtext
 import threading
-import subprocess
+import asyncio
 import time
-import socket
-import http.client
-import urllib.parse
-import ssl
-from urllib.error import URLError
+from contextlib import aclosing
 from ui.components.button_styler import create_hover_button
+from core.connection_check import (GROUP_DISCORD, GROUP_ORDER, GROUP_YOUTUBE, LEVEL_FAIL, LEVEL_OK, LEVEL_WARN,
+                                   get_service_status, stream_checks)
 from core.dpi_utils import place_toplevel_centered_on_parent
+from core.http_probe import ERROR_SSL
 import os
 
+# Значок и цвет строки лога по уровню результата цели
+LEVEL_STYLES = {
+    LEVEL_OK: ("✅", "#30d158"),
+    LEVEL_WARN: ("⚠️", "#ff9500"),
+    LEVEL_FAIL: ("❌", "#ff3b30"),
+}
+
 class ConnectionCheckWindow:
     def __init__(self, parent):
         self.parent = parent
         self.window = None
         self.checking = False
         self.results = []
+        self.probe_results = []
         self.zapret_status = None
 
     def run(self):
@@ -126,6 +133,8 @@ class ConnectionCheckWindow:
 
         self.checking = True
         self.results = []
+        self.probe_results = []
+        self.zapret_status = None
 
         # Обновляем текст кнопки
         self.toggle_button.config(text="Остановить проверку", bg='#15354D')
@@ -188,238 +197,75 @@ class ConnectionCheckWindow:
         self.results_text.config(state='disabled')
 
     def run_checks(self):
-        """Выполняет проверки соединения"""
+        """Выполняет проверки соединения: все цели одновременно, результаты — по мере готовности"""
+        loop = asyncio.new_event_loop()
         try:
-            # Проверяем статус Zapret перед началом проверок
-            self.zapret_status = self.check_zapret_status()
-
-            # 1. Проверка локальной сети
-            self.check_local_network()
-
-            if not self.checking:
-                return
-
-            # 2. Проверка интернет-соединения
-            self.check_internet()
-
-            if not self.checking:
-                return
-
-            # 3. Проверка YouTube (специальные URL)
-            self.check_youtube()
-
-            if not self.checking:
-                return
-
-            # 4. Проверка Discord
-            self.check_discord()
+            loop.run_until_complete(self._run_checks_async())
 
             if not self.checking:
                 return
 
-           # 5. Итоги
+            self.show_group_results()
+            self.interpret_youtube_results()
+            self.interpret_discord_results()
             self.show_summary()
 
         except Exception as e:
             self.log_message(f"\n[ОШИБКА] {str(e)}", "#ff3b30")
         finally:
+            loop.close()
             self.checking = False
             self.window.after(0, self.on_check_complete)
 
-    def check_zapret_status(self):
-        """Проверяет статус службы Zapret"""
-        try:
-            result = subprocess.run(
-                ["systemctl", "is-active", "zapret"],
-                capture_output=True,
-                text=True,
-                timeout=3
-            )
-            status = result.stdout.strip()
-            return status
-        except subprocess.TimeoutExpired:
-            return "timeout"
-        except Exception as e:
-            return f"error: {str(e)}"
-
-    def check_local_network(self):
-        """Проверка локальной сети"""
-        self.log_message("🔍 ПРОВЕРКА ЛОКАЛЬНОЙ СЕТИ:", "#0a84ff")
+    async def _run_checks_async(self):
+        """Запускает статус службы и все цели (core.connection_check) в одном цикле asyncio"""
+        status_task = asyncio.ensure_future(get_service_status())
 
-        try:
-            # Проверка шлюза
-            result = subprocess.run(
-                ["ip", "route", "show", "default"],
-                capture_output=True,
-                text=True
-            )
-
-            if result.stdout:
-                lines = result.stdout.strip().split('\n')
-                if lines and lines[0]:
-                    parts = lines[0].split()
-                    if len(parts) >= 3:
-                        gateway = parts[2]
-                        self.log_message(f"  📡 Шлюз по умолчанию: {gateway}", "#0a84ff")
-
-                        # Пинг шлюза
-                        ping_result = subprocess.run(
-                            ["ping", "-c", "2", "-W", "1", gateway],
-                            capture_output=True,
-                            text=True
-                        )
-
-                        if ping_result.returncode == 0:
-                            self.log_message(f"  ✅ Шлюз доступен", "#30d158")
-                            self.results.append(("Локальная сеть", "Шлюз", True))
-                        else:
-                            self.log_message(f"  ❌ Шлюз недоступен", "#ff3b30")
-                            self.results.append(("Локальная сеть", "Шлюз", False))
-                    else:
-                        self.log_message("  ❌ Не удалось определить шлюз", "#ff3b30")
-                else:
-                    self.log_message("  ❌ Шлюз не найден", "#ff3b30")
-            else:
-                self.log_message("  ❌ Шлюз не найден", "#ff3b30")
-                self.results.append(("Локальная сеть", "Шлюз", False))
+        self.log_message("🔍 ПРОВЕРКА СЕТИ, ИНТЕРНЕТА, YOUTUBE И DISCORD:", "#0a84ff")
+        started = time.monotonic()
+        async with aclosing(stream_checks(stop_check=lambda: not self.checking)) as results:
+            async for target, result in results:
+                self.probe_results.append((target, result))
+                self.results.append((target["group"], target["name"], result["ok"]))
+                icon, color = LEVEL_STYLES[result["level"]]
+                self.log_message(f"  {icon} [{target['group']}] {target['name']}: {result['message']}", color)
 
-        except Exception as e:
-            self.log_message(f"  ❌ Ошибка: {str(e)}", "#ff3b30")
-            self.results.append(("Локальная сеть", "Шлюз", False))
+        if not self.checking:
+            status_task.cancel()
+            await asyncio.gather(status_task, return_exceptions=True)
+            return
 
+        self.zapret_status = await status_task
+        self.log_message(f"  Все проверки завершены за {time.monotonic() - started:.1f} с", "#8e8e93")
         self.log_message("")
 
-    def check_internet(self):
-        """Проверка интернет-соединения через curl"""
-        self.log_message("🔍 ПРОВЕРКА ИНТЕРНЕТ-СОЕДИНЕНИЯ:", "#0a84ff")
-
-        test_urls = [
-            ("Google", "https://www.google.com"),
-            ("Cloudflare", "https://1.1.1.1"),
-            ("Yandex", "https://ya.ru"),
-        ]
-
-        for name, url in test_urls:
-            if not self.checking:
-                return
-
-            try:
-                start_time = time.time()
-
-                # Используем curl для проверки
-                result = subprocess.run(
-                    ["curl", "-s", "-I", "--max-time", "5", url],
-                    capture_output=True,
-                    text=True,
-                    timeout=7
-                )
-
-                response_time = (time.time() - start_time) * 1000
-
-                if result.returncode == 0:
-                    # Парсим статус код из вывода curl
-                    for line in result.stdout.split('\n'):
-                        if line.startswith('HTTP/'):
-                            status_code = int(line.split()[1])
-                            if status_code < 400:
-                                self.log_message(f"  ✅ {name}: {status_code} ({response_time:.0f} мс)", "#30d158")
-                                self.results.append(("Интернет", name, True))
-                            else:
-                                self.log_message(f"  ⚠️ {name}: код {status_code}", "#ff9500")
-                                self.results.append(("Интернет", name, False))
-                            break
-                else:
-                    self.log_message(f"  ❌ {name}: ошибка curl", "#ff3b30")
-                    self.results.append(("Интернет", name, False))
-
-            except subprocess.TimeoutExpired:
-                self.log_message(f"  ⏱️ {name}: таймаут", "#ff9500")
-                self.results.append(("Интернет", name, False))
-            except Exception as e:
-                self.log_message(f"  ❌ {name}: {str(e)}", "#ff3b30")
-                self.results.append(("Интернет", name, False))
-
+    def show_group_results(self):
+        """Итог по группам целей (результаты приходили вперемешку)"""
+        self.log_message("📊 ИТОГИ ПО ГРУППАМ:", "#0a84ff")
+        for group in GROUP_ORDER:
+            group_results = [ok for name_group, _, ok in self.results if name_group == group]
+            if not group_results:
+                continue
+            successful = sum(1 for ok in group_results if ok)
+            if successful == len(group_results):
+                color = "#30d158"
+            elif successful:
+                color = "#ff9500"
+            else:
+                color = "#ff3b30"
+            self.log_message(f"  {group}: {successful}/{len(group_results)}", color)
         self.log_message("")
 
-    def check_discord(self):
-        """Проверка доступности Discord"""
-        self.log_message("🔍 ПРОВЕРКА ДОСТУПА К DISCORD:", "#0a84ff")
-
-        discord_tests = [
-            {
-                "name": "Discord Website",
-                "url": "discord.com",
-                "path": "/",
-                "method": "HEAD",
-                "expected": [200, 301, 302]
-            },
-            {
-                "name": "Discord API",
-                "url": "discord.com",
-                "path": "/api/v9/gateway",
-                "method": "GET",
-                "expected": [200, 400, 401]
-            },
-        ]
-
-        discord_results = []  # Временный список для результатов Discord
-
-        for test in discord_tests:
-            if not self.checking:
-                return
-
-            try:
-                start_time = time.time()
-
-                # Создаем SSL контекст для HTTPS
-                context = ssl.create_default_context()
-                context.check_hostname = False
-                context.verify_mode = ssl.CERT_NONE
-
-                # Устанавливаем соединение
-                conn = http.client.HTTPSConnection(test["url"], timeout=5, context=context)
-
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                    'Accept': '*/*'
-                }
-
-                conn.request(test["method"], test["path"], headers=headers)
-
-                response = conn.getresponse()
-                response_time = (time.time() - start_time) * 1000
-                status_code = response.status
-
-                # Проверяем статус
-                if status_code in test["expected"] or (200 <= status_code < 300):
-                    self.log_message(f"  ✅ {test['name']}: {status_code} ({response_time:.0f} мс)", "#30d158")
-                    self.results.append(("Discord", test['name'], True))
-                    discord_results.append(True)  # Добавляем в временный список
-
-                else:
-                    self.log_message(f"  ⚠️ {test['name']}: код {status_code}", "#ff9500")
-                    self.results.append(("Discord", test['name'], False))
-                    discord_results.append(False)  # Добавляем в временный список
-
-                conn.close()
-
-            except socket.timeout:
-                self.log_message(f"  ⏱️ {test['name']}: таймаут", "#ff9500")
-                self.results.append(("Discord", test['name'], False))
-                discord_results.append(False)  # Добавляем в временный список
-            except Exception as e:
-                self.log_message(f"  ❌ {test['name']}: {str(e)}", "#ff3b30")
-                self.results.append(("Discord", test['name'], False))
-                discord_results.append(False)  # Добавляем в временный список
+    def interpret_discord_results(self):
+        """Интерпретирует результаты Discord тестов"""
+        discord_results = [ok for group, _, ok in self.results if group == GROUP_DISCORD]
 
-        self.log_message("")
-        # Проверяем результаты Discord тестов
         if discord_results:  # Если есть результаты
             successful_tests = sum(1 for result in discord_results if result)
             total_tests = len(discord_results)
 
             self.log_message("=" * 40, "#0a84ff")
-            self.log_message("🔍 АНАЛИЗ РЕЗУЛЬТАТОВ YOUTUBE:", "#0a84ff")
+            self.log_message("🔍 АНАЛИЗ РЕЗУЛЬТАТОВ DISCORD:", "#0a84ff")
             self.log_message("=" * 40, "#0a84ff")
 
             if successful_tests == total_tests:  # Все тесты успешны
@@ -433,191 +279,12 @@ class ConnectionCheckWindow:
 
         self.log_message("")
 
-    def check_youtube(self):
-        """Проверка YouTube через curl с реальными endpoint'ами"""
-        self.log_message("🔍 ПРОВЕРКА ДОСТУПА К YOUTUBE И ВИДЕО:", "#0a84ff")
-
-        youtube_tests = [
-            {
-                "name": "youtube.com",
-                "url": "https://www.youtube.com/",
-                "method": "HEAD"
-            },
-            {
-                "name": "generate_204",
-                "url": "https://rr2---sn-axq7sn7z.googlevideo.com/generate_204",
-                "method": "HEAD"
-            },
-            {
-                "name": "YouTube API",
-                "url": "https://www.googleapis.com/youtube/v3/videos?id=dQw4w9WgXcQ&key=test",
-                "method": "GET"
-            },
-            {
-                "name": "YouTube Images",
-                "url": "https://i.ytimg.com/vi/dQw4w9WgXcQ/mqdefault.jpg",
-                "method": "HEAD"
-            }
-        ]
-
-        for test in youtube_tests:
-            if not self.checking:
-                return
-
-            self.log_message(f"  Тест: {test['name']}", "#8e8e93")
-
-            try:
-                # Строим команду curl
-                command = [
-                    "curl",
-                    "-I",  # Только заголовки
-                    "--connect-timeout", "5",
-                    "--max-time", "10",
-                    "--silent",
-                    "--show-error",
-                    "--location"  # Следовать редиректам
-                ]
-
-                # Добавляем метод запроса
-                if test["method"] == "HEAD":
-                    command.extend(["-X", "HEAD"])
-                # Для GET метод по умолчанию, ничего не добавляем
-
-                # Добавляем User-Agent как у браузера
-                command.extend(["-H", "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"])
-
-                # Добавляем URL
-                command.append(test["url"])
-
-                start_time = time.time()
-
-                # Выполняем curl команду
-                result = subprocess.run(
-                    command,
-                    capture_output=True,
-                    text=True,
-                    timeout=12  # Немного больше чем --max-time
-                )
-
-                response_time = (time.time() - start_time) * 1000
-
-                if result.returncode == 0:
-                    # Успешный запрос, анализируем вывод
-                    lines = result.stdout.strip().split('\n')
-                    status_line = lines[0] if lines else ""
-
-                    if "HTTP/" in status_line:
-                        try:
-                            status_code = int(status_line.split()[1])
-                            status_str = str(status_code)
-
-                            # Логика проверки для разных тестов
-                            if test["name"] == "YouTube API":
-                                if status_str in ['400', '403', '404']:
-                                    self.log_message(f"    ✅ HTTP {status_code} ({response_time:.0f} мс) - ожидаемая ошибка ключа", "#30d158")
-                                    self.results.append(("YouTube", test['name'], True))
-                                elif status_str == '429':
-                                    self.log_message(f"    🚫 HTTP {status_code} - лимит запросов", "#ff3b30")
-                                    self.results.append(("YouTube", test['name'], False))
-                                elif status_str == '200':
-                                    self.log_message(f"    ⚠️ HTTP {status_code} - неожиданно для тестового ключа", "#ff9500")
-                                    self.results.append(("YouTube", test['name'], True))
-                                else:
-                                    self.log_message(f"    ❓ HTTP {status_code} - неожиданный ответ", "#ff9500")
-                                    self.results.append(("YouTube", test['name'], False))
-
-                            else:  # youtube.com, YouTube Images и generate_204
-                                if status_str in ['200', '204']:
-                                    self.log_message(f"    ✅ HTTP {status_code} ({response_time:.0f} мс)", "#30d158")
-                                    self.results.append(("YouTube", test['name'], True))
-                                elif status_str == '404':
-                                    self.log_message(f"    ⚠️ HTTP {status_code} - endpoint не найден", "#ff9500")
-                                    self.results.append(("YouTube", test['name'], False))
-                                elif status_str in ['403', '429']:
-                                    self.log_message(f"    🚫 HTTP {status_code} - блокировка", "#ff3b30")
-                                    self.results.append(("YouTube", test['name'], False))
-                                elif status_str in ['301', '302', '307', '308']:
-                                    self.log_message(f"    🔀 HTTP {status_code} - редирект", "#ff9500")
-                                    self.results.append(("YouTube", test['name'], True))
-                                else:
-                                    self.log_message(f"    ❓ HTTP {status_code} - неожиданный ответ", "#ff9500")
-                                    self.results.append(("YouTube", test['name'], False))
-
-                        except (IndexError, ValueError) as e:
-                            self.log_message(f"    ❌ Ошибка парсинга ответа: {str(e)}", "#ff3b30")
-                            self.results.append(("YouTube", test['name'], False))
-                    else:
-                        self.log_message(f"    ❌ Нет HTTP заголовка в ответе", "#ff3b30")
-                        self.results.append(("YouTube", test['name'], False))
-
-                else:
-                    # Ошибка curl, анализируем stderr
-                    error_output = result.stderr.strip() if result.stderr else result.stdout.strip()
-                    error_lower = error_output.lower()
-
-                    if "could not resolve host" in error_lower:
-                        self.log_message(f"    ❌ DNS блокировка - не удалось разрешить хост", "#ff3b30")
-                    elif "connection timed out" in error_lower:
-                        self.log_message(f"    ❌ Таймаут соединения - возможная DPI блокировка", "#ff3b30")
-                    elif "connection refused" in error_lower:
-                        self.log_message(f"    ❌ Соединение отклонено - блокировка", "#ff3b30")
-                    elif "ssl handshake" in error_lower or "tls" in error_lower:
-                        self.log_message(f"    🔐 SSL handshake ошибка - вероятная DPI блокировка", "#ff3b30")
-                    elif "operation timed out" in error_lower:
-                        self.log_message(f"    ⏱️ Общий таймаут запроса", "#ff9500")
-                    else:
-                        # Берем первую строку ошибки
-                        error_first_line = error_output.split('\n')[0] if error_output else "Неизвестная ошибка"
-                        self.log_message(f"    ❌ Ошибка curl: {error_first_line[:80]}", "#ff3b30")
-
-                    self.results.append(("YouTube", test['name'], False))
-
-            except subprocess.TimeoutExpired:
-                self.log_message(f"    ⏱️ Таймаут выполнения команды (>12 сек)", "#ff9500")
-                self.results.append(("YouTube", test['name'], False))
-            except Exception as e:
-                self.log_message(f"    ❌ Системная ошибка: {str(e)[:80]}", "#ff3b30")
-                self.results.append(("YouTube", test['name'], False))
-
-        self.log_message("")
-
-        # Интерпретируем результаты
-        self.interpret_youtube_results()
-
     def _check_ssl_handshake_issues(self):
-        """Проверяет наличие SSL handshake проблем в результатах"""
-        ssl_errors = []
-
-        # Собираем все сообщения об ошибках из results_text
-        text_content = self.results_text.get("1.0", tk.END)
-
-        # Ищем SSL ошибки
-        ssl_keywords = [
-            "SSL ошибка",
-            "SSLError",
-            "handshake",
-            "SSL handshake",
-            "TLS",
-            "certificate",
-            "CERT",
-            "ssl.CERT"
-        ]
-
-        youtube_keywords = [
-            "googlevideo",
-            "youtube",
-            "ytimg"
-        ]
-
-        lines = text_content.split('\n')
-        for line in lines:
-            line_lower = line.lower()
-            # Проверяем, есть ли в строке SSL ошибка И связана ли она с YouTube
-            if any(keyword.lower() in line_lower for keyword in ssl_keywords):
-                if any(keyword in line for keyword in youtube_keywords):
-                    ssl_errors.append(line.strip())
-
-        return len(ssl_errors) > 0
+        """Проверяет, были ли ошибки TLS-рукопожатия на YouTube доменах"""
+        return any(
+            target["group"] == GROUP_YOUTUBE and result["error_kind"] == ERROR_SSL
+            for target, result in self.probe_results
+        )
 
     def interpret_youtube_results(self):
         """Интерпретирует результаты YouTube тестов"""
@@ -666,7 +333,7 @@ class ConnectionCheckWindow:
             # self.log_message("   • SSL handshake успешен - нет DPI блокировки", "#30d158")
             # self.log_message("   • DNS разрешается - нет DNS блокировки", "#30d158")
 
-        elif successful_youtube == total_youtube:
+        elif successful_youtube > 0:
             self.log_message("⚠️ ЧАСТИЧНАЯ ДОСТУПНОСТЬ YOUTUBE", "#ff9500")
             self.log_message("")
             self.log_message("🔍 Возможные проблемы:", "#ff9500")
@@ -747,10 +414,3 @@ class ConnectionCheckWindow:
         self.checking = False
         if self.window:
             self.window.destroy()
-    def log_full_response(self, response):
-        """Логирование полного ответа для отладки"""
-        self.log_message(f"    Status: {response.status}", "#8e8e93")
-        self.log_message(f"    Reason: {response.reason}", "#8e8e93")
-        headers = response.getheaders()
-        for header, value in headers[:5]:  # Первые 5 заголовков
-            self.log_message(f"    {header}: {value}", "#8e8e93")
@@ -354,11 +354,11 @@ class CustomStrategyWindow:
         return True
 
     def restart_service(self):
-        """Перезапускает службу zapret"""
+        """Применяет новый config.txt к службе zapret (reload, при необходимости — перезапуск)"""
         if not self.service_manager:
             return False, "Менеджер службы не инициализирован"
 
-        success, message = self.service_manager.restart_service()
+        success, message = self.service_manager.reload_service()
         return success, message
 
     def apply_strategies(self):
@@ -6,6 +6,7 @@ from ui.components.custom_messagebox import show_info, show_error, ask_yesno
 from ui.components.button_styler import create_hover_button
 from ui.windows.sudo_password_window import SudoPasswordWindow
 from core.dpi_utils import place_toplevel_centered_on_parent
+from core.privileged import exec_step, log_transaction, run_privileged_transaction
 
 class DNSSettingsWindow:
     def __init__(self, parent):
@@ -129,6 +130,29 @@ class DNSSettingsWindow:
             return False, "Некорректный формат IP адреса"
 
 
+    def _auto_dns_steps(self):
+        """Шаги nmcli, возвращающие DNS от DHCP (используются и как откат)"""
+        connection = self.active_connection
+        return [
+            exec_step(['nmcli', 'connection', 'modify', connection,
+                       'ipv4.ignore-auto-dns', 'no', 'ipv6.ignore-auto-dns', 'no'],
+                      "Изменение настроек DHCP"),
+            exec_step(['nmcli', 'connection', 'modify', connection, 'ipv4.dns', ''],
+                      "Очистка статических DNS IPv4", check=False),
+            exec_step(['nmcli', 'connection', 'modify', connection, 'ipv6.dns', ''],
+                      "Очистка статических DNS IPv6", check=False),
+        ]
+
+    def _run_dns_transaction(self, steps, password):
+        """Выполняет шаги одним повышением прав; при ошибке показывает причину"""
+        result = run_privileged_transaction(steps, password)
+        log_transaction(result)
+        if result['failed_step'] is not None:
+            failed = result['steps'][result['failed_step']]
+            show_error(self.window, "Ошибка", f"Шаг «{failed['description']}» не выполнен:\n{failed['stderr']}")
+            return False
+        return True
+
     def reset_to_auto(self, password):
         """Сбросить на автоматические DNS с использованием пароля"""
         if not self.active_connection:
@@ -136,103 +160,18 @@ class DNSSettingsWindow:
             return False
 
         try:
-            # 1. Включить получение DNS от DHCP
-            modify1_cmd = [
-                'sudo', '-S', 'nmcli', 'connection', 'modify',
-                self.active_connection,
-                'ipv4.ignore-auto-dns', 'no',
-                'ipv6.ignore-auto-dns', 'no'
-            ]
-
-            process1 = subprocess.Popen(
-                modify1_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = process1.communicate(input=password + '\n')
-
-            if process1.returncode != 0:
-                show_error(self.window, "Ошибка", f"Не удалось изменить настройки DHCP:\n{stderr}")
-                return False
-
-            # 2. Очистить статические DNS
-            modify2_cmd = [
-                'sudo', '-S', 'nmcli', 'connection', 'modify',
-                self.active_connection, 'ipv4.dns', ''
-            ]
-
-            process2 = subprocess.Popen(
-                modify2_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = process2.communicate(input=password + '\n')
-
-            modify3_cmd = [
-                'sudo', '-S', 'nmcli', 'connection', 'modify',
-                self.active_connection, 'ipv6.dns', ''
+            steps = self._auto_dns_steps() + [
+                # Переподключить; ошибка отключения не важна (соединение может быть уже отключено)
+                exec_step(['nmcli', 'connection', 'down', self.active_connection],
+                          "Отключение соединения", check=False),
+                exec_step(['nmcli', 'connection', 'up', self.active_connection],
+                          "Подключение"),
+                # Сбросить через resolvectl
+                exec_step(['resolvectl', 'revert', 'wlan0'], "resolvectl revert", check=False),
+                exec_step(['resolvectl', 'default-route', 'wlan0', 'yes'],
+                          "resolvectl default-route", check=False),
             ]
-
-            process3 = subprocess.Popen(
-                modify3_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = process3.communicate(input=password + '\n')
-
-            # 3. Переподключить
-            down_cmd = ['sudo', '-S', 'nmcli', 'connection', 'down', self.active_connection]
-            down_process = subprocess.Popen(
-                down_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = down_process.communicate(input=password + '\n')
-
-            up_cmd = ['sudo', '-S', 'nmcli', 'connection', 'up', self.active_connection]
-            up_process = subprocess.Popen(
-                up_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = up_process.communicate(input=password + '\n')
-
-            if up_process.returncode != 0:
-                show_error(self.window, "Ошибка", f"Не удалось подключиться:\n{stderr}")
-                return False
-
-            # 4. Сбросить через resolvectl
-            revert_cmd = ['sudo', '-S', 'resolvectl', 'revert', 'wlan0']
-            revert_process = subprocess.Popen(
-                revert_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = revert_process.communicate(input=password + '\n')
-
-            route_cmd = ['sudo', '-S', 'resolvectl', 'default-route', 'wlan0', 'yes']
-            route_process = subprocess.Popen(
-                route_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = route_process.communicate(input=password + '\n')
-
-            return True
+            return self._run_dns_transaction(steps, password)
 
         except Exception as e:
             show_error(self.window, "Ошибка", f"Ошибка при сбросе DNS: {e}")
@@ -245,79 +184,26 @@ class DNSSettingsWindow:
             return False
 
         try:
-            # 1. Установить кастомные DNS через nmcli
-            modify_cmd = [
-                'sudo', '-S', 'nmcli', 'connection', 'modify',
-                self.active_connection,
-                'ipv4.dns', dns_servers,
-                'ipv4.ignore-auto-dns', 'yes'
+            # Если соединение не поднимется с новыми DNS, откат вернёт DHCP и переподключит его
+            restore_auto = self._auto_dns_steps() + [
+                exec_step(['nmcli', 'connection', 'up', self.active_connection], check=False),
             ]
-
-            modify_process = subprocess.Popen(
-                modify_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = modify_process.communicate(input=password + '\n')
-
-            if modify_process.returncode != 0:
-                show_error(self.window, "Ошибка", f"Не удалось установить DNS настройки:\n{stderr}")
-                return False
-
-            # 2. Переподключить соединение
-            down_cmd = ['sudo', '-S', 'nmcli', 'connection', 'down', self.active_connection]
-            down_process = subprocess.Popen(
-                down_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = down_process.communicate(input=password + '\n')
-            # Игнорируем ошибки при отключении (соединение может быть уже отключено)
-
-            # 3. Включить соединение
-            up_cmd = ['sudo', '-S', 'nmcli', 'connection', 'up', self.active_connection]
-            up_process = subprocess.Popen(
-                up_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = up_process.communicate(input=password + '\n')
-
-            if up_process.returncode != 0:
-                show_error(self.window, "Ошибка", f"Не удалось подключиться:\n{stderr}")
-                return False
-
-            # 4. Установить через resolvectl для текущей сессии
             servers_list = dns_servers.split()
-            resolve_cmd = ['sudo', '-S', 'resolvectl', 'dns', 'wlan0'] + servers_list
-            resolve_process = subprocess.Popen(
-                resolve_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = resolve_process.communicate(input=password + '\n')
-            # Игнорируем ошибки, так как это не критично
-
-            # 5. Отключить автоматический маршрут
-            route_cmd = ['sudo', '-S', 'resolvectl', 'default-route', 'wlan0', 'false']
-            route_process = subprocess.Popen(
-                route_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = route_process.communicate(input=password + '\n')
-
-            return True
+            steps = [
+                exec_step(['nmcli', 'connection', 'modify', self.active_connection,
+                           'ipv4.dns', dns_servers, 'ipv4.ignore-auto-dns', 'yes'],
+                          "Установка DNS", rollback=restore_auto),
+                # Ошибка отключения не важна (соединение может быть уже отключено)
+                exec_step(['nmcli', 'connection', 'down', self.active_connection],
+                          "Отключение соединения", check=False),
+                exec_step(['nmcli', 'connection', 'up', self.active_connection],
+                          "Подключение"),
+                # resolvectl — для текущей сессии, ошибки не критичны
+                exec_step(['resolvectl', 'dns', 'wlan0'] + servers_list, "resolvectl dns", check=False),
+                exec_step(['resolvectl', 'default-route', 'wlan0', 'false'],
+                          "resolvectl default-route", check=False),
+            ]
+            return self._run_dns_transaction(steps, password)
 
         except Exception as e:
             show_error(self.window, "Ошибка", f"Ошибка при установке DNS: {e}")
@@ -3,7 +3,7 @@ import os
 import threading
 import tkinter as tk
 
-from ui.windows.gamefilter_window import GameFilterWindow, clear_active_game_preset_disk
+from ui.windows.window_registry import open_window
 from ui.windows.main.main_gamefilter_warning import show_game_filter_warning_dialog
 from core.game_presets import get_active_preset_id, get_manager_dir
 from core.game_filter_settings import (
@@ -83,7 +83,7 @@ class MainGameFilterMixin:
 
     def toggle_game_filter(self, event=None):
         """Открывает окно GameFilter при клике на иконку."""
-        gamefilter_window = GameFilterWindow(self.root, self)
+        gamefilter_window = open_window("gamefilter", self.root, self)
         gamefilter_window.run()
 
     def _show_game_filter_warning(self, protocol_mode: str = GAMEFILTER_PROTOCOL_BOTH):
@@ -116,6 +116,8 @@ class MainGameFilterMixin:
                 print("🎮🔴 Game Filter выключен")
             else:
                 # Отдельный GameFilter и пресет игры не используются одновременно
+                from ui.windows.gamefilter_window import clear_active_game_preset_disk
+
                 had_preset = get_active_preset_id() is not None
                 clear_active_game_preset_disk(get_manager_dir())
                 if had_preset:
@@ -176,7 +178,7 @@ class MainGameFilterMixin:
         def restart_service_thread():
             try:
                 # Запускаем перезапуск службы
-                success, message = self.service_manager.restart_service()
+                success, message = self.service_manager.reload_service()
 
                 if success:
                     self.root.after(0, lambda: self.show_status_message(
@@ -193,8 +195,8 @@ class MainGameFilterMixin:
                 self.root.after(0, lambda: self.game_filter_indicator.config(state=tk.NORMAL))
                 self.root.after(0, self.update_game_filter_indicator)
 
-                # Обновляем статус службы через 1 секунду
-                self.root.after(1000, self.check_service_status)
+                # Монитор перечитывает статус службы
+                self.refresh_service_status()
 
         # Запускаем в отдельном потоке
         thread = threading.Thread(target=restart_service_thread, daemon=True)
@@ -207,7 +209,7 @@ class MainGameFilterMixin:
 
         def restart_thread():
             try:
-                success, message = self.service_manager.restart_service()
+                success, message = self.service_manager.reload_service()
                 if success:
                     self.root.after(0, lambda: self.show_status_message(
                         f"{status_message}, служба перезапущена", success=True))
@@ -218,7 +220,7 @@ class MainGameFilterMixin:
                 self.root.after(0, lambda: self.show_status_message(
                     f"Ошибка перезапуска службы: {e}", error=True))
             finally:
-                self.root.after(1000, self.check_service_status)
+                self.refresh_service_status()
 
         thread = threading.Thread(target=restart_thread, daemon=True)
         thread.start()
@@ -4,6 +4,7 @@ import threading
 import tkinter as tk
 
 from core.app_logging import LOG_FILE_PATH
+from core.service_monitor import ServiceMonitor, read_service_state
 from ui.windows.sudo_password_window import SudoPasswordWindow
 
 
@@ -71,8 +72,9 @@ class MainServiceMixin:
             self.root.after(0, lambda: self.restart_icon.config(state=tk.NORMAL))
             self.restarting = False
 
-            # Обновляем статус службы через 1 секунду
-            self.root.after(1000, self.check_service_status)
+            # Монитор перечитывает статус сразу, не дожидаясь сигнала systemd
+            self.refresh_service_status()
+
     def ensure_sudo_password(self):
         """Проверяет и получает пароль sudo если нужно"""
         if not self.service_manager:
@@ -110,40 +112,9 @@ class MainServiceMixin:
 
 
     def check_service_status(self):
-        """Проверяет статус службы Zapret"""
+        """Проверяет статус службы Zapret (один вызов systemctl show)"""
         try:
-            # Проверяем статус службы
-            result = subprocess.run(
-                ["systemctl", "is-active", "zapret"],
-                capture_output=True,
-                text=True
-            )
-
-            status_output = result.stdout.strip()
-
-            if result.returncode == 0 and status_output == "active":
-                # Служба активна
-                self.service_running = True
-                self.status_indicator.config(text="⬤", fg='#30d158')  # Зеленый круг
-                self.zapret_button.config(text="Остановить Zapret DPI")
-            elif result.returncode == 3 and status_output == "inactive":
-                # Служба неактивна
-                self.service_running = False
-                self.status_indicator.config(text="⬤", fg='#ff3b30')  # Красный круг
-                self.zapret_button.config(text="Запустить Zapret DPI")
-            elif result.returncode == 4:  # Код возврата 4 означает "неактивен" или "не существует"
-                self.service_running = False
-                self.status_indicator.config(text="⬤", fg='#ff3b30')  # Красный круг
-                self.zapret_button.config(text="Запустить Zapret DPI")
-            else:
-                # Неизвестный статус
-                self.service_running = False
-                self.status_indicator.config(text="⬤", fg='#ff9500')  # Оранжевый круг
-                self.zapret_button.config(text="Запустить Zapret DPI")
-
-            # Теперь проверяем автозапуск ОТДЕЛЬНО
-            self.check_autostart_status()
-
+            self.apply_service_state(read_service_state())
         except Exception as e:
             print(f"Ошибка проверки статуса службы: {e}")
             self.service_running = False
@@ -151,6 +122,31 @@ class MainServiceMixin:
             # Все равно проверяем автозапуск
             self.check_autostart_status()
 
+    def apply_service_state(self, state):
+        """Обновляет индикатор службы и кнопки по состоянию из core.service_monitor"""
+        active = state.get("active")
+        if active in ("active", "reloading"):
+            # Служба активна
+            self.service_running = True
+            self.status_indicator.config(text="⬤", fg='#30d158')  # Зеленый круг
+            self.zapret_button.config(text="Остановить Zapret DPI")
+        elif active == "inactive" or not state.get("loaded"):
+            # Служба неактивна или не существует
+            self.service_running = False
+            self.status_indicator.config(text="⬤", fg='#ff3b30')  # Красный круг
+            self.zapret_button.config(text="Запустить Zapret DPI")
+        else:
+            # failed, activating (в том числе автоперезапуск после сбоя nfqws) и прочие
+            self.service_running = False
+            self.status_indicator.config(text="⬤", fg='#ff9500')  # Оранжевый круг
+            self.zapret_button.config(text="Запустить Zapret DPI")
+
+        self.autostart_enabled = bool(state.get("enabled"))
+        if self.autostart_enabled:
+            self.autostart_button.config(text="Отключить автозапуск")
+        else:
+            self.autostart_button.config(text="Включить автозапуск")
+
     def check_autostart_status(self):
         """Проверяет и обновляет статус автозапуска"""
         try:
@@ -189,14 +185,32 @@ class MainServiceMixin:
             self.autostart_enabled = False
             self.autostart_button.config(text="Включить автозапуск")
 
-    def schedule_status_update(self):
-        """Периодически обновляет статус службы"""
+    def start_status_monitor(self):
+        """Запускает фоновое отслеживание службы: сигналы systemd по D-Bus, без шины — опрос в фоне"""
+        self.service_monitor = ServiceMonitor(self._on_service_state_changed)
+        self.service_monitor.start()
+
+    def stop_status_monitor(self):
+        """Останавливает фоновое отслеживание службы (при закрытии главного окна)"""
+        monitor = getattr(self, "service_monitor", None)
+        if monitor:
+            monitor.stop()
+
+    def refresh_service_status(self):
+        """Просит монитор перечитать состояние после запуска, остановки или перезапуска службы"""
+        monitor = getattr(self, "service_monitor", None)
+        if monitor:
+            monitor.refresh()
+        else:
+            self.root.after(0, self.check_service_status)
+
+    def _on_service_state_changed(self, state):
+        """Вызывается из потока монитора: передаёт состояние в цикл Tk"""
         try:
-            self.check_service_status()
-        except Exception as e:
-            print(f"Ошибка при обновлении статуса: {e}")
-        finally:
-            self.root.after(5000, self.schedule_status_update)  # Проверка каждые 5 секунд
+            self.root.after(0, lambda: self.apply_service_state(state))
+        except (RuntimeError, tk.TclError):
+            # Окно уже закрыто
+            self.service_monitor.stop()
 
     def toggle_zapret(self):
         """Переключает состояние Zapret (запуск/остановка)"""
@@ -245,7 +259,7 @@ class MainServiceMixin:
                     )
 
             # Обновляем статус после операции
-            self.root.after(1000, self.check_service_status)
+            self.refresh_service_status()
 
         except Exception as e:
             self.show_status_message(f"Ошибка: {str(e)}", error=True)
@@ -1,13 +1,64 @@
 """Проверки при запуске и фоновая проверка обновлений."""
-import os
 import threading
-import tkinter as tk
+import time
 
-from ui.integrations.dependency_check import run_dependency_check
-from ui.integrations.zapret_check import run_zapret_check
+from core.startup_checks import (StartupCache, StartupOrchestrator, check_dependencies,
+                                 check_zapret_installation, ensure_list_files)
+from ui.windows.window_registry import open_window
+
+STARTUP_CHECK_TITLES = {
+    "dependencies": "зависимости",
+    "zapret": "файлы zapret",
+    "lists": "списки",
+}
 
 
 class MainStartupMixin:
+    def start_startup_checks(self):
+        """
+        Запускает проверки запуска в фоне; окно уже показано и отвечает.
+        Интерактивная установка (зависимостей, zapret) открывается только
+        если быстрая проверка нашла проблему.
+        """
+        self._startup_started = time.monotonic()
+        self.show_status_message("Проверка зависимостей и файлов zapret...")
+        cache = StartupCache()
+        orchestrator = StartupOrchestrator(
+            {
+                "dependencies": lambda: check_dependencies(cache),
+                "zapret": lambda: check_zapret_installation(cache),
+                "lists": ensure_list_files,
+            },
+            on_result=lambda name, result: self.root.after(
+                0, lambda: self._on_startup_check_result(name, result)),
+            on_done=lambda results: self.root.after(
+                0, lambda: self._on_startup_checks_done(results)),
+        )
+        orchestrator.start()
+
+    def _on_startup_check_result(self, name, result):
+        """Промежуточный статус: какая проверка завершилась"""
+        source = "кеш" if result.get("cached") else f"{result['duration']:.3f} с"
+        print(f"Проверка запуска «{STARTUP_CHECK_TITLES.get(name, name)}»: "
+              f"{'OK' if result.get('ok') else 'требует внимания'} ({source})")
+
+    def _on_startup_checks_done(self, results):
+        """Все проверки завершены: при необходимости запускаем установку"""
+        elapsed = time.monotonic() - self._startup_started
+        print(f"Проверки запуска завершены за {elapsed:.3f} с")
+
+        dependencies = results.get("dependencies", {})
+        zapret = results.get("zapret", {})
+        if dependencies.get("ok") and zapret.get("ok"):
+            self.show_status_message("Зависимости и файлы zapret в порядке", success=True)
+            return
+
+        if not dependencies.get("ok"):
+            self.check_dependencies_on_startup()
+        if not zapret.get("ok"):
+            if self.check_zapret_on_startup():
+                self.refresh_service_status()
+
     def check_dependencies_on_startup(self):
         """Проверяет зависимости при запуске программы"""
         print("=== НАЧАЛО ПРОВЕРКИ ЗАВИСИМОСТЕЙ ===")
@@ -20,7 +71,7 @@ class MainStartupMixin:
         # Запускаем проверку зависимостей (окно видимо)
         print("Запуск run_dependency_check...")
         try:
-            dependencies_ok = run_dependency_check(self.root)
+            dependencies_ok = open_window("dependency_check", self.root)
             print(f"Результат проверки зависимостей: {dependencies_ok}")
         except Exception as e:
             print(f"ОШИБКА при проверке зависимостей: {e}")
@@ -42,7 +93,7 @@ class MainStartupMixin:
         # Запускаем проверку zapret
         print("Запуск проверки Zapret...")
         try:
-            zapret_ok = run_zapret_check(self.root)
+            zapret_ok = open_window("zapret_check", self.root)
             print(f"Результат проверки Zapret: {zapret_ok}")
         except Exception as e:
             print(f"ОШИБКА при проверке Zapret: {e}")
@@ -54,27 +105,6 @@ class MainStartupMixin:
 
         return zapret_ok
 
-    def ensure_lists_files(self):
-        """Проверяет наличие обязательных файлов в files/lists/ и создаёт их при отсутствии."""
-        manager_dir = os.path.expanduser("~/Zapret_DPI_Manager")
-        lists_dir = os.path.join(manager_dir, "files", "lists")
-        required_files = [
-            "ipset-all_user.txt",
-            "ipset-exclude_user.txt",
-            "list-exclude_user.txt",
-            "list-general_user.txt",
-        ]
-        if not os.path.isdir(lists_dir):
-            os.makedirs(lists_dir, exist_ok=True)
-        for filename in required_files:
-            path = os.path.join(lists_dir, filename)
-            if not os.path.isfile(path):
-                try:
-                    with open(path, "w", encoding="utf-8") as f:
-                        pass
-                except OSError as e:
-                    print(f"Не удалось создать {filename}: {e}")
-
     # def check_files_on_startup(self):
     #     """Проверяет наличие zapret при запуске программы"""
     #     print("=== НАЧАЛО ПРОВЕРКИ ФАЙЛОВ ===")
@@ -1,6 +1,8 @@
 """Всплывающие подсказки статуса и иконок."""
 import tkinter as tk
 
+from core.nfqws_workers import read_worker_states
+
 
 class MainTooltipsMixin:
     def show_status_tooltip(self, event=None):
@@ -20,6 +22,13 @@ class MainTooltipsMixin:
             # Безопасный фолбэк, если цвет задан именем или системой.
             status_text = "Статус службы: активен" if self.service_running else "Статус службы: неактивен"
 
+        # Несколько процессов nfqws: очередь, протокол и состояние каждого
+        workers = read_worker_states() if self.service_running else []
+        if len(workers) > 1:
+            for worker in workers:
+                state = "работает" if worker["running"] else "остановлен"
+                status_text += f"\nnfqws {worker['qnum']} ({worker['protocol']}): {state}"
+
         # Позиционируем подсказку рядом с индикатором
         x = self.status_indicator.winfo_rootx() - 20
         y = self.status_indicator.winfo_rooty() + self.status_indicator.winfo_height() + 5
@@ -36,6 +45,7 @@ class MainTooltipsMixin:
                         font=("Arial", 10),
                         fg='white',
                         bg='#15354D',
+                        justify=tk.LEFT,
                         padx=10,
                         pady=5)
         label.pack()
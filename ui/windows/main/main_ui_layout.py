@@ -4,8 +4,7 @@ import tkinter as tk
 import webbrowser
 
 from ui.components.button_styler import create_hover_button
-from ui.windows.donat_window import DonationWindow
-from ui.windows.info_window import show_info_dialog
+from ui.windows.window_registry import open_window
 from core.dpi_utils import fit_toplevel_to_content
 
 
@@ -89,7 +88,7 @@ class MainUILayoutMixin:
         self.info_icon.pack(side=tk.LEFT, padx=(0, 10))
         self.info_icon.bind("<Enter>", lambda e: self.show_icon_tooltip(e, "Информация о программе"))
         self.info_icon.bind("<Leave>", lambda e: self.hide_icon_tooltip())
-        self.info_icon.bind("<Button-1>", lambda e: show_info_dialog(self.root))
+        self.info_icon.bind("<Button-1>", lambda e: open_window("info", self.root))
 
         # Иконка доната
         self.donate_icon = tk.Label(icons_frame, text="$", font=("Arial", 18),
@@ -232,7 +231,7 @@ class MainUILayoutMixin:
 
     def open_donate_link(self, event=None):
         """Показывает окно доната"""
-        donation_window = DonationWindow(self.root)
+        donation_window = open_window("donation", self.root)
         donation_window.run()
 
     def open_user_guide(self, event=None):
@@ -2,16 +2,10 @@
 import tkinter as tk
 
 from ui.components.button_styler import create_hover_button, uniform_button_width_for_font
-from ui.windows.connection_check_window import ConnectionCheckWindow
-from ui.windows.dns_settings_window import DNSSettingsWindow
-from ui.windows.hostlist_settings_window import HostlistSettingsWindow
-from ui.windows.ipset_settings_window import IpsetMainWindow
-from ui.windows.service_unlock_window import ServiceUnlockWindow
-from ui.windows.strategy_selector_window import StrategySelectorWindow
-from ui.windows.update_window import show_update_window
+from ui.windows.window_registry import open_window
 from core.dpi_utils import fit_toplevel_to_content
+from core.nfqws_workers import max_worker_count, read_worker_count, write_worker_count
 from core.tk_scale_lab_helpers import logical_ui_scale
-from ui.integrations.zapret_uninstall import run_zapret_uninstall
 
 
 class MainUISettingsMixin:
@@ -57,6 +51,7 @@ class MainUISettingsMixin:
         installed = self.is_decky_zapret_plugin_installed()
         plugin_label = "Удалить плагин Zapret DPI" if installed else "Установить плагин Zapret DPI"
         plugin_command = self.remove_decky_plugin if installed else self.install_decky_plugin
+        workers_label = f"Процессы nfqws: {read_worker_count()}"
 
         # Кнопки меню
         menu_items = [
@@ -65,6 +60,7 @@ class MainUISettingsMixin:
             ("Настройки Hostlist", self.open_hostlist_settings),
             ("Настройки IPSet", self.open_ipset_settings),
             ("Настройки DNS", self.open_dns_settings),
+            (workers_label, self.cycle_nfqws_workers),
             ("Разблокировать сервисы", self.open_service_unlock),
             (plugin_label, plugin_command),
             ("Обновить Zapret", self.open_update_settings),
@@ -142,7 +138,7 @@ class MainUISettingsMixin:
 
     def open_service_window(self):
         """Открывает окно выбора типа стратегии"""
-        selector_window = StrategySelectorWindow(self.root)
+        selector_window = open_window("strategy_selector", self.root)
         selector_window.run()
         # После закрытия окна обновляем отображение стратегии
         self.load_current_strategy()
@@ -150,42 +146,54 @@ class MainUISettingsMixin:
     def open_connection_check(self):
         """Открывает окно проверки соединения"""
         self.close_settings_menu()  # Закрываем меню
-        connection_window = ConnectionCheckWindow(self.root)
+        connection_window = open_window("connection_check", self.root)
         connection_window.run()
 
     def open_hostlist_settings(self):
         """Открывает окно настроек HOSTLIST"""
         self.close_settings_menu()  # Закрываем меню
-        hostlist_window = HostlistSettingsWindow(self.root)
+        hostlist_window = open_window("hostlist_settings", self.root)
         hostlist_window.run()
 
     def open_ipset_settings(self):
         """Открывает окно настроек IPset"""
         self.close_settings_menu()  # Закрываем меню
-        ipset_main_window = IpsetMainWindow(self.root)
+        ipset_main_window = open_window("ipset_settings", self.root)
         ipset_main_window.run()
 
     def open_dns_settings(self):
         """Открывает окно настроек DNS"""
-        dns_window = DNSSettingsWindow(self.root)
+        dns_window = open_window("dns_settings", self.root)
         dns_window.run()
 
+    def cycle_nfqws_workers(self):
+        """Переключает число процессов nfqws (1, 2, 4, ... до числа ядер) и перезапускает службу"""
+        self.close_settings_menu()  # Закрываем меню
+        limit = max_worker_count()
+        current = read_worker_count()
+        count = current * 2 if current < limit else 1
+        count = write_worker_count(min(count, limit))
+        if self.service_running:
+            self.restart_zapret_service_properly()
+        else:
+            self.show_status_message(f"Процессов nfqws: {count} (при следующем запуске службы)", success=True)
+
     def open_service_unlock(self):
         """Открывает окно настроек Разблокировки сервисов"""
         self.close_settings_menu()  # Закрываем меню
-        unlock_window = ServiceUnlockWindow(self.root)
+        unlock_window = open_window("service_unlock", self.root)
         unlock_window.run()
 
     def open_update_settings(self):
         """Открывает окно обновления Zapret"""
-        update_window = show_update_window(self.root)
+        update_window = open_window("update", self.root)
         update_window.run()
 
     def uninstall_zapret(self):
         """Запускает удаление Zapret"""
         try:
             # Запускаем удаление
-            result = run_zapret_uninstall(self.root)
+            result = open_window("zapret_uninstall", self.root)
 
             if result:
                 # Если удаление успешно, закрываем программу
@@ -43,7 +43,7 @@ class MainUpdatesMixin:
 
             self.root.after(0, lambda: show_update_progress_window(self.root, update_tasks))
 
-            self.root.after(2000, self.check_service_status)
+            self.refresh_service_status()
 
         except Exception as e:
             print(f"❌ Ошибка при подготовке обновления: {e}")
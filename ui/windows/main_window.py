@@ -50,28 +50,32 @@ class MainWindow(
 
         self.setup_ui()
         self._apply_main_window_size()
-        # Сначала проверяем зависимости
-        self.check_dependencies_on_startup()
-        # Затем проверяем zapret
-        self.check_zapret_on_startup()
-        # Проверка и создание обязательных файлов в files/lists/
-        self.ensure_lists_files()
-        # Проверяем целостность файлов
-        # self.check_files_on_startup()
         self.load_current_strategy()
-        self.check_service_status()  # Проверяем статус службы при запуске
         self.update_game_filter_indicator()  # GameFilter / активный пресет игры (маркер в utils)
-        self.schedule_status_update()  # Запускаем периодическую проверку
         self.status_tooltip = None  # Всплывающее окошко для статуса
+        # Статус службы приходит из монитора (первое значение — сразу после старта потока)
+        self.start_status_monitor()  # Следим за службой в фоне (сигналы systemd)
+        # Зависимости, файлы zapret и списки проверяются в фоне; установка — только при проблемах
+        self.start_startup_checks()
         self.root.after(100, self.check_updates_on_startup)
 
         # Bind событий фокус
         self.root.bind("<FocusIn>", self.on_focus_in)
         self.root.bind("<FocusOut>", self.on_focus_out)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self) -> None:
+        """Закрытие главного окна: сначала останавливаем монитор службы"""
+        self.stop_status_monitor()
+        self.root.destroy()
 
     def run(self) -> None:
         """Запускает главное окно"""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            # Окно могло закрыться и без WM_DELETE_WINDOW (root.destroy после удаления zapret)
+            self.stop_status_monitor()
 
 
 if __name__ == "__main__":
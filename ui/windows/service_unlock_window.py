@@ -6,6 +6,7 @@ from ui.components.custom_messagebox import show_info, show_error
 from core.service_data import SERVICE_CATEGORIES, PROXY_DOMAINS
 from ui.components.button_styler import create_hover_button
 from ui.windows.sudo_password_window import SudoPasswordWindow
+from core.privileged import read_privileged_file, write_privileged_file
 from core.dpi_utils import (
     geometry_resize_keep_position,
     place_toplevel_centered_on_parent,
@@ -387,20 +388,11 @@ class ServiceUnlockWindow:
     def save_hosts_with_password(self, password, selected_entries, selected_domains):
         """Сохраняет файл hosts с использованием введенного пароля"""
         try:
-            import subprocess
-            import tempfile
-
             # 1. Читаем текущий /etc/hosts
-            read_process = subprocess.Popen(
-                ['sudo', '-S', 'cat', self.hosts_file],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = read_process.communicate(input=password + '\n')
+            read_result = read_privileged_file(self.hosts_file, password)
+            stdout, stderr = read_result['stdout'], read_result['stderr']
 
-            if read_process.returncode != 0:
+            if read_result['returncode'] != 0:
                 show_error(self.window, "Ошибка", f"Не удалось прочитать файл hosts:\n{stderr}")
                 return
 
@@ -466,60 +458,41 @@ class ServiceUnlockWindow:
                     if section_start_index < len(new_lines) and not new_lines[section_start_index].strip():
                         new_lines.pop(section_start_index)
 
-            # 4. Создаем временный файл
-            with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', delete=False) as temp_file:
-                temp_file.writelines(new_lines)
-                temp_path = temp_file.name
+            # 4. Атомарно записываем /etc/hosts (права и владелец файла сохраняются)
+            write_result = write_privileged_file(self.hosts_file, "".join(new_lines), password)
+            stderr = write_result['stderr']
 
-            try:
-                # 5. Записываем обратно в /etc/hosts
-                write_process = subprocess.Popen(
-                    ['sudo', '-S', 'cp', temp_path, self.hosts_file],
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                stdout, stderr = write_process.communicate(input=password + '\n')
-
-                if write_process.returncode == 0:
-                    # Обновляем кеш существующих записей
-                    self.existing_entries = selected_domains
-
-                    # Показываем статистику
-                    total_selected = len(selected_entries)
-
-                    if total_selected > 0:
-                        # Подсчитываем количество выбранных категорий
-                        categories_selected = 0
-                        for category_name, category_info in self.service_vars.items():
-                            if category_info['var'].get():
-                                categories_selected += 1
-
-                        show_info(
-                            self.window,
-                            "Сохранение",
-                            (
-                                f"Данные успешно сохранены в {self.hosts_file}. "
-                                f"Добавлено записей: {total_selected}. "
-                                f"Выбранных категорий: {categories_selected}"
-                            ),
-                        )
-                    else:
-                        show_info(self.window, "Сохранение",
-                                f"Все записи разблокировки удалены из {self.hosts_file}")
-
-                    # Обновляем системный DNS кеш
-                    self.update_dns_cache()
+            if write_result['returncode'] == 0:
+                # Обновляем кеш существующих записей
+                self.existing_entries = selected_domains
+
+                # Показываем статистику
+                total_selected = len(selected_entries)
+
+                if total_selected > 0:
+                    # Подсчитываем количество выбранных категорий
+                    categories_selected = 0
+                    for category_name, category_info in self.service_vars.items():
+                        if category_info['var'].get():
+                            categories_selected += 1
+
+                    show_info(
+                        self.window,
+                        "Сохранение",
+                        (
+                            f"Данные успешно сохранены в {self.hosts_file}. "
+                            f"Добавлено записей: {total_selected}. "
+                            f"Выбранных категорий: {categories_selected}"
+                        ),
+                    )
                 else:
-                    show_error(self.window, "Ошибка", f"Не удалось записать файл hosts:\n{stderr}")
-
-            finally:
-                # Удаляем временный файл
-                try:
-                    os.unlink(temp_path)
-                except Exception:
-                    pass
+                    show_info(self.window, "Сохранение",
+                            f"Все записи разблокировки удалены из {self.hosts_file}")
+
+                # Обновляем системный DNS кеш
+                self.update_dns_cache()
+            else:
+                show_error(self.window, "Ошибка", f"Не удалось записать файл hosts:\n{stderr}")
 
         except Exception as e:
             show_error(self.window, "Ошибка", f"Ошибка при сохранении: {e}")
@@ -1,11 +1,13 @@
 import tkinter as tk
 import os
+import threading
 from tkinter import messagebox
 from ui.components.button_styler import create_hover_button
 from core.dpi_utils import place_toplevel_centered_on_parent
 from ui.windows.strategy_window import StrategyWindow
 from ui.windows.custom_strategy_window import CustomStrategyWindow
 from ui.windows.strategy_tester_window import StrategyTesterWindow
+from core.strategy_results_db import format_age, latest_results_for_current_network
 
 class AutoSelectionWindow:
     """Окно автоподбора стратегий"""
@@ -52,6 +54,15 @@ class AutoSelectionWindow:
             'cursor': 'hand2'
         }
 
+        # Кнопка "Найти первую рабочую" (стратегии по успехам в этой сети)
+        quick_button = create_hover_button(
+            main_frame,
+            text="Найти первую рабочую",
+            command=self.find_first_working,
+            **button_style
+        )
+        quick_button.pack(pady=(0, 10))
+
         # Кнопка "Автоподбор по всем стратегиям"
         all_button = create_hover_button(
             main_frame,
@@ -89,6 +100,16 @@ class AutoSelectionWindow:
             print(f"Ошибка открытия тестировщика: {e}")
             messagebox.showerror("Ошибка", f"Не удалось открыть тестировщика: {str(e)}")
 
+    def find_first_working(self):
+        """Тестирует стратегии по порядку успехов в этой сети до первой рабочей"""
+        self.on_close()
+        try:
+            tester_window = StrategyTesterWindow(self.parent, find_first_working=True)
+            tester_window.run()
+        except Exception as e:
+            print(f"Ошибка открытия тестировщика: {e}")
+            messagebox.showerror("Ошибка", f"Не удалось открыть тестировщика: {str(e)}")
+
     def show_strategy_selection(self):
         """Показывает отдельное окно выбора стратегий"""
         self.on_close()
@@ -108,6 +129,10 @@ class AutoSelectionWindow:
 
 class StrategySelectionWindow:
     """Окно выбора стратегий для тестирования"""
+    # Тестировщик открывается в стандартном режиме: показываем результаты этого режима,
+    # а не последнюю запись любого режима для той же стратегии
+    HISTORY_MODE = "standard"
+
     def __init__(self, parent):
         self.parent = parent
         self.root = tk.Toplevel(parent)
@@ -116,9 +141,12 @@ class StrategySelectionWindow:
         self.selected_strategies = []  # Для хранения выбранных стратегий
         self.strategy_vars = {}  # Для хранения переменных чекбоксов
         self.strategy_items = []  # Список всех стратегий
+        self.strategy_checkboxes = {}  # Чекбоксы по имени стратегии (подпись обновляется после чтения базы)
+        self.strategy_history = {}  # Последние результаты тестов в текущей сети (из базы)
 
         self.setup_ui()
         self.load_strategies()
+        self.load_strategy_history()
         place_toplevel_centered_on_parent(
             self.root, self.parent, min_width=640, min_height=300, margin_width=8, margin_height=12
         )
@@ -270,7 +298,7 @@ class StrategySelectionWindow:
                             # Создаем чекбокс
                             checkbox = tk.Checkbutton(
                                 column_frame,
-                                text=strategy,
+                                text=self._strategy_text(strategy),
                                 variable=var,
                                 font=("Arial", 11),
                                 fg='white',
@@ -283,6 +311,7 @@ class StrategySelectionWindow:
                                 command=self.update_selection_status
                             )
                             checkbox.pack(anchor='w', pady=1)  # Уменьшили расстояние между строками
+                            self.strategy_checkboxes[strategy] = checkbox
 
                     print(f"Загружено {len(self.strategy_items)} стратегий")
                     self.update_selection_status()
@@ -298,14 +327,46 @@ class StrategySelectionWindow:
             )
             error_label.pack(pady=20)
 
+    def load_strategy_history(self):
+        """Читает последние результаты тестов в этой сети в фоне (SQLite и определение сети — не в потоке Tk)"""
+        def worker():
+            history = latest_results_for_current_network(mode=self.HISTORY_MODE)
+            try:
+                self.root.after(0, self._apply_strategy_history, history)
+            except (tk.TclError, RuntimeError):
+                pass  # окно уже закрыто
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _apply_strategy_history(self, history):
+        """Дописывает к стратегиям последний результат и обновляет статусную строку"""
+        if not history or not self.root.winfo_exists():
+            return
+        self.strategy_history = history
+        for strategy, checkbox in self.strategy_checkboxes.items():
+            checkbox.config(text=self._strategy_text(strategy))
+        self.update_selection_status()
+
+    def _strategy_text(self, strategy):
+        """Имя стратегии с последним результатом в этой сети, если он есть"""
+        info = self.strategy_history.get(strategy)
+        if not info:
+            return strategy
+        mark = "✓" if info["working"] else "✗"
+        return f"{strategy}  {mark} {info['success_rate']:.0f}%, {format_age(info['tested_at'])}"
+
     def update_selection_status(self):
         """Обновляет статусную строку выбора"""
         if self.strategy_vars:
             selected_count = sum(1 for var in self.strategy_vars.values() if var.get())
 
             if selected_count == 0:
+                known = sum(1 for strategy in self.strategy_items if strategy in self.strategy_history)
+                text = "Выберите стратегии для тестирования или оставьте все пустым для теста всех стратегий"
+                if known:
+                    text += f"\nУже проверено в этой сети: {known} (свежие результаты берутся из базы)"
                 self.status_label.config(
-                    text="Выберите стратегии для тестирования или оставьте все пустым для теста всех стратегий",
+                    text=text,
                     fg='#AAAAAA'
                 )
             else:
@@ -18,6 +18,9 @@ from datetime import datetime, timedelta
 sys.path.append(str(Path(__file__).parent.parent.parent / 'core'))
 
 from core.game_presets import reapply_active_preset_to_config
+from core.latency_stats import format_latency, strategy_rank_key
+from core.privileged import run_privileged_shell
+from core.strategy_lanes import MAX_LANES
 
 class OutputRedirector:
     """Перенаправляет вывод print в GUI окно"""
@@ -38,12 +41,13 @@ class OutputRedirector:
         return self.buffer.getvalue()
 
 class StrategyTesterWindow:
-    def __init__(self, parent, strategies_to_test=None):
+    def __init__(self, parent, strategies_to_test=None, find_first_working=False):
         home_dir = os.path.expanduser("~")
         project_root = os.path.join(home_dir, "Zapret_DPI_Manager")
         self.parent = parent
         self.project_root = Path(project_root)
         self.strategies_to_test = strategies_to_test  # Сохраняем переданные стратегии
+        self.find_first_working = find_first_working  # Остановиться на первой рабочей стратегии
         self.window = None
         self.testing = False
         self.results = []
@@ -160,6 +164,68 @@ class StrategyTesterWindow:
             cursor='hand2'
         ).pack(side=tk.LEFT)
 
+        # Сколько стратегий проверять одновременно (1 — по очереди через службу zapret)
+        self.parallel_var = tk.IntVar(value=1)
+
+        tk.Spinbox(
+            mode_frame,
+            from_=1,
+            to=MAX_LANES,
+            width=3,
+            textvariable=self.parallel_var,
+            state='readonly',
+            font=("Arial", 10),
+            fg='white',
+            bg='#15354D',
+            readonlybackground='#15354D',
+            buttonbackground='#15354D',
+            highlightthickness=0,
+            relief=tk.FLAT,
+            cursor='hand2'
+        ).pack(side=tk.RIGHT)
+
+        tk.Label(
+            mode_frame,
+            text="Параллельно:",
+            font=("Arial", 10),
+            fg='white',
+            bg='#182030'
+        ).pack(side=tk.RIGHT, padx=(20, 5))
+
+        # Остановиться на первой рабочей (стратегии идут по успехам в этой сети)
+        self.first_working_var = tk.BooleanVar(value=self.find_first_working)
+
+        tk.Checkbutton(
+            mode_frame,
+            text="До первой рабочей",
+            variable=self.first_working_var,
+            font=("Arial", 10),
+            fg='white',
+            bg='#182030',
+            selectcolor='#182030',
+            activebackground='#182030',
+            activeforeground='#4fc3f7',
+            highlightthickness=0,
+            cursor='hand2'
+        ).pack(side=tk.RIGHT, padx=(20, 0))
+
+        # Перепроверить стратегии, даже если свежий результат уже есть в базе
+        self.force_retest_var = tk.BooleanVar(value=False)
+
+        tk.Checkbutton(
+            mode_frame,
+            text="Перепроверить всё",
+            variable=self.force_retest_var,
+            font=("Arial", 10),
+            fg='white',
+            bg='#182030',
+            selectcolor='#182030',
+            activebackground='#182030',
+            activeforeground='#4fc3f7',
+            highlightthickness=0,
+            cursor='hand2'
+        ).pack(side=tk.RIGHT, padx=(20, 0))
+
         # Область вывода результатов
         results_frame = tk.Frame(main_frame, bg='#182030')
         results_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
@@ -392,6 +458,9 @@ class StrategyTesterWindow:
 
             # Получаем выбранный режим
             mode = self.mode_var.get()
+            parallel_instances = self.parallel_var.get()
+            force_retest = self.force_retest_var.get()
+            stop_on_first_working = self.first_working_var.get()
 
             # Создаем перехватчик вывода
             redirector = OutputRedirector(self.log_message)
@@ -425,7 +494,10 @@ class StrategyTesterWindow:
             # Запускаем ПОЛНОЕ тестирование всех стратегий
             results = loop.run_until_complete(
                 tester.run_full_test(mode, strategies_to_test,
-                                    stop_callback=lambda: not self.testing)  # Добавляем callback
+                                    stop_callback=lambda: not self.testing,  # Добавляем callback
+                                    parallel_instances=parallel_instances,
+                                    force_retest=force_retest,
+                                    stop_on_first_working=stop_on_first_working)
             )
 
             # Проверяем, была ли остановка
@@ -488,7 +560,12 @@ class StrategyTesterWindow:
                         critical_fail = result.get('critical_fail', False)
                         critical_reason = result.get('critical_fail_reason', '')
 
-                        if success_rate >= 60:
+                        if result.get('pruned'):
+                            # Процент отсечённой посчитан только по проверенным целям
+                            bad_results.append(result)
+                            result["status"] = "bad"
+                            result["bad_reason"] = critical_reason or "Отсечена досрочно"
+                        elif success_rate >= 60:
                             if youtube_passed and discord_passed:
                                 good_results.append(result)
                                 result["status"] = "good"
@@ -550,19 +627,21 @@ class StrategyTesterWindow:
                     self.log_message(f"📊 Не рабочих: {len(bad_results)}", "#ff3b30" if bad_results else "#30d158")
 
 
-                # Выбираем лучшую стратегию для применения (сначала из хороших, потом из частичных)
-                all_working = good_results + partial_results
-                sorted_all_working = sorted(all_working, key=lambda x: x.get('success_rate', 0), reverse=True)
+                # Выбираем лучшую стратегию для применения: сначала полностью рабочие, потом
+                # частичные, внутри категории — по эффективности и задержке
+                # (с включённым GameFilter задержка важнее, см. strategy_rank_key)
+                def rank_key(result):
+                    return strategy_rank_key(result, tester.prefer_latency)
+
+                sorted_good = sorted(good_results, key=rank_key)
+                sorted_partial = sorted(partial_results, key=rank_key)
+                sorted_all_working = sorted_good + sorted_partial
 
                 if sorted_all_working:
                     best_result = sorted_all_working[0]  # Лучшая стратегия
                     best_status = best_result.get("status", "")
 
-                    # Сортируем отдельно для топа
-                    sorted_good = sorted(good_results, key=lambda x: x.get('success_rate', 0), reverse=True)
-                    sorted_partial = sorted(partial_results, key=lambda x: x.get('success_rate', 0), reverse=True)
-
-                    # Объединяем для топа: сначала хорошие, потом частичные
+                    # Топ в том же порядке: сначала хорошие, потом частичные
                     top_strategies = sorted_good[:3] + sorted_partial[:max(0, 3 - len(sorted_good))]
 
                     # Определяем параметры лучшей стратегии
@@ -582,6 +661,9 @@ class StrategyTesterWindow:
                         self.log_message(f"   ⚠️  ЧАСТИЧНО РАБОТАЕТ: {best_successful}/{best_total} ({best_rate:.1f}%)", "#ffb74d")
                         self.log_message(f"   Причина: {reason}", "#ffb74d")
 
+                    if best_result.get('latency'):
+                        self.log_message(f"   ⏱ Задержка: {format_latency(best_result['latency'])}", "#4fc3f7")
+
                     # Затем идет вывод топа стратегий (следующий блок)
                     self.log_message("\n🏅 ТОП СТРАТЕГИИ:", "#4fc3f7")
                     for i, result in enumerate(top_strategies[:3], 1):
@@ -823,13 +905,14 @@ class StrategyTesterWindow:
         """
         import subprocess
 
+        if use_sudo and getattr(self, 'current_password', None):
+            result = run_privileged_shell(command, self.current_password, timeout=timeout)
+            if result["returncode"] == 0:
+                return True, result["stdout"].strip()
+            return False, result["stderr"].strip()
+
         try:
-            if use_sudo and hasattr(self, 'current_password') and self.current_password:
-                full_cmd = f"echo '{self.current_password}' | sudo -S {command}"
-            elif use_sudo:
-                full_cmd = f"sudo {command}"
-            else:
-                full_cmd = command
+            full_cmd = f"sudo {command}" if use_sudo else command
 
             result = subprocess.run(
                 full_cmd,
@@ -1,13 +1,19 @@
 import tkinter as tk
 import os
+import threading
 from tkinter import messagebox
 from ui.components.button_styler import create_hover_button
 from core.service_manager import ServiceManager
 from core.game_presets import reapply_active_preset_to_config
 from ui.windows.sudo_password_window import SudoPasswordWindow
 from core.dpi_utils import place_toplevel_centered_on_parent
+from core.strategy_results_db import latest_results_for_current_network
 
 class StrategyWindow:
+    # Отметки берутся из результатов стандартного режима теста (режим тестировщика по умолчанию):
+    # результаты DPI и YouTube/Discord для той же стратегии считаются по другим целям
+    HISTORY_MODE = "standard"
+
     def __init__(self, parent):
         self.parent = parent
         self.root = tk.Toplevel(parent)
@@ -34,11 +40,13 @@ class StrategyWindow:
             "working_strategies.txt"
         )
         self.working_strategies = set()  # Множество для быстрого поиска
+        self.strategy_history = {}  # Последние результаты тестов в текущей сети (из базы)
 
         self.setup_ui()
         self.load_working_strategies()  # Загружаем рабочие стратегии перед загрузкой всех
         self.load_strategies()
         self.load_current_strategy()
+        self.load_strategy_history()
         try:
             self.root.update_idletasks()
         except tk.TclError:
@@ -69,6 +77,27 @@ class StrategyWindow:
             print(f"Ошибка загрузки рабочих стратегий: {e}")
             self.working_strategies = set()
 
+    def load_strategy_history(self):
+        """Читает последние результаты тестов в этой сети в фоне (SQLite и определение сети — не в потоке Tk)"""
+        def worker():
+            history = latest_results_for_current_network(mode=self.HISTORY_MODE)
+            try:
+                self.root.after(0, self._apply_strategy_history, history)
+            except (tk.TclError, RuntimeError):
+                pass  # окно уже закрыто
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _apply_strategy_history(self, history):
+        """Стратегии, рабочие по последнему тесту в этой сети, тоже отмечаем звездой; в подписи — процент"""
+        if not history or not self.root.winfo_exists():
+            return
+        self.strategy_history = history
+        self.working_strategies |= {name for name, info in history.items() if info["working"]}
+        for strategy, widgets in self.row_widgets.items():
+            widgets["prefix"].config(text=self._prefix_text(strategy, strategy == self.selected_strategy))
+            widgets["name"].config(text=self._name_text(strategy))
+
 
     def setup_window_properties(self):
         """Настройка свойств окна"""
@@ -166,6 +195,12 @@ class StrategyWindow:
         star = "⭐ " if strategy in self.working_strategies else ""
         return f"  {radio}  {star}"
 
+    def _name_text(self, strategy):
+        info = self.strategy_history.get(strategy)
+        if not info:
+            return strategy
+        return f"{strategy}  ({info['success_rate']:.0f}%)"
+
     def _set_row_visual(self, strategy, selected):
         w = self.row_widgets.get(strategy)
         if not w:
@@ -198,7 +233,7 @@ class StrategyWindow:
         prefix_lbl.pack(side=tk.LEFT, anchor="nw")
         name_lbl = tk.Label(
             row,
-            text=strategy,
+            text=self._name_text(strategy),
             font=lbl_font,
             fg="white",
             bg="#182030",
@@ -416,7 +451,7 @@ class StrategyWindow:
             self.apply_button.config(text="Перезапуск...")
             self.root.update()
 
-            success, message = self.service_manager.restart_service()
+            success, message = self.service_manager.reload_service()
 
             if success:
                 self.status_label.config(text="Стратегия применена, служба перезапущена", fg=self.success_color)
@@ -0,0 +1,47 @@
+"""
+Реестр окон с отложенным импортом.
+
+Главное окно не импортирует модули дочерних окон при загрузке: модуль
+окна (и цепочка core-модулей за ним — strategy_tester, zapret_checker,
+zapret_updater и т.д.) загружается при первом открытии окна и дальше
+берётся из кеша импорта. Бюджет импорта при запуске проверяет
+tools/import_budget.py.
+"""
+from __future__ import annotations
+
+import importlib
+from typing import Any, Dict, Tuple
+
+# имя окна -> (модуль, атрибут: класс окна или функция, которая его показывает)
+WINDOWS: Dict[str, Tuple[str, str]] = {
+    "strategy_selector": ("ui.windows.strategy_selector_window", "StrategySelectorWindow"),
+    "connection_check": ("ui.windows.connection_check_window", "ConnectionCheckWindow"),
+    "hostlist_settings": ("ui.windows.hostlist_settings_window", "HostlistSettingsWindow"),
+    "ipset_settings": ("ui.windows.ipset_settings_window", "IpsetMainWindow"),
+    "dns_settings": ("ui.windows.dns_settings_window", "DNSSettingsWindow"),
+    "service_unlock": ("ui.windows.service_unlock_window", "ServiceUnlockWindow"),
+    "update": ("ui.windows.update_window", "show_update_window"),
+    "donation": ("ui.windows.donat_window", "DonationWindow"),
+    "info": ("ui.windows.info_window", "show_info_dialog"),
+    "gamefilter": ("ui.windows.gamefilter_window", "GameFilterWindow"),
+    "dependency_check": ("ui.integrations.dependency_check", "run_dependency_check"),
+    "zapret_check": ("ui.integrations.zapret_check", "run_zapret_check"),
+    "zapret_uninstall": ("ui.integrations.zapret_uninstall", "run_zapret_uninstall"),
+}
+
+_loaded: Dict[str, Any] = {}
+
+
+def load_window(name: str) -> Any:
+    """Импортирует модуль окна при первом обращении и возвращает класс/функцию окна"""
+    factory = _loaded.get(name)
+    if factory is None:
+        module_name, attr = WINDOWS[name]
+        factory = getattr(importlib.import_module(module_name), attr)
+        _loaded[name] = factory
+    return factory
+
+
+def open_window(name: str, *args, **kwargs) -> Any:
+    """Создаёт окно (или вызывает функцию показа) с отложенным импортом модуля"""
+    return load_window(name)(*args, **kwargs)
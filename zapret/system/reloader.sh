@@ -0,0 +1,35 @@
+#!/bin/bash
+
+# ExecReload службы zapret: просит starter.sh (главный процесс службы) перечитать
+# конфигурацию по SIGHUP и ждёт результата, чтобы systemctl reload завершался после него
+
+if [ "$EUID" -ne 0 ]; then
+  echo "Please run as root"
+  exit 1
+fi
+
+MAIN_PID="$1"
+RELOAD_STATUS_FILE="/run/zapret/reload"
+
+if [ -z "$MAIN_PID" ] || ! kill -0 "$MAIN_PID" 2>/dev/null; then
+    echo "Error: zapret main process is not running"
+    exit 1
+fi
+
+rm -f "$RELOAD_STATUS_FILE"
+kill -HUP "$MAIN_PID" || exit 1
+
+for _ in $(seq 1 120); do
+    if [ -f "$RELOAD_STATUS_FILE" ]; then
+        RESULT=$(cat "$RELOAD_STATUS_FILE")
+        echo "Reload: $RESULT"
+        [ "$RESULT" = "ok" ] && exit 0
+        exit 1
+    fi
+    # Главный процесс завершился (процессы nfqws не запустились): systemd перезапустит службу
+    kill -0 "$MAIN_PID" 2>/dev/null || { echo "Reload: main process exited"; exit 1; }
+    sleep 0.5
+done
+
+echo "Reload: timeout"
+exit 1
@@ -79,6 +79,8 @@ echo "Config file: $CONFIG_FILE"
 
 if pidof "nfqws" > /dev/null; then
     echo "nfqws is already running."
+    # Под надзором systemd нельзя сообщить о готовности за чужой процесс
+    [ "$1" = "--foreground" ] && exit 1
     exit 0
 fi
 
@@ -98,15 +100,6 @@ else
     exit 1
 fi
 
-# СОЗДАЕМ ВРЕМЕННУЮ ДИРЕКТОРИЮ ДЛЯ ФАЙЛОВ
-TEMP_DIR=$(mktemp -d)
-echo "Using temp directory: $TEMP_DIR"
-
-# КОПИРУЕМ ВСЕ НЕОБХОДИМЫЕ ФАЙЛЫ
-echo "Copying files to temp directory..."
-cp -f "$CURRENT_HOME/Zapret_DPI_Manager/files/lists/"* "$TEMP_DIR/" 2>/dev/null || true
-cp -f "$CURRENT_HOME/Zapret_DPI_Manager/files/bin/"* "$TEMP_DIR/" 2>/dev/null || true
-
 # ОБЪЕДИНЯЕМ ОСНОВНЫЕ И USER-СПИСКИ В ОДИН ФАЙЛ
 # Это исключает зависимость от порядка повторяющихся --hostlist/--hostlist-exclude/--ipset-exclude.
 merge_unique_lists() {
@@ -131,58 +124,102 @@ merge_unique_lists() {
     fi
 }
 
-merge_unique_lists \
-    "$TEMP_DIR/list-general_merged.txt" \
-    "$TEMP_DIR/list-general.txt" \
-    "$TEMP_DIR/list-general_user.txt"
-merge_unique_lists \
-    "$TEMP_DIR/list-exclude_merged.txt" \
-    "$TEMP_DIR/list-exclude.txt" \
-    "$TEMP_DIR/list-exclude_user.txt"
-merge_unique_lists \
-    "$TEMP_DIR/ipset-exclude_merged.txt" \
-    "$TEMP_DIR/ipset-exclude.txt" \
-    "$TEMP_DIR/ipset-exclude_user.txt"
-merge_unique_lists \
-    "$TEMP_DIR/ipset-all_merged.txt" \
-    "$TEMP_DIR/ipset-all.txt" \
-    "$TEMP_DIR/ipset-all_user.txt"
+# ПРЕЖНЯЯ ПОДГОТОВКА ФАЙЛОВ ВО ВРЕМЕННОЙ ДИРЕКТОРИИ (если кеш списков недоступен)
+prepare_temp_files() {
+    TEMP_DIR=$(mktemp -d)
+    FILES_DIR="$TEMP_DIR"
+    echo "Using temp directory: $TEMP_DIR"
+
+    echo "Copying files to temp directory..."
+    cp -f "$SOURCE_FILES_DIR/lists/"* "$TEMP_DIR/" 2>/dev/null || true
+    cp -f "$SOURCE_FILES_DIR/bin/"* "$TEMP_DIR/" 2>/dev/null || true
+
+    merge_unique_lists \
+        "$TEMP_DIR/list-general_merged.txt" \
+        "$TEMP_DIR/list-general.txt" \
+        "$TEMP_DIR/list-general_user.txt"
+    merge_unique_lists \
+        "$TEMP_DIR/list-exclude_merged.txt" \
+        "$TEMP_DIR/list-exclude.txt" \
+        "$TEMP_DIR/list-exclude_user.txt"
+    merge_unique_lists \
+        "$TEMP_DIR/ipset-exclude_merged.txt" \
+        "$TEMP_DIR/ipset-exclude.txt" \
+        "$TEMP_DIR/ipset-exclude_user.txt"
+    merge_unique_lists \
+        "$TEMP_DIR/ipset-all_merged.txt" \
+        "$TEMP_DIR/ipset-all.txt" \
+        "$TEMP_DIR/ipset-all_user.txt"
+
+    chmod -R a+r "$TEMP_DIR"
+}
+
+# ГОТОВИМ СПИСКИ И BIN-ФАЙЛЫ: ПОСТОЯННЫЙ КЕШ ПО СОДЕРЖИМОМУ В /opt/zapret/cache/lists
+# (копирование и объединение списков выполняются, только если исходники изменились).
+# nfqws получает постоянный путь current -> набор: при перезагрузке (reload) ссылка
+# переключается на новый набор, и изменившиеся hostlist/ipset nfqws перечитывает сам
+SOURCE_FILES_DIR="$CURRENT_HOME/Zapret_DPI_Manager/files"
+LIST_CACHE="/opt/zapret/list_cache.py"
+CURRENT_SET_LINK="/opt/zapret/cache/lists/current"
+TEMP_DIR=""
+FILES_DIR=""
+prepare_files() {
+    local set_dir=""
+    TEMP_DIR=""
+    if [ -f "$LIST_CACHE" ] && command -v python3 > /dev/null 2>&1; then
+        set_dir=$(python3 "$LIST_CACHE" \
+            --files-dir "$SOURCE_FILES_DIR" \
+            --cache /opt/zapret/cache/lists) || set_dir=""
+    fi
+
+    if [ -n "$set_dir" ] && [ -d "$set_dir" ] \
+            && ln -sfn "$set_dir" "$CURRENT_SET_LINK.new" \
+            && mv -Tf "$CURRENT_SET_LINK.new" "$CURRENT_SET_LINK"; then
+        FILES_DIR="$CURRENT_SET_LINK"
+        echo "Using list cache: $set_dir"
+    else
+        echo "List cache unavailable, using temp directory"
+        prepare_temp_files
+    fi
+}
 
 # ПРОВЕРЯЕМ НАЛИЧИЕ ФАЙЛА gamefilter.enable В ИСХОДНОЙ ПАПКЕ
-GAME_FILTER_TCP_VALUE="12"  # значение по умолчанию для TCP
-GAME_FILTER_UDP_VALUE="12"  # значение по умолчанию для UDP
-GAME_FILTER_FILE="$CURRENT_HOME/Zapret_DPI_Manager/utils/gamefilter.enable"
-GAME_FILTER_MODE_FILE="$CURRENT_HOME/Zapret_DPI_Manager/utils/gamefilter.mode"
-GAME_FILTER_MODE="both"
-if [ -f "$GAME_FILTER_MODE_FILE" ]; then
-    GAME_FILTER_MODE=$(head -n 1 "$GAME_FILTER_MODE_FILE" | tr -d '\r\n' | tr '[:upper:]' '[:lower:]')
-fi
-if [ "$GAME_FILTER_MODE" != "tcp" ] && [ "$GAME_FILTER_MODE" != "udp" ] && [ "$GAME_FILTER_MODE" != "both" ]; then
+read_game_filter() {
+    GAME_FILTER_TCP_VALUE="12"  # значение по умолчанию для TCP
+    GAME_FILTER_UDP_VALUE="12"  # значение по умолчанию для UDP
+    GAME_FILTER_FILE="$CURRENT_HOME/Zapret_DPI_Manager/utils/gamefilter.enable"
+    GAME_FILTER_MODE_FILE="$CURRENT_HOME/Zapret_DPI_Manager/utils/gamefilter.mode"
     GAME_FILTER_MODE="both"
-fi
+    if [ -f "$GAME_FILTER_MODE_FILE" ]; then
+        GAME_FILTER_MODE=$(head -n 1 "$GAME_FILTER_MODE_FILE" | tr -d '\r\n' | tr '[:upper:]' '[:lower:]')
+    fi
+    if [ "$GAME_FILTER_MODE" != "tcp" ] && [ "$GAME_FILTER_MODE" != "udp" ] && [ "$GAME_FILTER_MODE" != "both" ]; then
+        GAME_FILTER_MODE="both"
+    fi
 
-if [ -f "$GAME_FILTER_FILE" ]; then
-    echo "Game filter enabled file found. Using game ports range (mode: $GAME_FILTER_MODE)."
-    GAME_FILTER_TCP_PORTS="80,443,27000-27100,3074-3076"
-    GAME_FILTER_UDP_PORTS="3000-3010,5050-5060,27000-27100,3478-3481,3074-3076,4380,50000-50200,49152-52000"
-    if [ "$GAME_FILTER_MODE" = "tcp" ]; then
-        GAME_FILTER_TCP_VALUE="$GAME_FILTER_TCP_PORTS"
-        GAME_FILTER_UDP_VALUE="12"
-    elif [ "$GAME_FILTER_MODE" = "udp" ]; then
-        GAME_FILTER_TCP_VALUE="12"
-        GAME_FILTER_UDP_VALUE="$GAME_FILTER_UDP_PORTS"
+    # ЗНАЧЕНИЯ ПОРТОВ ДАЁТ config_compiler.py (--game-filter); НИЖЕ — КОПИЯ ДЛЯ BASH-FALLBACK,
+    # ОНА ДОЛЖНА СОВПАДАТЬ С GAMEFILTER_* В config_compiler.py (tests/test_game_filter_values.py)
+    GAME_FILTER_STATE="off"
+    if [ -f "$GAME_FILTER_FILE" ]; then
+        echo "Game filter enabled file found. Using game ports range (mode: $GAME_FILTER_MODE)."
+        GAME_FILTER_STATE="$GAME_FILTER_MODE"
+        GAME_FILTER_TCP_PORTS="80,443,27000-27100,3074-3076"
+        GAME_FILTER_UDP_PORTS="3000-3010,5050-5060,27000-27100,3478-3481,3074-3076,4380,50000-50200,49152-52000"
+        if [ "$GAME_FILTER_MODE" = "tcp" ]; then
+            GAME_FILTER_TCP_VALUE="$GAME_FILTER_TCP_PORTS"
+            GAME_FILTER_UDP_VALUE="12"
+        elif [ "$GAME_FILTER_MODE" = "udp" ]; then
+            GAME_FILTER_TCP_VALUE="12"
+            GAME_FILTER_UDP_VALUE="$GAME_FILTER_UDP_PORTS"
+        else
+            GAME_FILTER_TCP_VALUE="$GAME_FILTER_TCP_PORTS"
+            GAME_FILTER_UDP_VALUE="$GAME_FILTER_UDP_PORTS"
+        fi
     else
-        GAME_FILTER_TCP_VALUE="$GAME_FILTER_TCP_PORTS"
-        GAME_FILTER_UDP_VALUE="$GAME_FILTER_UDP_PORTS"
+        echo "Game filter enabled file not found. Using default value 12."
     fi
-else
-    echo "Game filter enabled file not found. Using default value 12."
-fi
-
-# ДАЕМ ПРАВА НА ЧТЕНИЕ
-chmod -R a+r "$TEMP_DIR"
+}
 
-ARGS=""
 CONFIG_FILE="$CURRENT_HOME/Zapret_DPI_Manager/config.txt"
 echo "Reading config from $CONFIG_FILE"
 
@@ -191,166 +228,406 @@ if [ ! -f "$CONFIG_FILE" ]; then
     exit 1
 fi
 
-while IFS= read -r line || [[ -n "$line" ]]; do
-    # ЗАМЕНЯЕМ ПУТИ НА ВРЕМЕННЫЕ
-    line="${line//\{list_general\}/$TEMP_DIR/list-general_merged.txt}"
-    line="${line//\{list_exclude\}/$TEMP_DIR/list-exclude_merged.txt}"
-    line="${line//\{ipset_exclude\}/$TEMP_DIR/ipset-exclude_merged.txt}"
-    line="${line//\{list_google\}/$TEMP_DIR/list-google.txt}"
-    line="${line//\{ipset_all\}/$TEMP_DIR/ipset-all_merged.txt}"
-    line="${line//\{ipset_all_user\}/$TEMP_DIR/ipset-all_merged.txt}"
-    line="${line//\{ipset_exclude_user\}/$TEMP_DIR/ipset-exclude_merged.txt}"
-    line="${line//\{list_general_user\}/$TEMP_DIR/list-general_merged.txt}"
-    line="${line//\{list_exclude_user\}/$TEMP_DIR/list-exclude_merged.txt}"
-    line="${line//\{gw\}/$TEMP_DIR/gw.txt}"
-    line="${line//\{other\}/$TEMP_DIR/other.txt}"
-    line="${line//\{quicgoogle\}/$TEMP_DIR/quic_initial_www_google_com.bin}"
-    line="${line//\{tlsgoogle\}/$TEMP_DIR/tls_clienthello_www_google_com.bin}"
-    line="${line//\{tls4pda\}/$TEMP_DIR/tls_clienthello_4pda_to.bin}"
-    line="${line//\{tlsmax\}/$TEMP_DIR/tls_clienthello_max_ru.bin}"
-    line="${line//\{stun\}/$TEMP_DIR/stun.bin}"
-    line="${line//\{dbankcloud\}/$TEMP_DIR/quic_initial_dbankcloud_ru.bin}"
-
-    # ЗАМЕНЯЕМ {GameFilter} НА ЗНАЧЕНИЕ В ЗАВИСИМОСТИ ОТ ПРОТОКОЛА
-    if [[ "$line" == *"--filter-tcp"* && "$line" == *"{GameFilter}"* ]]; then
-        # Для TCP строк используем TCP значение
-        line="${line//\{GameFilter\}/$GAME_FILTER_TCP_VALUE}"
-    elif [[ "$line" == *"--filter-udp"* && "$line" == *"{GameFilter}"* ]]; then
-        # Для UDP строк используем UDP значение
-        line="${line//\{GameFilter\}/$GAME_FILTER_UDP_VALUE}"
-    fi
+# ПРЕЖНИЙ РАЗБОР config.txt СРЕДСТВАМИ BASH (если компилятор недоступен)
+compile_config_fallback() {
+    ARGS=""
+    while IFS= read -r line || [[ -n "$line" ]]; do
+        # ЗАМЕНЯЕМ ПУТИ НА ВРЕМЕННЫЕ (КОПИЯ PLACEHOLDER_FILES ИЗ config_compiler.py)
+        line="${line//\{list_general\}/$FILES_DIR/list-general_merged.txt}"
+        line="${line//\{list_exclude\}/$FILES_DIR/list-exclude_merged.txt}"
+        line="${line//\{ipset_exclude\}/$FILES_DIR/ipset-exclude_merged.txt}"
+        line="${line//\{list_google\}/$FILES_DIR/list-google.txt}"
+        line="${line//\{ipset_all\}/$FILES_DIR/ipset-all_merged.txt}"
+        line="${line//\{ipset_all_user\}/$FILES_DIR/ipset-all_merged.txt}"
+        line="${line//\{ipset_exclude_user\}/$FILES_DIR/ipset-exclude_merged.txt}"
+        line="${line//\{list_general_user\}/$FILES_DIR/list-general_merged.txt}"
+        line="${line//\{list_exclude_user\}/$FILES_DIR/list-exclude_merged.txt}"
+        line="${line//\{gw\}/$FILES_DIR/gw.txt}"
+        line="${line//\{other\}/$FILES_DIR/other.txt}"
+        line="${line//\{quicgoogle\}/$FILES_DIR/quic_initial_www_google_com.bin}"
+        line="${line//\{tlsgoogle\}/$FILES_DIR/tls_clienthello_www_google_com.bin}"
+        line="${line//\{tls4pda\}/$FILES_DIR/tls_clienthello_4pda_to.bin}"
+        line="${line//\{tlsmax\}/$FILES_DIR/tls_clienthello_max_ru.bin}"
+        line="${line//\{stun\}/$FILES_DIR/stun.bin}"
+        line="${line//\{dbankcloud\}/$FILES_DIR/quic_initial_dbankcloud_ru.bin}"
+
+        # ЗАМЕНЯЕМ {GameFilter} НА ЗНАЧЕНИЕ В ЗАВИСИМОСТИ ОТ ПРОТОКОЛА
+        if [[ "$line" == *"--filter-tcp"* && "$line" == *"{GameFilter}"* ]]; then
+            # Для TCP строк используем TCP значение
+            line="${line//\{GameFilter\}/$GAME_FILTER_TCP_VALUE}"
+        elif [[ "$line" == *"--filter-udp"* && "$line" == *"{GameFilter}"* ]]; then
+            # Для UDP строк используем UDP значение
+            line="${line//\{GameFilter\}/$GAME_FILTER_UDP_VALUE}"
+        fi
 
-    # УДАЛЯЕМ --wf-* ОПЦИИ
-    line="$(echo "$line" | sed -E 's/--wf-(tcp|udp)=[^ ]+//g')"
+        # УДАЛЯЕМ --wf-* ОПЦИИ
+        line="$(echo "$line" | sed -E 's/--wf-(tcp|udp)=[^ ]+//g')"
 
-    # НОРМАЛИЗУЕМ ПРОБЕЛЫ
-    line="$(echo "$line" | sed -E 's/  +/ /g' | sed -E 's/^ //;s/ $//')"
+        # НОРМАЛИЗУЕМ ПРОБЕЛЫ
+        line="$(echo "$line" | sed -E 's/  +/ /g' | sed -E 's/^ //;s/ $//')"
 
-    # ДОБАВЛЯЕМ В ARGS
-    if [ -n "$line" ]; then
-        ARGS+=" $line"
+        # ДОБАВЛЯЕМ В ARGS
+        if [ -n "$line" ]; then
+            ARGS+=" $line"
+        fi
+    done < "$CONFIG_FILE"
+
+    if [ "$FWTYPE" = "iptables" ]; then
+        TCP_PORTS=$(echo "$ARGS" | tr -s ' ' '\n' | grep '^--filter-tcp=' | sed 's/--filter-tcp=//' | paste -sd, | sed 's/-/:/g')
+        UDP_PORTS=$(echo "$ARGS" | tr -s ' ' '\n' | grep '^--filter-udp=' | sed 's/--filter-udp=//' | paste -sd, | sed 's/-/:/g')
+    elif [ "$FWTYPE" = "nftables" ]; then
+        TCP_PORTS=$(echo "$ARGS" | tr -s ' ' '\n' | grep '^--filter-tcp=' | sed 's/--filter-tcp=//' | paste -sd, | sed 's/:/-/g')
+        UDP_PORTS=$(echo "$ARGS" | tr -s ' ' '\n' | grep '^--filter-udp=' | sed 's/--filter-udp=//' | paste -sd, | sed 's/:/-/g')
     fi
-done < "$CONFIG_FILE"
 
-echo "Final ARGS: $ARGS"
+    # Удаляем дубликаты портов
+    TCP_PORTS=$(echo "$TCP_PORTS" | tr ',' '\n' | sort -u | tr '\n' ',' | sed 's/,$//')
+    UDP_PORTS=$(echo "$UDP_PORTS" | tr ',' '\n' | sort -u | tr '\n' ',' | sed 's/,$//')
+
+    # Преобразуем диапазоны обратно в нужный формат
+    if [ "$FWTYPE" = "iptables" ]; then
+        TCP_PORTS=$(echo "$TCP_PORTS" | sed 's/-/:/g')
+        UDP_PORTS=$(echo "$UDP_PORTS" | sed 's/-/:/g')
+    elif [ "$FWTYPE" = "nftables" ]; then
+        TCP_PORTS=$(echo "$TCP_PORTS" | sed 's/:/-/g')
+        UDP_PORTS=$(echo "$UDP_PORTS" | sed 's/:/-/g')
+    fi
 
-sysctl net.netfilter.nf_conntrack_tcp_be_liberal=1
+    read -r -a NFQWS_ARGS <<< "$ARGS"
 
-if [ "$FWTYPE" = "iptables" ]; then
-    TCP_PORTS=$(echo "$ARGS" | tr -s ' ' '\n' | grep '^--filter-tcp=' | sed 's/--filter-tcp=//' | paste -sd, | sed 's/-/:/g')
-    UDP_PORTS=$(echo "$ARGS" | tr -s ' ' '\n' | grep '^--filter-udp=' | sed 's/--filter-udp=//' | paste -sd, | sed 's/-/:/g')
-elif [ "$FWTYPE" = "nftables" ]; then
-    TCP_PORTS=$(echo "$ARGS" | tr -s ' ' '\n' | grep '^--filter-tcp=' | sed 's/--filter-tcp=//' | paste -sd, | sed 's/:/-/g')
-    UDP_PORTS=$(echo "$ARGS" | tr -s ' ' '\n' | grep '^--filter-udp=' | sed 's/--filter-udp=//' | paste -sd, | sed 's/:/-/g')
-fi
+    # Без компилятора nfqws всегда запускается одним процессом
+    NFQWS_ARGS_TCP=()
+    NFQWS_ARGS_UDP=()
+    WORKER_QNUMS=(200)
+    WORKER_PROTOCOLS=(all)
+    TCP_QUEUES=200
+    UDP_QUEUES=200
+}
 
-# Удаляем дубликаты портов
-TCP_PORTS=$(echo "$TCP_PORTS" | tr ',' '\n' | sort -u | tr '\n' ',' | sed 's/,$//')
-UDP_PORTS=$(echo "$UDP_PORTS" | tr ',' '\n' | sort -u | tr '\n' ',' | sed 's/,$//')
-
-# Преобразуем диапазоны обратно в нужный формат
-if [ "$FWTYPE" = "iptables" ]; then
-    TCP_PORTS=$(echo "$TCP_PORTS" | sed 's/-/:/g')
-    UDP_PORTS=$(echo "$UDP_PORTS" | sed 's/-/:/g')
-elif [ "$FWTYPE" = "nftables" ]; then
-    TCP_PORTS=$(echo "$TCP_PORTS" | sed 's/:/-/g')
-    UDP_PORTS=$(echo "$UDP_PORTS" | sed 's/:/-/g')
-fi
+# ЧИСЛО ПРОЦЕССОВ NFQWS (utils/nfqws.workers; НЕ БОЛЬШЕ ЧИСЛА ЯДЕР)
+read_worker_count() {
+    NFQWS_WORKERS=1
+    WORKERS_FILE="$CURRENT_HOME/Zapret_DPI_Manager/utils/nfqws.workers"
+    if [ -f "$WORKERS_FILE" ]; then
+        NFQWS_WORKERS=$(head -n 1 "$WORKERS_FILE" | tr -cd '0-9')
+        [ -z "$NFQWS_WORKERS" ] && NFQWS_WORKERS=1
+        CPU_COUNT=$(nproc 2>/dev/null || echo 1)
+        [ "$NFQWS_WORKERS" -gt "$CPU_COUNT" ] && NFQWS_WORKERS="$CPU_COUNT"
+        [ "$NFQWS_WORKERS" -lt 1 ] && NFQWS_WORKERS=1
+    fi
+}
+
+# КОМПИЛИРУЕМ config.txt В АРГУМЕНТЫ NFQWS И НАБОР ПОРТОВ ЗА ОДИН ПРОХОД
+# (результат кешируется по config.txt и значениям GameFilter)
+CONFIG_COMPILER="/opt/zapret/config_compiler.py"
+compile_config() {
+    COMPILED=""
+    if [ -f "$CONFIG_COMPILER" ] && command -v python3 > /dev/null 2>&1; then
+        COMPILED=$(python3 "$CONFIG_COMPILER" \
+            --config "$CONFIG_FILE" \
+            --files-dir "$FILES_DIR" \
+            --fwtype "$FWTYPE" \
+            --game-filter "$GAME_FILTER_STATE" \
+            --cache /opt/zapret/cache/compiled_config.json \
+            --workers "$NFQWS_WORKERS") || COMPILED=""
+    fi
 
-echo "Configuring $FWTYPE for TCP ports: $TCP_PORTS"
-echo "Configuring $FWTYPE for UDP ports: $UDP_PORTS"
-
-if [ "$FWTYPE" = "iptables" ]; then
-    iptables -t mangle -F PREROUTING
-    iptables -t mangle -F POSTROUTING
-    ip6tables -t mangle -F PREROUTING
-    ip6tables -t mangle -F POSTROUTING
-elif [ "$FWTYPE" = "nftables" ]; then
-    nft add table inet zapret
-    nft flush table inet zapret
-    nft add chain inet zapret prerouting { type filter hook prerouting priority mangle \; }
-    nft add chain inet zapret postrouting { type filter hook postrouting priority mangle \; }
+    if [ -n "$COMPILED" ]; then
+        eval "$COMPILED"
+        if [ "$CONFIG_CACHED" = "1" ]; then
+            echo "Config compiled (cached)"
+        else
+            echo "Config compiled"
+        fi
+    else
+        echo "Config compiler unavailable, using bash fallback"
+        compile_config_fallback
+    fi
+    ARGS="${NFQWS_ARGS[*]}"
+}
+
+# ПРАВИЛА ФАЙРВОЛА: ТРАФИК НА ПОРТЫ TCP_PORTS/UDP_PORTS -> ОЧЕРЕДИ TCP_QUEUES/UDP_QUEUES
+FIREWALL_RULES="/opt/zapret/firewall_rules.py"
+HAVE_FIREWALL_RULES=0
+if [ -f "$FIREWALL_RULES" ] && command -v python3 > /dev/null 2>&1; then
+    HAVE_FIREWALL_RULES=1
 fi
 
-if [ "$FWTYPE" = "iptables" ]; then
-    add_ipt_rule() {
-        local chain=$1
-        local iface_arg=$2
-        local iface_list=$3
-        local proto=$4
-        local ports=$5
-        local qnum=$6
-        local extra_flags=$7
-
-        if [ -z "$iface_list" ]; then
-             iptables -t mangle -I "$chain" -p "$proto" -m multiport --dports "$ports" \
-                $extra_flags -j NFQUEUE --queue-num "$qnum" --queue-bypass
-             iptables -t mangle -I "$chain" -p "$proto" -m multiport --sports "$ports" \
-                $extra_flags -j NFQUEUE --queue-num "$qnum" --queue-bypass
-             ip6tables -t mangle -I "$chain" -p "$proto" -m multiport --dports "$ports" \
-                $extra_flags -j NFQUEUE --queue-num "$qnum" --queue-bypass
-             ip6tables -t mangle -I "$chain" -p "$proto" -m multiport --sports "$ports" \
-                $extra_flags -j NFQUEUE --queue-num "$qnum" --queue-bypass
+apply_firewall() {
+    echo "Configuring $FWTYPE for TCP ports: $TCP_PORTS"
+    echo "Configuring $FWTYPE for UDP ports: $UDP_PORTS"
+
+    if [ "$FWTYPE" = "iptables" ]; then
+        # СВОИ ЦЕПОЧКИ ZAPRET_POST/ZAPRET_PRE: ПО ОДНОМУ iptables-restore --noflush НА IPv4 И IPv6
+        # (ТЕМ ЖЕ ВЫЗОВОМ УДАЛЯЮТСЯ ПРЯМЫЕ ПРАВИЛА NFQUEUE ПРЕЖНЕГО starter.sh)
+        if [ "$HAVE_FIREWALL_RULES" = "1" ] && python3 "$FIREWALL_RULES" \
+                --fwtype iptables --apply \
+                --tcp-ports "$TCP_PORTS" \
+                --udp-ports "$UDP_PORTS" \
+                --wan "$IFACE_WAN" \
+                --lan "$IFACE_LAN" \
+                --tcp-queues "$TCP_QUEUES" \
+                --udp-queues "$UDP_QUEUES"; then
+            echo "iptables rules loaded"
         else
-            for iface in $iface_list; do
-                iptables -t mangle -I "$chain" "$iface_arg" "$iface" -p "$proto" -m multiport --dports "$ports" \
-                    $extra_flags -j NFQUEUE --queue-num "$qnum" --queue-bypass
-                iptables -t mangle -I "$chain" "$iface_arg" "$iface" -p "$proto" -m multiport --sports "$ports" \
-                    $extra_flags -j NFQUEUE --queue-num "$qnum" --queue-bypass
-                ip6tables -t mangle -I "$chain" "$iface_arg" "$iface" -p "$proto" -m multiport --dports "$ports" \
-                    $extra_flags -j NFQUEUE --queue-num "$qnum" --queue-bypass
-                ip6tables -t mangle -I "$chain" "$iface_arg" "$iface" -p "$proto" -m multiport --sports "$ports" \
-                    $extra_flags -j NFQUEUE --queue-num "$qnum" --queue-bypass
-            done
+            echo "iptables rules generator unavailable, using iptables commands"
+            iptables -t mangle -F PREROUTING
+            iptables -t mangle -F POSTROUTING
+            ip6tables -t mangle -F PREROUTING
+            ip6tables -t mangle -F POSTROUTING
+
+            add_ipt_rule() {
+                local chain=$1
+                local iface_arg=$2
+                local iface_list=$3
+                local proto=$4
+                local ports=$5
+                local qnum=$6
+                local extra_flags=$7
+                local target="--queue-num $qnum"
+                case "$qnum" in
+                    *-*) target="--queue-balance ${qnum/-/:}" ;;
+                esac
+
+                if [ -z "$iface_list" ]; then
+                     iptables -t mangle -I "$chain" -p "$proto" -m multiport --dports "$ports" \
+                        $extra_flags -j NFQUEUE $target --queue-bypass
+                     iptables -t mangle -I "$chain" -p "$proto" -m multiport --sports "$ports" \
+                        $extra_flags -j NFQUEUE $target --queue-bypass
+                     ip6tables -t mangle -I "$chain" -p "$proto" -m multiport --dports "$ports" \
+                        $extra_flags -j NFQUEUE $target --queue-bypass
+                     ip6tables -t mangle -I "$chain" -p "$proto" -m multiport --sports "$ports" \
+                        $extra_flags -j NFQUEUE $target --queue-bypass
+                else
+                    for iface in $iface_list; do
+                        iptables -t mangle -I "$chain" "$iface_arg" "$iface" -p "$proto" -m multiport --dports "$ports" \
+                            $extra_flags -j NFQUEUE $target --queue-bypass
+                        iptables -t mangle -I "$chain" "$iface_arg" "$iface" -p "$proto" -m multiport --sports "$ports" \
+                            $extra_flags -j NFQUEUE $target --queue-bypass
+                        ip6tables -t mangle -I "$chain" "$iface_arg" "$iface" -p "$proto" -m multiport --dports "$ports" \
+                            $extra_flags -j NFQUEUE $target --queue-bypass
+                        ip6tables -t mangle -I "$chain" "$iface_arg" "$iface" -p "$proto" -m multiport --sports "$ports" \
+                            $extra_flags -j NFQUEUE $target --queue-bypass
+                    done
+                fi
+            }
+
+            if [ -n "$TCP_PORTS" ]; then
+                add_ipt_rule "POSTROUTING" "-o" "$IFACE_WAN" "tcp" "$TCP_PORTS" "$TCP_QUEUES" "-m connbytes --connbytes-dir=original --connbytes-mode=packets --connbytes 1:12"
+            fi
+            if [ -n "$UDP_PORTS" ]; then
+                add_ipt_rule "POSTROUTING" "-o" "$IFACE_WAN" "udp" "$UDP_PORTS" "$UDP_QUEUES" "-m connbytes --connbytes-dir=original --connbytes-mode=packets --connbytes 1:12"
+            fi
+
+            if [ -n "$TCP_PORTS" ]; then
+                add_ipt_rule "PREROUTING" "-i" "$IFACE_LAN" "tcp" "$TCP_PORTS" "$TCP_QUEUES" "-m connbytes --connbytes-dir=reply --connbytes-mode=packets --connbytes 1:6"
+            fi
+            if [ -n "$UDP_PORTS" ]; then
+                add_ipt_rule "PREROUTING" "-i" "$IFACE_LAN" "udp" "$UDP_PORTS" "$UDP_QUEUES" "-m connbytes --connbytes-dir=reply --connbytes-mode=packets --connbytes 1:6"
+            fi
         fi
-    }
 
-    if [ -n "$TCP_PORTS" ]; then
-        add_ipt_rule "POSTROUTING" "-o" "$IFACE_WAN" "tcp" "$TCP_PORTS" "200" "-m connbytes --connbytes-dir=original --connbytes-mode=packets --connbytes 1:12"
-    fi
-    if [ -n "$UDP_PORTS" ]; then
-        add_ipt_rule "POSTROUTING" "-o" "$IFACE_WAN" "udp" "$UDP_PORTS" "200" "-m connbytes --connbytes-dir=original --connbytes-mode=packets --connbytes 1:12"
-    fi
+    elif [ "$FWTYPE" = "nftables" ]; then
+        # ОДИН СКРИПТ ДЛЯ nft -f: ТАБЛИЦА С НАБОРАМИ ПОРТОВ @tcp_ports/@udp_ports ПЕРЕСОЗДАЁТСЯ АТОМАРНО
+        RULESET=""
+        if [ "$HAVE_FIREWALL_RULES" = "1" ]; then
+            RULESET=$(python3 "$FIREWALL_RULES" \
+                --tcp-ports "$TCP_PORTS" \
+                --udp-ports "$UDP_PORTS" \
+                --tcp-queues "$TCP_QUEUES" \
+                --udp-queues "$UDP_QUEUES") || RULESET=""
+        fi
+
+        if [ -n "$RULESET" ] && nft -f - <<< "$RULESET"; then
+            echo "nftables ruleset loaded"
+        else
+            echo "nftables ruleset generator unavailable, using nft add commands"
+            nft add table inet zapret
+            nft flush table inet zapret
+            nft add chain inet zapret prerouting { type filter hook prerouting priority mangle \; }
+            nft add chain inet zapret postrouting { type filter hook postrouting priority mangle \; }
+
+            if [ -n "$TCP_PORTS" ]; then
+                nft add rule inet zapret postrouting tcp dport { $TCP_PORTS } ct original packets 1-12 queue num $TCP_QUEUES bypass
+                nft add rule inet zapret prerouting tcp sport { $TCP_PORTS } ct reply packets 1-6 queue num $TCP_QUEUES bypass
+            fi
 
-    if [ -n "$TCP_PORTS" ]; then
-        add_ipt_rule "PREROUTING" "-i" "$IFACE_LAN" "tcp" "$TCP_PORTS" "200" "-m connbytes --connbytes-dir=reply --connbytes-mode=packets --connbytes 1:6"
+            if [ -n "$UDP_PORTS" ]; then
+                nft add rule inet zapret postrouting udp dport { $UDP_PORTS } ct original packets 1-12 queue num $UDP_QUEUES bypass
+                nft add rule inet zapret prerouting udp sport { $UDP_PORTS } ct reply packets 1-6 queue num $UDP_QUEUES bypass
+            fi
+        fi
     fi
-    if [ -n "$UDP_PORTS" ]; then
-        add_ipt_rule "PREROUTING" "-i" "$IFACE_LAN" "udp" "$UDP_PORTS" "200" "-m connbytes --connbytes-dir=reply --connbytes-mode=packets --connbytes 1:6"
+}
+
+# ТОЛЬКО НАБОРЫ ПОРТОВ (nftables): ПРАВИЛА И ОЧЕРЕДИ ОСТАЮТСЯ НА МЕСТЕ, ЗАМЕНА ОДНОЙ ТРАНЗАКЦИЕЙ
+update_port_sets() {
+    [ "$FWTYPE" = "nftables" ] && [ "$HAVE_FIREWALL_RULES" = "1" ] || return 1
+    local script
+    script=$(python3 "$FIREWALL_RULES" \
+        --sets-only \
+        --tcp-ports "$TCP_PORTS" \
+        --udp-ports "$UDP_PORTS") || return 1
+    nft -f - <<< "$script" || return 1
+    echo "nftables port sets updated: TCP $TCP_PORTS, UDP $UDP_PORTS"
+}
+
+# ЗАПУСКАЕМ NFQWS: ПО ПРОЦЕССУ НА КАЖДУЮ ОЧЕРЕДЬ ИЗ WORKER_QNUMS
+NFQWS_PIDS=()
+start_workers() {
+    echo "Starting ${#WORKER_QNUMS[@]} nfqws worker(s) with files from $FILES_DIR..."
+    NFQWS_PIDS=()
+    local workers_state=""
+    local i qnum protocol
+    for i in "${!WORKER_QNUMS[@]}"; do
+        qnum="${WORKER_QNUMS[$i]}"
+        protocol="${WORKER_PROTOCOLS[$i]}"
+        case "$protocol" in
+            tcp) WORKER_ARGS=("${NFQWS_ARGS_TCP[@]}") ;;
+            udp) WORKER_ARGS=("${NFQWS_ARGS_UDP[@]}") ;;
+            *) WORKER_ARGS=("${NFQWS_ARGS[@]}") ;;
+        esac
+        /opt/zapret/nfqws --qnum="$qnum" --uid=0:0 "${WORKER_ARGS[@]}" &
+        NFQWS_PIDS+=("$!")
+        workers_state+="$qnum $protocol $!"$'\n'
+        echo "Worker $((i + 1))/${#WORKER_QNUMS[@]}: queue $qnum ($protocol), PID $!"
+    done
+    NFQWS_PID="${NFQWS_PIDS[0]}"
+
+    # СОСТОЯНИЕ ПРОЦЕССОВ ДЛЯ МЕНЕДЖЕРА (core/nfqws_workers.py)
+    mkdir -p /run/zapret
+    printf '%s' "$workers_state" > /run/zapret/workers
+
+    # ПРОВЕРЯЕМ ЗАПУСК ВСЕХ ПРОЦЕССОВ
+    sleep 2
+    local failed_workers=0
+    for i in "${!NFQWS_PIDS[@]}"; do
+        if ! ps -p "${NFQWS_PIDS[$i]}" > /dev/null; then
+            echo "ERROR: nfqws worker for queue ${WORKER_QNUMS[$i]} failed to start!"
+            failed_workers=$((failed_workers + 1))
+        fi
+    done
+
+    if [ "$failed_workers" -eq 0 ]; then
+        echo "nfqws successfully started: ${#NFQWS_PIDS[@]} worker(s), PID(s): ${NFQWS_PIDS[*]}"
+        # УДАЛЯЕМ ВРЕМЕННЫЕ ФАЙЛЫ ПОСЛЕ УСПЕШНОГО ЗАПУСКА (файлы из кеша остаются на месте)
+        if [ -n "$TEMP_DIR" ]; then
+            rm -rf "$TEMP_DIR"
+            echo "Temp files cleaned up"
+        fi
+        return 0
     fi
 
-elif [ "$FWTYPE" = "nftables" ]; then
+    echo "ERROR: $failed_workers of ${#NFQWS_PIDS[@]} nfqws worker(s) failed to start!"
+    echo "Check above for errors"
+    stop_workers
+    [ -n "$TEMP_DIR" ] && rm -rf "$TEMP_DIR"
+    return 1
+}
 
-    if [ -n "$TCP_PORTS" ]; then
-        nft add rule inet zapret postrouting tcp dport { $TCP_PORTS } ct original packets 1-12 queue num 200 bypass
-        nft add rule inet zapret prerouting tcp sport { $TCP_PORTS } ct reply packets 1-6 queue num 200 bypass
+# ОСТАНАВЛИВАЕМ ПРОЦЕССЫ И ЖДЁМ ИХ ЗАВЕРШЕНИЯ (ОЧЕРЕДИ ОСВОБОЖДАЮТСЯ ДЛЯ НОВЫХ ПРОЦЕССОВ)
+stop_workers() {
+    [ "${#NFQWS_PIDS[@]}" -gt 0 ] || return 0
+    kill "${NFQWS_PIDS[@]}" 2>/dev/null
+    wait "${NFQWS_PIDS[@]}" 2>/dev/null
+    NFQWS_PIDS=()
+    rm -f /run/zapret/workers
+}
+
+# ВСЁ, ОТ ЧЕГО ЗАВИСЯТ АРГУМЕНТЫ ПРОЦЕССОВ: ОЧЕРЕДИ, ПРОФИЛИ И bin-ФАЙЛЫ
+# (bin-файлы nfqws читает только при запуске; inode в кеше меняется вместе с содержимым)
+worker_signature() {
+    printf '%s\n' "${WORKER_QNUMS[*]}" "${WORKER_PROTOCOLS[*]}" \
+        "${NFQWS_ARGS[*]}" "${NFQWS_ARGS_TCP[*]}" "${NFQWS_ARGS_UDP[*]}"
+    stat -c '%n %i' "$FILES_DIR"/*.bin 2>/dev/null
+}
+
+# ПЕРЕЗАГРУЗКА КОНФИГУРАЦИИ (systemctl reload zapret -> reloader.sh -> SIGHUP):
+# правила файрвола не снимаются, при тех же портах не трогаются вовсе, процессы nfqws
+# перезапускаются, только если изменились их аргументы (пока процесса нет, --queue-bypass
+# пропускает трафик очереди без обработки)
+RELOAD_STATUS_FILE="/run/zapret/reload"
+reload_service() {
+    echo "Reloading configuration..."
+    local old_workers old_queues old_ports
+    old_workers=$(worker_signature)
+    old_queues="$TCP_QUEUES $UDP_QUEUES"
+    old_ports="$TCP_PORTS $UDP_PORTS"
+
+    prepare_files
+    read_game_filter
+    read_worker_count
+    compile_config
+    echo "Final ARGS: $ARGS"
+
+    if [ "$TCP_QUEUES $UDP_QUEUES" != "$old_queues" ]; then
+        echo "nfqws queues changed, reloading firewall rules"
+        apply_firewall
+    elif [ "$TCP_PORTS $UDP_PORTS" != "$old_ports" ]; then
+        update_port_sets || apply_firewall
+    else
+        echo "Ports unchanged, firewall rules kept"
     fi
 
-    if [ -n "$UDP_PORTS" ]; then
-        nft add rule inet zapret postrouting udp dport { $UDP_PORTS } ct original packets 1-12 queue num 200 bypass
-        nft add rule inet zapret prerouting udp sport { $UDP_PORTS } ct reply packets 1-6 queue num 200 bypass
+    if [ "$(worker_signature)" = "$old_workers" ]; then
+        # Те же аргументы: nfqws сам перечитывает изменившиеся hostlist/ipset, SIGHUP — сразу
+        kill -HUP "${NFQWS_PIDS[@]}" 2>/dev/null
+        echo "nfqws arguments unchanged, workers kept (lists re-read by nfqws)"
+        return 0
     fi
+
+    echo "nfqws arguments changed, restarting workers"
+    stop_workers
+    start_workers
+}
+
+prepare_files
+read_game_filter
+read_worker_count
+compile_config
+echo "Final ARGS: $ARGS"
+
+sysctl net.netfilter.nf_conntrack_tcp_be_liberal=1
+
+apply_firewall
+
+if ! start_workers; then
+    exit 1
 fi
 
-# ЗАПУСКАЕМ NFQWS С ВРЕМЕННЫМИ ФАЙЛАМИ
-echo "Starting nfqws with temp files..."
+# В РЕЖИМЕ --foreground (Type=notify в zapret.service) СКРИПТ ОСТАЁТСЯ ГЛАВНЫМ ПРОЦЕССОМ СЛУЖБЫ:
+# СООБЩАЕТ systemd О ГОТОВНОСТИ, ПО SIGHUP ПЕРЕЧИТЫВАЕТ КОНФИГУРАЦИЮ И ЗАВЕРШАЕТСЯ С ОШИБКОЙ,
+# КАК ТОЛЬКО УПАДЁТ ЛЮБОЙ ПРОЦЕСС NFQWS
+# (systemd перезапускает службу по Restart=on-failure, правила снимает ExecStopPost=stopper.sh)
+notify_ready() {
+    if [ -n "$NOTIFY_SOCKET" ] && command -v systemd-notify > /dev/null 2>&1; then
+        systemd-notify --ready --status="nfqws: ${#NFQWS_PIDS[@]} worker(s), queues TCP $TCP_QUEUES, UDP $UDP_QUEUES"
+    fi
+}
+
 if [ "$1" = "--foreground" ]; then
-    /opt/zapret/nfqws --qnum=200 --uid=0:0 $ARGS
-else
-    /opt/zapret/nfqws --qnum=200 --uid=0:0 $ARGS &
-fi
-NFQWS_PID=$!
-
-# ПРОВЕРЯЕМ ЗАПУСК
-sleep 2
-if ps -p $NFQWS_PID > /dev/null; then
-    echo "nfqws successfully started with PID: $NFQWS_PID"
-    # УДАЛЯЕМ ВРЕМЕННЫЕ ФАЙЛЫ ПОСЛЕ УСПЕШНОГО ЗАПУСКА
-    rm -rf "$TEMP_DIR"
-    echo "Temp files cleaned up"
-else
-    echo "ERROR: nfqws failed to start!"
-    echo "Check above for errors"
-    rm -rf "$TEMP_DIR"
-    exit 1
+    RELOAD_REQUESTED=0
+    trap 'RELOAD_REQUESTED=1' HUP
+    notify_ready
+    while true; do
+        if [ "$RELOAD_REQUESTED" = "1" ]; then
+            RELOAD_REQUESTED=0
+            if reload_service; then
+                echo "ok" > "$RELOAD_STATUS_FILE"
+                notify_ready
+                continue
+            fi
+            echo "failed" > "$RELOAD_STATUS_FILE"
+            exit 1
+        fi
+
+        wait -n "${NFQWS_PIDS[@]}"
+        WORKER_STATUS=$?
+        # wait прерван сигналом HUP: перезагрузка в начале цикла
+        [ "$RELOAD_REQUESTED" = "1" ] && continue
+
+        echo "ERROR: nfqws worker exited with code $WORKER_STATUS, stopping the remaining workers"
+        stop_workers
+        exit 1
+    done
 fi
@@ -8,6 +8,7 @@ fi
 if pidof "nfqws" > /dev/null; then
     killall nfqws
 fi
+rm -f /run/zapret/workers
 
 if [ -f /opt/zapret/FWTYPE ]; then
     content=$(cat /opt/zapret/FWTYPE)
@@ -26,8 +27,15 @@ else
 fi
 
 if [ "$FWTYPE" = "iptables" ]; then
-    iptables -t mangle -F PREROUTING
-    iptables -t mangle -F POSTROUTING
+    # УДАЛЯЕМ ТОЛЬКО ЦЕПОЧКИ СЛУЖБЫ (ПРАВИЛА ДРУГИХ ПРОГРАММ В mangle ОСТАЮТСЯ)
+    FIREWALL_RULES="/opt/zapret/firewall_rules.py"
+    if [ -f "$FIREWALL_RULES" ] && command -v python3 > /dev/null 2>&1 \
+            && python3 "$FIREWALL_RULES" --fwtype iptables --remove; then
+        echo "iptables rules removed"
+    else
+        iptables -t mangle -F PREROUTING
+        iptables -t mangle -F POSTROUTING
+    fi
 elif [ "$FWTYPE" = "nftables" ]; then
     nft flush table inet zapret 2>/dev/null || true
     nft delete table inet zapret 2>/dev/null || true